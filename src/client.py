@@ -366,7 +366,7 @@ def usage(usage_error=None, cmd=None, retcode=EXIT_BADOPT, full=False,
     adv_usage["publisher"] = _("[-HPn] [-F format] [publisher ...]")
     adv_usage["history"] = _("[-HNl] [-t [time|time-time],...] [-n number] [-o column,...]")
     adv_usage["purge-history"] = ""
-    adv_usage["rebuild-index"] = ""
+    adv_usage["rebuild-index"] = _("[--incremental]")
     adv_usage["update-format"] = ""
     adv_usage["exact-install"] = _("[-nvq] [-C n] [-g path_or_uri ...] [--accept]\n"
         "            [--licenses] [--no-be-activate] [--no-index] [--no-refresh]\n"
@@ -4846,18 +4846,26 @@ def image_create(args):
     return EXIT_OK
 
 
-def rebuild_index(api_inst, pargs):
-    """pkg rebuild-index
+def rebuild_index(api_inst, args):
+    """pkg rebuild-index [--incremental]
 
     Forcibly rebuild the search indexes. Will remove existing indexes
-    and build new ones from scratch."""
+    and build new ones from scratch, unless --incremental is given, in
+    which case only the packages which don't match the existing
+    indexes are reindexed."""
+
+    incremental = False
+    opts, pargs = getopt.getopt(args, "", ["incremental"])
+    for opt, arg in opts:
+        if opt == "--incremental":
+            incremental = True
 
     if pargs:
         usage(_("command does not take operands ('{0}')").format(
             " ".join(pargs)), cmd="rebuild-index")
 
     try:
-        api_inst.rebuild_search_index()
+        api_inst.rebuild_search_index(incremental=incremental)
     except api_errors.ImageFormatUpdateNeeded as e:
         format_update_error(e)
         return EXIT_OOPS
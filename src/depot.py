@@ -19,7 +19,7 @@
 #
 # CDDL HEADER END
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
 # pkg.depotd - package repository daemon
@@ -152,7 +152,8 @@ def usage(text=None, retcode=EXIT_BADOPT, full=False):
 Usage: /usr/lib/pkg.depotd [-a address] [-d inst_root] [-p port] [-s threads]
            [-t socket_timeout] [--cfg] [--content-root]
            [--disable-ops op[/1][,...]] [--debug feature_list]
-           [--image-root dir] [--log-access dest] [--log-errors dest]
+           [--image-root dir] [--index-workers count]
+           [--log-access dest] [--log-errors dest]
            [--mirror] [--nasty] [--nasty-sleep] [--proxy-base url]
            [--readonly] [--ssl-cert-file] [--ssl-dialog] [--ssl-key-file]
            [--sort-file-max-size size] [--writable-root dir]
@@ -192,6 +193,10 @@ Usage: /usr/lib/pkg.depotd [-a address] [-d inst_root] [-p port] [-s threads]
                         hash=sha256, hash=sha1+sha512t_256, hash=sha512t_256
         --image-root    The path to the image whose file information will be
                         used as a cache for file data.
+        --index-workers The number of processes used to read package
+                        manifests when building search indexes for many
+                        packages at once.  The default value is the number
+                        of processors.
         --log-access    The destination for any access related information
                         logged by the depot process.  Possible values are:
                         stderr, stdout, none, or an absolute pathname.  The
@@ -298,7 +303,8 @@ if __name__ == "__main__":
     try:
         long_opts = ["add-content", "cfg=", "cfg-file=",
             "content-root=", "debug=", "disable-ops=", "exit-ready",
-            "help", "image-root=", "log-access=", "log-errors=",
+            "help", "image-root=", "index-workers=", "log-access=",
+            "log-errors=",
             "llmirror", "mirror", "nasty=", "nasty-sleep=",
             "proxy-base=", "readonly", "rebuild", "refresh-index",
             "set-property=", "ssl-cert-file=", "ssl-dialog=",
@@ -382,6 +388,8 @@ if __name__ == "__main__":
                 exit_ready = True
             elif opt == "--image-root":
                 ivalues["pkg"]["image_root"] = arg
+            elif opt == "--index-workers":
+                ivalues["pkg"]["index_workers"] = arg
             elif opt.startswith("--log-"):
                 prop = "log_{0}".format(opt.lstrip("--log-"))
                 ivalues["pkg"][prop] = arg
@@ -873,12 +881,15 @@ if __name__ == "__main__":
     try:
         sort_file_max_size = dconf.get_property("pkg",
             "sort_file_max_size")
+        # Use the indexer's default if no worker count was set.
+        index_workers = dconf.get_property("pkg", "index_workers") or \
+            None
 
         repo = sr.Repository(cfgpathname=repo_config_file,
             log_obj=cherrypy, mirror=mirror, properties=repo_props,
             read_only=readonly, root=inst_root,
             sort_file_max_size=sort_file_max_size,
-            writable_root=writable_root)
+            writable_root=writable_root, index_workers=index_workers)
     except (RuntimeError, sr.RepositoryError) as _e:
         emsg("pkg.depotd: {0}".format(_e))
         sys.exit(EXIT_OOPS)
@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
 """
@@ -32,13 +32,21 @@ actions are dynamically discovered, so that new modules can be placed in this
 package directory and they'll just be picked up.  The current package contents
 can be seen in the section "PACKAGE CONTENTS", below.
 
-This package has two data members:
+This package has four data members:
   "types", a dictionary which maps the action names to the classes that
   represent them.
 
   "payload_types", a dictionary which maps action names that deliver payload
   to the classes that represent them.
 
+  "lazy_types", a dictionary which maps the classes of the actions that can be
+  created lazily by "fromstr" to the classes used for them until they are
+  materialized.
+
+  "pooled_attrs", a set of the names of the attributes whose values are pooled
+  by "fromstr", and a tuple, "pooled_attr_prefixes", of the prefixes of the
+  names of any others.
+
 This package also has one function: "fromstr", which creates an action instance
 based on a str() representation of an action.
 """
@@ -85,6 +93,32 @@ for modname in __all__:
 # Clean up after ourselves
 del modname, module, nvlist, classes, cls
 
+# A dictionary mapping the classes of the action types that can be created
+# lazily by fromstr() to the classes used for them until their attributes are
+# needed.  Actions whose constructors transform their attributes can't be
+# created lazily.
+lazy_types = dict(
+    (cls, type("Lazy" + cls.__name__, (generic.LazyAction, cls),
+        { "__slots__": [] }))
+    for cls in types.values()
+    if cls.name not in ("driver", "set", "signature")
+)
+
+# The names of the attributes whose values are shared by many actions, and the
+# prefixes of the names of any others.  fromstr() pools (interns) the values of
+# these attributes so that each distinct value is only stored once however
+# many actions it appears in.  Attribute names are always pooled.  The values
+# of other attributes, such as paths, hashes and sizes, are mostly unique to an
+# action, and pooling those would only add the cost of the pool's entries.
+pooled_attrs = frozenset([
+    "disable_fmri", "elfarch", "elfbits", "fmri", "group", "license",
+    "mediator", "mediator-implementation", "mediator-priority",
+    "mediator-version", "mode", "must-accept", "must-display", "name",
+    "overlay", "owner", "preserve", "refresh_fmri", "restart_fmri",
+    "revert-tag", "suspend_fmri", "sysattr", "type",
+])
+pooled_attr_prefixes = ("facet.", "variant.")
+
 
 class ActionError(Exception):
     """Base exception class for Action errors."""
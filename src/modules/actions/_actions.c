@@ -20,7 +20,7 @@
  */
 
 /*
- * Copyright (c) 2008, 2021, Oracle and/or its affiliates.
+ * Copyright (c) 2008, 2026, Oracle and/or its affiliates.
  */
 
 #define	PY_SSIZE_T_CLEAN    1
@@ -45,6 +45,33 @@ static PyObject *aclass_link;
 static PyObject *aclass_signature;
 static PyObject *aclass_unknown;
 static PyObject *aclass_user;
+static PyObject *attrs_descr;
+static PyObject *data_descr;
+static PyObject *empty_tuple;
+
+/*
+ * The names of the attributes whose values are pooled, and the prefixes of the
+ * names of any others (see pkg.actions.pooled_attrs).
+ */
+static PyObject *pooled_attrs;
+static struct {
+	const char *prefix;
+	Py_ssize_t len;
+} pooled_prefixes[8];
+static int npooled_prefixes;
+
+/*
+ * The action types that can be created lazily, the classes used for them until
+ * they are materialized (see pkg.actions.generic.LazyAction), and the name of
+ * their key attribute.
+ */
+static struct {
+	PyObject *aclass;
+	PyObject *lclass;
+	const char *key;
+	Py_ssize_t keylen;
+} lazy_info[16];
+static int nlazy_info;
 
 static const char *notident = "hash attribute not identical to positional hash";
 static const char *nohash = "action type doesn't allow payload";
@@ -101,6 +128,27 @@ add_to_attrs(PyObject *attrs, PyObject *key, PyObject *attr, bool concat)
 	return (ret);
 }
 
+/*
+ * Returns whether the values of the attribute 'key', whose name is 'keystr',
+ * should be pooled, or -1 on error.
+ */
+static inline int
+pool_attr(PyObject *key, const char *keystr, Py_ssize_t keysize)
+{
+	int i;
+	int ret = PySet_Contains(pooled_attrs, key);
+
+	if (ret != 0)
+		return (ret);
+	for (i = 0; i < npooled_prefixes; i++) {
+		if (keysize > pooled_prefixes[i].len &&
+		    strncmp(keystr, pooled_prefixes[i].prefix,
+		    pooled_prefixes[i].len) == 0)
+			return (1);
+	}
+	return (0);
+}
+
 static void
 set_malformederr(const char *str, int pos, const char *msg)
 {
@@ -126,6 +174,12 @@ set_invaliderr(const char *str, const char *msg)
 /*
  * Note that action parsing does not support line-continuation ('\'); that
  * support is provided by the Manifest class.
+ *
+ * If 'lazy' is true, and the action type supports it, the action string is
+ * fully checked for syntax errors but only the key attribute and hash are
+ * stored; an instance of the lazy class for the action type is returned with
+ * the action string as its data.  The remaining attributes are parsed when
+ * they are first needed.
  */
 
 /*ARGSUSED*/
@@ -144,6 +198,11 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 	int smlen = 0, smpos = 0;
 	int hash_allowed;
 	bool concat = false;
+	bool seen = false;
+	bool skip = false;
+	int pool = 0;
+	int lazy = 0;
+	int li = -1;
 	char quote = 0;
 	PyObject *act_args = NULL;
 	PyObject *act_class = NULL;
@@ -153,6 +212,7 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 	PyObject *attrs = NULL;
 	PyObject *key = NULL;
 	PyObject *attr = NULL;
+	PyObject *rawstr = NULL;
 	enum {
 		KEY,	/* key			*/
 		UQVAL,	/* unquoted value	*/
@@ -168,20 +228,22 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 	 */
 #define	malformed(msg) set_malformederr(str, i, (msg))
 #define	invalid(msg) set_invaliderr(str, (msg))
-#define	CLEANUP_REFS \
-	PyMem_Free(str);\
+#define	CLEANUP_PARSE \
 	Py_XDECREF(key);\
 	Py_XDECREF(attr);\
 	Py_XDECREF(attrs);\
 	Py_XDECREF(hash);\
 	free(hashstr);
+#define	CLEANUP_REFS \
+	PyMem_Free(str);\
+	CLEANUP_PARSE
 
 	/*
 	 * Positional arguments must be included in the keyword argument list in
 	 * the order you want them to be assigned.  (A subtle point missing from
 	 * the Python documentation.)
 	 */
-	static char *kwlist[] = { "string", "data", NULL };
+	static char *kwlist[] = { "string", "data", "lazy", NULL };
 
 	/* Assume data=None by default. */
 	act_data = Py_None;
@@ -192,8 +254,8 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 	 * object provided is a Unicode object, string object, or a character
 	 * buffer.
 	 */
-	if (PyArg_ParseTupleAndKeywords(args, kwdict, "et#|O:fromstr", kwlist,
-	    "utf-8", &str, &strl, &act_data) == 0) {
+	if (PyArg_ParseTupleAndKeywords(args, kwdict, "et#|Op:fromstr", kwlist,
+	    "utf-8", &str, &strl, &act_data, &lazy) == 0) {
 		return (NULL);
 	}
 
@@ -271,6 +333,23 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 		return (NULL);
 	}
 
+	/*
+	 * Actions with data and action types that transform their attributes
+	 * when initialized are never created lazily.
+	 */
+	if (lazy && act_data == Py_None) {
+		for (li = 0; li < nlazy_info; li++) {
+			if (lazy_info[li].aclass == act_class)
+				break;
+		}
+	}
+	lazy = (li >= 0 && li < nlazy_info);
+
+retry:
+	key = attr = hash = NULL;
+	hashstr = NULL;
+	concat = seen = skip = false;
+	pool = 0;
 	ks = vs = typestrl;
 	prevstate = state = WS;
 	if ((attrs = PyDict_New()) == NULL) {
@@ -283,7 +362,7 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 			keystr = &str[ks];
 
 			if (str[i] == ' ' || str[i] == '\t' || str[i] == '\n') {
-				if (PyDict_Size(attrs) > 0 || hash != NULL) {
+				if (seen || hash != NULL) {
 					malformed("whitespace in key");
 					CLEANUP_REFS;
 					return (NULL);
@@ -304,9 +383,20 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 					state = WS;
 				}
 			} else if (str[i] == '=') {
-				key = PyUnicode_FromStringAndSize(
-				    keystr, keysize);
-				if (key == NULL) {
+				seen = true;
+
+				/*
+				 * Only the key attribute and hash of lazily
+				 * created actions are stored.
+				 */
+				skip = lazy && !(keysize ==
+				    lazy_info[li].keylen && strncmp(keystr,
+				    lazy_info[li].key, keysize) == 0) &&
+				    !(keysize == 4 && strncmp(keystr, "hash",
+				    keysize) == 0);
+
+				if (!skip && (key = PyUnicode_FromStringAndSize(
+				    keystr, keysize)) == NULL) {
 					CLEANUP_REFS;
 					return (NULL);
 				}
@@ -328,7 +418,14 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 				 * Pool attribute key to reduce memory usage and
 				 * potentially improve lookup performance.
 				 */
-				PyUnicode_InternInPlace(&key);
+				if (!skip) {
+					PyUnicode_InternInPlace(&key);
+					pool = pool_attr(key, keystr, keysize);
+					if (pool == -1) {
+						CLEANUP_REFS;
+						return (NULL);
+					}
+				}
 
 				if (i == ks) {
 					malformed("impossible: missing key");
@@ -406,6 +503,12 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 			} else if (str[i] == quote) {
 				prevstate = state;
 				state = WS;
+				if (skip) {
+					free(slashmap);
+					slashmap = NULL;
+					concat = false;
+					continue;
+				}
 				if (slashmap != NULL) {
 					char *sattr;
 					int j, o, attrlen;
@@ -463,7 +566,8 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 					hash = attr;
 					attr = NULL;
 				} else {
-					PyUnicode_InternInPlace(&attr);
+					if (pool)
+						PyUnicode_InternInPlace(&attr);
 
 					if (add_to_attrs(attrs, key, attr,
 					    concat) == -1) {
@@ -477,6 +581,8 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 			if (str[i] == ' ' || str[i] == '\t' || str[i] == '\n') {
 				prevstate = state;
 				state = WS;
+				if (skip)
+					continue;
 				Py_XDECREF(attr);
 				attr = PyUnicode_FromStringAndSize(&str[vs],
 				    i - vs);
@@ -491,7 +597,8 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 					hash = attr;
 					attr = NULL;
 				} else {
-					PyUnicode_InternInPlace(&attr);
+					if (pool)
+						PyUnicode_InternInPlace(&attr);
 
 					if (add_to_attrs(attrs, key, attr,
 					    false) == -1) {
@@ -528,7 +635,9 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 	 * UQVAL is the most frequently encountered end-state, so check that
 	 * first to avoid unnecessary state comparisons.
 	 */
-	if (state == UQVAL) {
+	if (state == UQVAL && skip) {
+		/* Value isn't stored; see above. */
+	} else if (state == UQVAL) {
 		Py_XDECREF(attr);
 		attr = PyUnicode_FromStringAndSize(&str[vs], i - vs);
 
@@ -542,7 +651,8 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 			hash = attr;
 			attr = NULL;
 		} else {
-			PyUnicode_InternInPlace(&attr);
+			if (pool)
+				PyUnicode_InternInPlace(&attr);
 
 			if (add_to_attrs(attrs, key, attr, false) == -1) {
 				CLEANUP_REFS;
@@ -562,6 +672,54 @@ fromstr(PyObject *self, PyObject *args, PyObject *kwdict)
 		return (NULL);
 	}
 
+	if (lazy) {
+		PyObject *kv = NULL;
+		Py_ssize_t pos = 0;
+
+		/*
+		 * If the key attribute is missing, has multiple values, or is a
+		 * path that the action class would transform or reject, parse
+		 * the action normally instead.
+		 */
+		if (!PyDict_Next(attrs, &pos, NULL, &kv) ||
+		    PyList_CheckExact(kv) || PyUnicode_GET_LENGTH(kv) == 0 ||
+		    PyUnicode_READ_CHAR(kv, 0) == '/') {
+			CLEANUP_PARSE;
+			lazy = 0;
+			goto retry;
+		}
+
+		if ((rawstr = PyUnicode_FromStringAndSize(str, strl)) == NULL) {
+			CLEANUP_REFS;
+			return (NULL);
+		}
+		PyMem_Free(str);
+		Py_XDECREF(key);
+		Py_XDECREF(attr);
+
+		/*
+		 * The lazy class provides properties for "attrs" and "data", so
+		 * the slots of the action class are set directly.
+		 */
+		action = ((PyTypeObject *)lazy_info[li].lclass)->tp_new(
+		    (PyTypeObject *)lazy_info[li].lclass, empty_tuple, NULL);
+		if (action == NULL ||
+		    Py_TYPE(attrs_descr)->tp_descr_set(attrs_descr, action,
+		    attrs) == -1 ||
+		    Py_TYPE(data_descr)->tp_descr_set(data_descr, action,
+		    rawstr) == -1 ||
+		    (hash != NULL && hash != Py_None &&
+		    PyObject_SetAttrString(action, "hash", hash) == -1)) {
+			Py_XDECREF(action);
+			action = NULL;
+		}
+		Py_DECREF(rawstr);
+		Py_DECREF(attrs);
+		Py_XDECREF(hash);
+		free(hashstr);
+		return (action);
+	}
+
 	PyMem_Free(str);
 	Py_XDECREF(key);
 	Py_XDECREF(attr);
@@ -619,8 +777,15 @@ static struct PyModuleDef actionmodule = {
 static PyObject *
 moduleinit(void)
 {
+	PyObject *action_class = NULL;
 	PyObject *action_types = NULL;
+	PyObject *aclass = NULL;
+	PyObject *generic = NULL;
+	PyObject *lazy_types = NULL;
+	PyObject *lclass = NULL;
 	PyObject *pkg_actions = NULL;
+	PyObject *prefixes = NULL;
+	Py_ssize_t pos = 0;
 	PyObject *sys = NULL;
 	PyObject *sys_modules = NULL;
 	PyObject *m;
@@ -708,6 +873,84 @@ moduleinit(void)
 
 	Py_DECREF(action_types);
 
+	/*
+	 * Retrieve the classes used for lazily created actions, and the slot
+	 * descriptors used to set their attributes.
+	 */
+	if ((lazy_types = PyObject_GetAttrString(pkg_actions,
+	    "lazy_types")) == NULL) {
+		PyErr_SetString(PyExc_KeyError,
+		    "pkg.actions.lazy_types missing!");
+		return (NULL);
+	}
+
+	while (PyDict_Next(lazy_types, &pos, &aclass, &lclass)) {
+		PyObject *key = PyObject_GetAttrString(aclass, "key_attr");
+
+		if (key == NULL) {
+			Py_DECREF(lazy_types);
+			return (NULL);
+		}
+		/* The class keeps the key attribute name alive. */
+		Py_DECREF(key);
+		if (key == Py_None || nlazy_info == (int)(sizeof (lazy_info) /
+		    sizeof (lazy_info[0])))
+			continue;
+
+		lazy_info[nlazy_info].aclass = aclass;
+		lazy_info[nlazy_info].lclass = lclass;
+		if ((lazy_info[nlazy_info].key = PyUnicode_AsUTF8AndSize(key,
+		    &lazy_info[nlazy_info].keylen)) == NULL) {
+			Py_DECREF(lazy_types);
+			return (NULL);
+		}
+		nlazy_info++;
+	}
+	Py_DECREF(lazy_types);
+
+	if ((generic = PyObject_GetAttrString(pkg_actions, "generic")) ==
+	    NULL)
+		return (NULL);
+	action_class = PyObject_GetAttrString(generic, "Action");
+	Py_DECREF(generic);
+	if (action_class == NULL)
+		return (NULL);
+	attrs_descr = PyObject_GetAttrString(action_class, "attrs");
+	data_descr = PyObject_GetAttrString(action_class, "data");
+	Py_DECREF(action_class);
+	if (attrs_descr == NULL || data_descr == NULL)
+		return (NULL);
+
+	if ((empty_tuple = PyTuple_New(0)) == NULL)
+		return (NULL);
+
+	/*
+	 * Retrieve the names of the attributes whose values are pooled.  The
+	 * references are kept, as the prefix strings point into the tuple's
+	 * items.
+	 */
+	if ((pooled_attrs = PyObject_GetAttrString(pkg_actions,
+	    "pooled_attrs")) == NULL)
+		return (NULL);
+	if ((prefixes = PyObject_GetAttrString(pkg_actions,
+	    "pooled_attr_prefixes")) == NULL)
+		return (NULL);
+	if (!PyAnySet_Check(pooled_attrs) || !PyTuple_Check(prefixes) ||
+	    PyTuple_GET_SIZE(prefixes) > (Py_ssize_t)(sizeof (pooled_prefixes) /
+	    sizeof (pooled_prefixes[0]))) {
+		PyErr_SetString(PyExc_TypeError,
+		    "pkg.actions.pooled_attrs or pooled_attr_prefixes invalid");
+		return (NULL);
+	}
+	for (npooled_prefixes = 0;
+	    npooled_prefixes < PyTuple_GET_SIZE(prefixes); npooled_prefixes++) {
+		if ((pooled_prefixes[npooled_prefixes].prefix =
+		    PyUnicode_AsUTF8AndSize(PyTuple_GET_ITEM(prefixes,
+		    npooled_prefixes), &pooled_prefixes[npooled_prefixes].len))
+		    == NULL)
+			return (NULL);
+	}
+
 	return (m);
 }
 
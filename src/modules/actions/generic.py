@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
 """module describing a generic packaging object
@@ -1055,6 +1055,12 @@ class Action(metaclass=NSG):
     def get_size(self):
         return int(self.attrs.get("pkg.size", "0"))
 
+    def key_attr_value(self):
+        """Returns the value of the key attribute of the action, or None
+        if the action has no key attribute."""
+
+        return self.attrs.get(self.key_attr)
+
     def attrlist(self, name):
         """return list containing value of named attribute."""
         try:
@@ -1272,3 +1278,87 @@ class Action(metaclass=NSG):
     def __init__(self, data=None, **attrs):
         # create a bound method (no unbound method in Python 3)
         _common._generic_init(self, data, **attrs)
+
+
+class LazyAction(object):
+    """Mixin class for the actions created by pkg.actions.fromstr() when
+    'lazy' is True.  Only the key attribute (and hash) of these actions is
+    parsed when they are created; the action string is kept in the 'data'
+    slot until any other attribute of the action is needed.  The action is
+    then parsed completely and becomes an instance of its regular action
+    class.
+
+    Errors in the action that are reported by the action class when it is
+    initialized (instead of by the parser) are raised when it is first
+    materialized."""
+
+    __slots__ = []
+
+    def __materialize(self):
+        act = pkg.actions.fromstr(_data_slot.__get__(self))
+        cls = type(act)
+        self.__class__ = cls
+        for name in _slot_names(cls):
+            try:
+                value = getattr(act, name)
+            except AttributeError:
+                continue
+            setattr(self, name, value)
+
+    def __getattr__(self, name):
+        # Only called for attributes that aren't set; the slots of
+        # the action class are set by materializing the action.
+        if name not in _slot_names(type(self).__bases__[1]):
+            raise AttributeError("'{0}' object has no attribute "
+                "'{1}'".format(type(self).__name__, name))
+        self.__materialize()
+        return getattr(self, name)
+
+    def __reduce_ex__(self, protocol):
+        # Copies of the action are made of the materialized action.
+        self.__materialize()
+        return self.__reduce_ex__(protocol)
+
+    @property
+    def attrs(self):
+        self.__materialize()
+        return self.attrs
+
+    @attrs.setter
+    def attrs(self, value):
+        self.__materialize()
+        self.attrs = value
+
+    @property
+    def data(self):
+        self.__materialize()
+        return self.data
+
+    @data.setter
+    def data(self, value):
+        self.__materialize()
+        self.data = value
+
+    def key_attr_value(self):
+        """Returns the value of the key attribute of the action without
+        materializing it."""
+
+        return _attrs_slot.__get__(self).get(self.key_attr)
+
+
+_attrs_slot = Action.attrs
+_data_slot = Action.data
+
+
+def _slot_names(cls, cache={}):
+    """Returns the names of the slots of action class 'cls'."""
+
+    try:
+        return cache[cls]
+    except KeyError:
+        names = cache[cls] = [
+            name
+            for c in cls.__mro__
+            for name in getattr(c, "__slots__", ())
+        ]
+        return names
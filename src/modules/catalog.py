@@ -19,11 +19,12 @@
 #
 # CDDL HEADER END
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 
 """Interfaces and implementation for the Catalog object, as well as functions
 that operate on lists of package FMRIs."""
 
+import bisect
 import copy
 import calendar
 import collections
@@ -31,12 +32,18 @@ import datetime
 import errno
 import fnmatch
 import hashlib
+import mmap
 import os
 import rapidjson as json
+import re
 import stat
+import struct
 import threading
+import time
 
 from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from operator import itemgetter
 
 import pkg.actions
@@ -54,10 +61,16 @@ class _JSONWriter:
     """Private helper class used to serialize catalog data and generate
     signatures."""
 
-    def __init__(self, data, single_pass=False, pathname=None, sign=True):
+    def __init__(self, data, single_pass=False, pathname=None, sign=True,
+        index=False):
         self.__data = data
         self.__fileobj = None
 
+        # Determines whether the offsets of the entries for each
+        # package stem are recorded (see __dump_indexed()).
+        self.__index = index
+        self.offsets = []
+
         # Determines whether data is encoded in a single pass (uses
         # more memory) or iteratively.
         self.__single_pass = single_pass
@@ -73,9 +86,9 @@ class _JSONWriter:
         # computed and expected dictionaries must be identical at
         # present, so we must use sha-1.
         if sign:
-            if not pathname:
-                # Only needed if not writing to __fileobj.
-                self.__sha_1 = hashlib.sha1()
+            # The signature is computed from the serialized data
+            # as it is written.
+            self.__sha_1 = hashlib.sha1()
             self.__sha_1_value = None
 
         self.__sign = sign
@@ -119,6 +132,58 @@ class _JSONWriter:
             return {}
         return { "sha-1": self.__sha_1_value }
 
+    def __dump_indexed(self, fp):
+        """Serializes the catalog part data one package stem at a time
+        and records a tuple of (pub, stem, offset, length) in 'offsets'
+        for the JSON text of the version entries of each stem.  The
+        output is identical to that of _dump()."""
+
+        sort_keys = self.__sign
+        order = sorted if sort_keys else iter
+
+        def encode(obj):
+            return json.dumps(obj, sort_keys=sort_keys).encode(
+                "utf-8")
+
+        offset = 0
+        offsets = self.offsets
+        buf = [b"{"]
+        offset += 1
+        for i, pub in enumerate(order(self.__data)):
+            pkg_list = self.__data[pub]
+            if i:
+                buf.append(b",")
+                offset += 1
+            key = encode(pub) + b":"
+            buf.append(key)
+            offset += len(key)
+
+            if pub[0] == "_" or not isinstance(pkg_list, dict):
+                # Reserved catalog namespace; not indexed.
+                val = encode(pkg_list)
+                buf.append(val)
+                offset += len(val)
+                continue
+
+            buf.append(b"{")
+            offset += 1
+            for j, stem in enumerate(order(pkg_list)):
+                key = (j and b"," or b"") + encode(stem) + b":"
+                val = encode(pkg_list[stem])
+                buf.append(key)
+                buf.append(val)
+                offset += len(key)
+                offsets.append((pub, stem, offset, len(val)))
+                offset += len(val)
+
+                if not self.__single_pass and len(buf) > 1024:
+                    fp.writelines(buf)
+                    buf = []
+            buf.append(b"}")
+            offset += 1
+        buf.append(b"}")
+        fp.writelines(buf)
+
     def _dump(self, obj, fp, skipkeys=False, ensure_ascii=True,
         allow_nan=True, indent=None, default=None, **kw):
         json.dump(obj, fp, skipkeys=skipkeys,
@@ -136,37 +201,34 @@ class _JSONWriter:
         # should be signed.
 
         # Whenever possible, avoid using the write wrapper (self) as
-        # this can greatly increase write times.
-        out = self.__fileobj
-        if not out:
-            out = self
-
-        self._dump(self.__data, out, sort_keys=self.__sign)
+        # it is only needed to compute the signature of the content
+        # as it is written.
+        out = self
+        if self.__fileobj and not self.__sign:
+            out = self.__fileobj
+
+        if self.__index and self.__fileobj:
+            self.__dump_indexed(out)
+        elif self.__single_pass:
+            out.write(json.dumps(self.__data,
+                sort_keys=self.__sign).encode("utf-8"))
+        else:
+            self._dump(self.__data, out, sort_keys=self.__sign)
         out.write(b"\n")
 
-        if self.__fileobj:
-            self.__fileobj.close()
-
-        if not self.__sign or not self.__fileobj:
-            # Can't sign unless a file object is provided.  And if
-            # one is provided, but no signing is to be done, then
-            # ensure the fileobject is discarded.
-            self.__fileobj = None
-            if self.__sign:
-                self.__sha_1_value = self.__sha_1.hexdigest()
-            return
+        if self.__sign:
+            self.__sha_1_value = self.__sha_1.hexdigest()
 
         # Ensure file object goes out of scope.
+        sfile = self.__fileobj
         self.__fileobj = None
+        if not sfile:
+            return
 
-        # Calculating sha-1 this way is much faster than intercepting
-        # write calls because of the excessive number of write calls
-        # that json.dump() triggers (1M+ for /dev catalog files).
-        self.__sha_1_value = misc.get_data_digest(self.pathname,
-            hash_func=hashlib.sha1)[0]
+        with sfile:
+            if not self.__sign:
+                return
 
-        # Open the JSON file so that the signature data can be added.
-        with open(self.pathname, "rb+", self.__bufsz) as sfile:
             # The last bytes should be "}\n", which is where the
             # signature data structure needs to be appended.
             sfile.seek(-2, os.SEEK_END)
@@ -186,13 +248,777 @@ class _JSONWriter:
 
         if self.__sign:
             self.__sha_1.update(data)
+        if self.__fileobj:
+            self.__fileobj.write(data)
 
     def writelines(self, iterable):
         """Wrapper function that should not be called by external
         consumers."""
 
-        for l in iterable:
-            self.__sha_1.update(l)
+        self.write(b"".join(iterable))
+
+
+def _map_file(root, path):
+    """Returns a read-only memory map of the file at 'path' (which must
+    reside in 'root'), or None if the file doesn't exist or can't be
+    accessed or mapped."""
+
+    try:
+        fobj = misc.open_image_file(root, path, os.O_RDONLY,
+            misc.PKG_FILE_MODE)
+    except api_errors.PermissionsException:
+        return None
+    except EnvironmentError as e:
+        if e.errno in (errno.ENOENT, errno.EREMOTE):
+            return None
+        raise
+
+    try:
+        return mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, EnvironmentError):
+        # Empty file or mmap not possible.
+        return None
+    finally:
+        fobj.close()
+
+
+def _signature_digest(root, path):
+    """Returns the SHA-1 signature (as bytes) of the signed JSON catalog
+    part at 'path' (which must reside in 'root'), or None if it doesn't
+    exist, can't be read, or isn't signed.  The signature data is the
+    last entry in a signed part, so only the end of the file is read."""
+
+    mm = _map_file(root, path)
+    if mm is None:
+        return None
+
+    try:
+        tail = mm[-256:]
+        pos = tail.rfind(b'"_SIGNATURE":')
+        if pos >= 0 and tail.endswith(b"}\n"):
+            try:
+                sigs = json.loads(tail[pos + 13:-2])
+                return bytes.fromhex(sigs["sha-1"])
+            except (ValueError, TypeError, KeyError):
+                pass
+        return None
+    finally:
+        mm.close()
+
+
+def _part_generation(signatures):
+    """Returns the generation stamp (as bytes) to record in the binary
+    copy and stem offset index of a catalog part with the signature data
+    'signatures' when the part is saved.  For a signed part, this is its
+    SHA-1 signature, so that the files can still be matched to the part
+    if it's copied; otherwise, it's a random value."""
+
+    try:
+        return bytes.fromhex(signatures["sha-1"])
+    except (KeyError, TypeError, ValueError):
+        return os.urandom(20)
+
+
+def _check_sidecar(root, path, src_pathname, src_stat, src_key, gen):
+    """Returns a boolean value indicating whether the binary catalog
+    part or stem offset index at 'path', the header of which records
+    the size, modification time and inode 'src_key' and generation stamp
+    'gen', applies to the JSON part at 'src_pathname' described by
+    'src_stat' (the result of os.stat() for it).
+
+    Normally, only 'src_stat' is compared with 'src_key'.  If they don't
+    match, but the part is signed using the signature recorded as 'gen'
+    (for example, because the part and its files have been copied),
+    the header is updated to match 'src_stat' if possible."""
+
+    if _same_file(src_stat, *src_key):
+        return True
+    if _signature_digest(root, src_pathname) != gen:
+        return False
+    _rekey_sidecar(path, src_stat)
+    return True
+
+
+def _rekey_sidecar(path, src_stat, old_stat=None):
+    """Updates the size, modification time and inode of the JSON part
+    recorded in the header of the binary catalog part or stem offset
+    index at 'path' to those in 'src_stat' (the result of os.stat() for
+    the JSON part) if possible.
+
+    If 'old_stat' is provided, the header is only updated if it matches
+    the JSON part described by 'old_stat'."""
+
+    # The key follows the magic and version in the header.
+    key = struct.Struct("<QqQ")
+    key_off = struct.calcsize("<8sI")
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except EnvironmentError:
+        return
+    try:
+        if old_stat is not None and not _same_file(old_stat,
+            *key.unpack(os.pread(fd, key.size, key_off))):
+            return
+        os.pwrite(fd, key.pack(src_stat.st_size,
+            src_stat.st_mtime_ns, src_stat.st_ino), key_off)
+    except (EnvironmentError, struct.error):
+        pass
+    finally:
+        os.close(fd)
+
+
+def _same_file(st, size, mtime, ino):
+    """Returns a boolean indicating whether the os.stat() result 'st'
+    matches the given size, modification time (in nanoseconds) and inode
+    number."""
+
+    return st.st_size == size and st.st_mtime_ns == mtime and \
+        st.st_ino == ino
+
+
+class _LazyStems(Mapping):
+    """Private helper class used to provide read-only access to the
+    package entries of a single publisher stored in a binary catalog
+    part; the version entries for each stem are only decoded the first
+    time they are requested."""
+
+    def __init__(self, mm, index):
+        # The memory-mapped binary catalog part.
+        self.__mm = mm
+        # A dict of stem -> (offset, length) of the encoded entries.
+        self.__index = index
+        self.__cache = {}
+
+    def __contains__(self, stem):
+        return stem in self.__index
+
+    def __getitem__(self, stem):
+        ver_list = self.__cache.get(stem)
+        if ver_list is None:
+            offset, length = self.__index[stem]
+            ver_list = json.loads(self.__mm[offset:offset + length])
+            self.__cache[stem] = ver_list
+        return ver_list
+
+    def __iter__(self):
+        return iter(self.__index)
+
+    def __len__(self):
+        return len(self.__index)
+
+
+class _BinaryCatalog:
+    """Private helper class used to store a copy of the data of a
+    CatalogPart in a versioned binary format that can be read using
+    mmap without decoding the entire part.
+
+    The file consists of a fixed-size header, a string table containing
+    the publisher prefixes and package stems, an index of records for
+    each publisher and stem, the JSON-encoded version entries for each
+    stem, and the signature data of the related JSON part.  The
+    size, modification time and inode of the JSON part at the time the
+    binary part was written, and a generation stamp (see
+    _part_generation()), are recorded in the header so that a binary
+    part that no longer matches its JSON counterpart is ignored."""
+
+    MAGIC = b"PKG5BCAT"
+    VERSION = 3
+
+    # magic, version, JSON part size, mtime (ns), inode and generation,
+    # record count, string table offset and length, index offset,
+    # signature data offset and length.
+    __HEADER = struct.Struct("<8sIQqQ20sIQQQQQ")
+
+    # publisher offset and length, stem offset and length, number of
+    # versions, entry data offset and length.
+    __RECORD = struct.Struct("<IIIIIQQ")
+
+    # The file mode to be used for all catalog files.
+    __file_mode = stat.S_IRUSR|stat.S_IWUSR|stat.S_IRGRP|stat.S_IROTH
+
+    @classmethod
+    def load(cls, pathname, file_root, src_pathname, src_stat):
+        """Returns a tuple of (data, signatures) for the binary catalog
+        part at 'pathname', where 'data' is a dict of publisher prefix
+        to a read-only mapping of stem to version entries.  None is
+        returned if the part doesn't exist, is not recognized, or does
+        not match the JSON part at 'src_pathname' described by
+        'src_stat' (the result of os.stat() for it)."""
+
+        mm = _map_file(file_root, pathname)
+        hdr = cls.__HEADER
+        if mm is None or len(mm) < hdr.size:
+            return None
+        (magic, version, src_size, src_mtime, src_ino, gen,
+            nrecs, str_off, str_len, idx_off, sig_off, sig_len) = \
+            hdr.unpack_from(mm, 0)
+        if magic != cls.MAGIC or version != cls.VERSION or \
+            not _check_sidecar(file_root, pathname, src_pathname,
+            src_stat, (src_size, src_mtime, src_ino), gen):
+            return None
+
+        rec = cls.__RECORD
+        try:
+            strtab = mm[str_off:str_off + str_len].decode("utf-8")
+            signatures = json.loads(mm[sig_off:sig_off + sig_len])
+            pubs = {}
+            for (pub_off, pub_len, stem_off, stem_len, nver,
+                data_off, data_len) in rec.iter_unpack(
+                mm[idx_off:idx_off + nrecs * rec.size]):
+                pub = strtab[pub_off:pub_off + pub_len]
+                stem = strtab[stem_off:stem_off + stem_len]
+                pubs.setdefault(pub, {})[stem] = (data_off,
+                    data_len)
+        except (struct.error, ValueError, UnicodeDecodeError):
+            # Truncated or otherwise corrupt; the JSON part will
+            # be used instead.
+            return None
+
+        data = dict(
+            (pub, _LazyStems(mm, index))
+            for pub, index in pubs.items()
+        )
+        return data, signatures
+
+    @classmethod
+    def save(cls, pathname, data, signatures, src_stat, gen,
+        sort_keys=False):
+        """Stores the catalog part 'data' and 'signatures' in binary
+        form at 'pathname'.  'src_stat' is the result of os.stat() for
+        the JSON part the data was written to, and 'gen' is its
+        generation stamp (see _part_generation()).
+
+        'sort_keys' is an optional boolean value indicating whether
+        the JSON part was written with sorted keys."""
+
+        # The string table is decoded as a whole on load, so offsets
+        # into it are character offsets rather than byte offsets.
+        strings = []
+        str_pos = {}
+        str_len = 0
+
+        def add_string(val):
+            nonlocal str_len
+            pos = str_pos.get(val)
+            if pos is None:
+                pos = str_pos[val] = str_len
+                strings.append(val)
+                str_len += len(val)
+            return pos
+
+        # Records are stored in the same order as the JSON part so
+        # that iteration order is the same for either format.
+        order = sorted if sort_keys else iter
+        recs = [
+            (pub, stem)
+            for pub in order(data)
+            if pub[0] != "_"
+            for stem in order(data[pub])
+        ]
+
+        hdr = cls.__HEADER
+        rec = cls.__RECORD
+        index = []
+        blobs = []
+        data_off = 0
+        for pub, stem in recs:
+            ver_list = data[pub][stem]
+            blob = json.dumps(ver_list).encode("utf-8")
+            index.append((add_string(pub), len(pub),
+                add_string(stem), len(stem), len(ver_list),
+                data_off, len(blob)))
+            blobs.append(blob)
+            data_off += len(blob)
+
+        strtab = "".join(strings).encode("utf-8")
+        sigdata = json.dumps(signatures).encode("utf-8")
+        str_off = hdr.size
+        idx_off = str_off + len(strtab)
+        blob_off = idx_off + len(index) * rec.size
+        sig_off = blob_off + data_off
+
+        tmppath = "{0}.new".format(pathname)
+        try:
+            with open(tmppath, "wb") as bfile:
+                bfile.write(hdr.pack(cls.MAGIC, cls.VERSION,
+                    src_stat.st_size, src_stat.st_mtime_ns,
+                    src_stat.st_ino, gen, len(index), str_off,
+                    len(strtab), idx_off, sig_off, len(sigdata)))
+                bfile.write(strtab)
+                for entry in index:
+                    bfile.write(rec.pack(*(entry[:5] +
+                        (entry[5] + blob_off, entry[6]))))
+                bfile.writelines(blobs)
+                bfile.write(sigdata)
+            os.chmod(tmppath, cls.__file_mode)
+            portable.rename(tmppath, pathname)
+        except EnvironmentError as e:
+            if e.errno == errno.EACCES:
+                raise api_errors.PermissionsException(
+                    e.filename)
+            if e.errno == errno.EROFS:
+                raise api_errors.ReadOnlyFileSystemException(
+                    e.filename)
+            raise
+
+
+class _StemOffsetIndex:
+    """Private helper class used to store and search an index of the
+    offset and length of the JSON text of the version entries for each
+    package stem within the JSON file of a CatalogPart.  This allows the
+    entries for a single stem to be read and decoded without loading
+    the entire part.
+
+    The file consists of a fixed-size header, a string table containing
+    the (UTF-8 encoded) package stems and publisher prefixes, and an
+    index of records sorted by stem and then by publisher.  As with
+    binary catalog parts, the size, modification time and inode of the
+    JSON part, and a generation stamp, are recorded so that a stale
+    index is ignored."""
+
+    MAGIC = b"PKG5CIDX"
+    VERSION = 3
+
+    # magic, version, JSON part size, mtime (ns), inode and generation,
+    # record count, string table offset and length.
+    __HEADER = struct.Struct("<8sIQqQ20sIQQ")
+
+    # stem offset and length, publisher offset and length, position of
+    # publisher in part, entry data offset and length.
+    __RECORD = struct.Struct("<IIIIIQQ")
+
+    # The file mode to be used for all catalog files.
+    __file_mode = stat.S_IRUSR|stat.S_IWUSR|stat.S_IRGRP|stat.S_IROTH
+
+    def __init__(self, mm, nrecs, str_off, key):
+        self.__mm = mm
+        self.__nrecs = nrecs
+        self.__str_off = str_off
+        self.__idx_off = self.__HEADER.size
+
+        # The (size, mtime, inode) of the JSON part this index is for.
+        self.key = key
+
+    @classmethod
+    def open(cls, pathname, file_root, src_pathname, src_stat):
+        """Returns a _StemOffsetIndex object for the index file at
+        'pathname' or None if it doesn't exist, is not recognized, or
+        doesn't match the JSON part at 'src_pathname' described by
+        'src_stat' (the result of os.stat() for it)."""
+
+        mm = _map_file(file_root, pathname)
+        hdr = cls.__HEADER
+        if mm is None or len(mm) < hdr.size:
+            return None
+        magic, version, src_size, src_mtime, src_ino, gen, \
+            nrecs, str_off, str_len = hdr.unpack_from(mm, 0)
+        if magic != cls.MAGIC or version != cls.VERSION or \
+            len(mm) < str_off + str_len or \
+            str_off < hdr.size + nrecs * cls.__RECORD.size or \
+            not _check_sidecar(file_root, pathname, src_pathname,
+            src_stat, (src_size, src_mtime, src_ino), gen):
+            return None
+        return cls(mm, nrecs, str_off, (src_stat.st_size,
+            src_stat.st_mtime_ns, src_stat.st_ino))
+
+    def lookup(self, stem):
+        """Returns a list of tuples of the form (pub, offset, length)
+        for the entries of the named package stem in the JSON part,
+        in the order the publishers appear in the part."""
+
+        mm = self.__mm
+        rec = self.__RECORD
+        str_off = self.__str_off
+        idx_off = self.__idx_off
+        key = stem.encode("utf-8")
+
+        def rec_stem(i):
+            soff, slen = struct.unpack_from("<II", mm,
+                idx_off + i * rec.size)
+            soff += str_off
+            return mm[soff:soff + slen]
+
+        # Find the first record for the stem.
+        lo = 0
+        hi = self.__nrecs
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rec_stem(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        found = []
+        while lo < self.__nrecs and rec_stem(lo) == key:
+            (soff, slen, poff, plen, ppos, doff, dlen) = \
+                rec.unpack_from(mm, idx_off + lo * rec.size)
+            poff += str_off
+            found.append((ppos, mm[poff:poff + plen].decode(
+                "utf-8"), doff, dlen))
+            lo += 1
+        found.sort()
+        return [(pub, doff, dlen) for ppos, pub, doff, dlen in found]
+
+    def names(self, pubs=EmptyI):
+        """Returns a set containing the names of all the packages in
+        the index.
+
+        'pubs' is an optional list of publisher prefixes to restrict
+        the results to."""
+
+        mm = self.__mm
+        rec = self.__RECORD
+        str_off = self.__str_off
+        names = set()
+        for i in range(self.__nrecs):
+            soff, slen, poff, plen = struct.unpack_from("<IIII", mm,
+                self.__idx_off + i * rec.size)
+            if pubs:
+                poff += str_off
+                if mm[poff:poff + plen].decode("utf-8") not in pubs:
+                    continue
+            soff += str_off
+            names.add(mm[soff:soff + slen].decode("utf-8"))
+        return names
+
+    @classmethod
+    def save(cls, pathname, offsets, src_stat, gen):
+        """Stores an index of the (pub, stem, offset, length) tuples in
+        'offsets' at 'pathname'.  'src_stat' is the result of os.stat()
+        for the JSON part the offsets are for, and 'gen' is its
+        generation stamp (see _part_generation())."""
+
+        strings = []
+        str_pos = {}
+        str_len = 0
+
+        def add_string(val):
+            nonlocal str_len
+            pos = str_pos.get(val)
+            if pos is None:
+                pos = str_pos[val] = str_len
+                strings.append(val)
+                str_len += len(val)
+            return pos
+
+        pub_pos = {}
+        recs = []
+        for pub, stem, offset, length in offsets:
+            ppos = pub_pos.setdefault(pub, len(pub_pos))
+            recs.append((stem.encode("utf-8"), pub.encode("utf-8"),
+                ppos, offset, length))
+        recs.sort()
+
+        hdr = cls.__HEADER
+        rec = cls.__RECORD
+        index = []
+        for bstem, bpub, ppos, offset, length in recs:
+            index.append(rec.pack(add_string(bstem), len(bstem),
+                add_string(bpub), len(bpub), ppos, offset, length))
+
+        str_off = hdr.size + len(index) * rec.size
+        tmppath = "{0}.new".format(pathname)
+        try:
+            with open(tmppath, "wb") as ifile:
+                ifile.write(hdr.pack(cls.MAGIC, cls.VERSION,
+                    src_stat.st_size, src_stat.st_mtime_ns,
+                    src_stat.st_ino, gen, len(index), str_off,
+                    str_len))
+                ifile.writelines(index)
+                ifile.writelines(strings)
+            os.chmod(tmppath, cls.__file_mode)
+            portable.rename(tmppath, pathname)
+        except EnvironmentError as e:
+            if e.errno == errno.EACCES:
+                raise api_errors.PermissionsException(
+                    e.filename)
+            if e.errno == errno.EROFS:
+                raise api_errors.ReadOnlyFileSystemException(
+                    e.filename)
+            raise
+
+
+class _CatalogJournal:
+    """Private helper class used to store catalog operations applied to
+    a CatalogPart since its JSON file was last written.  This allows
+    incremental updates to be applied in time proportional to the number
+    of operations instead of the size of the part.
+
+    The journal is a file of JSON text lines.  The first line records the
+    size, modification time and inode of the JSON part the journal
+    applies to so that a journal left behind after the part has been
+    rewritten is ignored.  Each following line is a list describing an
+    operation:
+
+        ["add", pub, stem, entry]
+        ["remove", pub, stem, version]
+        ["commit", last_modified]
+
+    Operations are only applied once a "commit" line for them has been
+    written, so a partially written batch of operations (for example,
+    due to an interrupted update) is discarded.  As with
+    CatalogPart.add() and remove(), an operation that adds an entry that
+    already exists or removes one that doesn't fails, so a journal that
+    no longer matches its part isn't silently applied."""
+
+    VERSION = 1
+
+    # The file mode to be used for all catalog files.
+    __file_mode = stat.S_IRUSR|stat.S_IWUSR|stat.S_IRGRP|stat.S_IROTH
+
+    @classmethod
+    def __parse(cls, content, src_stat):
+        """Returns a tuple of the form (ops, last_modified, length)
+        for the committed operations in the journal 'content' or None
+        if the journal isn't for the JSON part described by 'src_stat'.
+        'length' is the number of bytes of 'content' that are part of
+        a committed batch of operations."""
+
+        lines = content.split(b"\n")
+        try:
+            hdr = json.loads(lines[0])["_JOURNAL"]
+            if hdr["version"] != cls.VERSION or \
+                not _same_file(src_stat, hdr["size"],
+                hdr["mtime"], hdr["ino"]):
+                return None
+        except (ValueError, TypeError, KeyError, IndexError):
+            return None
+
+        ops = []
+        pending = []
+        last_modified = None
+        length = pos = len(lines[0]) + 1
+        # The last element is either empty or an incomplete line.
+        for line in lines[1:-1]:
+            pos += len(line) + 1
+            try:
+                op = json.loads(line)
+            except ValueError:
+                # Torn write; nothing after this is usable.
+                break
+            if op[0] == "commit":
+                ops.extend(pending)
+                pending = []
+                last_modified = basic_ts_to_datetime(op[1])
+                length = pos
+            else:
+                pending.append(op)
+        return ops, last_modified, length
+
+    @classmethod
+    def read(cls, pathname, file_root, src_stat):
+        """Returns a tuple of the form (ops, last_modified) containing
+        the list of committed operations in the journal at 'pathname'
+        and the time of the last commit, or None if it doesn't exist or
+        doesn't apply to the JSON part described by 'src_stat' (the
+        result of os.stat() for it)."""
+
+        try:
+            fobj = misc.open_image_file(file_root, pathname,
+                os.O_RDONLY, misc.PKG_FILE_MODE)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+        with fobj:
+            content = fobj.buffer.read()
+        res = cls.__parse(content, src_stat)
+        if res is None:
+            return None
+        return res[:2]
+
+    @classmethod
+    def append(cls, pathname, src_stat, ops, op_time):
+        """Appends the list of operations 'ops' to the journal at
+        'pathname' for the JSON part described by 'src_stat' and commits
+        them using 'op_time' (a UTC datetime object) as the time of the
+        last modification.  Returns the new size of the journal."""
+
+        try:
+            fd = os.open(pathname, os.O_RDWR|os.O_CREAT,
+                cls.__file_mode)
+        except EnvironmentError as e:
+            raise api_errors._convert_error(e)
+
+        try:
+            fsize = os.fstat(fd).st_size
+            content = os.pread(fd, fsize, 0)
+            res = cls.__parse(content, src_stat)
+            if res is None:
+                # New or stale journal; start over.
+                length = 0
+                lines = [json.dumps({ "_JOURNAL": {
+                    "version": cls.VERSION,
+                    "size": src_stat.st_size,
+                    "mtime": src_stat.st_mtime_ns,
+                    "ino": src_stat.st_ino,
+                }})]
+            else:
+                # Discard any uncommitted operations.
+                length = res[2]
+                lines = []
+            lines.extend(json.dumps(op) for op in ops)
+            lines.append(json.dumps(["commit",
+                datetime_to_basic_ts(op_time)]))
+            data = misc.force_bytes("\n".join(lines) + "\n")
+
+            os.ftruncate(fd, length)
+            os.pwrite(fd, data, length)
+            os.fsync(fd)
+            os.fchmod(fd, cls.__file_mode)
+        except EnvironmentError as e:
+            raise api_errors._convert_error(e)
+        finally:
+            os.close(fd)
+        return length + len(data)
+
+    @classmethod
+    def rekey(cls, pathname, src_stat, old_stat):
+        """Updates the journal at 'pathname' to apply to the JSON part
+        described by 'src_stat' if it applies to the JSON part described
+        by 'old_stat' (for example, because the part and its journal
+        have been copied)."""
+
+        try:
+            fd = os.open(pathname, os.O_RDWR)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return
+            raise api_errors._convert_error(e)
+
+        try:
+            content = os.pread(fd, os.fstat(fd).st_size, 0)
+            res = cls.__parse(content, old_stat)
+            if res is None:
+                return
+            # Only the committed operations are kept.
+            data = misc.force_bytes(json.dumps({ "_JOURNAL": {
+                "version": cls.VERSION,
+                "size": src_stat.st_size,
+                "mtime": src_stat.st_mtime_ns,
+                "ino": src_stat.st_ino,
+            }}) + "\n") + content[content.index(b"\n") + 1:res[2]]
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, data, 0)
+            os.fsync(fd)
+        except EnvironmentError as e:
+            raise api_errors._convert_error(e)
+        finally:
+            os.close(fd)
+
+
+class _StemIndex:
+    """Private helper class used to find the package stems matching a
+    pattern without testing the pattern against every package stem.
+
+    Stems are kept in a sorted list so that exact and prefix lookups can
+    be done using a binary search.  Indices of the stems by their last
+    component (leaf name), a sorted list of the stems reversed (for
+    suffix lookups), and the stems containing each three character
+    substring (for patterns without a literal prefix or suffix) are
+    built as they are first needed."""
+
+    # The length of the substrings used to find candidate stems.
+    __GRAM = 3
+
+    def __init__(self, stems):
+        self.__stems = sorted(stems)
+        self.__grams = None
+        self.__leaves = None
+        self.__rstems = None
+
+    @staticmethod
+    def __prefixed(stems, prefix):
+        """Returns the entries of the sorted list 'stems' starting
+        with 'prefix'."""
+
+        i = bisect.bisect_left(stems, prefix)
+        j = i
+        while j < len(stems) and stems[j].startswith(prefix):
+            j += 1
+        return stems[i:j]
+
+    def __by_leaf(self, leaf):
+        if self.__leaves is None:
+            leaves = self.__leaves = {}
+            for stem in self.__stems:
+                leaves.setdefault(stem.rsplit("/", 1)[-1],
+                    []).append(stem)
+        return self.__leaves.get(leaf, EmptyI)
+
+    def __by_suffix(self, suffix):
+        if self.__rstems is None:
+            self.__rstems = sorted(s[::-1] for s in self.__stems)
+        return [
+            s[::-1]
+            for s in self.__prefixed(self.__rstems, suffix[::-1])
+        ]
+
+    def __by_substrings(self, runs):
+        """Returns the stems containing every string in 'runs' (each of
+        which must be at least __GRAM characters long)."""
+
+        n = self.__GRAM
+        if self.__grams is None:
+            grams = self.__grams = {}
+            for i, stem in enumerate(self.__stems):
+                for g in set(stem[j:j + n]
+                    for j in range(len(stem) - n + 1)):
+                    grams.setdefault(g, []).append(i)
+
+        found = None
+        for run in runs:
+            for j in range(len(run) - n + 1):
+                idxs = self.__grams.get(run[j:j + n])
+                if not idxs:
+                    return EmptyI
+                if found is None:
+                    found = set(idxs)
+                else:
+                    found.intersection_update(idxs)
+        return [self.__stems[i] for i in sorted(found)]
+
+    def matching(self, matcher, pattern):
+        """Returns a list of the stems matching 'pattern' using
+        'matcher', which must be one of the pkg.fmri functions
+        exact_name_match, fmri_match or glob_match."""
+
+        stems = self.__stems
+        if matcher == fmri.exact_name_match:
+            i = bisect.bisect_left(stems, pattern)
+            if i < len(stems) and stems[i] == pattern:
+                return [pattern]
+            return []
+
+        if matcher == fmri.fmri_match:
+            return [
+                s
+                for s in self.__by_leaf(pattern.rsplit("/", 1)[-1])
+                if matcher(s, pattern)
+            ]
+
+        assert matcher == fmri.glob_match
+        if "[" in pattern:
+            # Character classes can't appear in stems, so no attempt
+            # is made to use the literal parts of the pattern.
+            cands = stems
+        else:
+            runs = re.split(r"[*?]+", pattern)
+            if len(runs) == 1:
+                # No wildcards.
+                return self.matching(fmri.exact_name_match,
+                    pattern)
+            long_runs = [r for r in runs if len(r) >= self.__GRAM]
+            if runs[0]:
+                cands = self.__prefixed(stems, runs[0])
+            elif runs[-1]:
+                cands = self.__by_suffix(runs[-1])
+            elif long_runs:
+                cands = self.__by_substrings(long_runs)
+            else:
+                cands = stems
+        return [s for s in cands if fnmatch.fnmatchcase(s, pattern)]
 
 
 class CatalogPartBase:
@@ -347,7 +1173,7 @@ class CatalogPartBase:
             return None
         return os.path.join(self.meta_root, self.name)
 
-    def save(self, data, single_pass=False):
+    def save(self, data, single_pass=False, index=False):
         """Serialize and store the transformed catalog part's 'data' in
         a file using the pathname <self.meta_root>/<self.name>.
 
@@ -357,10 +1183,15 @@ class CatalogPartBase:
         should be serialized in a single pass.  This is significantly
         faster, but requires that the entire set of data be serialized
         in-memory instead of iteratively writing it to the target
-        storage object."""
+        storage object.
+
+        'index' is an optional boolean indicating whether the offsets
+        of the entries for each package stem should be recorded.  If
+        True, a list of tuples of the form (pub, stem, offset, length)
+        is returned; otherwise, the list is empty."""
 
         f = _JSONWriter(data, single_pass=single_pass,
-            pathname=self.pathname, sign=self.sign)
+            pathname=self.pathname, sign=self.sign, index=index)
         f.save()
 
         # Update in-memory copy to reflect stored data.
@@ -383,6 +1214,7 @@ class CatalogPartBase:
             mtime = calendar.timegm(
                 self.last_modified.utctimetuple())
             os.utime(self.pathname, (mtime, mtime))
+        return f.offsets
 
     meta_root = property(__get_meta_root, __set_meta_root)
     file_root = property(__get_file_root, __set_file_root)
@@ -393,13 +1225,29 @@ class CatalogPart(CatalogPartBase):
     FMRIs available from a package repository."""
 
     __data = None
+    __lazy = False
+    __offset_index = None
+    __stem_index = None
+    __stems = None
+    binary = False
     ordered = None
 
+    # The maximum number of package stems that will be retrieved using
+    # the stem offset index before the entire part is loaded instead.
+    __MAX_STEM_LOOKUPS = 32
+
     def __init__(self, name, meta_root=None, ordered=True, sign=True,
-        file_root=None):
-        """Initializes a CatalogPart object."""
+        file_root=None, binary=False):
+        """Initializes a CatalogPart object.
+
+        'binary' is an optional boolean value indicating whether a
+        binary copy of the part's data should be written when the part
+        is saved and used (when current) to load the part's data on
+        demand instead of decoding the entire JSON part."""
 
         self.__data = {}
+        self.__stems = {}
+        self.binary = binary
         self.ordered = ordered
         if not name.startswith("catalog."):
             raise api_errors.UnrecognizedCatalogPart(name)
@@ -452,6 +1300,215 @@ class CatalogPart(CatalogPartBase):
             for entry in self.__data[pub][stem]
         )
 
+    def __op_error(self, op_type, pub, stem, ver):
+        """Returns the exception to raise for a journaled catalog
+        operation that can't be applied to the part's data."""
+
+        pfmri = "pkg://{0}/{1}@{2}".format(pub, stem, ver)
+        if op_type == CatalogUpdate.ADD:
+            return api_errors.DuplicateCatalogEntry(pfmri,
+                operation="add", catalog_name=self.pathname)
+        return api_errors.UnknownCatalogEntry(pfmri)
+
+    def __apply_ops(self, ops):
+        """Applies the list of journaled catalog operations 'ops' to the
+        part's data.  Raises DuplicateCatalogEntry or
+        UnknownCatalogEntry if an operation adds an entry that already
+        exists or removes one that doesn't."""
+
+        def key_func(item):
+            return pkg.version.Version(item["version"])
+
+        touched = set()
+        for op_type, pub, stem, val in ops:
+            if op_type == CatalogUpdate.ADD:
+                ver_list = self.__data.setdefault(pub,
+                    {}).setdefault(stem, [])
+                for entry in ver_list:
+                    if entry["version"] == val["version"]:
+                        raise self.__op_error(op_type, pub,
+                            stem, val["version"])
+                ver_list.append(val)
+                touched.add((pub, stem))
+                continue
+
+            ver_list = self.__data.get(pub, EmptyDict).get(stem,
+                EmptyI)
+            for i, entry in enumerate(ver_list):
+                if entry["version"] == val:
+                    del ver_list[i]
+                    break
+            else:
+                raise self.__op_error(op_type, pub, stem, val)
+            if not ver_list:
+                del self.__data[pub][stem]
+            if not self.__data[pub]:
+                del self.__data[pub]
+
+        for pub, stem in touched:
+            ver_list = self.__data.get(pub, EmptyDict).get(stem)
+            if ver_list:
+                ver_list.sort(key=key_func)
+
+    def __check_ops(self, ops):
+        """Raises DuplicateCatalogEntry or UnknownCatalogEntry if the
+        list of catalog operations 'ops' can't be applied in order to
+        the part's (loaded) data.  Only the entries for the packages
+        the operations apply to are retrieved."""
+
+        # The (pub, stem, version) tuples added or removed by the
+        # operations checked so far.
+        exists = {}
+        for op_type, pub, stem, val in ops:
+            ver = val["version"] if op_type == CatalogUpdate.ADD \
+                else val
+            key = (pub, stem, ver)
+            found = exists.get(key)
+            if found is None:
+                found = any(
+                    entry["version"] == ver
+                    for entry in self.__data.get(pub,
+                        EmptyDict).get(stem, EmptyI)
+                )
+            if found == (op_type == CatalogUpdate.ADD):
+                raise self.__op_error(op_type, pub, stem, ver)
+            exists[key] = not found
+
+    def __read_journal(self):
+        """Returns a tuple of the form (ops, last_modified) for the
+        committed operations in the part's journal, or None if there
+        are none that apply to the part's JSON file."""
+
+        try:
+            src_stat = os.stat(self.pathname)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+        res = _CatalogJournal.read(self.journal_pathname,
+            self.file_root, src_stat)
+        if not res or not res[0]:
+            return None
+        return res
+
+    def __load_binary(self):
+        """Attempts to load the part's data from its binary copy;
+        returns a boolean indicating whether it was successful."""
+
+        try:
+            src_stat = os.stat(self.pathname)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return False
+            raise
+
+        res = _BinaryCatalog.load(self.binary_pathname,
+            self.file_root, self.pathname, src_stat)
+        if res is None:
+            return False
+
+        self.__data, self.signatures = res
+        self.__lazy = True
+        self.loaded = True
+        return True
+
+    def __get_offset_index(self, src_stat):
+        """Returns the stem offset index for the part's JSON file
+        described by 'src_stat' (the result of os.stat() for it) or
+        None if it doesn't exist or doesn't match."""
+
+        idx = self.__offset_index
+        if idx is None or idx.key != (src_stat.st_size,
+            src_stat.st_mtime_ns, src_stat.st_ino):
+            idx = self.__offset_index = _StemOffsetIndex.open(
+                self.index_pathname, self.file_root, self.pathname,
+                src_stat)
+        return idx
+
+    def __lookup_stem(self, stem):
+        """Returns a list of tuples of the form (pub, ver_list) for the
+        named package stem read using the part's stem offset index, or
+        None if the part has been (or had to be) loaded instead."""
+
+        if self.loaded:
+            return None
+
+        stems = self.__stems
+        found = stems.get(stem)
+        if found is not None:
+            return found
+
+        if self.binary or len(stems) >= self.__MAX_STEM_LOOKUPS or \
+            os.path.exists(self.journal_pathname):
+            # Binary parts are decoded on demand already, and if
+            # a large number of stems are being retrieved, loading
+            # the entire part is faster.  The index also doesn't
+            # reflect any journaled operations.
+            self.load()
+            return None
+
+        try:
+            fobj = misc.open_image_file(self.file_root,
+                self.pathname, os.O_RDONLY, misc.PKG_FILE_MODE)
+        except (api_errors.PermissionsException, EnvironmentError):
+            # Let load() handle (or raise) any errors.
+            self.load()
+            return None
+
+        with fobj:
+            idx = self.__get_offset_index(os.fstat(fobj.fileno()))
+            if idx is None:
+                # No index, or index doesn't match the part.
+                self.load()
+                return None
+
+            found = []
+            try:
+                for pub, offset, length in idx.lookup(stem):
+                    found.append((pub, json.loads(os.pread(
+                        fobj.fileno(), length, offset))))
+            except ValueError:
+                # Index doesn't match the part's content.
+                self.__offset_index = None
+                self.load()
+                return None
+
+        stems[stem] = found
+        return found
+
+    def __stem_entries(self, stem, pubs=EmptyI):
+        """A generator function that produces tuples of the form (pub,
+        ver_list) for the named package stem.
+
+        'pubs' is an optional list of publisher prefixes to restrict
+        the results to."""
+
+        found = self.__lookup_stem(stem)
+        if found is not None:
+            for pub, ver_list in found:
+                if not pubs or pub in pubs:
+                    yield pub, ver_list
+            return
+
+        for pub in self.publishers(pubs=pubs):
+            ver_list = self.__data[pub].get(stem)
+            if ver_list:
+                yield pub, ver_list
+
+    def __materialize(self):
+        """Decodes any package data only available from the part's
+        binary copy so that the part's data can be modified or
+        serialized."""
+
+        if not self.__lazy:
+            return
+        self.__data = dict(
+            (pub, dict(stems.items()))
+            for pub, stems in self.__data.items()
+        )
+        self.__lazy = False
+
     def add(self, pfmri=None, metadata=None, op_time=None, pub=None,
         stem=None, ver=None):
         """Add a catalog entry for a given FMRI or FMRI components.
@@ -471,6 +1528,8 @@ class CatalogPart(CatalogPartBase):
             # Hot path, so avoid calling load unless necessary, even
             # though it performs this check already.
             self.load()
+        if self.__lazy:
+            self.__materialize()
 
         if pfmri:
             pub, stem, ver = pfmri.tuple()
@@ -494,6 +1553,7 @@ class CatalogPart(CatalogPartBase):
         entry["version"] = ver
 
         ver_list.append(entry)
+        self.__stem_index = None
         if self.ordered:
             self.sort(pfmris=set([pfmri]))
 
@@ -503,11 +1563,125 @@ class CatalogPart(CatalogPartBase):
         self.signatures = {}
         return entry
 
+    def append_journal(self, updates, op_time):
+        """Records the catalog operations in 'updates' in the part's
+        journal instead of rewriting the part.  The operations are
+        applied to the part's data whenever it is loaded, until the
+        part is next saved.  Returns the size of the journal in bytes.
+
+        'updates' is a list of tuples of the form (op_type, fmri,
+        metadata), where 'op_type' is a CatalogUpdate operation
+        constant and 'metadata' is the catalog metadata for the FMRI
+        (if any).
+
+        'op_time' is a UTC datetime object indicating the time of the
+        last operation."""
+
+        assert self.meta_root and self.exists
+
+        ops = []
+        for op_type, pfmri, metadata in updates:
+            if not pfmri.publisher:
+                raise api_errors.AnarchicalCatalogFMRI(
+                    pfmri.get_fmri())
+            pub, stem, ver = pfmri.tuple()
+            ver = str(ver)
+            if op_type == CatalogUpdate.ADD:
+                entry = dict(metadata or EmptyDict)
+                entry["version"] = ver
+                ops.append([op_type, pub, stem, entry])
+            elif op_type == CatalogUpdate.REMOVE:
+                ops.append([op_type, pub, stem, ver])
+            else:
+                raise api_errors.UnknownUpdateType(op_type)
+
+        # As with add() and remove(), operations that don't apply to
+        # the part are rejected before anything is recorded.
+        self.load()
+        self.__check_ops(ops)
+
+        size = _CatalogJournal.append(self.journal_pathname,
+            os.stat(self.pathname), ops, op_time)
+
+        # Keep any data that has already been retrieved current.
+        self.__stems = {}
+        self.__offset_index = None
+        self.__stem_index = None
+        if self.__lazy:
+            # Decoding the entire binary copy would cost more than
+            # loading the part and its journal when next needed.
+            self.__data = {}
+            self.__lazy = False
+            self.loaded = False
+        else:
+            self.__apply_ops(ops)
+        self.last_modified = op_time
+        self.signatures = {}
+        return size
+
+    @property
+    def binary_pathname(self):
+        """The absolute path of the file used to store the binary copy
+        of the data for this part or None if meta_root or name is not
+        set."""
+
+        if not self.meta_root or not self.name:
+            return None
+        return "{0}.bin".format(self.pathname)
+
+    @property
+    def index_pathname(self):
+        """The absolute path of the file used to store the stem offset
+        index for this part or None if meta_root or name is not set."""
+
+        if not self.meta_root or not self.name:
+            return None
+        return "{0}.idx".format(self.pathname)
+
+    @property
+    def journal_last_modified(self):
+        """A UTC datetime object indicating the time of the last
+        operation committed to the part's journal or None if it has no
+        operations that apply to the part."""
+
+        if not self.meta_root or not self.name:
+            return None
+        res = self.__read_journal()
+        return res[1] if res else None
+
+    @property
+    def journal_pathname(self):
+        """The absolute path of the file used to store the journal of
+        catalog operations for this part or None if meta_root or name
+        is not set."""
+
+        if not self.meta_root or not self.name:
+            return None
+        return "{0}.journal".format(self.pathname)
+
     def destroy(self):
         """Removes any on-disk files that exist for the catalog part and
         discards all content."""
 
         self.__data = {}
+        self.__lazy = False
+        self.__stems = {}
+        self.__offset_index = None
+        self.__stem_index = None
+        for path in (self.binary_pathname, self.index_pathname,
+            self.journal_pathname):
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                portable.remove(path)
+            except EnvironmentError as e:
+                if e.errno == errno.EACCES:
+                    raise api_errors.PermissionsException(
+                        e.filename)
+                if e.errno == errno.EROFS:
+                    raise api_errors.ReadOnlyFileSystemException(
+                        e.filename)
+                raise
         return CatalogPartBase.destroy(self)
 
     def entries(self, cb=None, last=False, ordered=False, pubs=EmptyI):
@@ -557,12 +1731,9 @@ class CatalogPart(CatalogPartBase):
         'pubs' is an optional list of publisher prefixes to restrict
         the results to."""
 
-        self.load()
-
         versions = {}
         entries = {}
-        for pub in self.publishers(pubs=pubs):
-            ver_list = self.__data[pub].get(name, ())
+        for pub, ver_list in self.__stem_entries(name, pubs=pubs):
             for entry in ver_list:
                 sver = entry["version"]
                 pfmri = fmri.PkgFmri(name=name, publisher=pub,
@@ -621,15 +1792,9 @@ class CatalogPart(CatalogPartBase):
         'pubs' is an optional list of publisher prefixes to restrict
         the results to."""
 
-        self.load()
-
         versions = {}
         entries = {}
-        for pub in self.publishers(pubs=pubs):
-            ver_list = self.__data[pub].get(name, None)
-            if not ver_list:
-                continue
-
+        for pub, ver_list in self.__stem_entries(name, pubs=pubs):
             for entry in ver_list:
                 sver = entry["version"]
                 pfmri = fmri.PkgFmri(name=name, publisher=pub,
@@ -650,15 +1815,22 @@ class CatalogPart(CatalogPartBase):
         if pfmri and not pfmri.publisher:
             raise api_errors.AnarchicalCatalogFMRI(str(pfmri))
 
-        # Since this is a hot path, this function checks for loaded
-        # status before attempting to call the load function.
-        if not self.loaded:
-            self.load()
-
         if pfmri:
             pub, stem, ver = pfmri.tuple()
             ver = str(ver)
 
+        # Since this is a hot path, this function checks for loaded
+        # status before attempting to retrieve the entries for just
+        # the requested stem or calling the load function.
+        if not self.loaded:
+            for spub, ver_list in self.__stem_entries(stem,
+                pubs=(pub,)):
+                for entry in ver_list:
+                    if entry["version"] == ver:
+                        return entry
+            if not self.loaded:
+                return
+
         pkg_list = self.__data.get(pub, None)
         if not pkg_list:
             return
@@ -710,7 +1882,29 @@ class CatalogPart(CatalogPartBase):
         if self.loaded:
             # Already loaded, or only in-memory.
             return
+        # Individually retrieved stems are no longer needed.
+        self.__stems = {}
+        self.__offset_index = None
+        self.__stem_index = None
+        journal = self.__read_journal()
+        if not journal and self.binary and self.__load_binary():
+            return
         self.__data = CatalogPartBase.load(self)
+        if journal:
+            ops, self.last_modified = journal
+            self.__apply_ops(ops)
+            # The signatures of the JSON part no longer apply.
+            self.signatures = {}
+
+    def matching_names(self, matcher, pattern):
+        """Returns a list of the names of the packages in the
+        CatalogPart matching the package name 'pattern' using
+        'matcher', which must be one of the pkg.fmri functions
+        exact_name_match, fmri_match or glob_match."""
+
+        if self.__stem_index is None:
+            self.__stem_index = _StemIndex(self.names())
+        return self.__stem_index.matching(matcher, pattern)
 
     def names(self, pubs=EmptyI):
         """Returns a set containing the names of all the packages in
@@ -719,6 +1913,18 @@ class CatalogPart(CatalogPartBase):
         'pubs' is an optional list of publisher prefixes to restrict
         the results to."""
 
+        if not self.loaded and not self.binary and \
+            not os.path.exists(self.journal_pathname):
+            # The names can be read from the stem offset index
+            # (if current) without loading the part.
+            try:
+                idx = self.__get_offset_index(
+                    os.stat(self.pathname))
+            except EnvironmentError:
+                idx = None
+            if idx is not None:
+                return idx.names(pubs=pubs)
+
         self.load()
         return set((
             stem
@@ -781,6 +1987,7 @@ class CatalogPart(CatalogPartBase):
             raise api_errors.AnarchicalCatalogFMRI(pfmri.get_fmri())
 
         self.load()
+        self.__materialize()
         pkg_list = self.__data.get(pfmri.publisher, None)
         if not pkg_list:
             raise api_errors.UnknownCatalogEntry(pfmri.get_fmri())
@@ -806,6 +2013,7 @@ class CatalogPart(CatalogPartBase):
         else:
             raise api_errors.UnknownCatalogEntry(pfmri.get_fmri())
 
+        self.__stem_index = None
         if not op_time:
             op_time = datetime.datetime.utcnow()
         self.last_modified = op_time
@@ -827,8 +2035,56 @@ class CatalogPart(CatalogPartBase):
 
         # Ensure content is loaded before attempting save.
         self.load()
+        self.__materialize()
+
+        offsets = CatalogPartBase.save(self, self.__data,
+            single_pass=single_pass, index=True)
+        src_stat = os.stat(self.pathname)
+        gen = _part_generation(self.signatures)
+        _StemOffsetIndex.save(self.index_pathname, offsets, src_stat,
+            gen)
+        if self.binary:
+            _BinaryCatalog.save(self.binary_pathname, self.__data,
+                self.signatures, src_stat, gen, sort_keys=self.sign)
+
+        # The part now includes any journaled operations.
+        self.remove_journal()
+
+    def rekey(self, src_pathname):
+        """Updates the binary copy, stem offset index and journal of
+        this part, copied along with its JSON file from the part at
+        'src_pathname', so that they apply to the copy if they applied
+        to the original.  Copying the files doesn't preserve the inode
+        (or possibly the modification time) of the JSON file, so they
+        would otherwise be ignored."""
+
+        if not self.meta_root:
+            return
+
+        try:
+            old_stat = os.stat(src_pathname)
+            src_stat = os.stat(self.pathname)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return
+            raise api_errors._convert_error(e)
 
-        CatalogPartBase.save(self, self.__data, single_pass=single_pass)
+        for path in (self.binary_pathname, self.index_pathname):
+            _rekey_sidecar(path, src_stat, old_stat=old_stat)
+        _CatalogJournal.rekey(self.journal_pathname, src_stat,
+            old_stat)
+        self.__offset_index = None
+
+    def remove_journal(self):
+        """Removes the journal of catalog operations for this part,
+        if it has one."""
+
+        jpath = self.journal_pathname
+        if jpath and os.path.exists(jpath):
+            try:
+                portable.remove(jpath)
+            except EnvironmentError as e:
+                raise api_errors._convert_error(e)
 
     def sort(self, pfmris=None, pubs=None):
         """Re-sorts the contents of the CatalogPart such that version
@@ -851,6 +2107,7 @@ class CatalogPart(CatalogPartBase):
             return pkg.version.Version(item["version"])
 
         self.load()
+        self.__materialize()
         if pfmris is not None:
             processed = set()
             for f in pfmris:
@@ -950,6 +2207,7 @@ class CatalogPart(CatalogPartBase):
         # Ensure content is loaded before attempting to retrieve
         # or generate signature data.
         self.load()
+        self.__materialize()
         if not signatures:
             signatures = self.signatures
 
@@ -1362,9 +2620,13 @@ class Catalog:
     # found near the end of the class definition.
     _attrs = None
     __batch_mode = None
+    __binary = None
     __lock = None
     __meta_root = None
     __file_root = None
+    __journal = None
+    __save_timings = None
+    __save_workers = None
     __sign = None
 
     # These are used to cache or store CatalogPart and CatalogUpdate objects
@@ -1376,8 +2638,13 @@ class Catalog:
     # Class Constants
     DEPENDENCY, SUMMARY = range(2)
 
+    # When incremental updates are journaled, a part is rewritten once
+    # its journal exceeds this fraction of the part's size.
+    __JOURNAL_COMPACT_RATIO = 0.25
+
     def __init__(self, batch_mode=False, meta_root=None, log_updates=False,
-        read_only=False, sign=True, file_root=None):
+        read_only=False, sign=True, file_root=None, binary=False,
+        save_workers=1, journal=False):
         """Initializes a Catalog object.
 
         'batch_mode' is an optional boolean value that indicates that
@@ -1408,9 +2675,32 @@ class Catalog:
         the catalog data should have signature data generated and
         embedded when serialized.  This option is primarily a matter
         of convenience for callers that wish to trade integrity checks
-        for improved catalog serialization performance."""
+        for improved catalog serialization performance.
+
+        'binary' is an optional boolean value that indicates that a
+        binary copy of each catalog part should be stored alongside
+        the JSON part when saved and used to load catalog data on
+        demand.  This is intended for catalogs that are only used by
+        the client (such as image catalogs); the JSON parts remain
+        the authoritative (and interchange) format.
+
+        'save_workers' is an optional integer value indicating the
+        maximum number of catalog parts that may be serialized and
+        signed concurrently when the catalog is saved.  By default,
+        parts are saved one after another.
+
+        'journal' is an optional boolean value that indicates that
+        apply_updates() should record incremental updates in a journal
+        for each catalog part instead of rewriting the parts.  Parts
+        are only rewritten (compacted) once their journal grows large
+        relative to the part.  Journaled updates are applied when a
+        part is loaded."""
 
         self.__batch_mode = batch_mode
+        self.__binary = binary
+        self.__journal = journal
+        self.__save_timings = []
+        self.__save_workers = max(save_workers, 1)
         self.__parts = {}
         self.__updates = {}
 
@@ -1792,6 +3082,16 @@ class Catalog:
                 "last-modified": part.last_modified
             }
 
+    def __matching_names(self, matcher, pattern):
+        """Returns a list of the names of the packages in the catalog
+        matching the package name 'pattern' using 'matcher'."""
+
+        base = self.get_part(self.__BASE_PART, must_exist=True)
+        if base is None:
+            # Catalog contains nothing.
+            return []
+        return base.matching_names(matcher, pattern)
+
     @staticmethod
     def __parse_fmri_patterns(patterns):
         """A generator function that yields a list of tuples of the form
@@ -1864,10 +3164,15 @@ class Catalog:
         """Private save function.  Caller is responsible for locking
         the catalog."""
 
+        start = time.time()
+        timings = self.__save_timings = []
+
         attrs = self._attrs
         if self.log_updates:
             for name, ulog in self.__updates.items():
+                pstart = time.time()
                 ulog.save()
+                timings.append((name, time.time() - pstart))
 
                 # Replace the existing signature data
                 # with the new signature data.
@@ -1877,31 +3182,45 @@ class Catalog:
                 for n, v in ulog.signatures.items():
                     entry["signature-{0}".format(n)] = v
 
-        # Save any CatalogParts that are currently in-memory,
-        # updating their related information in catalog.attrs
-        # as they are saved.
-        for name, part in self.__parts.items():
-            # Must save first so that signature data is
-            # current.
-
+        def save_part(name):
             # single-pass encoding is not used for summary part as
             # it increases memory usage substantially (30MB at
             # current for /dev).  No significant difference is
             # detectable for other parts though.
+            pstart = time.time()
             single_pass = name in (self.__BASE_PART,
                 self.__DEPS_PART)
-            part.save(single_pass=single_pass)
+            self.__parts[name].save(single_pass=single_pass)
+            return time.time() - pstart
+
+        # Save any CatalogParts that are currently in-memory.  Each
+        # part is independent of the others, so if allowed, they are
+        # serialized and signed concurrently.
+        names = list(self.__parts.keys())
+        workers = min(self.__save_workers, len(names))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                elapsed = list(pool.map(save_part, names))
+        else:
+            elapsed = [save_part(name) for name in names]
 
-            # Now replace the existing signature data with
-            # the new signature data.
+        # Now update their related information in catalog.attrs,
+        # replacing the existing signature data with the new
+        # signature data.
+        for name, etime in zip(names, elapsed):
+            part = self.__parts[name]
             entry = attrs.parts[name] = {
                 "last-modified": part.last_modified
             }
             for n, v in part.signatures.items():
                 entry["signature-{0}".format(n)] = v
+            timings.append((name, etime))
 
         # Finally, save the catalog attributes.
+        pstart = time.time()
         attrs.save()
+        timings.append((attrs.name, time.time() - pstart))
+        timings.append(("total", time.time() - start))
 
     def __set_batch_mode(self, value):
         self.__batch_mode = value
@@ -2239,10 +3558,34 @@ class Catalog:
         # updates.
         old_parts = self._attrs.parts
 
+        # Used to store the operations to be journaled and the time of
+        # the last of them for each part when journaling updates.
+        journaled = {}
+        journal_times = {}
+
+        # Used to store the time after which updates are applied to
+        # each part.
+        part_times = {}
+
+        def get_sigs(mdata):
+            sigs = {}
+            for key in mdata:
+                if not key.startswith("signature-"):
+                    continue
+                sig = key.split("signature-")[1]
+                sigs[sig] = mdata[key]
+            return sigs
+
         def apply_incremental(name):
             # Load the CatalogUpdate from the path specified.
             # (Which is why __get_update is not used.)
             ulog = CatalogUpdate(name, meta_root=path)
+            if self.__journal:
+                # Parts aren't rewritten (and so can't be verified)
+                # when journaling, so verify the update log instead.
+                ulog.validate(signatures=get_sigs(
+                    new_attrs.updates.get(name, EmptyDict)))
+
             for pfmri, op_type, op_time, metadata in ulog.updates():
                 for pname, pdata in metadata.items():
                     part = self.get_part(pname,
@@ -2251,7 +3594,17 @@ class Catalog:
                         # Part doesn't exist; skip.
                         continue
 
-                    lm = old_parts[pname]["last-modified"]
+                    lm = part_times.get(pname)
+                    if lm is None:
+                        lm = old_parts[pname]["last-modified"]
+                        # Updates that were journaled without
+                        # the new catalog.attrs file being put
+                        # in place must not be applied again.
+                        jlm = self.__journal and \
+                            part.journal_last_modified
+                        if jlm and jlm > lm:
+                            lm = jlm
+                        part_times[pname] = lm
                     if op_time <= lm:
                         # Only add updates to the part
                         # that occurred after the last
@@ -2259,7 +3612,13 @@ class Catalog:
                         # modified.
                         continue
 
-                    if op_type == CatalogUpdate.ADD:
+                    if self.__journal:
+                        journaled.setdefault(pname, []).append(
+                            (op_type, pfmri, pdata))
+                        if op_time > journal_times.get(pname,
+                            lm):
+                            journal_times[pname] = op_time
+                    elif op_type == CatalogUpdate.ADD:
                         part.add(pfmri, metadata=pdata,
                             op_time=op_time)
                     elif op_type == CatalogUpdate.REMOVE:
@@ -2274,6 +3633,14 @@ class Catalog:
             dest = os.path.join(self.meta_root, name)
             portable.copyfile(src, dest)
 
+            # Any journal for the part no longer applies.
+            jpath = "{0}.journal".format(dest)
+            if name.startswith("catalog.") and os.path.exists(jpath):
+                try:
+                    portable.remove(jpath)
+                except EnvironmentError as e:
+                    raise api_errors._convert_error(e)
+
         self.__lock_catalog()
         try:
             old_batch_mode = self.batch_mode
@@ -2284,6 +3651,7 @@ class Catalog:
                 # Nothing has changed, so nothing to do.
                 return
 
+            new_attrs = CatalogAttrs(meta_root=path)
             for name in updates:
                 if name.startswith("update."):
                     # The provided update is an incremental.
@@ -2294,27 +3662,52 @@ class Catalog:
 
             # Next, verify that all of the updated parts have a
             # signature that matches the new catalog.attrs file.
-            new_attrs = CatalogAttrs(meta_root=path)
             new_sigs = {}
             for name, mdata in new_attrs.parts.items():
-                new_sigs[name] = {}
-                for key in mdata:
-                    if not key.startswith("signature-"):
+                new_sigs[name] = get_sigs(mdata)
+
+            if self.__journal:
+                # Record the operations for each part.  Each part's
+                # journal is committed before the new catalog.attrs
+                # file is put in place; if that doesn't happen, the
+                # journaled updates are skipped when next applied.
+                # The update logs have been verified and the
+                # operations must apply to each part, so parts are
+                # only verified in full when their journal has
+                # grown too large and they are rewritten.
+                for name, ops in journaled.items():
+                    part = self.__parts[name]
+                    jsize = part.append_journal(ops,
+                        journal_times[name])
+                    psize = os.stat(part.pathname).st_size
+                    if jsize <= psize * \
+                        self.__JOURNAL_COMPACT_RATIO:
                         continue
-                    sig = key.split("signature-")[1]
-                    new_sigs[name][sig] = mdata[key]
 
-            # This must be done to ensure that the catalog
-            # signature matches that of the source.
-            self.batch_mode = old_batch_mode
-            self.finalize()
+                    try:
+                        part.validate(signatures=new_sigs[name])
+                    except api_errors.BadCatalogSignatures:
+                        # Don't leave a journal behind that
+                        # would be applied to the part when
+                        # next loaded.
+                        part.remove_journal()
+                        raise
+                    part.save(single_pass=name in (
+                        self.__BASE_PART, self.__DEPS_PART))
+            else:
+                # This must be done to ensure that the catalog
+                # signature matches that of the source.
+                self.batch_mode = old_batch_mode
+                self.finalize()
 
-            for name, part in self.__parts.items():
-                part.validate(signatures=new_sigs[name])
+                for name, part in self.__parts.items():
+                    part.validate(signatures=new_sigs[name])
 
-            # Finally, save the catalog, and then copy the new
-            # catalog attributes file into place and reload it.
-            self.__save()
+                # Save the catalog.
+                self.__save()
+
+            # Finally, copy the new catalog attributes file into
+            # place and reload it.
             apply_full(self._attrs.name)
 
             self._attrs = CatalogAttrs(meta_root=self.meta_root)
@@ -2904,6 +4297,7 @@ class Catalog:
         # extract the individual components for use in filtering.
         newest = False
         illegals = []
+        pat_names = {}
         pat_tuples = {}
         latest_pats = set()
         seen = set()
@@ -2930,6 +4324,8 @@ class Catalog:
             if getattr(pfmri.version, "match_latest", None):
                 latest_pats.add(pat)
             pat_tuples[pat] = (pfmri.tuple(), matcher)
+            pat_names[pat] = frozenset(self.__matching_names(
+                matcher, pfmri.pkg_name))
 
         patterns = npatterns
         del npatterns, seen
@@ -2979,29 +4375,11 @@ class Catalog:
                             omit_package = True
                         continue
 
-                    if matcher == fmri.exact_name_match:
-                        if pat_stem != stem:
-                            # Stem doesn't match.
-                            if omit_package is None:
-                                omit_package = \
-                                    True
-                            continue
-                    elif matcher == fmri.fmri_match:
-                        if not ("/" + stem).endswith(
-                            "/" + pat_stem):
-                            # Stem doesn't match.
-                            if omit_package is None:
-                                omit_package = \
-                                    True
-                            continue
-                    elif matcher == fmri.glob_match:
-                        if not fnmatch.fnmatchcase(stem,
-                            pat_stem):
-                            # Stem doesn't match.
-                            if omit_package is None:
-                                omit_package = \
-                                    True
-                            continue
+                    if stem not in pat_names[pat]:
+                        # Stem doesn't match.
+                        if omit_package is None:
+                            omit_package = True
+                        continue
 
                     if pat_ver is not None:
                         if ever is None:
@@ -3244,14 +4622,19 @@ class Catalog:
         # dictionary of pkg names & fmris that match that pattern.
         ret = dict(zip(patterns, [dict() for i in patterns]))
 
-        for name in self.names():
-            for pat, matcher, pfmri in pat_data:
-                pub = pfmri.publisher
-                version = pfmri.version
-                if not matcher(name, pfmri.pkg_name):
-                    continue # name doesn't match
-                for ver, entries in \
-                    self.entries_by_version(name):
+        # Determine the patterns matching each package name using the
+        # stem index instead of testing every name.
+        name_pats = {}
+        for pat, matcher, pfmri in pat_data:
+            for name in self.__matching_names(matcher,
+                pfmri.pkg_name):
+                name_pats.setdefault(name, []).append((pat, pfmri))
+
+        for name in sorted(name_pats):
+            for ver, entries in self.entries_by_version(name):
+                for pat, pfmri in name_pats[name]:
+                    pub = pfmri.publisher
+                    version = pfmri.version
                     if version and not ver.is_successor(
                         version,
                         pkg.version.CONSTRAINT_AUTO):
@@ -3382,7 +4765,7 @@ class Catalog:
         # for it and add it to catalog attributes.
         part = CatalogPart(name, meta_root=self.meta_root,
             ordered=not self.__batch_mode, sign=self.__sign,
-            file_root=self.file_root)
+            file_root=self.file_root, binary=self.__binary)
         if must_exist and self.meta_root and not part.exists:
             # This is a double-check for the client case where
             # there is a part that is known to the catalog but
@@ -3602,6 +4985,25 @@ class Catalog:
             return set()
         return set(p for p in base.publishers())
 
+    def rekey(self, src_root):
+        """Updates the files used to speed up access to the parts of
+        the catalog after it has been copied from 'src_root' (for
+        example, using misc.copytree()) so that they continue to be
+        used for the copy.  This must be called after the catalog's
+        meta_root has been changed to the location of the copy."""
+
+        if not self.meta_root:
+            return
+
+        for name in self._attrs.parts:
+            part = self.__parts.get(name)
+            if part is None:
+                # Every cached part is saved, so the part isn't
+                # cached here.
+                part = CatalogPart(name, meta_root=self.meta_root,
+                    file_root=self.file_root, binary=self.__binary)
+            part.rekey(os.path.join(src_root, name))
+
     def remove_package(self, pfmri):
         """Remove a package and its metadata."""
 
@@ -3652,6 +5054,14 @@ class Catalog:
         finally:
             self.__unlock_catalog()
 
+    @property
+    def save_timings(self):
+        """A list of tuples of the form (name, seconds) indicating the
+        time taken to save each catalog file during the last save(),
+        followed by the total time taken (named 'total')."""
+
+        return self.__save_timings
+
     @property
     def signatures(self):
         """Returns a dict of the files the catalog is composed of along
@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2007, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
 # Missing docstring; pylint: disable=C0111
@@ -112,6 +112,10 @@ class GlobalSettings:
         # Minimum bytes/sec before client thinks about giving up
         # on connection.
         self.pkg_client_lowspeed_limit = 1024
+        # Minimum number of bytes of a file that must have been
+        # received before an interrupted download of it is kept so
+        # that it can be resumed.
+        self.pkg_client_resume_min_size = 1024 * 1024
         # Maximum number of transient errors before we abort an
         # endpoint.
         self.pkg_client_max_consecutive_error_default = 4
@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2008, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 #
 
 """This module provides the supported, documented interface for clients to
@@ -3251,6 +3251,10 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
             # Package should not be checked.
             return False
 
+        if not known_cat:
+            # Only the newest version of each package is needed,
+            # so avoid retrieving every version if possible.
+            known_cat = self._img.get_newest_catalog()
         if not known_cat:
             known_cat = self._img.get_catalog(
                 self._img.IMG_CATALOG_KNOWN)
@@ -3867,8 +3871,16 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
         elif known_cat:
             pkg_cat = known_cat
         else:
-            pkg_cat = self._img.get_catalog(
-                self._img.IMG_CATALOG_KNOWN)
+            pkg_cat = None
+            if newest and not pat_versioned:
+                # Only the newest version of each package, or
+                # the newest for the image's variants, will be
+                # listed, so avoid retrieving every version if
+                # possible.
+                pkg_cat = self._img.get_newest_catalog()
+            if not pkg_cat:
+                pkg_cat = self._img.get_catalog(
+                    self._img.IMG_CATALOG_KNOWN)
 
         cat_info = frozenset([pkg_cat.DEPENDENCY, pkg_cat.SUMMARY])
 
@@ -4993,12 +5005,19 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
 
         return None
 
-    def rebuild_search_index(self):
+    def rebuild_search_index(self, incremental=False):
         """Rebuilds the search indexes.  Removes all
         existing indexes and replaces them from scratch rather than
         performing the incremental update which is usually used.
         This is useful for times when the index for the client has
-        been corrupted."""
+        been corrupted.
+
+        If 'incremental' is True, the existing index is instead
+        brought up to date with the installed packages by reindexing
+        only those which have been installed, removed or changed since
+        they were indexed.  This is useful for catching up on index
+        updates skipped by operations performed with 'update_index'
+        set to False."""
         self._img.update_index_dir()
         self.log_operation_start("rebuild-index")
         if not os.path.isdir(self._img.index_dir):
@@ -5007,12 +5026,20 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
             ind = indexer.Indexer(self._img, self._img.get_manifest,
                 self._img.get_manifest_path,
                 self.__progresstracker, self._img.list_excludes())
-            ind.rebuild_index_from_scratch(
-                self._img.gen_installed_pkgs())
+            if incremental:
+                ind.client_repair_index(
+                    self._img.gen_installed_pkgs())
+            else:
+                ind.rebuild_index_from_scratch(
+                    self._img.gen_installed_pkgs())
         except search_errors.ProblematicPermissionsIndexException as e:
             error = apx.ProblematicPermissionsIndexException(e)
             self.log_operation_end(error=error)
             raise error
+        except search_errors.InconsistentIndexException as e:
+            error = apx.CorruptedIndexException(e)
+            self.log_operation_end(error=error)
+            raise error
         else:
             self.log_operation_end()
 
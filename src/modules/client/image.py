@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
 import atexit
@@ -114,6 +114,10 @@ class Image:
 
     __STATE_UPDATING_FILE = "state_updating"
 
+    # The name of the catalog containing only the newest version of each
+    # package in the known catalog for each publisher.
+    __NEWEST_CATALOG = "newest"
+
     def __init__(self, root, user_provided_dir=False, progtrack=None,
         should_exist=True, imgtype=None, force=False,
         augment_ta_from_parent_image=True, allow_ondisk_upgrade=None,
@@ -1163,12 +1167,17 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
             cdirs.append((self.__write_cache_dir, False, None,
                 file_layout))
 
+        # If a cache shared with other images is in use, new file
+        # data is stored there instead; see get_shared_cachedir().
+        shared_dir = self.get_shared_cachedir()[0]
+
         # For images newer than version 3, file data can be stored
         # in the publisher's file root.
         for pub in self.gen_publishers(inc_disabled=True):
             froot = os.path.join(pub.meta_root, "file")
             readonly = False
-            if self.__write_cache_dir or self.__write_cache_root:
+            if self.__write_cache_dir or self.__write_cache_root or \
+                shared_dir:
                 readonly = True
             cdirs.append((froot, readonly, pub.prefix, file_layout))
 
@@ -1182,6 +1191,37 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
 
         return cdirs
 
+    def get_shared_cachedir(self):
+        """Returns a tuple of the form (dir, size_limit) where 'dir' is
+        the absolute path of the download cache shared with other
+        images and 'size_limit' is the number of bytes its content
+        should be kept within, or (None, None) if no shared cache is
+        to be used.  The shared cache is not used if the user has
+        specified a cache using PKG_CACHEDIR or PKG_CACHEROOT, or if
+        it can't be written to."""
+
+        if self.__user_cache_dir or not self.cfg:
+            return None, None
+
+        try:
+            cdir = self.cfg.get_property("property",
+                imageconfig.SHARED_CACHE_DIR)
+            size = self.cfg.get_property("property",
+                imageconfig.SHARED_CACHE_SIZE)
+        except cfg.ConfigError:
+            return None, None
+        if not cdir or not os.path.isabs(cdir):
+            return None, None
+        cdir = os.path.normpath(cdir)
+
+        try:
+            os.makedirs(cdir, exist_ok=True)
+        except EnvironmentError:
+            return None, None
+        if not os.access(cdir, os.W_OK):
+            return None, None
+        return cdir, size * 1024 * 1024
+
     def get_root(self):
         return self.root
 
@@ -1909,6 +1949,13 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
             self.cfg.mediators = new_mediators
         self.save_config()
 
+        if new_variants is not None or new_facets is not None:
+            # The catalog of the newest packages depends on the
+            # variants and facets it was saved for.
+            self.__catalogs.pop(self.__NEWEST_CATALOG, None)
+            shutil.rmtree(os.path.join(self._statedir,
+                self.__NEWEST_CATALOG), True)
+
     def __verify_manifest(self, fmri, mfstpath, alt_pub=None):
         """Verify a manifest.  The caller must supply the FMRI
         for the package in 'fmri', as well as the path to the
@@ -2233,11 +2280,13 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
                 # written.
                 progtrack.job_add_progress(
                     progtrack.JOB_IMAGE_STATE)
-                misc.copytree(cat.meta_root, cpath)
+                old_root = cat.meta_root
+                misc.copytree(old_root, cpath)
                 progtrack.job_add_progress(
                     progtrack.JOB_IMAGE_STATE)
                 cat.meta_root = cpath
                 cat.file_root = tmp_state_root
+                cat.rekey(old_root)
                 cat.finalize(pfmris=added)
                 progtrack.job_add_progress(
                     progtrack.JOB_IMAGE_STATE)
@@ -2246,6 +2295,7 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
                     progtrack.JOB_IMAGE_STATE)
 
             del cat, name
+            self.__save_newest_catalog(kcat, tmp_state_root)
             self.__init_catalogs()
             progtrack.job_add_progress(progtrack.JOB_IMAGE_STATE)
 
@@ -2341,10 +2391,101 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
         # the catalogs (add or remove entries) are only done during an
         # image upgrade or metadata refresh.  In both cases, the catalog
         # is resorted and finalized so this is always safe to use.
+        # Image catalogs are read by nearly every operation, so the
+        # binary copy of each part is used to avoid decoding the
+        # entire catalog.
         cat = pkg.catalog.Catalog(batch_mode=True, meta_root=croot,
-            sign=False, file_root=self.imgdir)
+            sign=False, file_root=self.imgdir, binary=True)
         return cat
 
+    def get_newest_catalog(self):
+        """Returns a catalog containing only the newest versions of each
+        package in the known catalog for each publisher, or None if it
+        isn't available or doesn't match the known catalog.  Callers
+        that only need the newest version of each package, or the
+        newest version for the image's variants, can use it in place of
+        the known catalog to avoid retrieving every version."""
+
+        if self.__alt_pkg_pub_map:
+            # Temporary package sources are merged into the known
+            # catalog, but not this one.
+            return None
+
+        ncat = self.__catalogs.get(self.__NEWEST_CATALOG)
+        if not ncat:
+            croot = os.path.join(self._statedir,
+                self.__NEWEST_CATALOG)
+            if not os.path.isdir(croot):
+                return None
+            ncat = pkg.catalog.Catalog(batch_mode=True,
+                meta_root=croot, read_only=True, sign=False,
+                file_root=self.imgdir, binary=True)
+            if not ncat.exists:
+                return None
+            self.__catalogs[self.__NEWEST_CATALOG] = ncat
+
+        kcat = self.get_catalog(self.IMG_CATALOG_KNOWN)
+        if ncat.last_modified != kcat.last_modified:
+            # The known catalog has changed since this was saved.
+            return None
+        return ncat
+
+    def __save_newest_catalog(self, kcat, state_root):
+        """Saves a catalog containing only the newest versions of each
+        package in the known catalog 'kcat' for each publisher in the
+        state directory 'state_root'.  For each package, every version
+        from the newest down to the newest that is installed or for the
+        image's variants is kept.  It is only considered current (see
+        get_newest_catalog) while the last modification time of the
+        known catalog matches its own, and is removed if the image's
+        variants or facets are changed."""
+
+        img_variants = self.get_variants()
+        newest = set()
+        found = set()
+        for t, entry, actions in kcat.entry_actions([kcat.DEPENDENCY],
+            excludes=self.list_excludes(), ordered=True):
+            pub, stem, ver = t
+            if (pub, stem) in found:
+                continue
+            newest.add(t)
+            states = entry["metadata"]["states"]
+            if pkgdefs.PKG_STATE_INSTALLED in states or \
+                self.__variants_match(actions, img_variants):
+                found.add((pub, stem))
+
+        def newest_only(src, pfmri, entry):
+            return (pfmri.publisher, pfmri.pkg_name,
+                str(pfmri.version)) in newest, None
+
+        croot = os.path.join(state_root, self.__NEWEST_CATALOG)
+        misc.makedirs(croot)
+        ncat = pkg.catalog.Catalog(batch_mode=True, meta_root=croot,
+            sign=False, file_root=self.imgdir, binary=True)
+        ncat.append(kcat, cb=newest_only)
+        ncat.finalize()
+        ncat.last_modified = kcat.last_modified
+        ncat.save()
+
+    @staticmethod
+    def __variants_match(actions, img_variants):
+        """Returns a boolean value indicating whether the variants of a
+        package, as given by the catalog 'actions' for it, match the
+        image variants 'img_variants'.  Packages with invalid or
+        unsupported metadata are considered to match."""
+
+        try:
+            for a in actions:
+                if a.name != "set" or \
+                    not a.attrs["name"].startswith("variant."):
+                    continue
+                vv = img_variants.get(a.attrs["name"])
+                if vv is not None and vv not in a.attrlist("value"):
+                    return False
+        except apx.InvalidPackageErrors:
+            pass
+        return True
+
     def __remove_catalogs(self):
         """Removes all image catalogs and their directories."""
 
@@ -2352,6 +2493,8 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
         for name in (self.IMG_CATALOG_KNOWN,
             self.IMG_CATALOG_INSTALLED):
             shutil.rmtree(os.path.join(self._statedir, name))
+        shutil.rmtree(os.path.join(self._statedir,
+            self.__NEWEST_CATALOG), True)
 
     def get_version_installed(self, pfmri):
         """Returns an fmri of the installed package matching the
@@ -2564,7 +2707,7 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
         kcat = pkg.catalog.Catalog(batch_mode=True,
             meta_root=os.path.join(tmp_state_root,
             self.IMG_CATALOG_KNOWN), sign=False,
-            file_root=self.imgdir)
+            file_root=self.imgdir, binary=True)
 
         # XXX if any of the below fails for any reason, the old 'known'
         # catalog needs to be re-loaded so the client is in a consistent
@@ -2621,7 +2764,7 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
         icat = pkg.catalog.Catalog(batch_mode=True,
             meta_root=os.path.join(tmp_state_root,
             self.IMG_CATALOG_INSTALLED), sign=False,
-            file_root=self.imgdir)
+            file_root=self.imgdir, binary=True)
 
         excludes = self.list_excludes()
 
@@ -2831,6 +2974,7 @@ in the environment or by setting simulate_cmdpath in DebugValues.""")
             misc.makedirs(cat.meta_root)
             cat.finalize(pfmris=final_fmris)
             cat.save()
+        self.__save_newest_catalog(kcat, tmp_state_root)
 
         # Next, preserve the old installed state dir, rename the
         # new one into place, and then remove the old one.
@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
 import errno
@@ -54,6 +54,7 @@ from pkg.client.transport.exception import TransportFailures
 BE_POLICY = "be-policy"
 CONTENT_UPDATE_POLICY = "content-update-policy"
 FLUSH_CONTENT_CACHE = "flush-content-cache-on-success"
+HTTP2_STREAMS = "http2-streams"
 MIRROR_DISCOVERY = "mirror-discovery"
 SEND_UUID = "send-uuid"
 USE_SYSTEM_REPO = "use-system-repo"
@@ -65,6 +66,7 @@ default_policies = {
     CHECK_CERTIFICATE_REVOCATION: False,
     CONTENT_UPDATE_POLICY: "default",
     FLUSH_CONTENT_CACHE: True,
+    HTTP2_STREAMS: 0,
     MIRROR_DISCOVERY: False,
     SEND_UUID: True,
     SIGNATURE_POLICY: sigpolicy.DEFAULT_POLICY,
@@ -89,6 +91,12 @@ default_properties = {
 # 4 hours.
 REPO_REFRESH_SECONDS_DEFAULT = 4 * 60 * 60
 
+# The download cache shared with other images, and the size, in megabytes,
+# it's kept within by default.
+SHARED_CACHE_DIR = "shared-cache-dir"
+SHARED_CACHE_SIZE = "shared-cache-size"
+SHARED_CACHE_SIZE_DEFAULT = 10 * 1024
+
 # names of image configuration files managed by this module
 CFG_FILE = "cfg_cache"
 DA_FILE = "disabled_auth"
@@ -174,10 +182,15 @@ class ImageConfig(cfg.FileConfig):
                     default=default_policies[CONTENT_UPDATE_POLICY]),
                 cfg.PropBool(FLUSH_CONTENT_CACHE,
                     default=default_policies[FLUSH_CONTENT_CACHE]),
+                cfg.PropInt(HTTP2_STREAMS,
+                    default=default_policies[HTTP2_STREAMS]),
                 cfg.PropBool(MIRROR_DISCOVERY,
                     default=default_policies[MIRROR_DISCOVERY]),
                 cfg.PropBool(SEND_UUID,
                     default=default_policies[SEND_UUID]),
+                cfg.Property(SHARED_CACHE_DIR),
+                cfg.PropInt(SHARED_CACHE_SIZE,
+                    default=SHARED_CACHE_SIZE_DEFAULT, minimum=1),
                 cfg.PropDefined(SIGNATURE_POLICY,
                     allowed=list(sigpolicy.Policy.policies()) + [DEF_TOKEN],
                     default=DEF_TOKEN),
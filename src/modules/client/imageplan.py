@@ -5138,7 +5138,8 @@ class ImagePlan:
         # so that the incremental update that follows at the end of
         # the function will work correctly. It also repairs the index
         # for this BE so the user can boot into this BE and have a
-        # correct index.
+        # correct index; only the packages which don't match the
+        # index are reindexed to do so.
         if self.update_index:
             ind = None
             try:
@@ -5159,7 +5160,7 @@ class ImagePlan:
                                 traceback.format_exc(),
                                 traceback.format_stack()
                                 )
-                        ind.rebuild_index_from_scratch(
+                        ind.client_repair_index(
                                 self.image.\
                                     gen_installed_pkgs()
                                 )
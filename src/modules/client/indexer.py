@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2009, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 #
 
 
@@ -30,7 +30,13 @@
 # fast comparison between what the catalog thinks is installed and what
 # the indexer has indexed.
 
+import hashlib
+import os
+import shutil
+
+import pkg.fmri as fmri
 import pkg.indexer as indexer
+import pkg.misc as misc
 import pkg.search_storage as ss
 from pkg.misc import EmptyI
 
@@ -45,6 +51,130 @@ class Indexer(indexer.Indexer):
             ss.IndexStoreSetHash('full_fmri_list.hash')
         self._data_full_fmri_hash = self._data_dict['full_fmri_hash']
 
+        # Checksums of the manifests of the indexed packages, used to
+        # find the packages which need reindexing when the index is
+        # repaired.  It isn't part of _data_dict so that indexes from
+        # before its introduction can still be read and updated.
+        # Checksums are only computed when the index is repaired, so
+        # that building or updating the index doesn't read every
+        # manifest again.
+        self._data_pkg_checksums = \
+            ss.IndexStoreChecksums(ss.PKG_CHECKSUM_FILE)
+        self._repairing = False
+
+    def _get_checksum(self, pfmri):
+        """Returns the checksum of the manifest of the package
+        'pfmri'."""
+
+        return misc.get_data_digest(self.get_manifest_path_func(pfmri),
+            hash_func=hashlib.sha256)[0]
+
+    def _read_input_indexes(self, directory):
+        """Reads the manifest checksums along with the rest of the
+        index.  If they weren't written with this version of the
+        index, none of the indexed packages have a known checksum."""
+
+        indexer.Indexer._read_input_indexes(self, directory)
+        self._data_pkg_checksums.clear()
+        if self.empty_index:
+            return
+        try:
+            if self._data_pkg_checksums.open(directory) == \
+                self.file_version_number:
+                self._data_pkg_checksums.read_dict_file()
+        finally:
+            self._data_pkg_checksums.close_file_handle()
+
+    def _fast_update(self, filters_pkgplan_list):
+        """Forgets the checksums of the packages added to or removed
+        from the update logs; those added are checksummed when the
+        index is next repaired."""
+
+        if not indexer.Indexer._fast_update(self, filters_pkgplan_list):
+            return False
+        filters, pkgplan_list = filters_pkgplan_list
+        for d_fmri, o_fmri in pkgplan_list:
+            for f in (d_fmri, o_fmri):
+                if f:
+                    self._data_pkg_checksums.remove_entity(
+                        f.get_fmri(anarchy=True,
+                        include_scheme=False))
+        return True
+
+    def _process_fmris(self, fmris):
+        """Updates the main dictionary so that it indexes exactly the
+        packages 'fmris', which are those installed in the image.
+
+        Only the packages which aren't in the main dictionary yet, or
+        (when the index is being repaired) whose manifests no longer
+        match the checksums recorded when they were last checked, are
+        indexed; the packages in the update logs are folded into the
+        main dictionary along with them.  Returns the packages whose
+        entries need to be removed from the main dictionary."""
+
+        installed = dict(
+            (f.get_fmri(anarchy=True, include_scheme=False), f)
+            for f in fmris
+        )
+        # When the index is rebuilt from scratch, the package list may
+        # still hold the packages a failed fast update added to it.
+        in_main = set()
+        if not self.empty_index:
+            in_main = set(
+                fmri.PkgFmri(s).get_fmri(anarchy=True,
+                    include_scheme=False)
+                for s in self._data_full_fmri.get_set()
+            )
+            in_main -= self._data_fast_add.get_set()
+            in_main |= self._data_fast_remove.get_set()
+
+        checksums = self._data_pkg_checksums
+        if self.empty_index:
+            checksums.clear()
+        changed = set()
+        for s in in_main:
+            if s not in installed:
+                checksums.remove_entity(s)
+                continue
+            if not self._repairing:
+                continue
+            old = checksums.get_checksum(s)
+            new = self._get_checksum(installed[s])
+            checksums.set_checksum(s, new)
+            # Packages which haven't been checked since they were
+            # indexed have nothing to be compared with.
+            if old is not None and new != old:
+                changed.add(s)
+
+        added = []
+        for s, f in installed.items():
+            if s not in in_main:
+                if self._repairing:
+                    checksums.set_checksum(s,
+                        self._get_checksum(f))
+            elif s not in changed:
+                continue
+            added.append(f)
+        removed = set(
+            fmri.PkgFmri(s)
+            for s in in_main
+            if s not in installed or s in changed
+        )
+
+        self._data_fast_add.clear()
+        self._data_fast_remove.clear()
+        self._data_full_fmri.clear()
+        for f in fmris:
+            self._data_full_fmri.add_entity(f.get_fmri(anarchy=True))
+
+        # The packages which are already indexed are done.
+        if len(fmris) > len(added):
+            self._progtrack.job_add_progress(
+                self._progtrack.JOB_REBUILD_SEARCH,
+                nitems=len(fmris) - len(added))
+        indexer.Indexer._process_fmris(self, added)
+        return removed
+
     def _write_assistant_dicts(self, out_dir):
         """Gives the full_fmri hash object the data it needs before
         the superclass is called to write out the dictionaries.
@@ -52,6 +182,39 @@ class Indexer(indexer.Indexer):
         self._data_full_fmri_hash.set_hash(
             self._data_full_fmri.get_set())
         indexer.Indexer._write_assistant_dicts(self, out_dir)
+        self._data_pkg_checksums.write_dict_file(out_dir,
+            self.file_version_number)
+
+    def _migrate(self, source_dir=None, dest_dir=None, fast_update=False):
+        """Moves the manifest checksums into place along with the
+        rest of the index."""
+
+        if not source_dir:
+            source_dir = self._tmp_dir
+        if not dest_dir:
+            dest_dir = self._index_dir
+        name = self._data_pkg_checksums.get_file_name()
+        if os.path.exists(os.path.join(source_dir, name)):
+            shutil.move(os.path.join(source_dir, name),
+                os.path.join(dest_dir, name))
+        indexer.Indexer._migrate(self, source_dir=source_dir,
+            dest_dir=dest_dir, fast_update=fast_update)
+
+    def client_repair_index(self, fmris, tmp_index_dir=None):
+        """Brings the index up to date with the packages 'fmris',
+        which are those installed in the image, without rebuilding it
+        from scratch.  Only the packages which have been installed,
+        removed or changed since they were indexed are reindexed, and
+        the update logs are folded into the main dictionary.  If there
+        is no index yet, one is built."""
+
+        self._repairing = True
+        try:
+            self._generic_update_index(fmris,
+                indexer.IDX_INPUT_TYPE_FMRI,
+                tmp_index_dir=tmp_index_dir)
+        finally:
+            self._repairing = False
 
     def check_index_has_exactly_fmris(self, fmri_names):
         """Checks to see if the fmris given are the ones indexed.
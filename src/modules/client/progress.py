@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2008, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 #
 
 #
@@ -1116,6 +1116,9 @@ class ProgressTracker(ProgressTrackerFrontend, ProgressTrackerBackend):
         self.dl_files = GoalTrackerItem(_("Download files"))
         self.dl_bytes = GoalTrackerItem(_("Download bytes"))
         self._dl_items = [self.dl_pkgs, self.dl_files, self.dl_bytes]
+        # files and bytes found in a download cache
+        self.dl_cache_files = TrackerItem(_("Download cache files"))
+        self.dl_cache_bytes = TrackerItem(_("Download cache bytes"))
 
         # republishing support; republishing also uses dl_bytes
         self.repub_pkgs = \
@@ -1487,6 +1490,8 @@ class ProgressTracker(ProgressTrackerFrontend, ProgressTrackerBackend):
             self.dl_files.items += nfiles
 
         if cachehit:
+            self.dl_cache_files.items += nfiles
+            self.dl_cache_bytes.items += nbytes
             self.dl_estimator.goalbytes -= nbytes
         else:
             self.dl_estimator.newdata(nbytes)
@@ -1502,6 +1507,18 @@ class ProgressTracker(ProgressTrackerFrontend, ProgressTrackerBackend):
             if self.dl_mode == self.DL_MODE_REPUBLISH:
                 self._republish_output(outspec)
 
+    def _dl_cache_msg(self):
+        """Return a message describing how many of the files downloaded
+        were found in a download cache, or None if none were."""
+
+        if not self.dl_cache_files.items:
+            return None
+        return _("Download cache: {hits:d} hits ({size}), {misses:d} "
+            "misses").format(hits=self.dl_cache_files.items,
+            size=misc.bytes_to_str(self.dl_cache_bytes.items),
+            misses=max(self.dl_files.items - self.dl_cache_files.items,
+            0))
+
     def download_done(self, dryrun=False):
         """Call when all downloading is finished."""
         if dryrun:
@@ -2148,6 +2165,9 @@ class CommandLineProgressTracker(ProgressTracker):
                 "seconds {speed}").format(
                 num=goal, sec=self.dl_estimator.elapsed(),
                 speed=speedstr))
+            msg = self._dl_cache_msg()
+            if msg:
+                self.__generic_done(msg=msg)
 
     def _republish_output(self, outspec):
         if "startpkg" in outspec.changed:
@@ -3073,6 +3093,9 @@ class FancyUNIXProgressTracker(ProgressTracker):
 
         if outspec.last:
             self.__generic_done_newline()
+            msg = self._dl_cache_msg()
+            if msg:
+                self._pe.cprint(msg)
             self.__generic_done_newline()
 
     def _republish_output(self, outspec):
@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2009, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 #
 
 #
@@ -1951,15 +1951,40 @@ pkg unset-publisher {0}
                 for update in attrs.updates:
                     flist.append(update)
 
+        # Where more than one update log is needed for a locale, they
+        # are retrieved using a single request if the repository
+        # supports it.
+        ulogs = {}
+        for name in flist:
+            if not name.startswith("update."):
+                continue
+            locale = name.split(".", 2)[2]
+            ulogs.setdefault(locale, []).append(name)
+        retrieved = set()
+        for locale, names in ulogs.items():
+            if len(names) < 2:
+                continue
+            try:
+                retrieved.update(self.transport.get_catalog_updates(
+                    self, min(names), path=tempdir,
+                    redownload=redownload, revalidate=revalidate,
+                    alt_repo=repo))
+            except api_errors.UnsupportedRepositoryOperation:
+                break
+        if retrieved:
+            flist = [name for name in flist if name not in retrieved]
+
         if flist:
             # More catalog files to retrieve.
             self.transport.get_catalog1(self, flist, path=tempdir,
                 redownload=redownload, revalidate=revalidate,
                 alt_repo=repo, progtrack=progtrack)
 
-        # Clear _catalog, so we'll read in the new catalog.
+        # Clear _catalog, so we'll read in the new catalog.  Incremental
+        # updates are journaled so that only the changes (and not the
+        # entire catalog) have to be written.
         self._catalog = None
-        v1_cat = pkg.catalog.Catalog(meta_root=croot)
+        v1_cat = pkg.catalog.Catalog(meta_root=croot, journal=True)
 
         # At this point the client should have a set of the constituent
         # pieces that are necessary to construct a catalog.  If a
@@ -19,7 +19,7 @@
 #
 # CDDL HEADER END
 #
-# Copyright (c) 2009, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 
 import sys
 import threading
@@ -33,7 +33,6 @@ from pkg.choose import choose
 import pkg.query_parser as qp
 # pylint: disable-next=unused-import
 from pkg.query_parser import BooleanQueryException, ParseError, QueryLengthExceeded
-import itertools
 
 
 class QueryLexer(qp.QueryLexer):
@@ -179,9 +178,11 @@ class TermQuery(qp.TermQuery):
         qp.TermQuery.__init__(self, term)
         self._impl_fmri_to_path = None
         self._efn = None
+        self._gen_installed_pkg_names = None
         self._data_fast_remove = None
         self.full_fmri_hash = None
         self._data_fast_add = None
+        self._data_full_fmri = None
 
     def __init_gdd(self, path):
         gdd = self._global_data_dict
@@ -200,6 +201,7 @@ class TermQuery(qp.TermQuery):
         tq_gdd["fast_remove"] = ss.IndexStoreSet(ss.FAST_REMOVE)
         tq_gdd["fmri_hash"] = ss.IndexStoreSetHash(
             ss.FULL_FMRI_HASH_FILE)
+        tq_gdd["full_fmri"] = ss.IndexStoreSet(ss.FULL_FMRI_FILE)
 
     def _lock_client_gdd(self, index_dir):
         # This lock is used so that only one instance of a term query
@@ -227,6 +229,7 @@ class TermQuery(qp.TermQuery):
         whether slow search was used."""
 
         self.get_use_slow_search = get_use_slow_search
+        self._gen_installed_pkg_names = gen_installed_pkg_names
         self._efn = gen_installed_pkg_names()
         index_dir = kwargs["index_dir"]
         self._lock_client_gdd(index_dir)
@@ -245,6 +248,7 @@ class TermQuery(qp.TermQuery):
                 self._data_fast_add = tq_gdd["fast_add"]
                 self._data_fast_remove = tq_gdd["fast_remove"]
                 self.full_fmri_hash = tq_gdd["fmri_hash"]
+                self._data_full_fmri = tq_gdd["full_fmri"]
                 set_use_slow_search(False)
             except se.NoIndexException:
                 # If no index was found, the slower version of
@@ -272,50 +276,88 @@ class TermQuery(qp.TermQuery):
         this image."""
 
         if restriction:
-            return self._restricted_search_internal(restriction)
+            return self._limit_results(
+                self._restricted_search_internal(restriction))
         elif not self.get_use_slow_search():
+            fast_add = self._data_fast_add.get_set()
+            fast_remove = self._data_fast_remove.get_set()
             try:
                 self.full_fmri_hash.check_against_file(
                     self._efn)
             except se.IncorrectIndexFileHash:
-                raise \
-                    api_errors.IncorrectIndexFileHash()
-            base_res = \
-                self._search_internal(fmris)
-            client_res = \
-                self._search_fast_update(manifest_func,
-                excludes)
-            base_res = self._check_fast_remove(base_res)
-            it = itertools.chain(self._get_results(base_res),
-                self._get_fast_results(client_res))
-            return it
+                fast_add, fast_remove = self._get_index_delta()
+            return self._limit_results(self.__gen_results(fmris,
+                manifest_func, excludes, fast_add, fast_remove))
         else:
-            return self.slow_search(fmris, manifest_func, excludes)
+            return self._limit_results(self.slow_search(fmris,
+                manifest_func, excludes))
+
+    def __gen_results(self, fmris, manifest_func, excludes, fast_add,
+        fast_remove):
+        """Yields the results found using the index, followed by those
+        found in the manifests of the packages installed since the
+        index was last rebuilt.  Those manifests are only searched
+        once all of the results from the index have been used."""
+
+        base_res = self._check_fast_remove(
+            self._search_internal(fmris), fast_remove)
+        yield from self._get_results(base_res)
+        yield from self._get_fast_results(self._search_fast_update(
+            manifest_func, excludes, fast_add))
+
+    def _get_index_delta(self):
+        """Returns the packages which have been installed in, and
+        removed from, the image since the main dictionary was last
+        updated, as sets of the strings used by the update logs.
+
+        This is used when the index hasn't been kept up to date with
+        the installed packages, for example because an operation was
+        interrupted or skipped updating it, so that the packages which
+        don't match the index can be searched using their manifests
+        instead of the index having to be rebuilt first."""
+
+        def strip_scheme(s):
+            return fmri.PkgFmri(s).get_fmri(anarchy=True,
+                include_scheme=False)
+
+        installed = set(
+            strip_scheme(s) for s in self._gen_installed_pkg_names()
+        )
+        in_main = set(
+            strip_scheme(s) for s in self._data_full_fmri.get_set()
+        )
+        in_main -= self._data_fast_add.get_set()
+        in_main |= self._data_fast_remove.get_set()
+        return installed - in_main, in_main - installed
 
-    def _check_fast_remove(self, res):
+    def _check_fast_remove(self, res, fast_remove):
         """This function removes any results from the generator "res"
         (the search results) that are actions from packages known to
         have been removed from the image since the last time the index
-        was built."""
+        was built.
+
+        The "fast_remove" parameter is the set of those packages."""
 
         return (
             (p_str, o, a, s, f)
             for p_str, o, a, s, f
             in res
-            if not self._data_fast_remove.has_entity(p_str)
+            if p_str not in fast_remove
         )
 
-    def _search_fast_update(self, manifest_func, excludes):
+    def _search_fast_update(self, manifest_func, excludes, fast_add):
         """This function searches the packages which have been
-        installed since the last time the index was rebuilt.
+        installed since the last time the index was rebuilt.  It is a
+        generator which reads each manifest only once the results
+        from those before it have been used.
 
         The "manifest_func" parameter is a function which maps fmris to
         the path to their manifests.
 
         The "excludes" parameter is a list of variants defined in the
-        image."""
+        image.
 
-        assert self._data_main_dict.get_file_handle() is not None
+        The "fast_add" parameter is the set of those packages."""
 
         glob = self._glob
         term = self._term
@@ -324,16 +366,13 @@ class TermQuery(qp.TermQuery):
         if not case_sensitive:
             glob = True
 
-        fast_update_dict = {}
-
-        fast_update_res = []
-
-        # self._data_fast_add holds the names of the fmris added
-        # since the last time the index was rebuilt.
-        for fmri_str in self._data_fast_add._set:
+        # fast_add holds the names of the fmris added since the last
+        # time the index was rebuilt.
+        for fmri_str in fast_add:
             if not (self.pkg_name_wildcard or
                 self.pkg_name_match(fmri_str)):
                 continue
+            fast_update_dict = {}
             f = fmri.PkgFmri(fmri_str)
             path = manifest_func(f)
             search_dict = manifest.Manifest.search_dict(path,
@@ -348,17 +387,12 @@ class TermQuery(qp.TermQuery):
                     fast_update_dict[tok] = []
                 fast_update_dict[tok].append((at, st, fv,
                     fmri_str, search_dict[tmp]))
-        if glob:
-            keys = fast_update_dict.keys()
-            matches = choose(keys, term, case_sensitive)
-            fast_update_res = [
-                fast_update_dict[m] for m in matches
-            ]
-
-        else:
-            if term in fast_update_dict:
-                fast_update_res.append(fast_update_dict[term])
-        return fast_update_res
+            if glob:
+                keys = fast_update_dict.keys()
+                for m in choose(keys, term, case_sensitive):
+                    yield fast_update_dict[m]
+            elif term in fast_update_dict:
+                yield fast_update_dict[term]
 
     def _get_fast_results(self, fast_update_res):
         """This function transforms the output of _search_fast_update
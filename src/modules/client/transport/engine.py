@@ -21,13 +21,14 @@
 #
 
 #
-# Copyright (c) 2009, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 #
 
 import errno
 import http.client
 import os
 import pycurl
+import rapidjson as json
 import time
 
 from urllib.parse import urlsplit
@@ -51,6 +52,25 @@ from pkg.client.debugvalues import DebugValues
 pipelined_protocols = ()
 response_protocols = ("ftp", "http", "https")
 
+# The bytes received of an interrupted, resumable download are kept in its
+# file, and the URL they came from and how many there are are recorded in
+# a file of the same name with this suffix.
+PARTIAL_SUFFIX = ".part"
+
+# The most requests that are performed at once when they're multiplexed
+# over HTTP/2 connections, however many streams each connection may
+# carry.  Each request in progress needs its own curl handle.
+MAX_HANDLES = 64
+
+
+def http2_supported():
+    """Returns whether the libcurl and pycurl in use support multiplexing
+    transfers over HTTP/2 connections."""
+
+    return hasattr(pycurl, "PIPE_MULTIPLEX") and \
+        hasattr(pycurl, "M_MAX_CONCURRENT_STREAMS") and \
+        bool(pycurl.version_info()[4] & pycurl.VERSION_HTTP2)
+
 
 class TransportEngine:
     """This is an abstract class.  It shouldn't implement any
@@ -61,7 +81,14 @@ class TransportEngine:
 class CurlTransportEngine(TransportEngine):
     """Concrete class of TransportEngine for libcurl transport."""
 
-    def __init__(self, transport, max_conn=20):
+    def __init__(self, transport, max_conn=20, max_streams=0):
+        """'max_conn' is the maximum number of connections to use at
+        once.
+
+        'max_streams' is the maximum number of requests to multiplex
+        over each HTTP/2 connection, or 0 if HTTP/2 shouldn't be
+        used.  Requests to hosts that don't support HTTP/2 use
+        HTTP/1.1 instead."""
 
         # Backpointer to transport object
         self.__xport = transport
@@ -70,6 +97,11 @@ class CurlTransportEngine(TransportEngine):
         self.__chandles = []
         self.__active_handles = 0
         self.__max_handles = max_conn
+        # Maximum number of streams per HTTP/2 connection, or 0 if
+        # HTTP/2 isn't used.
+        self.__max_streams = 0
+        if max_streams > 0 and http2_supported():
+            self.__max_streams = max_streams
         # Request queue
         self.__req_q = deque()
         # List of failures
@@ -87,25 +119,28 @@ class CurlTransportEngine(TransportEngine):
         self.__last_stall_check = 0
 
         # Set options on multi-handle
-        self.__mhandle.setopt(pycurl.M_PIPELINING, 0)
-
-        # initialize easy handles
-        for i in range(self.__max_handles):
-            eh = pycurl.Curl()
-            eh.url = None
-            eh.repourl = None
-            eh.fobj = None
-            eh.r_fobj = None
-            eh.filepath = None
-            eh.success = False
-            eh.fileprog = None
-            eh.filetime = -1
-            eh.starttime = -1
-            eh.uuid = None
-            self.__chandles.append(eh)
-
-        # copy handles into handle freelist
-        self.__freehandles = self.__chandles[:]
+        if self.__max_streams:
+            # Multiplex requests over as few connections to each
+            # host as possible.  No more connections are used than
+            # would be otherwise, so requests to hosts that only
+            # support HTTP/1.1 just wait for a free one.
+            self.__mhandle.setopt(pycurl.M_PIPELINING,
+                pycurl.PIPE_MULTIPLEX)
+            self.__mhandle.setopt(pycurl.M_MAX_CONCURRENT_STREAMS,
+                self.__max_streams)
+            self.__mhandle.setopt(pycurl.M_MAX_TOTAL_CONNECTIONS,
+                max_conn)
+            self.__max_handles = max(max_conn,
+                min(self.__max_streams, MAX_HANDLES))
+        else:
+            self.__mhandle.setopt(pycurl.M_PIPELINING, 0)
+
+        # Easy handles are created as requests are started, so that
+        # no more are made than are ever in use at once; those not in
+        # use are kept in the freelist.
+        self.__freehandles = []
+        # Maximum number of requests to perform at once
+        self.__concurrency = self.__max_handles
 
     def __call_perform(self):
         """An internal method that invokes the multi-handle's
@@ -122,7 +157,7 @@ class CurlTransportEngine(TransportEngine):
     def add_url(self, url, filepath=None, writefunc=None, header=None,
         progclass=None, progtrack=None, sslcert=None, sslkey=None,
         repourl=None, compressible=False, failonerror=True, proxy=None,
-        runtime_proxy=None):
+        runtime_proxy=None, resumable=False, donefunc=None):
         """Add a URL to the transport engine.  Caller must supply
         either a filepath where the file should be downloaded,
         or a callback to a function that will perform the write.
@@ -135,17 +170,55 @@ class CurlTransportEngine(TransportEngine):
         stored as part of the transport stats accounting.
 
         'runtime_proxy' is the actual proxy value that is used by pycurl
-        to retrieve this resource."""
+        to retrieve this resource.
+
+        'resumable' indicates that if the download to filepath is
+        interrupted, the bytes received should be kept so that a later
+        request for the same url can continue from where it stopped.
+
+        'donefunc' is a function to call, with no arguments, as soon
+        as the request has completed successfully."""
 
         t = TransportRequest(url, filepath=filepath,
             writefunc=writefunc, header=header, progclass=progclass,
             progtrack=progtrack, sslcert=sslcert, sslkey=sslkey,
             repourl=repourl, compressible=compressible,
             failonerror=failonerror, proxy=proxy,
-            runtime_proxy=runtime_proxy)
+            runtime_proxy=runtime_proxy, resumable=resumable,
+            donefunc=donefunc)
 
         self.__req_q.appendleft(t)
 
+    def __can_start(self):
+        """Returns whether another queued request can be started."""
+
+        return bool(self.__req_q) and len(self.__chandles) - \
+            len(self.__freehandles) < self.__concurrency
+
+    def __get_handle(self):
+        """Returns a free easy handle, creating one if there are
+        none."""
+
+        if self.__freehandles:
+            return self.__freehandles.pop(-1)
+
+        eh = pycurl.Curl()
+        eh.url = None
+        eh.repourl = None
+        eh.fobj = None
+        eh.r_fobj = None
+        eh.filepath = None
+        eh.donefunc = None
+        eh.resumable = False
+        eh.resume_offset = 0
+        eh.success = False
+        eh.fileprog = None
+        eh.filetime = -1
+        eh.starttime = -1
+        eh.uuid = None
+        self.__chandles.append(eh)
+        return eh
+
     def __check_for_stalls(self):
         """In some situations, libcurl can get itself
         tied in a knot, and fail to make progress.  Check that the
@@ -206,6 +279,13 @@ class CurlTransportEngine(TransportEngine):
         relevant error information."""
 
         count, good, bad = self.__mhandle.info_read()
+        while count:
+            # Collect every request that has finished; those
+            # not collected now wouldn't be until the next
+            # time libcurl reported activity.
+            count, more_good, more_bad = self.__mhandle.info_read()
+            good.extend(more_good)
+            bad.extend(more_bad)
         failures = self.__failures
         success = self.__success
         done_handles = []
@@ -274,6 +354,16 @@ class CurlTransportEngine(TransportEngine):
             if en == pycurl.E_ABORTED_BY_CALLBACK:
                 ex = None
                 ex_to_raise = api_errors.CanceledException
+            elif en == pycurl.E_RANGE_ERROR and h.resume_offset:
+                # The server won't send the rest of a file
+                # whose download was interrupted, so discard
+                # what was received and start over.
+                h.resumable = False
+                ex = tx.TransportFrameworkError(en, url, em,
+                    repourl=urlstem, uuid=uuid)
+                ex.retryable = True
+                repostats.record_error(decayable=ex.decayable)
+                errors_seen += 1
             elif en in (pycurl.E_HTTP_RETURNED_ERROR,
                 pycurl.E_FILE_COULDNT_READ_FILE):
                 # E_HTTP_RETURNED_ERROR is only used for http://
@@ -299,14 +389,21 @@ class CurlTransportEngine(TransportEngine):
                 ex = tx.TransportProtoError(proto, respcode,
                     url, reason=proto_reason, repourl=urlstem,
                     uuid=uuid)
-                repostats.record_error(decayable=ex.decayable)
+                if respcode == \
+                    http.client.REQUESTED_RANGE_NOT_SATISFIABLE \
+                    and h.resume_offset:
+                    # The partial download is discarded, so
+                    # the next attempt starts over.
+                    ex.retryable = True
+                repostats.record_error(decayable=ex.decayable,
+                    congestion=ex.congestion)
                 errors_seen += 1
             else:
                 timeout = en == pycurl.E_OPERATION_TIMEOUTED
                 ex = tx.TransportFrameworkError(en, url, em,
                     repourl=urlstem, uuid=uuid)
                 repostats.record_error(decayable=ex.decayable,
-                    timeout=timeout)
+                    congestion=ex.congestion, timeout=timeout)
                 errors_seen += 1
 
             if ex and ex.retryable:
@@ -378,7 +475,9 @@ class CurlTransportEngine(TransportEngine):
             respcode = h.getinfo(pycurl.RESPONSE_CODE)
 
             if proto not in response_protocols or \
-                respcode == http.client.OK:
+                respcode == http.client.OK or \
+                (respcode == http.client.PARTIAL_CONTENT and
+                h.resume_offset):
                 h.success = True
                 repostats.clear_consecutive_errors()
                 success.append(url)
@@ -399,7 +498,8 @@ class CurlTransportEngine(TransportEngine):
                 # for 200/300 codes that aren't OK
                 if respcode >= 400:
                     repostats.record_error(
-                        decayable=ex.decayable)
+                        decayable=ex.decayable,
+                        congestion=ex.congestion)
                     errors_seen += 1
                 # If code == 0, libcurl failed to read
                 # any HTTP status.  Response is almost
@@ -425,11 +525,19 @@ class CurlTransportEngine(TransportEngine):
             done_handles.append(h)
 
         # Call to remove_handle must be separate from info_read()
+        donefuncs = []
         for h in done_handles:
+            if h.success and h.donefunc:
+                donefuncs.append(h.donefunc)
             self.__mhandle.remove_handle(h)
             self.__teardown_handle(h)
             self.__freehandles.append(h)
 
+        # Only tell callers that requests are done once any files
+        # they were retrieved to are complete.
+        for func in donefuncs:
+            func()
+
         self.__failures = failures
         self.__success = success
 
@@ -603,7 +711,9 @@ class CurlTransportEngine(TransportEngine):
         if not self.pending:
             return
 
-        if self.__active_handles > 0:
+        # Don't wait for activity on the requests in progress if
+        # there are more that can be started now.
+        if self.__active_handles > 0 and not self.__can_start():
             # timeout returned in milliseconds
             timeout = self.__mhandle.timeout()
             if timeout == -1:
@@ -626,9 +736,9 @@ class CurlTransportEngine(TransportEngine):
             url, uuid = self.__orphans.pop()
             self.remove_request(url, uuid)
 
-        while self.__freehandles and self.__req_q:
+        while self.__can_start():
             t = self.__req_q.pop()
-            eh = self.__freehandles.pop(-1)
+            eh = self.__get_handle()
             self.__setup_handle(eh, t)
             self.__mhandle.add_handle(eh)
 
@@ -636,8 +746,7 @@ class CurlTransportEngine(TransportEngine):
 
         self.__cleanup_requests()
 
-        if self.__active_handles and (not self.__freehandles or not
-            self.__req_q):
+        if self.__active_handles and not self.__can_start():
             cur_clock = time.time()
             if cur_clock - self.__last_stall_check > 1:
                 self.__last_stall_check = cur_clock
@@ -746,6 +855,16 @@ class CurlTransportEngine(TransportEngine):
 
         return fobj
 
+    def set_concurrency(self, num=None):
+        """Set the maximum number of requests to perform at once to
+        'num', or to as many as possible if 'num' is None.  Returns
+        the maximum that will be used."""
+
+        if num is None:
+            num = self.__max_handles
+        self.__concurrency = max(1, min(num, self.__max_handles))
+        return self.__concurrency
+
     def set_file_bufsz(self, size):
         """If the downloaded files are being written out by
         the file() mechanism, and not written using a callback,
@@ -804,6 +923,15 @@ class CurlTransportEngine(TransportEngine):
         hdl.setopt(pycurl.MAXREDIRS,
             global_settings.PKG_CLIENT_MAX_REDIRECT)
 
+        if self.__max_streams:
+            # Negotiate HTTP/2 with https hosts, falling back to
+            # HTTP/1.1 for those that don't support it, and wait
+            # for a connection that can be multiplexed rather than
+            # making a new one.
+            hdl.setopt(pycurl.HTTP_VERSION,
+                pycurl.CURL_HTTP_VERSION_2TLS)
+            hdl.setopt(pycurl.PIPEWAIT, 1)
+
         # Store the proxy in the handle so it can be used to retrieve
         # transport statistics later.
         hdl.proxy = None
@@ -864,9 +992,16 @@ class CurlTransportEngine(TransportEngine):
         # repository. This is useful to have around for coalescing
         # error output, and statistics reporting.
         hdl.repourl = treq.repourl
+        hdl.donefunc = treq.donefunc
         if treq.filepath:
+            mode = "wb+"
+            if treq.resumable:
+                hdl.resume_offset = self.__partial_size(treq.url,
+                    treq.filepath)
+                if hdl.resume_offset:
+                    mode = "ab"
             try:
-                hdl.fobj = open(treq.filepath, "wb+",
+                hdl.fobj = open(treq.filepath, mode,
                     self.__file_bufsz)
             except EnvironmentError as e:
                 if e.errno == errno.EACCES:
@@ -883,7 +1018,12 @@ class CurlTransportEngine(TransportEngine):
             hdl.setopt(pycurl.WRITEDATA, hdl.fobj)
             # Request filetime, if endpoint knows it.
             hdl.setopt(pycurl.OPT_FILETIME, True)
+            if hdl.resume_offset:
+                # Ask for the rest of the file.
+                hdl.setopt(pycurl.RESUME_FROM_LARGE,
+                    hdl.resume_offset)
             hdl.filepath = treq.filepath
+            hdl.resumable = treq.resumable
         elif treq.writefunc:
             hdl.setopt(pycurl.WRITEFUNCTION, treq.writefunc)
             hdl.filepath = None
@@ -1003,6 +1143,64 @@ class CurlTransportEngine(TransportEngine):
         self.__orphans = None
         self.__active_handles = 0
 
+    @staticmethod
+    def __remove_file(path):
+        """Remove the file at path, if it exists."""
+
+        try:
+            os.remove(path)
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                raise tx.TransportOperationError(
+                    "Unable to remove file: {0}".format(e))
+
+    @staticmethod
+    def __partial_size(url, filepath):
+        """Returns the number of bytes of url that an earlier,
+        interrupted request has already downloaded to filepath, or 0
+        if the download must start from the beginning.  A partial
+        download that can't be resumed is removed."""
+
+        sidecar = filepath + PARTIAL_SUFFIX
+        try:
+            with open(sidecar, "rb") as f:
+                state = json.loads(f.read())
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return 0
+            state = None
+        except ValueError:
+            state = None
+
+        # The record is removed now, and written again if this
+        # request is interrupted too.
+        CurlTransportEngine.__remove_file(sidecar)
+        try:
+            size = os.stat(filepath).st_size
+        except EnvironmentError:
+            size = None
+        if isinstance(state, dict) and state.get("url") == url and \
+            state.get("size") == size:
+            return size
+        CurlTransportEngine.__remove_file(filepath)
+        return 0
+
+    @staticmethod
+    def __keep_partial(hdl):
+        """Record the bytes that the interrupted request using hdl
+        has downloaded so that a later request can resume from them.
+        Returns False if they weren't worth keeping."""
+
+        try:
+            size = os.stat(hdl.filepath).st_size
+            if size < global_settings.pkg_client_resume_min_size:
+                return False
+            with open(hdl.filepath + PARTIAL_SUFFIX, "w") as f:
+                f.write(json.dumps({"url": hdl.url, "size": size}))
+        except EnvironmentError:
+            return False
+        return True
+
     @staticmethod
     def __teardown_handle(hdl):
         """Cleanup any state that we've associated with this handle.
@@ -1010,6 +1208,9 @@ class CurlTransportEngine(TransportEngine):
         for use, but should have no previous state.  To remove
         handles from use completely, use __shutdown."""
 
+        # Only content sent because it was asked for may be kept to
+        # resume from; an error response isn't part of the file.
+        respcode = hdl.getinfo(pycurl.RESPONSE_CODE)
         hdl.reset()
         if hdl.fobj:
             hdl.fobj.close()
@@ -1017,14 +1218,11 @@ class CurlTransportEngine(TransportEngine):
             if not hdl.success:
                 if hdl.fileprog:
                     hdl.fileprog.abort()
-                try:
-                    os.remove(hdl.filepath)
-                except EnvironmentError as e:
-                    if e.errno != errno.ENOENT:
-                        raise \
-                            tx.TransportOperationError(
-                            "Unable to remove file: "
-                            "{0}".format(e))
+                if not (hdl.resumable and respcode in
+                    (http.client.OK, http.client.PARTIAL_CONTENT) and
+                    CurlTransportEngine.__keep_partial(hdl)):
+                    CurlTransportEngine.__remove_file(
+                        hdl.filepath)
             else:
                 if hdl.fileprog:
                     filesz = os.stat(hdl.filepath).st_size
@@ -1045,6 +1243,9 @@ class CurlTransportEngine(TransportEngine):
         hdl.repourl = None
         hdl.success = False
         hdl.filepath = None
+        hdl.donefunc = None
+        hdl.resumable = False
+        hdl.resume_offset = 0
         hdl.fileprog = None
         hdl.uuid = None
         hdl.filetime = -1
@@ -1061,7 +1262,8 @@ class TransportRequest:
         progclass=None, progtrack=None, sslcert=None, sslkey=None,
         repourl=None, compressible=False, progfunc=None, uuid=None,
         read_fobj=None, read_filepath=None, failonerror=False, proxy=None,
-        runtime_proxy=None, system=False):
+        runtime_proxy=None, system=False, resumable=False,
+        donefunc=None):
         """Create a TransportRequest with the following parameters:
 
         url - The url that the transport engine should retrieve
@@ -1143,6 +1345,15 @@ class TransportRequest:
         resources served by the system-repository, we use this to
         prevent $http_proxy environment variables from being used.
 
+        resumable - If the download to filepath is interrupted, keep
+        the bytes received so that a later request for the same url
+        can ask for just the rest of the file using a Range request.
+
+        donefunc - A function that the engine calls, with no arguments,
+        as soon as the request has completed successfully, so that the
+        caller can begin processing its result while other requests
+        are still in progress.
+
         A TransportRequest must contain enough information to uniquely
         identify any pkg.client.publisher.TransportRepoURI - in
         particular, it must contain all fields used by
@@ -1171,3 +1382,5 @@ class TransportRequest:
         self.proxy = proxy
         self.runtime_proxy = runtime_proxy
         self.system = system
+        self.resumable = resumable
+        self.donefunc = donefunc
@@ -44,6 +44,16 @@ decayable_file_errors = set((pycurl.E_FILE_COULDNT_READ_FILE, errno.EAGAIN,
 decayable_pycurl_errors = set((pycurl.E_OPERATION_TIMEOUTED,
         pycurl.E_COULDNT_CONNECT))
 
+# Errors that stats.py takes as a sign that a repository, or the network
+# path to it, can't keep up with the requests made to it
+congestion_http_errors = set((http.client.REQUEST_TIMEOUT,
+    http.client.TOO_MANY_REQUESTS, http.client.BAD_GATEWAY,
+    http.client.SERVICE_UNAVAILABLE, http.client.GATEWAY_TIMEOUT))
+congestion_file_errors = set((errno.EAGAIN,))
+congestion_pycurl_errors = set((pycurl.E_COULDNT_CONNECT,
+    pycurl.E_PARTIAL_FILE, pycurl.E_OPERATION_TIMEOUTED,
+    pycurl.E_GOT_NOTHING, pycurl.E_SEND_ERROR, pycurl.E_RECV_ERROR))
+
 # Different protocols may have different retryable errors.  Map proto
 # to set of retryable errors.
 
@@ -59,6 +69,12 @@ decayable_proto_errors = {
     "https": decayable_http_errors,
 }
 
+congestion_proto_errors = {
+    "file": congestion_file_errors,
+    "http": congestion_http_errors,
+    "https": congestion_http_errors,
+}
+
 proto_code_map = {
     "http": http.client.responses,
     "https": http.client.responses
@@ -76,6 +92,7 @@ class TransportException(api_errors.TransportError):
 
     def __init__(self):
         self.count = 1
+        self.congestion = False
         self.decayable = False
         self.retryable = False
 
@@ -158,6 +175,7 @@ class TransportProtoError(TransportException):
         self.urlstem = repourl
         self.reason = reason
         self.request = request
+        self.congestion = self.code in congestion_proto_errors[self.proto]
         self.decayable = self.code in decayable_proto_errors[self.proto]
         self.retryable = self.code in retryable_proto_errors[self.proto]
         self.uuid = uuid
@@ -225,6 +243,7 @@ class TransportFrameworkError(TransportException):
         self.url = url
         self.urlstem = repourl
         self.reason = reason
+        self.congestion = self.code in congestion_pycurl_errors
         self.decayable = self.code in decayable_pycurl_errors
         self.retryable = self.code in retryable_pycurl_errors
         self.uuid = uuid
@@ -25,6 +25,7 @@
 #
 
 import errno
+import functools
 import http.client
 import io
 import itertools
@@ -77,17 +78,31 @@ class TransportRepo:
 
         raise NotImplementedError
 
+    def get_catalog_updates(self, name, header=None, ccancel=None,
+        pub=None, revalidate=False, redownload=False):
+        """Get the catalog update log named by 'name' and every newer
+        update log for the same locale as a single JSON object indexed
+        by update log name.  Returns a file-like object.
+
+        Revalidate and redownload are used to control upstream
+        caching behavior, for protocols that support caching. (HTTP)"""
+
+        raise NotImplementedError
+
     def get_datastream(self, fhash, version, header=None, ccancel=None, pub=None):
         """Get a datastream from a repo.  The name of the
         file is given in fhash."""
 
         raise NotImplementedError
 
-    def get_files(self, filelist, dest, progtrack, version, header=None, pub=None):
+    def get_files(self, filelist, dest, progtrack, version, header=None,
+        pub=None, donefunc=None):
         """Get multiple files from the repo at once.
         The files are named by hash and supplied in filelist.
         If dest is specified, download to the destination
-        directory that is given. Progtrack is a ProgressTracker"""
+        directory that is given. Progtrack is a ProgressTracker.
+        If donefunc is provided, it is called with the name of
+        each file as soon as that file has been retrieved."""
 
         raise NotImplementedError
 
@@ -196,8 +211,11 @@ class TransportRepo:
 
         raise NotImplementedError
 
-    def publish_refresh_indexes(self, header=None, pub=None):
-        """Attempt to refresh the search data in the repository."""
+    def publish_refresh_indexes(self, header=None, pub=None,
+        merge=False):
+        """Attempt to refresh the search data in the repository.  If
+        'merge' is True, the segments of the repository's search
+        indexes are merged into their main indexes as well."""
 
         raise NotImplementedError
 
@@ -391,12 +409,14 @@ class HTTPRepo(TransportRepo):
             self._repouri)
 
     def _add_file_url(self, url, filepath=None, progclass=None,
-        progtrack=None, header=None, compress=False):
+        progtrack=None, header=None, compress=False, resumable=False,
+        donefunc=None):
         self._engine.add_url(url, filepath=filepath,
             progclass=progclass, progtrack=progtrack, repourl=self._url,
             header=header, compressible=compress,
             runtime_proxy=self._repouri.runtime_proxy,
-            proxy=self._repouri.proxy)
+            proxy=self._repouri.proxy, resumable=resumable,
+            donefunc=donefunc)
 
     def _fetch_url(self, url, header=None, compress=False, ccancel=None,
         failonerror=True, system=False):
@@ -576,6 +596,32 @@ class HTTPRepo(TransportRepo):
 
         return self._annotate_exceptions(errors)
 
+    def get_catalog_updates(self, name, header=None, ccancel=None,
+        pub=None, revalidate=False, redownload=False):
+        """Get the catalog update log named by 'name' and every newer
+        update log for the same locale as a single JSON object indexed
+        by update log name.  Returns a file-like object.
+
+        If 'redownload' or 'revalidate' is set, cache control
+        headers are appended to the request as for get_catalog1."""
+
+        headers = {}
+        if redownload and revalidate:
+            raise ValueError("Either revalidate or redownload"
+                " may be used, but not both.")
+        if revalidate:
+            headers["Cache-Control"] = "max-age=0"
+        if redownload:
+            headers["Cache-Control"] = "no-cache"
+            headers["Pragma"] = "no-cache"
+        if header:
+            headers.update(header)
+
+        baseurl = self.__get_request_url("updatelog/0/", pub=pub)
+        requesturl = urljoin(baseurl, name)
+        return self._fetch_url(requesturl, headers, compress=True,
+            ccancel=ccancel)
+
     def get_datastream(self, fhash, version, header=None, ccancel=None,
         pub=None):
         """Get a datastream from a repo.  The name of the
@@ -681,13 +727,16 @@ class HTTPRepo(TransportRepo):
 
         return self._annotate_exceptions(errors, urlmapping)
 
-    def get_files(self, filelist, dest, progtrack, version, header=None, pub=None):
+    def get_files(self, filelist, dest, progtrack, version, header=None,
+        pub=None, donefunc=None):
         """Get multiple files from the repo at once.
         The files are named by hash and supplied in filelist.
         If dest is specified, download to the destination
         directory that is given.  If progtrack is not None,
         it contains a ProgressTracker object for the
-        downloads."""
+        downloads.  If donefunc is not None, it is called
+        with the name of each file as soon as that file has
+        been retrieved."""
 
         baseurl = self.__get_request_url("file/{0}/".format(version),
             pub=pub)
@@ -701,9 +750,14 @@ class HTTPRepo(TransportRepo):
             url = urljoin(baseurl, f)
             urllist.append(url)
             fn = os.path.join(dest, f)
+            filedone = None
+            if donefunc:
+                filedone = functools.partial(donefunc, f)
+            # Files aren't compressed in transit, so if a download
+            # is interrupted, a retry can ask for just the rest.
             self._add_file_url(url, filepath=fn,
                 progclass=progclass, progtrack=progtrack,
-                header=header)
+                header=header, resumable=True, donefunc=filedone)
 
         try:
             while self._engine.pending:
@@ -1038,12 +1092,17 @@ class HTTPRepo(TransportRepo):
             failonerror=False)
         self.__check_response_body(fobj)
 
-    def publish_refresh_indexes(self, header=None, pub=None):
+    def publish_refresh_indexes(self, header=None, pub=None,
+        merge=False):
         """Attempt to refresh the search data in the repository."""
 
         if self.supports_version("admin", [0]) > -1:
-            requesturl = self.__get_request_url("admin/0", query={
-                "cmd": "refresh-indexes" }, pub=pub)
+            query = { "cmd": "refresh-indexes" }
+            if merge:
+                # Older depots ignore this.
+                query["merge"] = "1"
+            requesturl = self.__get_request_url("admin/0", query=query,
+                pub=pub)
         else:
             requesturl = self.__get_request_url("index/0/refresh")
 
@@ -1168,14 +1227,16 @@ class HTTPSRepo(HTTPRepo):
 
     # override the download functions to use ssl cert/key
     def _add_file_url(self, url, filepath=None, progclass=None,
-        progtrack=None, header=None, compress=False):
+        progtrack=None, header=None, compress=False, resumable=False,
+        donefunc=None):
         self._engine.add_url(url, filepath=filepath,
             progclass=progclass, progtrack=progtrack,
             sslcert=self._repouri.ssl_cert,
             sslkey=self._repouri.ssl_key, repourl=self._url,
             header=header, compressible=compress,
             runtime_proxy=self._repouri.runtime_proxy,
-            proxy=self._repouri.proxy)
+            proxy=self._repouri.proxy, resumable=resumable,
+            donefunc=donefunc)
 
     def _fetch_url(self, url, header=None, compress=False, ccancel=None,
         failonerror=True):
@@ -1267,10 +1328,10 @@ class _FilesystemRepo(TransportRepo):
             self._frepo = None
 
     def _add_file_url(self, url, filepath=None, progclass=None,
-        progtrack=None, header=None, compress=False):
+        progtrack=None, header=None, compress=False, donefunc=None):
         self._engine.add_url(url, filepath=filepath,
             progclass=progclass, progtrack=progtrack, repourl=self._url,
-            header=header, compressible=False)
+            header=header, compressible=False, donefunc=donefunc)
 
     def _fetch_url(self, url, header=None, compress=False, ccancel=None,
         failonerror=True):
@@ -1564,13 +1625,16 @@ class _FilesystemRepo(TransportRepo):
 
         return errors + pre_exec_errors
 
-    def get_files(self, filelist, dest, progtrack, version, header=None, pub=None):
+    def get_files(self, filelist, dest, progtrack, version, header=None,
+        pub=None, donefunc=None):
         """Get multiple files from the repo at once.
         The files are named by hash and supplied in filelist.
         If dest is specified, download to the destination
         directory that is given.  If progtrack is not None,
         it contains a ProgressTracker object for the
-        downloads."""
+        downloads.  If donefunc is not None, it is called
+        with the name of each file as soon as that file has
+        been retrieved."""
 
         urllist = []
         progclass = None
@@ -1604,9 +1668,12 @@ class _FilesystemRepo(TransportRepo):
                 continue
             urllist.append(url)
             fn = os.path.join(dest, f)
+            filedone = None
+            if donefunc:
+                filedone = functools.partial(donefunc, f)
             self._add_file_url(url, filepath=fn,
                 progclass=progclass, progtrack=progtrack,
-                header=header)
+                header=header, donefunc=filedone)
 
         try:
             while self._engine.pending:
@@ -1861,14 +1928,15 @@ class _FilesystemRepo(TransportRepo):
         except svr_repo.RepositoryError as e:
             raise tx.TransportOperationError(str(e))
 
-    def publish_refresh_indexes(self, header=None, pub=None):
+    def publish_refresh_indexes(self, header=None, pub=None,
+        merge=False):
         """Attempt to refresh the search data in the repository."""
 
         # Calling any publication operation sets read_only to False.
         self._frepo.read_only = False
 
         try:
-            self._frepo.refresh_index()
+            self._frepo.refresh_index(merge=merge)
         except svr_repo.RepositoryError as e:
             raise tx.TransportOperationError(str(e))
 
@@ -2176,13 +2244,16 @@ class _ArchiveRepo(TransportRepo):
                 continue
         return errors
 
-    def get_files(self, filelist, dest, progtrack, version, header=None, pub=None):
+    def get_files(self, filelist, dest, progtrack, version, header=None,
+        pub=None, donefunc=None):
         """Get multiple files from the repo at once.
         The files are named by hash and supplied in filelist.
         If dest is specified, download to the destination
         directory that is given.  If progtrack is not None,
         it contains a ProgressTracker object for the
-        downloads."""
+        downloads.  If donefunc is not None, it is called
+        with the name of each file as soon as that file has
+        been retrieved."""
 
         pub_prefix = getattr(pub, "prefix", None)
         errors = []
@@ -2208,6 +2279,8 @@ class _ArchiveRepo(TransportRepo):
                 self.__record_proto_error(ex)
                 errors.append(ex)
                 continue
+            if donefunc:
+                donefunc(f)
         return errors
 
     def get_url(self):
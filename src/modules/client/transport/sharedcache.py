@@ -0,0 +1,210 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+import errno
+import os
+import tempfile
+import time
+
+import pkg.file_layout.file_manager as fm
+import pkg.file_layout.layout as layout
+import pkg.lockfile as lockfile
+import pkg.portable as portable
+
+# Content used less than this many seconds ago is never evicted, so that
+# the files an operation has found in or stored to the cache remain there
+# until they have been installed.
+MIN_AGE = 60 * 60
+
+# When the cache has grown beyond its size limit, content is evicted until
+# the cache is this fraction of the limit, so that eviction isn't needed
+# again straight away.
+LOW_WATER = 0.9
+
+
+class SharedCache(fm.FileManager):
+    """A FileManager for a download cache that is shared by the images on
+    a system.  As in any other cache, content is stored by hash, so each
+    file is only downloaded and stored once however many images use it.
+
+    The cache is kept within a size limit by evicting the content used
+    least recently.  The time content was last used is recorded as the
+    modification time of its file, since access times are often not
+    maintained.  Eviction is serialized using a lock file in the cache,
+    so any number of processes may use the cache at once."""
+
+    def __init__(self, root, size_limit, readonly=False):
+        """Initialize the SharedCache object.
+
+        The "root" parameter is the path to the cache directory.
+
+        The "size_limit" parameter is the number of bytes the content
+        in the cache should be kept within."""
+
+        fm.FileManager.__init__(self, root, readonly,
+            layouts=layout.V1Layout())
+        self.size_limit = size_limit
+        # Bytes stored since the size of the cache was last checked,
+        # or None if it hasn't been checked yet.
+        self.__added = None
+        self.__lock = lockfile.LockFile(os.path.join(root, "lock"),
+            set_lockstr=lockfile.generic_lock_set_str,
+            get_lockstr=lockfile.generic_lock_get_str)
+
+    def __touch(self, path):
+        """Record that the content at 'path' has just been used."""
+
+        if self.readonly:
+            return
+        try:
+            os.utime(path)
+        except EnvironmentError:
+            # The content may have just been evicted; if so, it
+            # will be retrieved again.
+            pass
+
+    def lookup(self, hashval, opener=False, check_existence=True):
+        """Find the file for hashval, and record that it has been
+        used."""
+
+        path = fm.FileManager.lookup(self, hashval,
+            check_existence=check_existence)
+        if not path:
+            return None
+
+        self.__touch(path)
+        if opener:
+            return open(path, "rb")
+        return path
+
+    def insert(self, hashval, src_path):
+        """Add the content at "src_path" to the files under the name
+        "hashval".  Returns the path to the inserted file.
+
+        Content on a different file system from the cache is copied
+        into it first, so that it appears in the cache atomically."""
+
+        if self.readonly:
+            raise fm.NeedToModifyReadOnlyFileManager(hashval)
+
+        st = os.stat(src_path)
+        try:
+            same_fs = st.st_dev == os.stat(self.root).st_dev
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            os.makedirs(self.root, exist_ok=True)
+            same_fs = st.st_dev == os.stat(self.root).st_dev
+
+        if not same_fs:
+            fd, tmp_path = tempfile.mkstemp(dir=self.root,
+                prefix="incoming-")
+            os.close(fd)
+            try:
+                portable.copyfile(src_path, tmp_path)
+                path = fm.FileManager.insert(self, hashval,
+                    tmp_path)
+            except:
+                portable.remove(tmp_path)
+                raise
+            portable.remove(src_path)
+        else:
+            path = fm.FileManager.insert(self, hashval, src_path)
+        self.__touch(path)
+
+        # Check the size of the cache when content is first stored
+        # and after each further tenth of the limit.
+        if self.__added is None or self.__added + st.st_size > \
+            self.size_limit * (1 - LOW_WATER):
+            self.prune()
+        else:
+            self.__added += st.st_size
+        return path
+
+    def prune(self):
+        """Evict the content used least recently until the cache is
+        within its size limit, and remove any copies into the cache
+        that were abandoned.  Nothing is done if another process is
+        already doing so."""
+
+        self.__added = 0
+        if self.readonly:
+            return
+
+        try:
+            self.__lock.lock(blocking=False)
+        except (lockfile.FileLocked, EnvironmentError):
+            return
+
+        try:
+            total = 0
+            entries = []
+            oldest = time.time() - MIN_AGE
+            for d in os.scandir(self.root):
+                # Copies being made into the cache by insert() that
+                # haven't been written to in so long were left
+                # behind by a process that stopped part way through.
+                if d.name.startswith("incoming-"):
+                    try:
+                        st = d.stat(follow_symlinks=False)
+                        if st.st_mtime < oldest:
+                            portable.remove(d.path)
+                    except EnvironmentError:
+                        pass
+                    continue
+
+                # Content is stored in one level of directories
+                # named by the first two characters of its hash.
+                if len(d.name) != 2 or \
+                    not d.is_dir(follow_symlinks=False):
+                    continue
+                for f in os.scandir(d.path):
+                    try:
+                        st = f.stat(follow_symlinks=False)
+                    except EnvironmentError:
+                        continue
+                    total += st.st_size
+                    entries.append((st.st_mtime, st.st_size,
+                        f.path))
+
+            if total <= self.size_limit:
+                return
+
+            goal = self.size_limit * LOW_WATER
+            entries.sort()
+            for mtime, size, path in entries:
+                if total <= goal or mtime > oldest:
+                    break
+                try:
+                    portable.remove(path)
+                except EnvironmentError:
+                    continue
+                total -= size
+        except EnvironmentError:
+            # The cache can't be examined; leave it as it is.
+            pass
+        finally:
+            self.__lock.unlock()
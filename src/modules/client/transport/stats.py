@@ -21,13 +21,21 @@
 #
 
 #
-# Copyright (c) 2009, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 #
 
 import random
+import time
 from urllib.parse import urlsplit
 import pkg.misc as misc
 
+# The bounds of the number of requests made to a repository in each chunk.
+CHUNK_MIN = 10
+CHUNK_MAX = 1024
+# The longest, in seconds, that a chunk should take to complete at the rate
+# that requests to a repository have been completed.
+CHUNK_SECONDS = 60
+
 
 class RepoChooser:
     """An object that contains repo statistics.  It applies algorithms
@@ -225,6 +233,7 @@ class RepoStats:
         self.__content_err = 0
         self.__decayable_err = 0
         self.__timeout_err = 0
+        self.__congestion_err = 0
         self.__total_tx = 0
         self.__consecutive_errors = 0
 
@@ -241,6 +250,15 @@ class RepoStats:
         self.origin_factor = 1
         self.origin_decay = 1
 
+        # The number of requests to make in each chunk, the size
+        # beyond which it's only grown additively, and the number
+        # of requests to make at once (None if not limited).
+        self.__chunk_size = CHUNK_MIN
+        self.__chunk_thresh = CHUNK_MAX
+        self.__concurrency = None
+        self.__chunk_start = None
+        self.__chunk_congestion = 0
+
     def clear_consecutive_errors(self):
         """Set the count of consecutive errors to zero.  This is
         done once we know a transaction has been successfully
@@ -248,6 +266,59 @@ class RepoStats:
 
         self.__consecutive_errors = 0
 
+    def start_chunk(self):
+        """Record that a chunk of requests to the repository is about
+        to be made."""
+
+        self.__chunk_start = time.time()
+        self.__chunk_congestion = self.__congestion_err
+
+    def end_chunk(self, nreqs, concurrency):
+        """Record that the chunk of 'nreqs' requests started by
+        start_chunk() has completed, having made up to 'concurrency'
+        requests at once, and adjust the size of the next chunk and
+        the number of requests to make at once.
+
+        As in TCP congestion control, both are cut in half if any
+        requests failed in a way that suggests the repository couldn't
+        keep up with them (see record_error()), and otherwise grow:
+        the chunk size doubles until it reaches the size it was last
+        cut to, and then grows linearly, while the number of requests
+        made at once grows by one.  Chunks are limited to the number of requests that can be
+        completed in CHUNK_SECONDS at the rate this chunk's were, so
+        that a slow repository isn't given too much to do before the
+        choice of repository is reconsidered."""
+
+        if self.__chunk_start is None:
+            return
+        elapsed = time.time() - self.__chunk_start
+        self.__chunk_start = None
+
+        if self.__congestion_err > self.__chunk_congestion:
+            self.__chunk_thresh = max(self.__chunk_size // 2,
+                CHUNK_MIN)
+            self.__chunk_size = self.__chunk_thresh
+            self.__concurrency = max(concurrency // 2, 1)
+            return
+
+        if self.__chunk_size < self.__chunk_thresh:
+            self.__chunk_size = min(self.__chunk_size * 2,
+                self.__chunk_thresh)
+        else:
+            self.__chunk_size += CHUNK_MIN
+        if elapsed > 0 and nreqs:
+            self.__chunk_size = min(self.__chunk_size,
+                max(int(nreqs * CHUNK_SECONDS / elapsed), CHUNK_MIN))
+        self.__chunk_size = min(self.__chunk_size, CHUNK_MAX)
+
+        if self.__concurrency is not None:
+            if self.__concurrency > concurrency:
+                # The limit has grown past the number of
+                # requests the transport can make at once.
+                self.__concurrency = None
+            else:
+                self.__concurrency += 1
+
     def record_connection(self, time):
         """Record amount of time spent connecting."""
 
@@ -257,7 +328,8 @@ class RepoStats:
         self.__connections += 1
         self.__connect_time += time
 
-    def record_error(self, decayable=False, content=False, timeout=False):
+    def record_error(self, decayable=False, content=False, timeout=False,
+        congestion=False):
         """Record that an operation to the TransportRepoURI represented
         by this RepoStats object failed with an error.
 
@@ -265,7 +337,11 @@ class RepoStats:
         error that may be decayed by the stats framework.
 
         Set content to true if the error is caused by
-        corrupted or invalid content."""
+        corrupted or invalid content.
+
+        Set congestion to true if the error suggests that the
+        repository or the network path to it is overloaded, such
+        as a timeout, a dropped connection or a 503 response."""
 
         if not self.__used:
             self.__used = True
@@ -278,10 +354,12 @@ class RepoStats:
             self.__content_err += 1
         else:
             self.__failed_tx += 1
-        # A timeout may be decayable or not, so track it in addition
-        # to the other classes of errors.
+        # Timeouts and congestion may be decayable or not, so track
+        # them in addition to the other classes of errors.
         if timeout:
             self.__timeout_err += 1
+        if congestion:
+            self.__congestion_err += 1
 
     def record_progress(self, bytes, seconds):
         """Record time and size of a network operation to a
@@ -311,7 +389,8 @@ class RepoStats:
         # reset because the metadata bandwidth calculation would be
         # skewed when picking a host that gives us fast data.  In that
         # case, keeping track of the latency helps quality make a
-        # better choice.
+        # better choice.  Nor are the chunk size and concurrency, which
+        # reflect what the network path to the repository can take.
         self.__bytes_xfr = 0.0
         self.__seconds_xfr = 0.0
         self.__failed_tx = 0
@@ -328,6 +407,20 @@ class RepoStats:
 
         return self.__bytes_xfr
 
+    @property
+    def chunk_size(self):
+        """The number of requests to make to the repository in the next
+        chunk."""
+
+        return self.__chunk_size
+
+    @property
+    def concurrency(self):
+        """The maximum number of requests to make to the repository at
+        once, or None if not limited."""
+
+        return self.__concurrency
+
     @property
     def connect_time(self):
         """The average connection time for this host."""
@@ -21,9 +21,10 @@
 #
 
 #
-# Copyright (c) 2009, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 #
 
+import concurrent.futures
 import copy
 import datetime as dt
 import errno
@@ -32,6 +33,7 @@ import itertools
 import os
 import rapidjson as json
 import tempfile
+import threading
 import zlib
 from collections import defaultdict
 from functools import cmp_to_key
@@ -48,6 +50,7 @@ import pkg.client.transport.engine as engine
 import pkg.client.transport.exception as tx
 import pkg.client.transport.mdetect as mdetect
 import pkg.client.transport.repo as trepo
+import pkg.client.transport.sharedcache as sharedcache
 import pkg.client.transport.stats as tstats
 import pkg.client.progress as progress
 import pkg.digest as digest
@@ -68,6 +71,27 @@ from pkg.misc import PKG_RO_FILE_MODE
 logger = global_settings.logger
 
 
+def _verify_workers(ncpus):
+    """Return the number of verification threads to use on a system
+    with 'ncpus' processors.  With only one, a worker thread could only
+    take time away from the thread driving the engine, so content is
+    verified inline instead."""
+
+    if not ncpus or ncpus < 2:
+        return 0
+    return min(ncpus, 8)
+
+
+# The number of threads that verify downloaded content while the engine
+# continues to retrieve more.  If zero, content is verified on the thread
+# driving the engine once each group of files has been retrieved.
+VERIFY_WORKERS = _verify_workers(os.cpu_count())
+
+# The number of files, per verification thread, that may be waiting to be
+# verified before retrieval pauses to let verification catch up.
+VERIFY_BACKLOG = 4
+
+
 class TransportCfg:
     """Contains configuration needed by the transport for proper
     operations.  Clients must create one of these objects, and then pass
@@ -88,7 +112,8 @@ class TransportCfg:
         # file needs to be uploaded for the transport.
         self.max_transfer_checks = 20
 
-    def add_cache(self, path, layout=None, pub=None, readonly=True):
+    def add_cache(self, path, layout=None, pub=None, readonly=True,
+        size_limit=None):
         """Adds the directory specified by 'path' as a location to read
         file data from, and optionally to store to for the specified
         publisher. 'path' must be a directory created for use with the
@@ -106,7 +131,12 @@ class TransportCfg:
 
         'readonly' is an optional boolean value indicating whether file
         data should be stored here as well.  Only one writeable cache
-        can exist for each 'pub' at a time."""
+        can exist for each 'pub' at a time.
+
+        'size_limit' is an optional number of bytes indicating that the
+        cache is shared with other images and that the content in it
+        used least recently should be evicted to keep it within that
+        size.  'layout' is ignored for such caches."""
 
         if not self.__caches_set:
             self.reset_caches(shared=True)
@@ -149,8 +179,12 @@ class TransportCfg:
         else:
             # Either no caches exist for this publisher, or this is
             # a new cache.
-            pub_caches.append(fm.FileManager(path, readonly,
-                layouts=layout))
+            if size_limit is not None:
+                pub_caches.append(sharedcache.SharedCache(path,
+                    size_limit, readonly=readonly))
+            else:
+                pub_caches.append(fm.FileManager(path, readonly,
+                    layouts=layout))
 
     def gen_publishers(self):
         raise NotImplementedError
@@ -199,6 +233,9 @@ class TransportCfg:
     def get_policy(self, policy_name):
         raise NotImplementedError
 
+    def get_policy_str(self, policy_name):
+        raise NotImplementedError
+
     def get_property(self, property_name):
         raise NotImplementedError
 
@@ -362,6 +399,11 @@ class ImageTransportCfg(TransportCfg):
             return False
         return self.__img.cfg.get_policy(policy_name)
 
+    def get_policy_str(self, policy_name):
+        if not self.__img.cfg:
+            return imageconfig.default_policies[policy_name]
+        return self.__img.cfg.get_policy_str(policy_name)
+
     def get_img_cfg_property(self, section, name):
         if not self.__img.cfg:
             return None
@@ -436,6 +478,12 @@ class ImageTransportCfg(TransportCfg):
             self.add_cache(path, layout=layout, pub=pub,
                 readonly=readonly)
 
+        # And the cache shared with other images, if any.
+        path, size_limit = self.__img.get_shared_cachedir()
+        if path:
+            self.add_cache(path, readonly=False,
+                size_limit=size_limit)
+
     def __get_user_agent(self):
         return misc.user_agent_str(self.__img,
             global_settings.client_name)
@@ -487,6 +535,10 @@ class GenericTransportCfg(TransportCfg):
     def get_policy(self, policy_name):
         return self.__policy_map.get(policy_name, False)
 
+    def get_policy_str(self, policy_name):
+        return self.__policy_map.get(policy_name,
+            imageconfig.default_policies[policy_name])
+
     def get_property(self, property_name):
         return self.__property_map[property_name]
 
@@ -581,15 +633,30 @@ class Transport:
         # Used to record those CRLs which are unreachable during the
         # current operation.
         self.__bad_crls = set()
+        self.__verifier = None
+        self.__verify_slots = None
 
     def __setup(self):
-        self.__engine = engine.CurlTransportEngine(self)
+        try:
+            streams = int(self.cfg.get_policy_str(
+                imageconfig.HTTP2_STREAMS))
+        except (TypeError, ValueError):
+            streams = 0
+        self.__engine = engine.CurlTransportEngine(self,
+            max_streams=streams)
 
         # Configure engine's user agent
         self.__engine.set_user_agent(self.cfg.user_agent)
 
         self.__repo_cache = trepo.RepoCache(self.__engine)
 
+        if VERIFY_WORKERS > 0:
+            self.__verifier = concurrent.futures.ThreadPoolExecutor(
+                max_workers=VERIFY_WORKERS,
+                thread_name_prefix="pkg-verify")
+            self.__verify_slots = threading.Semaphore(
+                VERIFY_WORKERS * VERIFY_BACKLOG)
+
         if self.cfg.get_policy(imageconfig.MIRROR_DISCOVERY):
             self.__dynamic_mirrors = mdetect.MirrorDetector()
             try:
@@ -634,6 +701,10 @@ class Transport:
         try:
             self.__engine.shutdown()
             self.__engine = None
+            if self.__verifier:
+                self.__verifier.shutdown()
+                self.__verifier = None
+                self.__verify_slots = None
             if self.__repo_cache:
                 self.__repo_cache.clear_cache()
             self.__repo_cache = None
@@ -980,6 +1051,120 @@ class Transport:
                 tfailurex.append(f)
             raise tfailurex
 
+    @LockedTransport()
+    def get_catalog_updates(self, pub, name, path=None, ccancel=None,
+        revalidate=False, redownload=False, alt_repo=None):
+        """Get the catalog update log 'name' and every newer update log
+        for the same locale from publisher 'pub' using a single request.
+        Returns a list of the names of the update logs retrieved.
+
+        If the caller wants the completed download to be placed
+        in an alternate directory (pub.catalog_root is standard),
+        set a directory path in 'path'.
+
+        'revalidate' and 'redownload' are used as for get_catalog1.
+
+        If none of the publisher's origins support retrieving update
+        logs this way, UnsupportedRepositoryOperation is raised and
+        the caller should use get_catalog1 to retrieve the update logs
+        instead."""
+
+        retry_count = global_settings.PKG_CLIENT_MAX_TIMEOUT
+        failures = tx.TransportFailures()
+        header = self.__build_header(pub=pub)
+
+        if redownload and revalidate:
+            raise ValueError("Either revalidate or redownload"
+                " may be used, but not both.")
+
+        # download_dir is temporary download path.  Completed_dir
+        # is the cache where valid content lives.
+        if path:
+            completed_dir = path
+        else:
+            completed_dir = pub.catalog_root
+        download_dir = self.cfg.incoming_root
+
+        # Call setup if the transport isn't configured or was shutdown.
+        if not self.__engine:
+            self.__setup()
+
+        # If version check hasn't been executed, run it prior to this
+        # operation.
+        self._version_check_all(ccancel=ccancel, alt_repo=alt_repo)
+
+        self._makedirs(download_dir)
+        self._makedirs(completed_dir)
+
+        for d, retries, v in self.__gen_repo(pub, retry_count,
+            origin_only=True, operation="updatelog", versions=[0],
+            ccancel=ccancel, alt_repo=alt_repo):
+
+            repostats = self.stats[d.get_repouri_key()]
+            rheader = Transport.__get_request_header(header,
+                repostats, retries, d)
+
+            try:
+                resp = d.get_catalog_updates(name, header=rheader,
+                    ccancel=ccancel, pub=pub, revalidate=revalidate,
+                    redownload=redownload)
+                updates = json.loads(resp.read())
+                if not isinstance(updates, dict) or \
+                    name not in updates:
+                    raise ValueError("{0} is missing".format(
+                        name))
+            except tx.ExcessiveTransientFailure as e:
+                # If an endpoint experienced so many failures
+                # that we just gave up, grab the list of
+                # failures that it contains
+                failures.extend(e.failures)
+                continue
+            except ValueError as e:
+                repostats.record_error(content=True)
+                failures.append(tx.TransferContentException(
+                    d.get_repouri_key()[0],
+                    "Invalid update log data: {0}".format(e)))
+                continue
+            except tx.TransportException as e:
+                if e.retryable:
+                    failures.append(e)
+                    continue
+                raise
+
+            # Each of the update logs is written out and verified
+            # as though it had been retrieved individually.
+            written = []
+            try:
+                for uname, udata in updates.items():
+                    if not uname.startswith("update.") or \
+                        os.path.basename(uname) != uname:
+                        raise tx.InvalidContentException(
+                            uname, "Invalid update log name",
+                            url=d.get_url())
+                    written.append(uname)
+                    with open(os.path.join(download_dir, uname),
+                        "w") as f:
+                        json.dump(udata, f)
+                    self._verify_catalog(uname, download_dir)
+            except tx.InvalidContentException as e:
+                repostats.record_error(content=True)
+                failures.append(e)
+                for uname in written:
+                    try:
+                        portable.remove(os.path.join(
+                            download_dir, uname))
+                    except EnvironmentError:
+                        # Already removed by verification.
+                        pass
+                continue
+
+            for uname in written:
+                portable.rename(os.path.join(download_dir, uname),
+                    os.path.join(completed_dir, uname))
+            return written
+
+        raise failures
+
     @LockedTransport()
     def get_publisherdata(self, pub, ccancel=None):
         """Given a publisher pub, return the publisher/0
@@ -1555,6 +1740,13 @@ class Transport:
                 mfstlist = [(fmri, d.build_refetch_header(h))
                     for fmri, h in mfstlist]
 
+            # Limit the number of requests made at once to what
+            # the repository has been able to take.
+            concurrency = self.__engine.set_concurrency(
+                repostats.concurrency)
+            nreqs = len(mfstlist)
+            repostats.start_chunk()
+
             # This returns a list of transient errors
             # that occurred during the transport operation.
             # An exception handler here isn't necessary
@@ -1569,6 +1761,12 @@ class Transport:
                 gave_up = True
                 errlist = ex.failures
                 success = ex.success
+            finally:
+                self.__engine.set_concurrency()
+
+            # Only the transfer is timed; verification and parsing
+            # of what was retrieved aren't the repository's doing.
+            repostats.end_chunk(nreqs, concurrency)
 
             for e in errlist:
                 req = getattr(e, "request", None)
@@ -1807,6 +2005,19 @@ class Transport:
         else:
             cache = None
 
+        # Each file is verified by a worker thread as soon as it has
+        # been retrieved, while the engine carries on retrieving the
+        # rest.  This maps the files to the results.
+        verifying = {}
+
+        def verify(s):
+            verifying[s] = self.__verify_async(mfile[s][0],
+                os.path.join(download_dir, s))
+
+        donefunc = None
+        if self.__verifier:
+            donefunc = verify
+
         for d, retries, v in self.__gen_repo(pub, retry_count,
             operation="file", versions=[0, 1],
             alt_repo=mfile.get_alt_repo()):
@@ -1818,13 +2029,21 @@ class Transport:
 
             gave_up = False
 
+            # Limit the number of requests made at once to what
+            # the repository has been able to take.
+            concurrency = self.__engine.set_concurrency(
+                repostats.concurrency)
+            nreqs = len(filelist)
+            repostats.start_chunk()
+
             # This returns a list of transient errors
             # that occurred during the transport operation.
             # An exception handler here isn't necessary
             # unless we want to suppress a permanent failure.
             try:
                 errlist = d.get_files(filelist, download_dir,
-                    progtrack, v, header, pub=pub)
+                    progtrack, v, header, pub=pub,
+                    donefunc=donefunc)
             except tx.ExcessiveTransientFailure as ex:
                 # If an endpoint experienced so many failures
                 # that we just gave up, record this for later
@@ -1832,6 +2051,15 @@ class Transport:
                 gave_up = True
                 errlist = ex.failures
                 success = ex.success
+            except:
+                self.__cancel_verify(verifying)
+                raise
+            finally:
+                self.__engine.set_concurrency()
+
+            # Only the transfer is timed; verification of what was
+            # retrieved isn't the repository's doing.
+            repostats.end_chunk(nreqs, concurrency)
 
             for e in errlist:
                 req = getattr(e, "request", None)
@@ -1839,6 +2067,7 @@ class Transport:
                     failedreqs.append(req)
                     failures.append(e)
                 else:
+                    self.__cancel_verify(verifying)
                     raise e
 
             if gave_up:
@@ -1871,8 +2100,11 @@ class Transport:
                 dl_path = os.path.join(download_dir, s)
 
                 try:
-                    self._verify_content(mfile[s][0],
-                        dl_path)
+                    if s in verifying:
+                        verifying.pop(s).result()
+                    else:
+                        self._verify_content(mfile[s][0],
+                            dl_path)
                 except tx.InvalidContentException as e:
                     mfile.subtract_progress(e.size)
                     e.request = s
@@ -1889,6 +2121,10 @@ class Transport:
                 else:
                     mfile.file_done(s, dl_path)
 
+            # Don't let a worker still be looking at a file that may
+            # be retrieved again.
+            self.__cancel_verify(verifying)
+
             # Return if everything was successful
             if not filelist and not errlist:
                 return
@@ -2412,11 +2648,12 @@ class Transport:
         """Determine the chunk size based upon how many of the known
         mirrors have been visited.  If not all mirrors have been
         visited, choose a small size so that if it ends up being
-        a poor choice, the client doesn't transfer too much data."""
-
-        CHUNK_SMALL = 10
-        CHUNK_LARGE = 100
-        CHUNK_HUGE = 1024
+        a poor choice, the client doesn't transfer too much data.
+        Otherwise, use the size that the statistics of the repository
+        ranked best, and so tried first, have adapted to (see
+        RepoStats.end_chunk()).  This applies when there's only one
+        repository too, so that a single origin that can't keep up
+        isn't given more than it can take."""
 
         # Call setup if the transport isn't configured or was shutdown.
         if not self.__engine:
@@ -2441,11 +2678,12 @@ class Transport:
         repolist = _convert_repouris(repolist)
         n = len(repolist)
         m = self.stats.get_num_visited(repolist)
-        if n == 1:
-            return CHUNK_HUGE
         if m < n:
-            return CHUNK_SMALL
-        return CHUNK_LARGE
+            return tstats.CHUNK_MIN
+        return max(
+            (self.stats[ruri.key()] for ruri in repolist),
+            key=lambda rs: rs.quality
+        ).chunk_size
 
     @LockedTransport()
     def valid_publisher_test(self, pub, ccancel=None):
@@ -2715,6 +2953,32 @@ class Transport:
         return self._make_opener(self._action_cached(action, pub,
             verify=False))
 
+    def __verify_async(self, action, filepath):
+        """Start verifying the content at filepath for action on a
+        worker thread, and return a Future for the result.  If too many
+        files are already waiting to be verified, wait for one of them
+        first, so that retrieval doesn't get too far ahead."""
+
+        self.__verify_slots.acquire()
+        try:
+            f = self.__verifier.submit(self._verify_content, action,
+                filepath)
+        except:
+            self.__verify_slots.release()
+            raise
+        f.add_done_callback(lambda f: self.__verify_slots.release())
+        return f
+
+    @staticmethod
+    def __cancel_verify(verifying):
+        """Abandon the verification of the files in the dictionary
+        'verifying', waiting for any that have already started."""
+
+        for f in verifying.values():
+            f.cancel()
+        concurrent.futures.wait(verifying.values())
+        verifying.clear()
+
     def _verify_content(self, action, filepath):
         """If action contains an attribute that has the compressed
         hash, read the file specified in filepath and verify
@@ -3158,9 +3422,11 @@ class Transport:
         raise failures
 
     @LockedTransport()
-    def publish_refresh_indexes(self, pub):
+    def publish_refresh_indexes(self, pub, merge=False):
         """Instructs the repositories named by Publisher pub
-        to refresh their search indexes."""
+        to refresh their search indexes.  If 'merge' is True, the
+        repositories are also asked to merge the segments of their
+        search indexes into their main indexes."""
 
         failures = tx.TransportFailures()
         retry_count = global_settings.PKG_CLIENT_MAX_TIMEOUT
@@ -3174,7 +3440,7 @@ class Transport:
             origin_only=True, single_repository=True):
             try:
                 d.publish_refresh_indexes(header=header,
-                    pub=pub)
+                    pub=pub, merge=merge)
                 return
             except tx.ExcessiveTransientFailure as ex:
                 # If an endpoint experienced so many failures
@@ -21,10 +21,14 @@
 #
 
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
+import concurrent.futures
 import errno
+import gettext
+import heapq
+import multiprocessing
 import os
 import shutil
 from urllib.parse import unquote
@@ -50,10 +54,30 @@ FILE_OPEN_TIMEOUT_SECS = 2
 
 MAX_FAST_INDEXED_PKGS = 20
 
+# The number of segments a server index may have before an update merges
+# them, and the packages being added, into the main index instead of
+# writing another segment.
+MAX_INDEX_SEGMENTS = 16
+
 SORT_FILE_PREFIX = "sort."
 
 SORT_FILE_MAX_SIZE = 128 * 1024 * 1024
 
+# The minimum number of packages which must be indexed at once before their
+# manifests are tokenized by a pool of worker processes rather than by the
+# indexing process itself.
+PARALLEL_INDEX_MIN_PKGS = 256
+
+# The number of tasks each worker process is given when tokenizing manifests
+# in parallel.  Every task writes at least one sorted run, so this trades the
+# granularity of progress reporting against the number of runs to merge.
+PARALLEL_INDEX_TASKS_PER_WORKER = 4
+
+# Worker processes are started afresh rather than forked from the indexing
+# process, which may be running other threads (as the depot server does)
+# whose locks would be copied in whatever state they were in.
+PARALLEL_INDEX_START_METHOD = "spawn"
+
 
 def makedirs(pathname):
     """Create a directory at the specified location if it does not
@@ -73,6 +97,60 @@ def makedirs(pathname):
             raise
 
 
+def _init_worker():
+    """Prepares a worker process used to tokenize manifests."""
+
+    gettext.install("pkg", "/usr/share/locale")
+
+
+def _tokenize_manifests(tmp_dir, run_prefix, manifests, run_max_size):
+    """Tokenizes manifests in a worker process.
+
+    The "tmp_dir" parameter is the directory to write sorted runs to.
+
+    The "run_prefix" parameter is the prefix of the names of the runs.
+
+    The "manifests" parameter is a list of tuples of the id assigned to a
+    package and the path to the package's manifest.
+
+    The "run_max_size" parameter is the amount of data to gather, and sort
+    in memory, before writing it out as a run.
+
+    Returns a tuple of the paths of the runs written, in the format used
+    by the indexer's sort files, and a list of messages to log."""
+
+    runs = []
+    lines = []
+    nbytes = 0
+    msgs = []
+
+    def write_run():
+        lines.sort()
+        path = os.path.join(tmp_dir, "{0}{1:d}".format(run_prefix,
+            len(runs)))
+        with open(path, "w", buffering=PKG_FILE_BUFSIZ) as fh:
+            fh.writelines(line for tok, line in lines)
+        runs.append(path)
+        del lines[:]
+
+    for p_id, mpath in manifests:
+        new_dict = manifest.Manifest.search_dict(mpath, EmptyI,
+            log=msgs.append)
+        for tok_tup, offsets in new_dict.items():
+            tok, action_type, subtype, fv = tok_tup
+            lst = [(action_type, [(subtype, [(fv, [(p_id,
+                list(offsets))])])])]
+            line = ss.IndexStoreMainDict.transform_main_dict_line(
+                tok, lst)
+            if lines and nbytes + len(line) >= run_max_size:
+                write_run()
+                nbytes = 0
+            lines.append((tok, line))
+            nbytes += len(line)
+    write_run()
+    return runs, msgs
+
+
 class Indexer:
     """Indexer is a class designed to index a set of manifests or pkg plans
     and provide a compact representation on disk, which is quickly
@@ -82,7 +160,7 @@ class Indexer:
 
     def __init__(self, index_dir, get_manifest_func, get_manifest_path_func,
         progtrack=None, excludes=EmptyI, log=None,
-        sort_file_max_size=SORT_FILE_MAX_SIZE):
+        sort_file_max_size=SORT_FILE_MAX_SIZE, workers=None):
         self._num_keys = 0
         self._num_manifests = 0
         self._num_entries = 0
@@ -95,6 +173,17 @@ class Indexer:
             raise search_errors.IndexingException(
                 _("sort_file_max_size must be greater than 0"))
 
+        # The number of worker processes used to tokenize manifests
+        # when many packages are indexed at once.  The memory used to
+        # sort the tokens, as limited by sort_file_max_size, is shared
+        # between them.
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        if self.workers <= 0:
+            raise search_errors.IndexingException(
+                _("workers must be greater than 0"))
+
         # This structure was used to gather all index files into one
         # location. If a new index structure is needed, the files can
         # be added (or removed) from here. Providing a list or
@@ -129,6 +218,15 @@ class Indexer:
             ss.InvertedDict(ss.FMRI_OFFSETS_FILE, self._data_manf)
         self._data_fmri_offsets = self._data_dict["fmri_offsets"]
 
+        # The binary token index is written alongside the token byte
+        # offset file, which is kept for older clients.  It isn't
+        # part of _data_dict so that indexes from before its
+        # introduction can still be read and updated, but when it's
+        # present it must have the same version as the rest of the
+        # index (see _remove_stale_token_index()).
+        self._data_token_index = \
+            ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+
         self._index_dir = index_dir
         self._tmp_dir = os.path.join(self._index_dir, "TMP")
 
@@ -153,6 +251,9 @@ class Indexer:
         self._sort_fh = None
         self._sort_file_num = 0
         self._sort_file_bytes = 0
+        # Paths of the sorted runs written by worker processes, which
+        # are merged along with the sort files.
+        self._sort_runs = []
 
         # The action type and key indexes, which are necessary for
         # efficient searches by type or key, store their file handles in
@@ -161,6 +262,15 @@ class Indexer:
         self.at_fh = {}
         self.st_fh = {}
 
+        # The postings for each combination of action type and key are
+        # also written to a partition of their own, so that searches
+        # restricted to both needn't read and filter the main
+        # dictionary's lines.  File handles for the partitions, and the
+        # number of lines written to each, are keyed by action type and
+        # key.
+        self.fk_fh = {}
+        self.fk_lines = {}
+
         self.old_out_token = None
 
         # Handle for the output main dictionary file and
@@ -194,6 +304,7 @@ class Indexer:
 
         res = ss.consistent_open(self._data_dict.values(), directory,
             self._file_timeout_secs)
+        self._remove_stale_token_index(directory, res)
         pt = self._progtrack
         if res is None:
             self.file_version_number = INITIAL_VERSION_NUMBER
@@ -373,6 +484,13 @@ class Indexer:
 
         removed_paths = []
 
+        # Excludes are evaluated by functions bound to the image, which
+        # can't be handed to other processes.
+        if self.workers > 1 and not self.excludes and \
+            len(fmris) >= PARALLEL_INDEX_MIN_PKGS:
+            self._process_fmris_parallel(fmris)
+            return removed_paths
+
         for added_fmri in fmris:
             self._data_full_fmri.add_entity(
                 added_fmri.get_fmri(anarchy=True))
@@ -385,6 +503,73 @@ class Indexer:
                 self._progtrack.JOB_REBUILD_SEARCH)
         return removed_paths
 
+    def _process_fmris_parallel(self, fmris):
+        """Tokenizes the manifests of the list of fmris using a pool of
+        worker processes, each of which writes the tokens as sorted runs
+        which are merged along with the sort files."""
+
+        # Assign package ids here so that they're consistent with the
+        # package list written by this process.
+        manifests = []
+        for added_fmri in fmris:
+            self._data_full_fmri.add_entity(
+                added_fmri.get_fmri(anarchy=True))
+            manifests.append((self._data_manf.get_id_and_add(added_fmri),
+                self.get_manifest_path_func(added_fmri)))
+
+        ntasks = self.workers * PARALLEL_INDEX_TASKS_PER_WORKER
+        tasks = [manifests[i::ntasks] for i in range(ntasks)]
+        run_max_size = max(1, self.sort_file_max_size // self.workers)
+
+        pt = self._progtrack
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            mp_context=multiprocessing.get_context(
+            PARALLEL_INDEX_START_METHOD)) as executor:
+            futures = dict(
+                (executor.submit(_tokenize_manifests, self._tmp_dir,
+                "{0}run.{1:d}.".format(SORT_FILE_PREFIX, i), task,
+                run_max_size), len(task))
+                for i, task in enumerate(tasks)
+                if task
+            )
+            try:
+                for f in concurrent.futures.as_completed(futures):
+                    runs, msgs = f.result()
+                    self._sort_runs.extend(runs)
+                    if self.__log:
+                        for msg in msgs:
+                            self.__log(msg)
+                    pt.job_add_progress(pt.JOB_REBUILD_SEARCH,
+                        nitems=futures[f])
+            except:
+                for f in futures:
+                    f.cancel()
+                raise
+
+    def _remove_stale_token_index(self, directory, version):
+        """Removes the binary token index from 'directory' if it
+        doesn't have the version 'version' of the rest of the index
+        there, as happens when the index is updated by an indexer that
+        doesn't maintain the token index.  The token byte offset file
+        is used in its place until it's written again."""
+
+        ti_path = os.path.join(directory,
+            self._data_token_index.get_file_name())
+        if not os.path.exists(ti_path):
+            return
+
+        ti = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+        try:
+            ti_version = ti.open(directory)
+        except (ValueError, IndexError):
+            # The version line is unreadable.
+            ti_version = None
+        finally:
+            ti.close_file_handle()
+        if version is None or ti_version != version:
+            portable.remove(ti_path)
+
     def _write_main_dict_line(self, token, fv_fmri_pos_list_list, out_dir):
         """Writes out the new main dictionary file and also adds the
         token offsets to _data_token_offset. token is the token
@@ -409,6 +594,8 @@ class Indexer:
 
         cur_location = str(self.out_main_dict_pos)
         self._data_token_offset.write_entity(token, cur_location)
+        self._data_token_index.write_entity(token,
+            self.out_main_dict_pos)
 
         for at, st_list in fv_fmri_pos_list_list:
             self._progtrack.job_add_progress(
@@ -423,6 +610,16 @@ class Indexer:
                         open(os.path.join(out_dir,
                         "__st_" + st), "w")
                 self.st_fh[st].write(cur_location + "\n")
+                fk = (at, st)
+                if fk not in self.fk_fh:
+                    self.fk_fh[fk] = open(os.path.join(out_dir,
+                        ss.get_field_partition_name(at, st)), "w",
+                        buffering=PKG_FILE_BUFSIZ)
+                    self.fk_lines[fk] = 0
+                self.fk_fh[fk].write("{0} {1}".format(cur_location,
+                    self._data_main_dict.transform_main_dict_line(
+                    token, [(at, [(st, fv_list)])])))
+                self.fk_lines[fk] += 1
                 for fv, p_list in fv_list:
                     for p_id, m_off_set in p_list:
                         p_id = int(p_id)
@@ -468,8 +665,9 @@ class Indexer:
         merge sort being done on the tokens to be indexed."""
 
         def get_line(fh):
-            """Helper function to make the initialization of the
-            fh_dict easier to understand."""
+            """Helper function which returns the next line of a
+            temporary file, parsed, or None at the end of the
+            file."""
 
             try:
                 return \
@@ -478,73 +676,55 @@ class Indexer:
             except StopIteration:
                 return None
 
-        # Build a mapping from numbers to the file handle for the
-        # temporary sort file with that number.
-        fh_dict = dict([
-            (i, open(os.path.join(self._tmp_dir,
-            SORT_FILE_PREFIX + str(i)), "r",
-            buffering=PKG_FILE_BUFSIZ))
+        # Open the temporary sort files and the runs written by any
+        # worker processes.
+        paths = [
+            os.path.join(self._tmp_dir, SORT_FILE_PREFIX + str(i))
             for i in range(self._sort_file_num)
-        ])
+        ]
+        paths.extend(self._sort_runs)
+        fhs = [
+            open(path, "r", buffering=PKG_FILE_BUFSIZ)
+            for path in paths
+        ]
 
-        cur_toks = {}
-        # Seed cur_toks with the first token from each temporary file.
+        # Seed the heap with the first token from each temporary file.
         # The line may not exist since, for a empty repo, an empty file
-        # is created.
-        for i in list(fh_dict.keys()):
-            line = get_line(fh_dict[i])
+        # is created.  Entries are ordered by token and then by file,
+        # so the information for a token is combined in file order.
+        heap = []
+        for i, fh in enumerate(fhs):
+            line = get_line(fh)
+            if line is None:
+                fh.close()
+            else:
+                heap.append((line[0], i, line[1]))
+        heapq.heapify(heap)
+
+        def advance(i):
+            """Replaces the entry for the i'th file on the heap with
+            the next line from that file, if there is one."""
+
+            line = get_line(fhs[i])
             if line is None:
-                del fh_dict[i]
+                fhs[i].close()
             else:
-                cur_toks[i] = line
+                heapq.heappush(heap, (line[0], i, line[1]))
 
         old_min_token = None
-        # cur_toks will have items deleted from it as files no longer
+        # The heap will have entries removed from it as files no longer
         # have tokens to provide. When no files have tokens, the merge
         # is done.
-        while cur_toks:
-            min_token = None
-            matches = []
-            # Find smallest available token and the temporary files
-            # which contain that token.
-            for i in fh_dict.keys():
-                cur_tok, info = cur_toks[i]
-                if cur_tok is None:
-                    continue
-                if min_token is None or cur_tok < min_token:
-                    min_token = cur_tok
-                    matches = [i]
-                elif cur_tok == min_token:
-                    matches.append(i)
-            assert min_token is not None
-            assert len(matches) > 0
-            res = None
-            for i in matches:
-                new_tok, new_info = cur_toks[i]
-                assert new_tok == min_token
-                try:
-                    # Continue pulling the next tokens from
-                    # and adding them to the result list as
-                    # long as the token matches min_token.
-                    while new_tok == min_token:
-                        if res is None:
-                            res = new_info
-                        else:
-                            self.__splice(res,
-                                new_info)
-                        new_tok, new_info = \
-                            ss.IndexStoreMainDict.parse_main_dict_line(next(fh_dict[i]))
-                    cur_toks[i] = new_tok, new_info
-                except StopIteration:
-                    # When a StopIteration happens, the
-                    # last line in the file has been read
-                    # and processed. Delete all the
-                    # information associated with that file
-                    # so that we no longer check that file.
-                    fh_dict[i].close()
-                    del fh_dict[i]
-                    del cur_toks[i]
-            assert res is not None
+        while heap:
+            # Take the smallest available token and combine the
+            # information for it from every temporary file which
+            # contains it.
+            min_token, i, res = heapq.heappop(heap)
+            advance(i)
+            while heap and heap[0][0] == min_token:
+                new_tok, i, new_info = heapq.heappop(heap)
+                self.__splice(res, new_info)
+                advance(i)
             if old_min_token is not None and \
                 old_min_token >= min_token:
                 raise RuntimeError("Got min token:{0} greater "
@@ -590,6 +770,8 @@ class Indexer:
 
         self._data_token_offset.open_out_file(out_dir,
             self.file_version_number)
+        self._data_token_index.open_out_file(out_dir,
+            self.file_version_number)
 
         new_toks_available = True
         new_toks_it = self._gen_new_toks_from_files()
@@ -680,13 +862,31 @@ class Indexer:
 
             self.out_main_dict_handle.close()
             self._data_token_offset.close_file_handle()
+            self._data_token_index.close_file_handle()
             for fh in self.at_fh.values():
                 fh.close()
             for fh in self.st_fh.values():
                 fh.close()
+            for fh in self.fk_fh.values():
+                fh.close()
 
             removed_paths = []
 
+        self._write_field_index(out_dir)
+
+    def _write_field_index(self, out_dir):
+        """Writes the list of the partitions of the main dictionary by
+        action type and key, and the number of lines in each, to the
+        directory 'out_dir'.  The list has the same version as the
+        main dictionary the partitions were written with."""
+
+        with open(os.path.join(out_dir, ss.FIELD_INDEX_FILE),
+            "w") as fh:
+            fh.write("VERSION: {0:d}\n".format(
+                self.file_version_number))
+            for (at, st), n in sorted(self.fk_lines.items()):
+                fh.write("{0} {1} {2:d}\n".format(at, st, n))
+
     def _write_assistant_dicts(self, out_dir):
         """Write out the companion dictionaries needed for
         translating the internal representation of the main
@@ -701,6 +901,27 @@ class Indexer:
                 continue
             d.write_dict_file(out_dir, self.file_version_number)
 
+    def _convert_token_offsets(self, out_dir):
+        """Writes the binary token index into out_dir using the token
+        byte offset file in the index directory."""
+
+        tok_offset = ss.IndexStoreDictMutable(ss.BYTE_OFFSET_FILE)
+        if tok_offset.open(self._index_dir) is None:
+            return
+        try:
+            tok_offset.read_dict_file()
+        finally:
+            tok_offset.close_file_handle()
+
+        self._data_token_index.open_out_file(out_dir,
+            self.file_version_number)
+        try:
+            for tok in sorted(tok_offset.get_keys()):
+                self._data_token_index.write_entity(tok,
+                    tok_offset.get_id(tok))
+        finally:
+            self._data_token_index.close_file_handle()
+
     def _generic_update_index(self, inputs, input_type,
         tmp_index_dir=None, image=None):
         """Performs all the steps needed to update the indexes.
@@ -756,6 +977,15 @@ class Indexer:
                 #
                 fast_update = self._fast_update(inputs)
 
+                if fast_update and not os.path.exists(
+                    os.path.join(self._index_dir,
+                    ss.TOKEN_INDEX_FILE)):
+                    # The main dictionary isn't rewritten by a
+                    # fast update, so convert the token byte
+                    # offsets of an index from before the binary
+                    # token index was introduced.
+                    self._convert_token_offsets(tmp_index_dir)
+
                 if not fast_update:
                     self._data_main_dict.close_file_handle()
                     self._data_fast_add.clear()
@@ -770,6 +1000,18 @@ class Indexer:
                         tmp_index_dir)
 
             elif input_type == IDX_INPUT_TYPE_FMRI:
+                # Merge any segments written since the main
+                # index was last updated into it.
+                segments = ss.get_segment_dirs(self._index_dir,
+                    self.file_version_number)
+                if segments:
+                    known = set(f.get_fmri(anarchy=True)
+                        for f in inputs)
+                    inputs.extend(
+                        fmri.PkgFmri(s)
+                        for s in self._read_segment_fmris(segments)
+                        if s not in known)
+
                 assert not self._sort_fh
                 self._sort_fh = open(os.path.join(self._tmp_dir,
                     SORT_FILE_PREFIX +
@@ -797,6 +1039,8 @@ class Indexer:
             # dir. Note: the need for consistent_open is that
             # migrate is not an atomic action.
             self._migrate(source_dir=tmp_index_dir, fast_update=fast_update)
+            if input_type == IDX_INPUT_TYPE_FMRI:
+                self._remove_segments()
             self.unlock()
 
         except:
@@ -817,7 +1061,8 @@ class Indexer:
         self._generic_update_index(pkgplan_list, IDX_INPUT_TYPE_PKG,
             tmp_index_dir=tmp_index_dir, image=image)
 
-    def server_update_index(self, fmris, tmp_index_dir=None):
+    def server_update_index(self, fmris, tmp_index_dir=None,
+        segment=False):
         """ This version of update index is designed to work with the
         server side of things. Specifically, since we don't currently
         support removal of a package from a repo, this function simply
@@ -825,29 +1070,135 @@ class Indexer:
         only way to remove a package from the index is to remove it
         from the depot and reindex.  Note: if tmp_index_dir is
         specified, it must NOT exist in the current directory structure.
-        This prevents the indexer from accidentally removing files."""
+        This prevents the indexer from accidentally removing files.
+
+        If 'segment' is True, the FMRIs are indexed into a new segment
+        of the index instead of the main index so that the main
+        dictionary doesn't have to be rewritten.  If there is no main
+        index yet, or the index already has MAX_INDEX_SEGMENTS
+        segments, the main index is updated instead.  Any update of the
+        main index merges the index's segments into it."""
 
+        if segment and self._write_segment(fmris):
+            return
         self._generic_update_index(fmris, IDX_INPUT_TYPE_FMRI,
             tmp_index_dir)
 
+    def merge_segments(self, tmp_index_dir=None):
+        """Merges the segments of the index into the main index and
+        then removes them.  Does nothing if the index has no
+        segments."""
+
+        if self._get_segments()[1]:
+            self._generic_update_index([], IDX_INPUT_TYPE_FMRI,
+                tmp_index_dir)
+
+    def _get_segments(self):
+        """Returns a tuple of the version of the main index and a list
+        of the paths of its segments.  The version is None if there is
+        no main index."""
+
+        try:
+            version = ss.consistent_open(self._data_dict.values(),
+                self._index_dir, self._file_timeout_secs)
+        finally:
+            for d in self._data_dict.values():
+                d.close_file_handle()
+        if version is None:
+            return None, []
+        return version, ss.get_segment_dirs(self._index_dir, version)
+
+    @staticmethod
+    def _read_segment_fmris(segments):
+        """Returns a list of the FMRIs, as strings, indexed by the
+        segments at the paths in 'segments'."""
+
+        res = []
+        for seg in segments:
+            data = ss.IndexStoreSet(ss.FULL_FMRI_FILE)
+            data.open(seg)
+            try:
+                data.read_dict_file()
+            finally:
+                data.close_file_handle()
+            res.extend(data.get_set())
+        return res
+
+    def _write_segment(self, fmris):
+        """Indexes 'fmris' into a new segment of the index.  Returns
+        False, without writing anything, if there is no main index for
+        the segment to extend or the index already has
+        MAX_INDEX_SEGMENTS segments.
+
+        A segment is built in a temporary directory and renamed into
+        place once complete, so searches only ever see whole
+        segments."""
+
+        self.lock()
+        try:
+            version, segments = self._get_segments()
+            if version is None or \
+                len(segments) >= MAX_INDEX_SEGMENTS:
+                return False
+
+            seq = 1
+            if segments:
+                seq += int(os.path.basename(
+                    segments[-1]).split(".")[1])
+            seg_root = os.path.join(self._index_dir, ss.SEGMENTS_DIR)
+            build_dir = os.path.join(seg_root, "TMP")
+            if os.path.exists(build_dir):
+                shutil.rmtree(build_dir)
+
+            seg_ind = Indexer(build_dir, self.get_manifest_func,
+                self.get_manifest_path_func, progtrack=self._progtrack,
+                excludes=self.excludes, log=self.__log,
+                sort_file_max_size=self.sort_file_max_size,
+                workers=self.workers)
+            seg_ind.server_update_index(fmris)
+            portable.rename(build_dir, os.path.join(seg_root,
+                "{0:d}.{1:d}".format(version, seq)))
+        finally:
+            self.unlock()
+        return True
+
+    def _remove_segments(self):
+        """Removes the segments of the index once the main index has
+        been updated to include them."""
+
+        seg_root = os.path.join(self._index_dir, ss.SEGMENTS_DIR)
+        if not os.path.exists(seg_root):
+            return
+        # The main index has a new version now, so searches ignore
+        # the existing segments; rename the directory first so that
+        # none of them are seen while partially removed either.
+        old_root = seg_root + ".old"
+        shutil.rmtree(old_root, ignore_errors=True)
+        portable.rename(seg_root, old_root)
+        shutil.rmtree(old_root)
+
     def check_index_existence(self):
         """ Returns a boolean value indicating whether a consistent
         index exists. If an index exists but is inconsistent, an
         exception is raised."""
 
+        # The binary token index is checked along with the rest of
+        # the index if it's present.
+        dicts = list(self._data_dict.values())
+        if os.path.exists(os.path.join(self._index_dir,
+            self._data_token_index.get_file_name())):
+            dicts.append(self._data_token_index)
         try:
             try:
-                res = \
-                    ss.consistent_open(self._data_dict.values(),
-                        self._index_dir,
-                        self._file_timeout_secs)
+                res = ss.consistent_open(dicts, self._index_dir,
+                    self._file_timeout_secs)
             except (KeyboardInterrupt,
                 search_errors.InconsistentIndexException):
                 raise
             except Exception:
                 return False
         finally:
-            for d in self._data_dict.values():
+            for d in dicts:
                 d.close_file_handle()
         assert res != 0
         return res
@@ -910,6 +1261,30 @@ class Indexer:
                 raise search_errors.InconsistentIndexException(
                         self._index_dir)
         if present:
+            # Don't leave a token index that the rest of the index
+            # has moved on from for searches to find, unless the
+            # index is being updated, which will deal with it.
+            try:
+                self.lock()
+            except (search_errors.IndexLockedException,
+                search_errors.ProblematicPermissionsIndexException):
+                return
+            try:
+                try:
+                    version = ss.consistent_open(
+                        self._data_dict.values(),
+                        self._index_dir,
+                        self._file_timeout_secs)
+                except search_errors.InconsistentIndexException:
+                    # This is reported when the index is used.
+                    return
+                finally:
+                    for d in self._data_dict.values():
+                        d.close_file_handle()
+                self._remove_stale_token_index(self._index_dir,
+                    version)
+            finally:
+                self.unlock()
             return
         if self.file_version_number:
             raise RuntimeError("Got file_version_number other than "
@@ -918,6 +1293,8 @@ class Indexer:
         for d in self._data_dict.values():
             d.write_dict_file(self._index_dir,
                 self.file_version_number)
+        self._data_token_index.write_dict_file(self._index_dir,
+            self.file_version_number)
 
     @staticmethod
     def check_for_updates(index_root, cat):
@@ -932,7 +1309,7 @@ class Indexer:
 
         data = ss.IndexStoreSet("full_fmri_list")
         try:
-            data.open(index_root)
+            version = data.open(index_root)
         except IOError as e:
             if not os.path.exists(os.path.join(
                     index_root, data.get_file_name())):
@@ -943,6 +1320,16 @@ class Indexer:
             data.read_and_discard_matching_from_argument(fmri_set)
         finally:
             data.close_file_handle()
+
+        # Packages in the index's segments have been indexed too.
+        for seg in ss.get_segment_dirs(index_root, version):
+            data = ss.IndexStoreSet("full_fmri_list")
+            data.open(seg)
+            try:
+                data.read_and_discard_matching_from_argument(
+                    fmri_set)
+            finally:
+                data.close_file_handle()
         return fmri_set
 
     def _migrate(self, source_dir=None, dest_dir=None, fast_update=False):
@@ -975,6 +1362,14 @@ class Indexer:
                 shutil.move(os.path.join(source_dir,
                     d.get_file_name()),
                     os.path.join(dest_dir, d.get_file_name()))
+        # The binary token index is only present after a fast update
+        # if it was converted from the token byte offset file.
+        ti_name = self._data_token_index.get_file_name()
+        if not fast_update or \
+            os.path.exists(os.path.join(source_dir, ti_name)):
+            shutil.move(os.path.join(source_dir, ti_name),
+                os.path.join(dest_dir, ti_name))
+
         if not fast_update:
             # Remove legacy index/pkg/ directory which is obsoleted
             # by the fmri_offsets.v1 file.
@@ -994,6 +1389,13 @@ class Indexer:
                 shutil.move(
                     os.path.join(source_dir, "__st_" + st),
                     os.path.join(dest_dir, "__st_" + st))
+
+            for at, st in self.fk_fh:
+                name = ss.get_field_partition_name(at, st)
+                shutil.move(os.path.join(source_dir, name),
+                    os.path.join(dest_dir, name))
+            shutil.move(os.path.join(source_dir, ss.FIELD_INDEX_FILE),
+                os.path.join(dest_dir, ss.FIELD_INDEX_FILE))
         shutil.rmtree(source_dir)
 
     def lock(self, blocking=False):
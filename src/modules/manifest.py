@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2007, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2007, 2026, Oracle and/or its affiliates.
 #
 
 from collections import namedtuple, defaultdict
@@ -30,6 +30,7 @@ from functools import reduce
 import errno
 import fnmatch
 import hashlib
+import marshal
 import os
 import re
 import tempfile
@@ -217,44 +218,56 @@ class Manifest:
                 [(None, a) for a in self.gen_actions(
                 excludes=self_exclude)], [], [])
 
-        def hashify(v):
-            """handle key values that may be lists"""
-            if type(v) is not list:
-                return v
-            return tuple(v)
-
         def dictify(mf, excludes):
             # Transform list of actions into a dictionary keyed by
             # action key attribute, key attribute and mediator, or
             # id if there is no key attribute.
+            d = {}
             for a in mf.gen_actions(excludes=excludes):
-                if (a.name == "link" or
-                    a.name == "hardlink") and \
-                    a.attrs.get("mediator"):
-                    akey = (a.name, tuple([
-                        a.attrs[a.key_attr],
-                        a.attrs.get("mediator-version"),
-                        a.attrs.get("mediator-implementation")
-                    ]))
+                name = a.name
+                attrs = a.attrs
+                if (name == "link" or name == "hardlink") and \
+                    attrs.get("mediator"):
+                    akey = (name, (
+                        attrs[a.key_attr],
+                        attrs.get("mediator-version"),
+                        attrs.get("mediator-implementation")
+                    ))
                 else:
-                    akey = (a.name, hashify(a.attrs.get(
-                        a.key_attr, id(a))))
-                yield (akey, a)
-
-        sdict = dict(dictify(self, self_exclude))
-        odict = dict(dictify(origin, origin_exclude))
-
-        sset = set(sdict.keys())
-        oset = set(odict.keys())
-
-        added = [(None, sdict[i]) for i in sset - oset]
-        removed = [(odict[i], None) for i in oset - sset]
-        changed = [
-            (odict[i], sdict[i])
-            for i in oset & sset
-            if odict[i].different(sdict[i], pkgplan=pkgplan,
-                cmp_policy=cmp_policy)
-        ]
+                    kv = attrs.get(a.key_attr, None)
+                    if kv is None:
+                        kv = id(a)
+                    elif type(kv) is list:
+                        # handle key values that may be lists
+                        kv = tuple(kv)
+                    akey = (name, kv)
+                d[akey] = a
+            return d
+
+        sdict = dictify(self, self_exclude)
+        odict = dictify(origin, origin_exclude)
+
+        added = []
+        changed = []
+        for akey, sa in sdict.items():
+            oa = odict.pop(akey, None)
+            if oa is None:
+                added.append((None, sa))
+                continue
+
+            # Most actions are unchanged between package versions, so
+            # skip the full comparison if the attributes and payload
+            # hash of the two actions are identical; different()
+            # would always consider these the same.
+            if oa.attrs == sa.attrs and \
+                getattr(oa, "hash", None) == getattr(sa, "hash", None):
+                continue
+            if oa.different(sa, pkgplan=pkgplan,
+                cmp_policy=cmp_policy):
+                changed.append((oa, sa))
+
+        # Anything left in the origin is no longer delivered.
+        removed = [(oa, None) for oa in odict.values()]
 
         # XXX Do changed actions need to be sorted at all?  This is
         # likely to be the largest list, so we might save significant
@@ -981,7 +994,7 @@ class Manifest:
         of type "type" in the manifest."""
 
         return (
-            a.attrs.get(a.key_attr)
+            a.key_attr_value()
             for a in self.gen_actions_by_type(atype, excludes=excludes)
         )
 
@@ -1008,12 +1021,15 @@ class Manifest:
                 alldups.append((k, dups))
         return alldups
 
-    def __content_to_actions(self, content):
+    def __content_to_actions(self, content, lazy=False):
         """Parse manifest content, stripping line-continuation
         characters from the input as it is read; this results in actions
         with values across multiple lines being passed to the
         action parsing code whitespace-separated instead.
 
+        If 'lazy' is True, actions are created lazily where possible
+        (see pkg.actions.fromstr()).
+
         For example:
 
         set name=pkg.summary \
@@ -1049,7 +1065,10 @@ class Manifest:
                 continue
 
             try:
-                yield actions.fromstr(l)
+                # Actions that add_action() must transform are
+                # never created lazily.
+                yield actions.fromstr(l, lazy=lazy and
+                    "opensolaris.zone" not in l)
             except actions.ActionError as e:
                 # Accumulate errors and continue so that as
                 # much of the action data as possible can be
@@ -1062,7 +1081,7 @@ class Manifest:
             raise apx.InvalidPackageErrors(errors)
 
     def set_content(self, content=None, excludes=EmptyI, pathname=None,
-        signatures=False):
+        signatures=False, lazy=False):
         """Populate the manifest with actions.
 
         'content' is an optional value containing either the text
@@ -1079,6 +1098,13 @@ class Manifest:
         'signatures' is an optional boolean value that indicates whether
         a manifest signature should be generated.  This is only possible
         when 'content' is a string or 'pathname' is provided.
+
+        'lazy' is an optional boolean value that indicates whether only
+        the type and key attribute of each action should be parsed until
+        its other attributes are needed.  This is only possible when
+        'content' is a string or 'pathname' is provided and no
+        'excludes' are.  Errors in actions that aren't found by the
+        parser are then raised when the actions are first used.
         """
 
         assert content is not None or pathname is not None
@@ -1116,7 +1142,8 @@ class Manifest:
                 self.signatures = {
                     "sha-1": self.hash_create(content)
                 }
-            content = self.__content_to_actions(content)
+            content = self.__content_to_actions(content,
+                lazy=lazy and not excludes)
 
         for action in content:
             self.add_action(action, excludes)
@@ -1142,20 +1169,25 @@ class Manifest:
         The "excludes" parameter is the variants to exclude from the
         manifest."""
 
-        attrs = action.attrs
         aname = action.name
 
-        # XXX handle legacy transition issues; not needed once support
-        # for upgrading images from older releases (< build 151) has
-        # been removed.
-        if "opensolaris.zone" in attrs and \
-            "variant.opensolaris.zone" not in attrs:
-            attrs["variant.opensolaris.zone"] = \
-                attrs["opensolaris.zone"]
+        # Lazily created actions never need to be transformed (see
+        # __content_to_actions()), so they are only materialized if
+        # needed for excludes.
+        if not isinstance(action, actions.generic.LazyAction):
+            attrs = action.attrs
+
+            # XXX handle legacy transition issues; not needed once
+            # support for upgrading images from older releases
+            # (< build 151) has been removed.
+            if "opensolaris.zone" in attrs and \
+                "variant.opensolaris.zone" not in attrs:
+                attrs["variant.opensolaris.zone"] = \
+                    attrs["opensolaris.zone"]
 
-        if aname == "set" and attrs["name"] == "authority":
-            # Translate old action to new.
-            attrs["name"] = "publisher"
+            if aname == "set" and attrs["name"] == "authority":
+                # Translate old action to new.
+                attrs["name"] = "publisher"
 
         if excludes and not action.include_this(excludes,
             publisher=self.publisher):
@@ -1565,6 +1597,11 @@ class FactoredManifest(Manifest):
     explicitly and implicitly referenced by the manifest each tagged with
     the appropriate variants/facets."""
 
+    # Tag at the start of the binary per-action type cache files
+    # (manifest.<type>.bin); the last byte is the version of the format.
+    # Files with any other tag are ignored and rewritten.
+    BINARY_CACHE_MAGIC = b"PKG5FMC\x01"
+
     def __init__(self, fmri, cache_root, contents=None, excludes=EmptyI,
         pathname=None):
         """Raises KeyError exception if factored manifest is not present
@@ -1690,29 +1727,35 @@ class FactoredManifest(Manifest):
             except EnvironmentError as e:
                 raise apx._convert_error(e)
 
+            if n == "set":
+                # Add supplemental action data; yes this does
+                # mean the cache is not the same as retrieved
+                # manifest, but that's ok.  Signature
+                # verification is done using the raw manifest.
+                acts = acts + [
+                    actions.fromstr(s.rstrip())
+                    for s in self._gen_attrs_to_str()
+                ]
+
             f = os.fdopen(fd, "w")
             try:
                 for a in acts:
                     f.write("{0}\n".format(a))
-                if n == "set":
-                    # Add supplemental action data; yes this
-                    # does mean the cache is not the same as
-                    # retrieved manifest, but that's ok.
-                    # Signature verification is done using
-                    # the raw manifest.
-                    f.writelines(self._gen_attrs_to_str())
             except EnvironmentError as e:
                 raise apx._convert_error(e)
             finally:
                 f.close()
 
+            mpath = self.__cache_path("manifest.{0}".format(n))
             try:
                 os.chmod(fn, PKG_FILE_MODE)
-                portable.rename(fn,
-                    self.__cache_path("manifest.{0}".format(n)))
+                portable.rename(fn, mpath)
+                st = os.stat(mpath)
             except EnvironmentError as e:
                 raise apx._convert_error(e)
 
+            self.__store_binary_cache(n, acts, st)
+
         def create_cache(name, refs):
             try:
                 fd, fn = tempfile.mkstemp(dir=t_dir,
@@ -1728,6 +1771,92 @@ class FactoredManifest(Manifest):
         create_cache("manifest.mediatorcache",
             self._gen_mediators_to_str)
 
+    def __store_binary_cache(self, atype, acts, st):
+        """Private helper function that stores the list of actions
+        'acts' of type 'atype' in manifest.<atype>.bin so that they can
+        be loaded later without parsing manifest.<atype>.  'st' is the
+        os.stat() result of the manifest.<atype> file the actions were
+        written to; the binary cache is only used as long as that file
+        is unchanged."""
+
+        records = [
+            (a.name, getattr(a, "hash", None), a.attrs)
+            for a in acts
+        ]
+        try:
+            data = marshal.dumps((st.st_size, st.st_mtime_ns,
+                st.st_ino, records))
+        except ValueError:
+            # Some attribute value can't be stored; the text
+            # cache will be used instead.
+            return
+
+        try:
+            fd, fn = tempfile.mkstemp(dir=self.__cache_root,
+                prefix="manifest.{0}.bin.".format(atype))
+            with os.fdopen(fd, "wb") as f:
+                f.write(self.BINARY_CACHE_MAGIC)
+                f.write(data)
+            os.chmod(fn, PKG_FILE_MODE)
+            portable.rename(fn,
+                self.__cache_path("manifest.{0}.bin".format(atype)))
+        except EnvironmentError as e:
+            raise apx._convert_error(e)
+
+    def __load_binary_cache(self, atype, st):
+        """Private helper function that returns the list of (type, hash,
+        attrs) records of the actions of type 'atype' stored in
+        manifest.<atype>.bin, or None if that file doesn't exist, is of
+        a different version, is malformed, or no longer matches
+        manifest.<atype> (as given by its os.stat() result 'st')."""
+
+        try:
+            with open(self.__cache_path(
+                "manifest.{0}.bin".format(atype)), "rb") as f:
+                data = f.read()
+        except EnvironmentError:
+            return None
+
+        magic = self.BINARY_CACHE_MAGIC
+        if not data.startswith(magic):
+            return None
+
+        try:
+            size, mtime, ino, records = marshal.loads(
+                memoryview(data)[len(magic):])
+        except (EOFError, TypeError, ValueError):
+            return None
+        if st.st_size != size or st.st_mtime_ns != mtime or \
+            st.st_ino != ino or not isinstance(records, list):
+            return None
+        return records
+
+    def __gen_cached_actions(self, atype):
+        """Private generator function that yields all actions of type
+        'atype' in the per-action type cache.  The binary cache is used
+        if it is current; otherwise manifest.<atype> is parsed.  The
+        binary cache is only ever written when the cache is stored, so
+        that reading a manifest never modifies the image.
+
+        Raises EnvironmentError if manifest.<atype> doesn't exist or
+        can't be read."""
+
+        mpath = self.__cache_path("manifest.{0}".format(atype))
+        st = os.stat(mpath)
+        records = self.__load_binary_cache(atype, st)
+        if records is None:
+            with open(mpath, "r") as f:
+                for l in f:
+                    yield actions.fromstr(l.rstrip())
+            return
+
+        atypes = actions.types
+        for t, h, attrs in records:
+            a = atypes[t](None, **attrs)
+            if h is not None:
+                a.hash = h
+            yield a
+
     @staticmethod
     def clear_cache(cache_root):
         """Remove all manifest cache files found in the given directory
@@ -1844,27 +1973,23 @@ class FactoredManifest(Manifest):
             # failures.
             return
 
-        # Assume a cached copy exists; if not, tag the action type to
-        # avoid pointless I/O later.
-        mpath = self.__cache_path("manifest.{0}".format(atype))
-
         if attr_match:
             attr_match = _compile_fnpats(attr_match)
 
+        # Assume a cached copy exists; if not, tag the action type to
+        # avoid pointless I/O later.
         try:
-            with open(mpath, "r") as f:
-                for l in f:
-                    a = actions.fromstr(l.rstrip())
-                    if (excludes and
-                        not a.include_this(excludes,
-                            publisher=self.publisher)):
-                        continue
-                    # These conditions are split by
-                    # performance.
-                    if not attr_match:
-                        yield a
-                    elif _attr_matches(a, attr_match):
-                        yield a
+            for a in self.__gen_cached_actions(atype):
+                if (excludes and
+                    not a.include_this(excludes,
+                        publisher=self.publisher)):
+                    continue
+                # These conditions are split by
+                # performance.
+                if not attr_match:
+                    yield a
+                elif _attr_matches(a, attr_match):
+                    yield a
 
         except EnvironmentError as e:
             if e.errno == errno.ENOENT:
@@ -1908,16 +2033,16 @@ class FactoredManifest(Manifest):
         """Load attributes dictionary from cached set actions;
         this speeds up pkg info a lot"""
 
-        mpath = self.__cache_path("manifest.set")
-        if not os.path.exists(mpath):
-            return False
-        with open(mpath, "r") as f:
-            for l in f:
-                a = actions.fromstr(l.rstrip())
+        try:
+            for a in self.__gen_cached_actions("set"):
                 if not self.excludes or \
                     a.include_this(self.excludes,
                         publisher=self.publisher):
                     self.fill_attributes(a)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return False
+            raise apx._convert_error(e)
 
         return True
 
@@ -45,6 +45,11 @@ from pkg.misc import EmptyI, force_str
 FILE_OPEN_TIMEOUT_SECS = 1
 MAX_TOKEN_COUNT = 100
 
+# If more than one in PARTITION_SEEK_RATIO of the lines of a partition of
+# the main dictionary are needed, it's read sequentially instead of
+# searching it for each line.
+PARTITION_SEEK_RATIO = 32
+
 
 class QueryLexer:
     """This class defines the lexer used to separate parse queries into
@@ -626,6 +631,18 @@ class BooleanQuery:
 class AndQuery(BooleanQuery):
     """Class representing AND queries in the AST."""
 
+    def set_info(self, max_results=None, **kwargs):
+        """This function passes information to the terms prior to
+        search being executed.  When actions are returned, the results
+        of the right child are those of this query, so only its search
+        can stop once "max_results" results have been found; the left
+        child's results are only the domain of that search."""
+
+        if self.return_type != Query.RETURN_ACTIONS:
+            max_results = None
+        self.lc.set_info(max_results=None, **kwargs)
+        self.rc.set_info(max_results=max_results, **kwargs)
+
     def search(self, restriction, *args):
         """Performs a search over the two children and combines
         the results.
@@ -663,6 +680,16 @@ class AndQuery(BooleanQuery):
 class OrQuery(BooleanQuery):
     """Class representing OR queries in the AST."""
 
+    def set_info(self, max_results=None, **kwargs):
+        """This function passes information to the terms prior to
+        search being executed.  When actions are returned, the results
+        of each child are returned as they are, so neither child's
+        search needs to find more than "max_results" results."""
+
+        if self.return_type != Query.RETURN_ACTIONS:
+            max_results = None
+        BooleanQuery.set_info(self, max_results=max_results, **kwargs)
+
     def search(self, restriction, *args):
         """Performs a search over the two children and combines
         the results.
@@ -726,10 +753,11 @@ class PkgConversion:
     def __repr__(self):
         return "p<{0!r}>".format(self.query)
 
-    def set_info(self, **kwargs):
+    def set_info(self, max_results=None, **kwargs):
         """This function passes information to the terms prior to
         search being executed.  It only needs to pass whatever
-        information exists to its child."""
+        information exists to its child, except for "max_results":
+        all of the child's results are needed to find the packages."""
 
         self.query.set_info(**kwargs)
 
@@ -814,10 +842,11 @@ class PhraseQuery:
     def add_field_restrictions(self, *params):
         self.query.add_field_restrictions(*params)
 
-    def set_info(self, case_sensitive, **kwargs):
+    def set_info(self, case_sensitive, max_results=None, **kwargs):
         """This function passes information to the terms prior to
         search being executed.  It only needs to pass whatever
-        information exists to its child."""
+        information exists to its child, except for "max_results": the
+        child's results are filtered, so any of them may be needed."""
 
         self._case_sensitive = case_sensitive
         if not case_sensitive:
@@ -948,48 +977,58 @@ class TopQuery:
     def __str__(self):
         return str(self.query)
 
-    def __keep(self, x):
-        """Determines whether the x'th result should be returned."""
-
-        return x >= self.start_point and \
-            (self.num_to_return is None or
-            x < self.num_to_return + self.start_point)
-
     def finalize_results(self, it):
         """Converts the internal result representation to the format
         which is expected by the callers of search.  It also handles
-        returning only those results requested by the user."""
+        returning only those results requested by the user.
+
+        Results are produced lazily by the rest of the AST, and the
+        terms whose results are returned stop searching once they've
+        found as many as are needed (see set_info), so the rest of the
+        index is never read."""
 
         # Need to replace "1" with current search version, or something
         # similar
 
+        start = max(self.start_point, 0)
+        stop = None
+        if self.num_to_return is not None:
+            stop = max(self.start_point + self.num_to_return, start)
+        it = itertools.islice(it, start, stop)
+
         if self.query.return_type == Query.RETURN_ACTIONS:
             return (
                 (1, Query.RETURN_ACTIONS,
                 (fmri.PkgFmri(pfmri), fv, force_str(l)))
-                for x, (at, st, pfmri, fv, l)
-                in enumerate(it)
-                if self.__keep(x)
+                for at, st, pfmri, fv, l in it
             )
         else:
             return (
                 (1, Query.RETURN_PACKAGES, fmri.PkgFmri(pfmri))
-                for x, pfmri
-                in enumerate(it)
-                if self.__keep(x)
+                for pfmri in it
             )
 
     def set_info(self, num_to_return, start_point, **kwargs):
         """This function passes information to the terms prior to
         search being executed.  This is also where the starting point
         and number of results to return is set.  Both "num_to_return"
-        and "start_point" are expected to be integers."""
+        and "start_point" are expected to be integers.  Packages must
+        already be propagated (see propagate_pkg_return) if they're to
+        be returned, as the number of actions needed to find a number
+        of packages isn't known."""
 
         if start_point:
             self.start_point = start_point
         self.num_to_return = num_to_return
+        # The most results the rest of the AST needs to produce.
+        max_results = None
+        if num_to_return is not None and \
+            self.query.return_type == Query.RETURN_ACTIONS:
+            max_results = max(self.start_point, 0) + \
+                max(num_to_return, 0)
         self.query.set_info(start_point=start_point,
-            num_to_return=num_to_return, **kwargs)
+            num_to_return=num_to_return, max_results=max_results,
+            **kwargs)
 
     def search(self, *args):
         """Perform search by taking the result of the child's search
@@ -1064,17 +1103,28 @@ class TermQuery:
         self._data_manf = None
         self._data_token_offset = None
         self._data_main_dict = None
+        self._index_version = None
+        # The most results this term needs to produce, or None if
+        # there's no limit.
+        self._max_results = None
 
     def __init_gdd(self, path):
         gdd = self._global_data_dict
         if path in gdd:
             return
 
+        # Use the binary token index if the index has one; it's only
+        # absent from indexes built before it was introduced, which
+        # are searched using the token byte offset file instead.
+        if os.path.exists(os.path.join(path, ss.TOKEN_INDEX_FILE)):
+            tok_offset = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+        else:
+            tok_offset = ss.IndexStoreDictMutable(ss.BYTE_OFFSET_FILE)
+
         # Setup default global dictionary for this index path.
         gdd[path] = {
             "manf": ss.IndexStoreDict(ss.MANIFEST_LIST),
-            "token_byte_offset": ss.IndexStoreDictMutable(
-                ss.BYTE_OFFSET_FILE),
+            "token_byte_offset": tok_offset,
             "fmri_offsets": ss.InvertedDict(ss.FMRI_OFFSETS_FILE, None)
         }
 
@@ -1172,7 +1222,7 @@ class TermQuery:
             self._term += "*"
 
     def set_info(self, index_dir, get_manifest_path,
-        case_sensitive, **kwargs):
+        case_sensitive, max_results=None, **kwargs):
         """Sets the information needed to search which is specific to
         the particular index used to back the search.
 
@@ -1183,8 +1233,12 @@ class TermQuery:
         for that fmri.
 
         'case_sensitive' is a boolean which determines whether search
-        is case sensitive or not."""
+        is case sensitive or not.
 
+        'max_results' is the most results the search needs to produce,
+        or None if all of them are needed."""
+
+        self._max_results = max_results
         self._dir_path = index_dir
         assert self._dir_path
 
@@ -1273,6 +1327,7 @@ class TermQuery:
                 # what happens.
                 for d in tq_gdd.values():
                     d.close_file_handle()
+            self._index_version = ret
             self._data_manf = tq_gdd["manf"]
 
             self._data_token_offset = tq_gdd["token_byte_offset"]
@@ -1292,6 +1347,30 @@ class TermQuery:
 
         self._data_main_dict.close_file_handle()
 
+    def _limit_results(self, it):
+        """Returns an iterator over the results in 'it' which stops
+        once as many have been produced as are needed.  'it' is then
+        closed, so that the index files it reads are closed and no
+        more of them is read."""
+
+        if self._max_results is None:
+            return it
+        return self.__gen_limited(it, self._max_results)
+
+    @staticmethod
+    def __gen_limited(it, n):
+        try:
+            if n > 0:
+                for res in it:
+                    yield res
+                    n -= 1
+                    if not n:
+                        break
+        finally:
+            close = getattr(it, "close", None)
+            if close:
+                close()
+
     @staticmethod
     def flatten(lst):
         """Takes a list which may contain one or more sublists and
@@ -1351,6 +1430,52 @@ class TermQuery:
             md_fh.seek(o)
             yield md_fh.readline()
 
+    def __partition_line_read(self, name, offsets, nlines):
+        """Reads the lines of the partition of the main dictionary
+        named 'name', which has 'nlines' lines, corresponding to the
+        main dictionary lines at the byte offsets in 'offsets'.  Every
+        line is read if 'offsets' is None."""
+
+        with open(os.path.join(self._dir_path, name), "rb") as fh:
+            if offsets is None or \
+                len(offsets) * PARTITION_SEEK_RATIO > nlines:
+                for l in fh:
+                    o, l = l.split(b" ", 1)
+                    if offsets is None or int(o) in offsets:
+                        yield l.decode()
+                return
+
+            # The lines are ordered by offset, so binary search
+            # the file for each one, starting from the last found.
+            lo = 0
+            size = os.fstat(fh.fileno()).st_size
+            for o in sorted(offsets):
+                hi = size
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    start, l = self.__partition_line_at(fh, mid)
+                    if l and int(l.split(b" ", 1)[0]) < o:
+                        lo = start + 1
+                    else:
+                        hi = mid
+                start, l = self.__partition_line_at(fh, lo)
+                if not l:
+                    return
+                lo = start
+                lo_o, l = l.split(b" ", 1)
+                if int(lo_o) == o:
+                    yield l.decode()
+
+    @staticmethod
+    def __partition_line_at(fh, pos):
+        """Returns the byte offset and contents of the first line of
+        the partition open as 'fh' which starts at or after 'pos'."""
+
+        fh.seek(max(pos - 1, 0))
+        if pos:
+            fh.readline()
+        return fh.tell(), fh.readline()
+
     def _read_pkg_dirs(self, fmris):
         """Legacy function used to search indexes which have a pkg
         directory with fmri offset information instead of the
@@ -1406,12 +1531,9 @@ class TermQuery:
             # If the term has at least one non-wildcard character
             # in it, do the glob search.
             if TermQuery.has_non_wildcard_character.match(term):
-                keys = self._data_token_offset.get_keys()
-                matches = choose(keys, term, case_sensitive)
-                offsets = set([
-                    self._data_token_offset.get_id(match)
-                    for match in matches
-                ])
+                offsets = set(
+                    self._data_token_offset.get_matching_ids(term,
+                    case_sensitive))
         elif self._data_token_offset.has_entity(term):
             offsets = set([
                 self._data_token_offset.get_id(term)])
@@ -1433,8 +1555,19 @@ class TermQuery:
                 offsets = pkg_offsets
             else:
                 offsets &= pkg_offsets
+        # If the search is restricted to both an action type and a key,
+        # and the index is partitioned by them, only the partition for
+        # that action type and key needs to be read.
+        partition = None
+        if not self.action_type_wildcard and not self.key_wildcard:
+            parts = ss.get_field_partitions(self._dir_path,
+                self._index_version)
+            if parts is not None:
+                partition = (ss.get_field_partition_name(
+                    self.action_type, self.key),
+                    parts.get((self.action_type, self.key), 0))
         # Restrict results by action type.
-        if not self.action_type_wildcard:
+        if not self.action_type_wildcard and partition is None:
             tmp_set = set()
             try:
                 fh = open(os.path.join(self._dir_path,
@@ -1452,7 +1585,7 @@ class TermQuery:
                 # with that action type were indexed.
                 offsets = set()
         # Restrict results by key.
-        if not self.key_wildcard:
+        if not self.key_wildcard and partition is None:
             tmp_set = set()
             try:
                 fh = open(os.path.join(self._dir_path,
@@ -1470,9 +1603,17 @@ class TermQuery:
                 # with that key were indexed.
                 offsets = set()
         line_iter = EmptyI
+        # If the index is partitioned by the action type and key, the
+        # partition has the lines for the offsets, or every line if
+        # offsets is None.
+        if partition is not None:
+            name, nlines = partition
+            if nlines:
+                line_iter = self.__partition_line_read(name,
+                    offsets, nlines)
         # If offsets isn't None, then the set of results has been
         # restricted so iterate through those offsets.
-        if offsets is not None:
+        elif offsets is not None:
             line_iter = self.__offset_line_read(offsets)
         # If offsets is None and the term was only wildcard search
         # tokens, return results for every known token.
@@ -1480,6 +1621,24 @@ class TermQuery:
             not TermQuery.has_non_wildcard_character.match(term):
             line_iter = self._data_main_dict.get_file_handle()
 
+        # Close the dictionaries once there are no more results to
+        # yield, or no more are wanted.
+        try:
+            for res in self.__gen_line_results(line_iter):
+                yield res
+        finally:
+            self._close_dicts()
+
+    def __gen_line_results(self, line_iter):
+        """Yields the results found in the main dictionary lines
+        produced by 'line_iter'."""
+
+        glob = self._glob
+        term = self._term
+        case_sensitive = self._case_sensitive
+
+        if not case_sensitive:
+            glob = True
         for line in line_iter:
             assert not line == '\n'
             tok, at_lst = \
@@ -1525,10 +1684,6 @@ class TermQuery:
                             ]
                             yield (p_str, int_os,
                                 at, st, fv)
-        # Close the dictionaries since there are no more results to
-        # yield.
-        self._close_dicts()
-        return
 
     def _get_results(self, res):
         """Takes the results from search_internal ("res") and reads the
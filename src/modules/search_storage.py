@@ -21,11 +21,16 @@
 #
 
 #
-# Copyright (c) 2010, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2010, 2026, Oracle and/or its affiliates.
 #
 
 import os
+import bisect
 import errno
+import fnmatch
+import mmap
+import re
+import struct
 import time
 import hashlib
 from urllib.parse import quote, unquote
@@ -33,6 +38,7 @@ from urllib.parse import quote, unquote
 import pkg.fmri as fmri
 import pkg.search_errors as search_errors
 import pkg.portable as portable
+from pkg.choose import choose
 from pkg.misc import PKG_FILE_BUFSIZ, force_bytes
 from pkg._misc import fast_quote
 
@@ -44,6 +50,10 @@ MAIN_FILE = 'main_dict.ascii.v2'
 BYTE_OFFSET_FILE = 'token_byte_offset.v1'
 FULL_FMRI_HASH_FILE = 'full_fmri_list.hash'
 FMRI_OFFSETS_FILE = 'fmri_offsets.v1'
+TOKEN_INDEX_FILE = 'token_index.v1'
+SEGMENTS_DIR = 'segments'
+FIELD_INDEX_FILE = 'field_index.v1'
+PKG_CHECKSUM_FILE = 'pkg_checksums.v1'
 
 
 def consistent_open(data_list, directory, timeout=1):
@@ -77,7 +87,7 @@ def consistent_open(data_list, directory, timeout=1):
             # in the function is greater than timeout.
             try:
                 f = os.path.join(directory, d.get_file_name())
-                fh = open(f, 'r')
+                fh = open(f, d.file_mode)
                 # If we get here, then the current index file
                 # is present.
                 if missing is None:
@@ -90,8 +100,7 @@ def consistent_open(data_list, directory, timeout=1):
                     break
                 d.set_file_handle(fh, f)
                 version_tmp = fh.readline()
-                version_num = \
-                    int(version_tmp.split(' ')[1].rstrip('\n'))
+                version_num = int(version_tmp.split()[1])
                 # Read the version. If this is the first file,
                 # set the expected version otherwise check that
                 # the version matches the expected version.
@@ -130,6 +139,100 @@ def consistent_open(data_list, directory, timeout=1):
         return cur_version
 
 
+def get_segment_dirs(index_dir, version):
+    """Returns a list of the paths of the segments in the index at
+    'index_dir' which extend version 'version' of its main index, in the
+    order they were written.
+
+    Each segment is a complete, immutable index of the packages added
+    since the main index was last updated and is stored in a directory
+    named '<version>.<sequence>' below the index's segments directory.
+    Segments which extend any other version of the main index have
+    already been merged into it and are ignored."""
+
+    seg_root = os.path.join(index_dir, SEGMENTS_DIR)
+    try:
+        names = os.listdir(seg_root)
+    except EnvironmentError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return []
+        raise
+
+    segs = []
+    for name in names:
+        try:
+            seg_version, seq = (int(n) for n in name.split("."))
+        except ValueError:
+            # Segments being written, or anything else that
+            # isn't a segment.
+            continue
+        if seg_version == version:
+            segs.append((seq, os.path.join(seg_root, name)))
+    return [path for seq, path in sorted(segs)]
+
+
+def get_field_partition_name(action_type, key):
+    """Returns the name of the file holding the partition of the main
+    dictionary for actions of type 'action_type' and key 'key'.
+
+    Each line of a partition is the byte offset of a line of the main
+    dictionary followed by a space and that line reduced to the postings
+    for the action type and key.  Lines are in the same order as those
+    of the main dictionary.  The partitions an index has are listed in
+    its FIELD_INDEX_FILE."""
+
+    return "__fk_{0}.{1}".format(action_type, key)
+
+
+def get_field_partitions(index_dir, version):
+    """Returns a dictionary mapping the action type and key of each
+    partition of the main dictionary of the index at 'index_dir' to the
+    number of lines in the partition.  None is returned if the index
+    has no partitions, or they weren't written with version 'version'
+    of the main dictionary."""
+
+    try:
+        with open(os.path.join(index_dir, FIELD_INDEX_FILE)) as fh:
+            if int(fh.readline().split()[1]) != version:
+                return None
+            res = {}
+            for l in fh:
+                at, l = l.rstrip("\n").split(" ", 1)
+                st, n = l.rsplit(" ", 1)
+                res[(at, st)] = int(n)
+    except EnvironmentError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return None
+        raise
+    except (IndexError, ValueError):
+        # The list is being written.
+        return None
+    return res
+
+
+def get_index_generation(index_dir):
+    """Returns a value identifying the current contents of the index at
+    'index_dir', or None if there is no index.  The value differs after
+    any update of the main index or addition of a segment, so it can be
+    used to determine whether data derived from the index is stale.
+
+    Only the version of the main dictionary is read, so the value is
+    cheap to determine but isn't checked for consistency with the rest
+    of the index."""
+
+    try:
+        with open(os.path.join(index_dir, MAIN_FILE), "rb") as fh:
+            version = int(fh.readline().split()[1])
+    except EnvironmentError as e:
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return None
+        raise
+    except (IndexError, ValueError):
+        # The index is being written.
+        return None
+    return version, tuple(get_segment_dirs(index_dir, version))
+
+
 class IndexStoreBase:
     """Base class for all data storage used by the indexer and
     queryEngine. All members must have a file name and maintain
@@ -137,6 +240,9 @@ class IndexStoreBase:
     calls.
     """
 
+    # The mode in which consistent_open opens the file.
+    file_mode = "r"
+
     def __init__(self, file_name):
         self._name = file_name
         self._file_handle = None
@@ -563,6 +669,12 @@ class IndexStoreDictMutable(IndexStoreBase):
     def get_keys(self):
         return list(self._dict.keys())
 
+    def get_matching_ids(self, pattern, case_sensitive):
+        return [
+            self._dict[k]
+            for k in choose(self._dict.keys(), pattern, case_sensitive)
+        ]
+
     @staticmethod
     def __quote(str):
         if " " in str:
@@ -735,6 +847,58 @@ class IndexStoreSet(IndexStoreBase):
         return len(self._set)
 
 
+class IndexStoreChecksums(IndexStoreBase):
+    """Used to map the fmris of the indexed packages to checksums of
+    their manifests so that the packages whose manifests have changed
+    since they were indexed can be found."""
+
+    def __init__(self, file_name):
+        IndexStoreBase.__init__(self, file_name)
+        self._dict = {}
+
+    def get_dict(self):
+        return self._dict
+
+    def clear(self):
+        self._dict.clear()
+
+    def get_checksum(self, entity):
+        """Returns the checksum recorded for entity, or None if there
+        isn't one."""
+        return self._dict.get(entity)
+
+    def set_checksum(self, entity, checksum):
+        self._dict[entity] = checksum
+
+    def remove_entity(self, entity):
+        self._dict.pop(entity, None)
+
+    def write_dict_file(self, path, version_num):
+        """Write each entity and its checksum out to a line in a
+        file."""
+        IndexStoreBase._protected_write_dict_file(self, path,
+            version_num, (
+                "{0} {1}".format(c, e)
+                for e, c in sorted(self._dict.items())
+            ))
+
+    def read_dict_file(self):
+        """Process a dictionary file written using the above method
+        """
+        assert self._file_handle
+        self._dict.clear()
+        for line in self._file_handle:
+            c, e = line.rstrip("\n").split(" ", 1)
+            self._dict[e] = c
+        IndexStoreBase.read_dict_file(self)
+        return len(self._dict)
+
+    def count_entries_removed_during_partial_indexing(self):
+        """Returns the number of entries removed during a second phase
+        of indexing."""
+        return len(self._dict)
+
+
 class InvertedDict(IndexStoreBase):
     """Class used to store and process fmri to offset mappings.  It does
     delta compression and deduplication of shared offset sets when writing
@@ -845,3 +1009,476 @@ class InvertedDict(IndexStoreBase):
                         self._dict[fmris].split()))
                     break
         return set(offs)
+
+
+def _encode_varint(n):
+    """Returns the bytes representing the non-negative integer n using
+    seven bits per byte, least significant first, with the high bit of
+    each byte but the last set."""
+
+    res = bytearray()
+    while n > 0x7f:
+        res.append((n & 0x7f) | 0x80)
+        n >>= 7
+    res.append(n)
+    return res
+
+
+def _decode_varint(buf, pos):
+    """Returns the integer encoded by _encode_varint at position pos of
+    buf and the position following it."""
+
+    res = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        res |= (b & 0x7f) << shift
+        if b < 0x80:
+            return res, pos
+        shift += 7
+
+
+def _literal_runs(pattern):
+    """Returns the prefix of the fnmatch-style pattern up to its first
+    wildcard and the runs of literal characters in it."""
+
+    runs = []
+    prefix = None
+    cur = ""
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c not in "*?[":
+            cur += c
+            continue
+        if prefix is None:
+            prefix = cur
+        runs.append(cur)
+        cur = ""
+        if c == "[":
+            # Skip the bracket expression, if it is one; otherwise
+            # the '[' is treated as a wildcard, which can only
+            # result in more candidates.
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j >= 0:
+                i = j + 1
+    if prefix is None:
+        prefix = cur
+    runs.append(cur)
+    return prefix, [r for r in runs if r]
+
+
+class IndexStoreTokenIndex(IndexStoreBase):
+    """Sorted, memory-mapped binary mapping of tokens to the byte offsets
+    of their lines in the main dictionary.  It provides the same lookup
+    methods as the IndexStoreDictMutable for the token byte offset file,
+    but only its block directory is read into memory, so a lookup only
+    touches the pages of the file holding the block of the token.
+
+    Tokens matching a wildcard pattern are found using the sorted order
+    of the tokens for the pattern's prefix, or a trigram index for its
+    other literal characters, so only candidate tokens are visited.
+
+    After the version line, the file consists of:
+
+        a header (see HEADER) giving the number of tokens, the
+        number of tokens per block, and the start of each section;
+
+        the tokens, in sorted order, each followed by a newline;
+
+        the offsets of the tokens, with the first offset of each block
+        stored as a varint and the others as varint encoded differences
+        from the previous one;
+
+        the block directory, which is a pair of varints for each block
+        giving the difference between the start of its tokens and
+        its offsets and those of the previous block;
+
+        the posting lists of the trigram index, each a varint count
+        followed by the varint encoded differences between the
+        sorted numbers of the tokens containing the trigram, starting
+        with the list of the tokens which aren't plain ASCII;
+
+        the trigram table, which is a sorted array of TRIGRAM
+        records giving each lower case ASCII trigram and the
+        position of its posting list.
+    """
+
+    file_mode = "rb"
+
+    MAGIC = b"PKG5TIX\x02"
+    HEADER = struct.Struct(">8sIIQQQQQ")
+    TRIGRAM = struct.Struct(">3sQ")
+    BLOCK_SIZE = 64
+
+    def __init__(self, file_name):
+        IndexStoreBase.__init__(self, file_name)
+        self._mm = None
+        self._ntoks = 0
+        self._bsize = self.BLOCK_SIZE
+        self._tok_start = 0
+        self._tok_end = 0
+        self._block_toks = []
+        self._block_pos = []
+        self._tri_start = 0
+        self._ntris = 0
+        self._nonascii_pos = 0
+
+        # State used while the file is being written.
+        self._out_hpos = None
+        self._out_offs = None
+        self._out_dir = None
+        self._out_last = None
+        self._out_tris = None
+
+    def read_dict_file(self):
+        """Maps the file and reads the block directory."""
+
+        assert self._file_handle
+        fh = self._file_handle
+        hpos = fh.tell()
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, ntoks, bsize, tstart, ostart, dstart, xpos, \
+                gstart = self.HEADER.unpack_from(mm, hpos)
+        except struct.error:
+            magic = None
+        if magic != self.MAGIC:
+            mm.close()
+            raise search_errors.InconsistentIndexException(
+                os.path.dirname(self._file_path))
+
+        toks = []
+        bpos = []
+        tpos = tstart
+        opos = ostart
+        pos = dstart
+        for i in range(0, ntoks, bsize):
+            td, pos = _decode_varint(mm, pos)
+            od, pos = _decode_varint(mm, pos)
+            tpos += td
+            opos += od
+            toks.append(mm[tpos:mm.find(b"\n", tpos)].decode(
+                "utf-8"))
+            bpos.append((tpos, opos))
+        # The end of the last block.
+        bpos.append((ostart, dstart))
+
+        self._mm = mm
+        self._ntoks = ntoks
+        self._bsize = bsize
+        self._tok_start = tstart
+        self._tok_end = ostart
+        self._block_toks = toks
+        self._block_pos = bpos
+        self._nonascii_pos = xpos
+        self._tri_start = gstart
+        self._ntris = (len(mm) - gstart) // self.TRIGRAM.size
+        IndexStoreBase.read_dict_file(self)
+
+    def __read_block(self, b):
+        """Returns the tokens in block b."""
+
+        tpos = self._block_pos[b][0]
+        tend = self._block_pos[b + 1][0]
+        toks = self._mm[tpos:tend].decode("utf-8").split("\n")
+        toks.pop()
+        return toks
+
+    def __read_offsets(self, b, n):
+        """Returns the offsets of the first n tokens in block b."""
+
+        mm = self._mm
+        opos = self._block_pos[b][1]
+        offs = []
+        o = 0
+        for i in range(n):
+            d, opos = _decode_varint(mm, opos)
+            o += d
+            offs.append(o)
+        return offs
+
+    def __find(self, entity):
+        """Returns the offset of entity or None if entity isn't
+        stored."""
+
+        b = bisect.bisect_right(self._block_toks, entity) - 1
+        if b < 0:
+            return None
+        toks = self.__read_block(b)
+        i = bisect.bisect_left(toks, entity)
+        if i == len(toks) or toks[i] != entity:
+            return None
+        return self.__read_offsets(b, i + 1)[i]
+
+    def has_entity(self, entity):
+        return self.__find(entity) is not None
+
+    def get_id(self, entity):
+        res = self.__find(entity)
+        if res is None:
+            raise KeyError(entity)
+        return res
+
+    def get_keys(self):
+        """Returns all tokens in sorted order."""
+
+        if not self._ntoks:
+            return []
+        res = self._mm[self._tok_start:self._tok_end].decode(
+            "utf-8").split("\n")
+        res.pop()
+        return res
+
+    def __read_posting(self, pos):
+        """Returns the set of token numbers in the posting list at
+        pos."""
+
+        mm = self._mm
+        n, pos = _decode_varint(mm, pos)
+        res = set()
+        t = 0
+        for i in range(n):
+            d, pos = _decode_varint(mm, pos)
+            t += d
+            res.add(t)
+        return res
+
+    def __find_trigram(self, tri):
+        """Returns the position of the posting list of the trigram
+        or None if no token contains it."""
+
+        mm = self._mm
+        rsize = self.TRIGRAM.size
+        start = self._tri_start
+        lo, hi = 0, self._ntris
+        while lo < hi:
+            mid = (lo + hi) // 2
+            rpos = start + mid * rsize
+            cur = mm[rpos:rpos + 3]
+            if cur < tri:
+                lo = mid + 1
+            elif cur > tri:
+                hi = mid
+            else:
+                return self.TRIGRAM.unpack_from(mm, rpos)[1]
+        return None
+
+    def __trigram_candidates(self, runs):
+        """Returns the numbers of the tokens which could contain all
+        of the given runs of characters ignoring case, or None if the
+        runs are too short to narrow the search."""
+
+        tris = set()
+        for r in runs:
+            r = r.lower()
+            try:
+                r = r.encode("ascii")
+            except UnicodeEncodeError:
+                continue
+            for i in range(len(r) - 2):
+                tris.add(r[i:i + 3])
+        if not tris:
+            return None
+
+        res = None
+        for tri in tris:
+            pos = self.__find_trigram(tri)
+            if pos is None:
+                res = set()
+                break
+            if res is None:
+                res = self.__read_posting(pos)
+            else:
+                res &= self.__read_posting(pos)
+            if not res:
+                break
+        # Tokens which aren't plain ASCII have no trigrams and may
+        # match regardless.
+        return res | self.__read_posting(self._nonascii_pos)
+
+    def __prefix_blocks(self, prefixes):
+        """Returns the numbers of the blocks which could contain tokens
+        starting with any of the given prefixes."""
+
+        blocks = set()
+        btoks = self._block_toks
+        for p in prefixes:
+            first = max(bisect.bisect_right(btoks, p) - 1, 0)
+            if p[-1] == "\U0010ffff":
+                last = len(btoks)
+            else:
+                # Every token starting with p sorts before this.
+                last = bisect.bisect_left(btoks,
+                    p[:-1] + chr(ord(p[-1]) + 1))
+            blocks.update(range(first, last))
+        return blocks
+
+    @staticmethod
+    def __case_variants(s):
+        """Returns every combination of upper and lower case of the
+        characters of s."""
+
+        res = [""]
+        for c in s:
+            cs = set((c.lower(), c.upper()))
+            res = [r + v for r in res for v in cs]
+        return res
+
+    def get_matching_ids(self, pattern, case_sensitive):
+        """Returns the offsets of the tokens matching the fnmatch-style
+        pattern."""
+
+        if not self._ntoks:
+            return []
+
+        flag = 0
+        if not case_sensitive:
+            flag = re.I
+        match = re.compile(fnmatch.translate(pattern), flag).match
+
+        prefix, runs = _literal_runs(pattern)
+        blocks = None
+        cands = None
+        if prefix and case_sensitive:
+            blocks = self.__prefix_blocks([prefix])
+        else:
+            cands = self.__trigram_candidates(runs)
+            if cands is None and prefix and len(prefix) < 3 and \
+                prefix.isascii():
+                # Too short for a trigram.  Tokens which aren't
+                # plain ASCII may also match.
+                cands = self.__read_posting(self._nonascii_pos)
+                blocks = self.__prefix_blocks(
+                    self.__case_variants(prefix))
+
+        if blocks is None and cands is None:
+            # Nothing narrows the search, so every token has to be
+            # checked.
+            blocks = range(len(self._block_toks))
+        elif blocks is None:
+            blocks = set()
+        if cands:
+            blocks = set(blocks)
+            bsize = self._bsize
+            blocks.update(t // bsize for t in cands)
+
+        res = []
+        for b in sorted(blocks):
+            toks = self.__read_block(b)
+            idx = [i for i, t in enumerate(toks) if match(t)]
+            if idx:
+                offs = self.__read_offsets(b, idx[-1] + 1)
+                res.extend(offs[i] for i in idx)
+        return res
+
+    def open_out_file(self, use_dir, version_num):
+        """Opens the output file for this class and prepares it
+        to be written via write_entity."""
+
+        fh = open(os.path.join(use_dir, self._name), "wb",
+            buffering=PKG_FILE_BUFSIZ)
+        fh.write("VERSION: {0:d}\n".format(version_num).encode())
+        self._out_hpos = fh.tell()
+        fh.write(b"\0" * self.HEADER.size)
+        self._tok_start = fh.tell()
+        self._ntoks = 0
+        self._out_offs = bytearray()
+        self._out_dir = bytearray()
+        self._out_last = (self._tok_start, 0, 0)
+        # Maps each trigram to its encoded posting list, the number
+        # of tokens in it, and the last token in it; tokens which
+        # aren't plain ASCII are kept under None.
+        self._out_tris = {}
+        self._file_handle = fh
+
+    def __add_posting(self, tri, num):
+        """Adds token number num to the posting list of trigram tri
+        while writing."""
+
+        try:
+            buf, cnt, last = self._out_tris[tri]
+        except KeyError:
+            buf, cnt, last = bytearray(), 0, 0
+        buf += _encode_varint(num - last)
+        self._out_tris[tri] = (buf, cnt + 1, num)
+
+    def write_entity(self, entity, my_id):
+        """Writes the entity out to the file with my_id.  Entities
+        must be written in sorted order."""
+
+        assert self._out_offs is not None
+        my_id = int(my_id)
+        ltpos, lopos, lid = self._out_last
+        if self._ntoks % self.BLOCK_SIZE == 0:
+            # Start a new block; its first offset is stored in
+            # full.
+            tpos = self._file_handle.tell()
+            opos = len(self._out_offs)
+            self._out_dir += _encode_varint(tpos - ltpos)
+            self._out_dir += _encode_varint(opos - lopos)
+            ltpos, lopos, lid = tpos, opos, 0
+        self._out_offs += _encode_varint(my_id - lid)
+        self._out_last = (ltpos, lopos, my_id)
+
+        tok = str(entity).encode("utf-8")
+        if tok.isascii():
+            tok_l = tok.lower()
+            for tri in set(tok_l[i:i + 3]
+                for i in range(len(tok_l) - 2)):
+                self.__add_posting(tri, self._ntoks)
+        else:
+            self.__add_posting(None, self._ntoks)
+        self._ntoks += 1
+        self._file_handle.write(tok + b"\n")
+
+    def close_file_handle(self):
+        """Closes the file handle; if the file was being written, its
+        offsets, directory, trigram index, and header are written out
+        first."""
+
+        if self._out_offs is not None and self._file_handle:
+            fh = self._file_handle
+            ostart = fh.tell()
+            fh.write(self._out_offs)
+            dstart = fh.tell()
+            fh.write(self._out_dir)
+
+            tris = self._out_tris
+            xpos = fh.tell()
+            buf, cnt, last = tris.pop(None, (b"", 0, 0))
+            fh.write(_encode_varint(cnt))
+            fh.write(buf)
+            table = []
+            for tri in sorted(tris):
+                buf, cnt, last = tris[tri]
+                table.append(self.TRIGRAM.pack(tri, fh.tell()))
+                fh.write(_encode_varint(cnt))
+                fh.write(buf)
+            gstart = fh.tell()
+            fh.writelines(table)
+
+            fh.seek(self._out_hpos)
+            fh.write(self.HEADER.pack(self.MAGIC, self._ntoks,
+                self.BLOCK_SIZE, self._tok_start, ostart, dstart,
+                xpos, gstart))
+        self._out_offs = self._out_dir = self._out_tris = None
+        IndexStoreBase.close_file_handle(self)
+
+    def write_dict_file(self, path, version_num):
+        """Writes out an index which contains no tokens."""
+
+        self.open_out_file(path, version_num)
+        self.close_file_handle()
+
+    def count_entries_removed_during_partial_indexing(self):
+        """Returns the number of entries removed during a second phase
+        of indexing.
+        """
+        return 0
@@ -20,7 +20,7 @@
 # CDDL HEADER END
 
 #
-# Copyright (c) 2008, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 #
 
 import cherrypy
@@ -414,7 +414,9 @@ class CatalogInterface(_Interface):
                     notfound.append(f)
                     continue
 
-                mfst.set_content(pathname=mpath)
+                # Only some types of actions are used, so the
+                # others are never completely parsed.
+                mfst.set_content(pathname=mpath, lazy=True)
 
                 if PackageInfo.LICENSES in info_needed:
                     licenses = self.__licenses(mfst)
@@ -26,6 +26,7 @@
 
 import cherrypy
 from cherrypy._cptools import HandlerTool
+from cherrypy.lib import cptools, httputil
 from cherrypy.lib.static import serve_file
 from email.utils import formatdate
 from cherrypy.process.plugins import SimplePlugin
@@ -40,11 +41,14 @@ else:
 
 import atexit
 import ast
+import collections
 import errno
+import gzip
 import http.client
 import inspect
 import io
 import itertools
+import lzma
 import math
 import os
 import queue
@@ -103,6 +107,7 @@ class DepotHTTP(_Depot):
         "versions",
         "search",
         "catalog",
+        "updatelog",
         "info",
         "manifest",
         "file",
@@ -122,6 +127,7 @@ class DepotHTTP(_Depot):
         "versions",
         "search",
         "catalog",
+        "updatelog",
         "info",
         "manifest",
         "file",
@@ -140,6 +146,19 @@ class DepotHTTP(_Depot):
     content_root = None
     web_root = None
 
+    # The content encodings catalog data can be returned with, in order
+    # of preference, the functions used to compress it, and whether that
+    # is slow enough that it should be done in the background rather
+    # than while a request is being handled.
+    CATALOG_ENCODINGS = (
+        ("xz", lzma.compress, True),
+        ("gzip", gzip.compress, False),
+    )
+
+    # The maximum combined size of the compressed catalog files kept in
+    # memory to serve subsequent requests.
+    CATALOG_CACHE_SIZE = 64 * 1024 * 1024
+
     def __init__(self, repo, dconf, request_pub_func=None):
         """Initialize and map the valid operations for the depot.  While
         doing so, ensure that the operations have been explicitly
@@ -154,6 +173,16 @@ class DepotHTTP(_Depot):
         # threads modifying data structures at the same time.
         self._lock = pkg.nrlock.NRLock()
 
+        # Compressed copies of catalog files, indexed by pathname and
+        # content encoding, in least recently used order.  Each entry
+        # also records the identity of the file it was created from.
+        self.__catalog_cache = collections.OrderedDict()
+        self.__catalog_cache_size = 0
+        self.__catalog_cache_lock = threading.Lock()
+        # The keys of the catalog data being compressed in the
+        # background.
+        self.__catalog_pending = set()
+
         self.cfg = dconf
         self.repo = repo
         self.request_pub_func = request_pub_func
@@ -267,6 +296,11 @@ class DepotHTTP(_Depot):
         self.__bgtask = BackgroundTaskPlugin(cherrypy.engine)
         self.__bgtask.subscribe()
 
+        # Catalog data is compressed by a separate handler so that
+        # it can't prevent other tasks from being queued.
+        self.__compress_bgtask = BackgroundTaskPlugin(cherrypy.engine)
+        self.__compress_bgtask.subscribe()
+
     def _queue_refresh_index(self):
         """Queues a background task to update search indexes.  This
         method is a protected helper function for depot consumers."""
@@ -589,10 +623,216 @@ class DepotHTTP(_Depot):
             raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
 
         self.__set_response_expires("catalog", 86400, 86400)
-        return serve_file(fpath, "text/plain; charset=utf-8")
+        cherrypy.response.headers["Vary"] = "Accept-Encoding"
+        encodings = self.__get_catalog_encodings()
+        if not encodings:
+            return serve_file(fpath, "text/plain; charset=utf-8")
+
+        try:
+            st = os.stat(fpath)
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                cherrypy.log("Request failed: {0}".format(str(e)))
+            raise cherrypy.HTTPError(http.client.NOT_FOUND,
+                _("Catalog file {0} not found.").format(name))
+
+        # Allow conditional requests to be satisfied in the same way
+        # as for uncompressed content.
+        cherrypy.response.headers["Last-Modified"] = \
+            httputil.HTTPDate(st.st_mtime)
+        cptools.validate_since()
+
+        return self.__compress_catalog_data([fpath], [st], encodings,
+            lambda data: data[0])
 
     catalog_1._cp_config = { "response.stream": True }
 
+    def updatelog_0(self, *tokens):
+        """Outputs the catalog update log named in the request path and
+        every newer update log for the same locale as a single JSON
+        object indexed by update log name.  This allows clients to
+        retrieve all of the updates needed to bring a catalog up to date
+        using a single request."""
+
+        try:
+            name = tokens[0]
+        except IndexError:
+            raise cherrypy.HTTPError(http.client.FORBIDDEN,
+                _("Directory listing not allowed."))
+
+        try:
+            fpaths = self.repo.catalog_updates(name,
+                pub=self._get_req_pub())
+            sts = [os.stat(fpath) for fpath in fpaths]
+        except (srepo.RepositoryError, EnvironmentError) as e:
+            # Treat any remaining repository error as a 404, but
+            # log the error and include the real failure
+            # information.
+            cherrypy.log("Request failed: {0}".format(str(e)))
+            raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
+
+        def combine(data):
+            # Each update log is a JSON object, so their contents
+            # can be combined without having to parse them.
+            return b"{" + b",".join(
+                b"".join((b'"', misc.force_bytes(
+                os.path.basename(fpath)), b'":', udata.strip()))
+                for fpath, udata in zip(fpaths, data)
+            ) + b"}"
+
+        self.__set_response_expires("catalog", 86400, 86400)
+        cherrypy.response.headers["Vary"] = "Accept-Encoding"
+        return self.__compress_catalog_data(fpaths, sts,
+            self.__get_catalog_encodings(), combine)
+
+    @classmethod
+    def __get_catalog_encodings(cls):
+        """Returns a list of the names of the content encodings for
+        catalog data that the client has indicated it will accept, in
+        order of preference; the list is empty if the content should
+        not be compressed."""
+
+        accepted = {}
+        for e in cherrypy.request.headers.elements("Accept-Encoding"):
+            accepted[e.value.lower()] = e.qvalue
+        return [
+            encoding
+            for encoding, func, background in cls.CATALOG_ENCODINGS
+            if accepted.get(encoding, 0) > 0
+        ]
+
+    def __compress_catalog_data(self, fpaths, sts, encodings,
+        transform):
+        """Returns the result of calling 'transform' with a list of the
+        contents of the catalog files at 'fpaths' (with the stat(2)
+        information 'sts'), compressed using the first of 'encodings'
+        possible, if any.  Compressed data is cached until any of the
+        files change or the space it uses is needed for other catalog
+        data.  Data is never compressed using a slow encoding while
+        the request is handled; instead, it's compressed in the
+        background for subsequent requests, and a faster encoding (or
+        none) is used until then."""
+
+        slow = set(
+            e
+            for e, func, background in self.CATALOG_ENCODINGS
+            if background
+        )
+        fpaths = tuple(fpaths)
+        ident = self.__get_catalog_ident(sts)
+        encoding = data = None
+        deferred = []
+        with self.__catalog_cache_lock:
+            for e in encodings:
+                entry = self.__catalog_cache.get((fpaths, e))
+                if entry and entry[0] == ident:
+                    self.__catalog_cache.move_to_end(
+                        (fpaths, e))
+                    encoding, data = e, entry[1]
+                    break
+                if e not in slow:
+                    encoding = e
+                    break
+                if (fpaths, e) not in self.__catalog_pending:
+                    self.__catalog_pending.add((fpaths, e))
+                    deferred.append(e)
+
+        for e in deferred:
+            try:
+                self.__compress_bgtask.put(
+                    self.__compress_catalog_task,
+                    fpaths, e, transform)
+            except queue.Full:
+                # It will be compressed for a later request.
+                with self.__catalog_cache_lock:
+                    self.__catalog_pending.discard((fpaths, e))
+
+        if data is None:
+            try:
+                data = self.__read_catalog_data(fpaths,
+                    transform)
+            except EnvironmentError as e:
+                cherrypy.log("Request failed: {0}".format(str(e)))
+                raise cherrypy.HTTPError(http.client.NOT_FOUND,
+                    str(e))
+
+            if encoding:
+                data = self.__compress_data(data, encoding)
+                self.__cache_catalog_data((fpaths, encoding),
+                    ident, data)
+
+        response = cherrypy.response
+        response.headers["Content-Type"] = "text/plain; charset=utf-8"
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        return data
+
+    @staticmethod
+    def __get_catalog_ident(sts):
+        """Returns a value identifying the contents of the catalog
+        files with the stat(2) information 'sts'."""
+
+        return tuple(
+            (st.st_size, st.st_mtime_ns, st.st_ino)
+            for st in sts
+        )
+
+    @staticmethod
+    def __read_catalog_data(fpaths, transform):
+        """Returns the result of calling 'transform' with a list of the
+        contents of the catalog files at 'fpaths'."""
+
+        contents = []
+        for fpath in fpaths:
+            with open(fpath, "rb") as f:
+                contents.append(f.read())
+        return transform(contents)
+
+    @classmethod
+    def __compress_data(cls, data, encoding):
+        """Returns 'data' compressed using 'encoding'."""
+
+        return dict(
+            (e, func)
+            for e, func, background in cls.CATALOG_ENCODINGS
+        )[encoding](data)
+
+    def __compress_catalog_task(self, fpaths, encoding, transform):
+        """Compresses the result of calling 'transform' with a list of
+        the contents of the catalog files at 'fpaths' using 'encoding',
+        and caches it for subsequent requests.  This is run as a
+        background task."""
+
+        key = (fpaths, encoding)
+        try:
+            ident = self.__get_catalog_ident(
+                [os.stat(fpath) for fpath in fpaths])
+            data = self.__compress_data(self.__read_catalog_data(
+                fpaths, transform), encoding)
+            self.__cache_catalog_data(key, ident, data)
+        except EnvironmentError:
+            # The files were removed or replaced; this will be
+            # retried by a later request if needed.
+            pass
+        finally:
+            with self.__catalog_cache_lock:
+                self.__catalog_pending.discard(key)
+
+    def __cache_catalog_data(self, key, ident, data):
+        """Caches the compressed catalog data 'data' using 'key',
+        discarding the least recently used data as needed."""
+
+        with self.__catalog_cache_lock:
+            old = self.__catalog_cache.pop(key, None)
+            if old:
+                self.__catalog_cache_size -= len(old[1])
+            if len(data) <= self.CATALOG_CACHE_SIZE:
+                self.__catalog_cache[key] = (ident, data)
+                self.__catalog_cache_size += len(data)
+            while self.__catalog_cache_size > self.CATALOG_CACHE_SIZE:
+                k, old = self.__catalog_cache.popitem(last=False)
+                self.__catalog_cache_size -= len(old[1])
+
     def manifest_0(self, *tokens):
         """The request is an encoded pkg FMRI.  If the version is
         specified incompletely, we return an error, as the client is
@@ -926,7 +1166,10 @@ class DepotHTTP(_Depot):
                     Update search and package data.
                 refresh-indexes
                     Update search data.  (Add packages found in the
-                    repository to their related search indexes.)
+                    repository to their related search indexes.)  If
+                    the "merge" parameter is "1", the segments of the
+                    search indexes are also merged into their main
+                    indexes.
                 refresh-packages
                     Update package data.  (Add packages found in the
                     repository to their related catalog.)
@@ -963,7 +1206,8 @@ class DepotHTTP(_Depot):
             elif cmd == "refresh-indexes":
                 # Update search indexes.
                 self.__bgtask.put(self.repo.refresh_index,
-                    pub=self._get_req_pub())
+                    pub=self._get_req_pub(),
+                    merge=params.get("merge") == "1")
             elif cmd == "refresh-packages":
                 # Add new packages.
                 self.__bgtask.put(self.repo.add_content,
@@ -2169,6 +2413,7 @@ class DepotConfig:
                 cfg.PropList("disable_ops"),
                 cfg.PropDefined("image_root", allowed=["",
                     "<abspathname>"]),
+                cfg.PropInt("index_workers"),
                 cfg.PropDefined("inst_root", allowed=["", "<pathname>"]),
                 cfg.PropBool("ll_mirror"),
                 cfg.PropDefined("log_access", allowed=["", "stderr",
@@ -21,11 +21,17 @@
 #
 
 #
-# Copyright (c) 2009, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 #
 
+import copy
+import itertools
+import os
 import sys
+import threading
 import pkg.query_parser as qp
+import pkg.search_errors as se
+import pkg.search_storage as ss
 # pylint: disable-next=unused-import
 from pkg.query_parser import BooleanQueryException, ParseError, QueryException
 
@@ -81,12 +87,187 @@ class TopQuery(qp.TopQuery):
     pass
 
 
+class _IndexSnapshot:
+    """The data read from one version of an index which is shared, without
+    modification, by every search of that version.  A snapshot is only
+    valid for the main dictionary whose identity it records; once that's
+    replaced, a new snapshot is made and the old one is left to the
+    searches still using it."""
+
+    def __init__(self, main_dict_id, version, manf, token_offset,
+        fmri_offsets):
+        self.main_dict_id = main_dict_id
+        self.version = version
+        self.manf = manf
+        self.token_offset = token_offset
+        self.fmri_offsets = fmri_offsets
+
+
 class TermQuery(qp.TermQuery):
     """This class handles the client specific search logic for searching
     for a specific query term."""
 
+    # Maps the path of each index to the _IndexSnapshot of its current
+    # version.
     _global_data_dict = {}
 
+    # Serializes making snapshots of each index; searches using a current
+    # snapshot don't need it.
+    __snapshot_locks = {}
+    __snapshot_locks_lock = threading.Lock()
+
+    def __init__(self, term):
+        qp.TermQuery.__init__(self, term)
+        self._segments = []
+
+    def set_info(self, **kwargs):
+        """Sets the information needed to search the index, and each
+        of its segments, which back the search.  A copy of this query
+        is set up for each segment so that the results from the
+        segments can be merged with those from the main index."""
+
+        self._max_results = kwargs.get("max_results")
+        self.__set_index_info(**kwargs)
+
+        segs = ss.get_segment_dirs(self._dir_path,
+            self._index_version)
+
+        # Segments are removed once merged into the main index, so
+        # discard any cached data for them.
+        seg_root = os.path.join(self._dir_path, ss.SEGMENTS_DIR, "")
+        for path in list(self._global_data_dict):
+            if path.startswith(seg_root) and path not in segs:
+                self.clear_cache(path)
+
+        self._segments = []
+        for seg in segs:
+            seg_query = copy.copy(self)
+            kwargs["index_dir"] = seg
+            try:
+                seg_query.__set_index_info(**kwargs)
+            except (se.NoIndexException,
+                se.InconsistentIndexException):
+                # The segment was merged into the main index
+                # and removed after the main index was opened.
+                if os.path.exists(seg):
+                    raise
+                continue
+            self._segments.append(seg_query)
+
+    def __set_index_info(self, index_dir, get_manifest_path,
+        case_sensitive, **kwargs):
+        """Sets the information needed to search the index at
+        'index_dir'; see qp.TermQuery.set_info.
+
+        Rather than locking the index's shared data, this opens the
+        main dictionary and uses the index's snapshot if it was made
+        from that main dictionary.  Only if it wasn't is a new snapshot
+        made, under a lock, and published for other searches."""
+
+        self._dir_path = index_dir
+        assert self._dir_path
+        self._manifest_path_func = get_manifest_path
+        self._case_sensitive = case_sensitive
+
+        gdd = self._global_data_dict
+        while True:
+            snap = gdd.get(index_dir)
+            if snap is not None:
+                main_dict, main_dict_id, version = \
+                    self.__open_main_dict(index_dir)
+                if main_dict_id == snap.main_dict_id and \
+                    version == snap.version:
+                    break
+                main_dict.close_file_handle()
+
+            lock = self.__get_snapshot_lock(index_dir)
+            lock.acquire()
+            try:
+                if gdd.get(index_dir) is not snap:
+                    # Another search has made a new snapshot.
+                    continue
+                snap, main_dict = self.__make_snapshot(index_dir)
+                gdd[index_dir] = snap
+                break
+            finally:
+                lock.release()
+
+        self._data_main_dict = main_dict
+        self._index_version = snap.version
+        self._data_manf = snap.manf
+        self._data_token_offset = snap.token_offset
+        self._data_fmri_offsets = snap.fmri_offsets
+
+    @classmethod
+    def __get_snapshot_lock(cls, index_dir):
+        with cls.__snapshot_locks_lock:
+            return cls.__snapshot_locks.setdefault(index_dir,
+                threading.Lock())
+
+    @staticmethod
+    def __main_dict_id(main_dict):
+        """Returns a value identifying the file that the main
+        dictionary 'main_dict' was opened from."""
+
+        st = os.fstat(main_dict.get_file_handle().fileno())
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def __open_main_dict(self, index_dir):
+        """Opens the main dictionary of the index at 'index_dir' and
+        returns it, its identity and its version."""
+
+        main_dict = ss.IndexStoreMainDict(ss.MAIN_FILE)
+        version = ss.consistent_open([main_dict], index_dir,
+            self._file_timeout_secs)
+        if version is None:
+            raise se.NoIndexException(index_dir)
+        return main_dict, self.__main_dict_id(main_dict), version
+
+    def __make_snapshot(self, index_dir):
+        """Reads a snapshot of the index at 'index_dir' and returns it
+        and the main dictionary, left open, it was made along with."""
+
+        # Use the binary token index if the index has one; it's only
+        # absent from indexes built before it was introduced, which
+        # are searched using the token byte offset file instead.
+        if os.path.exists(os.path.join(index_dir, ss.TOKEN_INDEX_FILE)):
+            tok_offset = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+        else:
+            tok_offset = ss.IndexStoreDictMutable(ss.BYTE_OFFSET_FILE)
+        manf = ss.IndexStoreDict(ss.MANIFEST_LIST)
+        fmri_offsets = ss.InvertedDict(ss.FMRI_OFFSETS_FILE, None)
+        main_dict = ss.IndexStoreMainDict(ss.MAIN_FILE)
+
+        dicts = [manf, tok_offset, fmri_offsets]
+        try:
+            # Try to open the index files assuming they were made
+            # after the conversion to using the fmri_offsets.v1
+            # file.
+            version = ss.consistent_open(dicts + [main_dict],
+                index_dir, self._file_timeout_secs)
+        except se.InconsistentIndexException:
+            # If opening the index fails, try falling back to the
+            # index prior to the conversion to using the
+            # fmri_offsets.v1 file.
+            fmri_offsets = None
+            dicts = [manf, tok_offset]
+            version = ss.consistent_open(dicts + [main_dict],
+                index_dir, self._file_timeout_secs)
+        try:
+            if version is None:
+                raise se.NoIndexException(index_dir)
+            for d in dicts:
+                d.read_dict_file()
+            main_dict_id = self.__main_dict_id(main_dict)
+        except:
+            main_dict.close_file_handle()
+            raise
+        finally:
+            for d in dicts:
+                d.close_file_handle()
+        return _IndexSnapshot(main_dict_id, version, manf, tok_offset,
+            fmri_offsets), main_dict
+
     def search(self, restriction, fmris):
         """This function performs the specific steps needed to do
         search on a server.
@@ -100,7 +281,20 @@ class TermQuery(qp.TermQuery):
         which iterates over all known fmris."""
 
         if restriction:
-            return self._restricted_search_internal(restriction)
-        base_res = self._search_internal(fmris)
-        it = self._get_results(base_res)
-        return it
+            return self._limit_results(
+                self._restricted_search_internal(restriction))
+        return self._limit_results(self.__gen_results(fmris))
+
+    def __gen_results(self, fmris):
+        """Yields the results from the main index followed by those
+        from each of its segments."""
+
+        try:
+            for q in itertools.chain([self], self._segments):
+                yield from q._get_results(
+                    q._search_internal(fmris))
+        finally:
+            # The segments not reached, if no more results were
+            # wanted, still have their main dictionaries open.
+            for q in self._segments:
+                q._close_dicts()
@@ -21,6 +21,7 @@
 #
 # Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 
+import collections
 import datetime
 import errno
 import logging
@@ -53,6 +54,7 @@ import pkg.portable as portable
 import pkg.misc as misc
 import pkg.nrlock
 import pkg.search_errors as se
+import pkg.search_storage as ss
 import pkg.query_parser as qp
 import pkg.server.query_parser as sqp
 import pkg.server.transaction as trans
@@ -78,6 +80,12 @@ REPO_VERIFY_UNKNOWN = 99
 REPO_FIX_ITEM = 0
 REPO_FIX_FAILED = 1
 
+# The maximum number of search results cached for each repository storage
+# object, and the maximum number of results a query may return for its
+# results to be cached.
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_MAX_RESULTS = 10000
+
 VERIFY_DEPENDENCY = "dependency"
 verify_default_checks = frozenset([
       VERIFY_DEPENDENCY,
@@ -376,7 +384,8 @@ class _RepoStore:
     def __init__(self, allow_invalid=False, file_layout=None,
         file_root=None, log_obj=None, mirror=False, pub=None,
         read_only=False, root=None,
-        sort_file_max_size=indexer.SORT_FILE_MAX_SIZE, writable_root=None):
+        sort_file_max_size=indexer.SORT_FILE_MAX_SIZE, writable_root=None,
+        index_workers=None):
         """Prepare the repository for use."""
 
         self.__catalog = None
@@ -390,6 +399,7 @@ class _RepoStore:
         self.__read_only = read_only
         self.__root = None
         self.__sort_file_max_size = sort_file_max_size
+        self.__index_workers = index_workers
         self.__tmp_root = None
         self.__writable_root = None
         self.cache_store = None
@@ -419,6 +429,14 @@ class _RepoStore:
         self.__search_available = False
         self.__refresh_again = False
 
+        # Results of recent searches, keyed by query, and the index
+        # generation they were produced from.
+        self.__search_cache = collections.OrderedDict()
+        self.__search_cache_gen = None
+        self.__search_cache_hits = 0
+        self.__search_cache_misses = 0
+        self.__search_cache_lock = pkg.nrlock.NRLock()
+
         self.__lock = pkg.nrlock.NRLock()
         if self.__tmp_root:
             self.__lockfile = lockfile.LockFile(os.path.join(
@@ -496,13 +514,18 @@ class _RepoStore:
         c.add_package(pfmri, manifest=manifest)
 
     def __check_search(self):
+        """Checks whether the search index is usable, updating the
+        search state if that has changed, and returns whether search
+        is available."""
+
         if not self.index_root:
-            return
+            return False
 
         ind = indexer.Indexer(self.index_root,
             self._get_manifest, self.manifest,
             log=self.__index_log,
-            sort_file_max_size=self.__sort_file_max_size)
+            sort_file_max_size=self.__sort_file_max_size,
+            workers=self.__index_workers)
         cie = False
         try:
             cie = ind.check_index_existence()
@@ -520,6 +543,7 @@ class _RepoStore:
                 self.__index_log("Search Unavailable")
                 self.reset_search()
             self.__search_available = False
+        return self.__search_available
 
     def __destroy_catalog(self):
         """Destroy the catalog."""
@@ -608,7 +632,8 @@ class _RepoStore:
                 ind = indexer.Indexer(self.index_root,
                     self._get_manifest, self.manifest,
                     log=self.__index_log,
-                    sort_file_max_size=self.__sort_file_max_size)
+                    sort_file_max_size=self.__sort_file_max_size,
+                    workers=self.__index_workers)
                 ind.lock(blocking=False)
             except se.IndexLockedException:
                 index_locked = True
@@ -652,6 +677,10 @@ class _RepoStore:
             "package-count": pkg_count,
             "package-version-count": pkg_ver_count,
             "last-catalog-update": lcat_update,
+            "search-cache": {
+                "hits": self.__search_cache_hits,
+                "misses": self.__search_cache_misses,
+            },
             "status": rstatus,
         }
 
@@ -710,7 +739,8 @@ class _RepoStore:
             self._get_manifest,
             self.manifest,
             log=self.__index_log,
-            sort_file_max_size=self.__sort_file_max_size)
+            sort_file_max_size=self.__sort_file_max_size,
+            workers=self.__index_workers)
 
         # To prevent issues with NFS consumers, attempt to lock the
         # index first, but don't hold the lock as holding a lock while
@@ -822,7 +852,7 @@ class _RepoStore:
         else:
             self.__check_search()
 
-    def __refresh_index(self):
+    def __refresh_index(self, merge=False):
         """Private version; caller responsible for repository
         locking."""
 
@@ -836,8 +866,8 @@ class _RepoStore:
         fmris_to_index = indexer.Indexer.check_for_updates(
             self.index_root, cat)
 
-        if fmris_to_index:
-            return self.__run_update_index()
+        if fmris_to_index or merge:
+            return self.__run_update_index(merge=merge)
 
         # Since there is nothing to index, setup the index
         # and declare search available.  This is only logged
@@ -846,7 +876,8 @@ class _RepoStore:
             self._get_manifest,
             self.manifest,
             log=self.__index_log,
-            sort_file_max_size=self.__sort_file_max_size)
+            sort_file_max_size=self.__sort_file_max_size,
+            workers=self.__index_workers)
         ind.setup()
         if not self.__search_available:
             self.__index_log("Search Available")
@@ -1008,6 +1039,10 @@ class _RepoStore:
         if lm:
             self.catalog.last_modified = lm
         self.catalog.save()
+        self.__log(_("Catalog saved: {0}").format(", ".join(
+            "{0} {1:.3f}s".format(name, secs)
+            for name, secs in self.catalog.save_timings)), "CATALOG",
+            severity=logging.DEBUG)
 
         orig_cat_root = None
         if os.path.exists(old_cat_root):
@@ -1084,9 +1119,13 @@ class _RepoStore:
         finally:
             self.__lock.release()
 
-    def __update_searchdb_unlocked(self, fmris):
+    def __update_searchdb_unlocked(self, fmris, segment=False):
         """Creates an indexer then hands it fmris; it assumes that all
         needed locking has already occurred.
+
+        'segment' is an optional boolean value indicating whether the
+        fmris should be indexed into a new segment of the index rather
+        than its main index.
         """
         assert self.index_root
 
@@ -1094,8 +1133,9 @@ class _RepoStore:
             index_inst = indexer.Indexer(self.index_root,
                 self._get_manifest, self.manifest,
                 log=self.__index_log,
-                sort_file_max_size=self.__sort_file_max_size)
-            index_inst.server_update_index(fmris)
+                sort_file_max_size=self.__sort_file_max_size,
+                workers=self.__index_workers)
+            index_inst.server_update_index(fmris, segment=segment)
             if not self.__search_available:
                 self.__index_log("Search Available")
             self.__search_available = True
@@ -1257,8 +1297,11 @@ class _RepoStore:
             # Object not available.
             raise RepositoryUnsupportedOperationError()
 
+        # Catalog parts are saved concurrently as they are independent
+        # of each other.
         self.__catalog = catalog.Catalog(meta_root=self.catalog_root,
-            log_updates=True, read_only=self.read_only)
+            log_updates=True, read_only=self.read_only,
+            save_workers=os.cpu_count() or 1)
         return self.__catalog
 
     def catalog_1(self, name):
@@ -1274,6 +1317,31 @@ class _RepoStore:
             raise RepositoryFileNotFoundError(name)
         return os.path.normpath(os.path.join(self.catalog_root, name))
 
+    def catalog_updates(self, name):
+        """Returns a list of the absolute pathnames of the catalog update
+        log named by 'name' and of every newer update log for the same
+        locale, ordered from oldest to newest."""
+
+        if self.mirror:
+            raise RepositoryMirrorError()
+        if not self.catalog_root or self.catalog_version < 1:
+            raise RepositoryUnsupportedOperationError()
+
+        assert name
+        # The list of available update logs is read from the catalog's
+        # attributes file on-disk so that it matches what is offered
+        # to clients retrieving catalog.attrs.
+        attrs = catalog.CatalogAttrs(meta_root=self.catalog_root)
+        if "/" in name or name not in attrs.updates:
+            raise RepositoryFileNotFoundError(name)
+
+        locale = name.split(".", 2)[2]
+        return [
+            os.path.normpath(os.path.join(self.catalog_root, uname))
+            for uname in sorted(attrs.updates)
+            if uname >= name and uname.split(".", 2)[2] == locale
+        ]
+
     def reset_search(self):
         """Discards currently loaded search data so that it will be
         reloaded the next a search is performed.
@@ -1282,6 +1350,56 @@ class _RepoStore:
             # Nothing to do.
             return
         sqp.TermQuery.clear_cache(self.index_root)
+        self.__clear_search_cache()
+
+    def __clear_search_cache(self, gen=None):
+        """Discards any cached search results; 'gen' is the index
+        generation that results cached from now on belong to."""
+
+        self.__search_cache_lock.acquire()
+        try:
+            self.__search_cache.clear()
+            self.__search_cache_gen = gen
+        finally:
+            self.__search_cache_lock.release()
+
+    def __get_search_generation(self):
+        """Returns a value that changes whenever search results could
+        change: that is, whenever the search index or the package
+        catalog the results are restricted to are updated."""
+
+        try:
+            lm = self.catalog.last_modified
+        except Exception:
+            lm = None
+        return ss.get_index_generation(self.index_root), lm
+
+    def __cache_search_results(self, key, gen, results):
+        """Yields the search results in 'results' and, if they're all
+        consumed and there aren't too many of them, caches them for
+        the query 'key' made of index generation 'gen'."""
+
+        res = []
+        for r in results:
+            if res is not None:
+                if len(res) < SEARCH_CACHE_MAX_RESULTS:
+                    res.append(r)
+                else:
+                    res = None
+            yield r
+        if res is None:
+            return
+
+        self.__search_cache_lock.acquire()
+        try:
+            if self.__search_cache_gen != gen:
+                # The index has changed while searching.
+                return
+            self.__search_cache[key] = res
+            while len(self.__search_cache) > SEARCH_CACHE_SIZE:
+                self.__search_cache.popitem(last=False)
+        finally:
+            self.__search_cache_lock.release()
 
     def close(self, trans_id, add_to_catalog=True):
         """Closes the transaction specified by 'trans_id'.
@@ -1451,9 +1569,15 @@ class _RepoStore:
         except trans.TransactionError as e:
             raise RepositoryError(e)
 
-    def refresh_index(self):
+    def refresh_index(self, merge=False):
         """This function refreshes the search indexes if there any new
         packages.
+
+        New packages are indexed into a new segment of the search
+        indexes so that the main index isn't rewritten for every
+        update.  'merge' is an optional boolean value indicating
+        whether the segments should be merged into the main index
+        instead.
         """
 
         if self.mirror:
@@ -1468,7 +1592,7 @@ class _RepoStore:
         try:
             try:
                 try:
-                    self.__refresh_index()
+                    self.__refresh_index(merge=merge)
                 except se.InconsistentIndexException as e:
                     s = _("Index corrupted or out of date. "
                         "Removing old index directory ({0}) "
@@ -1751,10 +1875,14 @@ class _RepoStore:
         finally:
             self.__unlock_rstore()
 
-    def __run_update_index(self):
+    def __run_update_index(self, merge=False):
         """ Determines which fmris need to be indexed and passes them
         to the indexer.
 
+        'merge' is an optional boolean value indicating whether the
+        fmris, and any segments of the index, should be merged into
+        the main index instead of being indexed into a new segment.
+
         Note: Only one instance of this method should be running.
         External locking is expected to ensure this behavior. Calling
         refresh index is the preferred method to use to reindex.
@@ -1771,13 +1899,18 @@ class _RepoStore:
 
         if fmris_to_index:
             self.__index_log("Updating search indexes")
-            self.__update_searchdb_unlocked(fmris_to_index)
+            self.__update_searchdb_unlocked(fmris_to_index,
+                segment=not merge)
         else:
             ind = indexer.Indexer(self.index_root,
                 self._get_manifest, self.manifest,
                 log=self.__index_log,
-                sort_file_max_size=self.__sort_file_max_size)
+                sort_file_max_size=self.__sort_file_max_size,
+                workers=self.__index_workers)
             ind.setup()
+            if merge:
+                self.__index_log("Merging search index segments")
+                ind.merge_segments()
             if not self.__search_available:
                 self.__index_log("Search Available")
             self.__search_available = True
@@ -1785,30 +1918,65 @@ class _RepoStore:
     def search(self, queries):
         """Searches the index for each query in the list of queries.
         Each entry should be the output of str(Query), or a Query
-        object."""
+        object.
+
+        The results of recent queries are cached until the index or
+        catalog changes, so a query that's repeated is answered without
+        searching the index again."""
 
         if self.mirror:
             raise RepositoryMirrorError()
         if not self.index_root or not self.catalog_root:
             raise RepositoryUnsupportedOperationError()
 
-        self.__check_search()
+        # Whether the index is usable is only checked while it's
+        # unavailable, or if it fails to open below, so that searches
+        # needn't open every index file each time.
         if not self.search_available:
             raise RepositorySearchUnavailableError()
 
+        gen = self.__get_search_generation()
+
         def _search(q):
+            # str(Query) includes everything that determines the
+            # results of the query.
+            key = str(q)
+            self.__search_cache_lock.acquire()
+            try:
+                if self.__search_cache_gen != gen:
+                    self.__search_cache.clear()
+                    self.__search_cache_gen = gen
+                res = self.__search_cache.get(key)
+                if res is not None:
+                    self.__search_cache.move_to_end(key)
+                    self.__search_cache_hits += 1
+                    return iter(res)
+                self.__search_cache_misses += 1
+            finally:
+                self.__search_cache_lock.release()
+            return self.__cache_search_results(key, gen, _run(q))
+
+        def _run(q):
             assert self.index_root
             l = sqp.QueryLexer()
             l.build()
             qqp = sqp.QueryParser(l)
             query = qqp.parse(q.text)
-            query.set_info(num_to_return=q.num_to_return,
-                start_point=q.start_point,
-                index_dir=self.index_root,
-                get_manifest_path=self.manifest,
-                case_sensitive=q.case_sensitive)
+            # The terms need to know what the query returns before
+            # they're set up, as only as many actions as are returned
+            # need to be found.
             if q.return_type == sqp.Query.RETURN_PACKAGES:
                 query.propagate_pkg_return()
+            try:
+                query.set_info(num_to_return=q.num_to_return,
+                    start_point=q.start_point,
+                    index_dir=self.index_root,
+                    get_manifest_path=self.manifest,
+                    case_sensitive=q.case_sensitive)
+            except (se.NoIndexException,
+                se.InconsistentIndexException):
+                self.__check_search()
+                raise RepositorySearchUnavailableError()
             return query.search(self.catalog.fmris)
 
         query_lst = []
@@ -2560,7 +2728,8 @@ class Repository:
     def __init__(self, allow_invalid=False, cfgpathname=None, create=False,
         file_root=None, log_obj=None, mirror=False,
         properties=misc.EmptyDict, read_only=False, root=None,
-        sort_file_max_size=indexer.SORT_FILE_MAX_SIZE, writable_root=None):
+        sort_file_max_size=indexer.SORT_FILE_MAX_SIZE, writable_root=None,
+        index_workers=None):
         """Prepare the repository for use."""
 
         # This lock is used to protect the repository from multiple
@@ -2594,6 +2763,7 @@ class Repository:
         self.__read_only = read_only
         self.__rstores = None
         self.__sort_file_max_size = sort_file_max_size
+        self.__index_workers = index_workers
         self.log_obj = log_obj
         self.version = -1
 
@@ -2924,7 +3094,7 @@ class Repository:
             log_obj=self.log_obj, mirror=self.mirror, pub=pub,
             read_only=self.read_only, root=root,
             sort_file_max_size=self.__sort_file_max_size,
-            writable_root=writ_root)
+            writable_root=writ_root, index_workers=self.__index_workers)
         self.__rstores[pub] = rstore
         return rstore
 
@@ -3100,6 +3270,21 @@ class Repository:
         rstore = self.get_pub_rstore(pub)
         return rstore.catalog_1(name)
 
+    def catalog_updates(self, name, pub=None):
+        """Returns a list of the absolute pathnames of the catalog update
+        log named by 'name' and of every newer update log for the same
+        locale, ordered from oldest to newest.
+
+        'pub' is the prefix of the publisher to return catalog data for.
+        If not specified, the default publisher will be used.  If no
+        default publisher has been configured, an AssertionError will be
+        raised.
+        """
+
+        self.inc_catalog()
+        rstore = self.get_pub_rstore(pub)
+        return rstore.catalog_updates(name)
+
     def close(self, trans_id, add_to_catalog=True):
         """Closes the transaction specified by 'trans_id'.
 
@@ -3454,9 +3639,13 @@ class Repository:
                 pubs.add(rstore.publisher)
         return pubs
 
-    def refresh_index(self, pub=None):
+    def refresh_index(self, pub=None, merge=False):
         """ This function refreshes the search indexes if there any new
         packages.
+
+        'merge' is an optional boolean value indicating whether the
+        segments of the search indexes should be merged into their
+        main indexes.
         """
 
         for rstore in self.rstores:
@@ -3464,7 +3653,7 @@ class Repository:
                 continue
             if pub and rstore.publisher and rstore.publisher != pub:
                 continue
-            rstore.refresh_index()
+            rstore.refresh_index(merge=merge)
 
     def remove_packages(self, packages, progtrack=None, pub=None):
         """Removes the specified packages from the repository.
@@ -3609,9 +3798,9 @@ class Repository:
 
         if op == "search" and self.root:
             return True
-        if op == "catalog" and ver == 1:
-            # For catalog v1 to be "supported", all storage objects
-            # must use it.
+        if (op == "catalog" and ver == 1) or op == "updatelog":
+            # For catalog v1 (and the update logs that are part of
+            # it) to be "supported", all storage objects must use it.
             for rstore in self.rstores:
                 if rstore.catalog_version == 0:
                     return False
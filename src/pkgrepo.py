@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2010, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2010, 2026, Oracle and/or its affiliates.
 #
 
 try:
@@ -1341,7 +1341,9 @@ def subcmd_refresh(conf, args):
         elif add_content:
             xport.publish_refresh_packages(xpub)
         elif refresh_index:
-            xport.publish_refresh_indexes(xpub)
+            # Only the search indexes are being refreshed, so take
+            # the opportunity to merge their segments as well.
+            xport.publish_refresh_indexes(xpub, merge=True)
 
     xport, xpub, tmp_dir = setup_transport(conf.get("repo_uri"),
         subcommand=subcommand, ssl_key=key, ssl_cert=cert)
@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2008, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 #
 
 from . import testutils
@@ -410,29 +410,32 @@ Incorrect attribute list.
             generic.Action.sig_version) is None)
 
     def assertMalformed(self, text):
-        malformed = False
+        # Lazily created actions are checked for syntax errors too.
+        for lazy in (False, True):
+            malformed = False
 
-        try:
-            action.fromstr(text)
-        except action.MalformedActionError as e:
-            assert e.actionstr == text
-            self.debug(text)
-            self.debug(str(e))
-            malformed = True
+            try:
+                action.fromstr(text, lazy=lazy)
+            except action.MalformedActionError as e:
+                assert e.actionstr == text
+                self.debug(text)
+                self.debug(str(e))
+                malformed = True
 
-        # If the action isn't malformed, something is wrong.
-        self.assertTrue(malformed, "Action not malformed: " + text)
+            # If the action isn't malformed, something is wrong.
+            self.assertTrue(malformed, "Action not malformed: " + text)
 
     def assertInvalid(self, text):
-        invalid = False
+        for lazy in (False, True):
+            invalid = False
 
-        try:
-            action.fromstr(text)
-        except action.InvalidActionError:
-            invalid = True
+            try:
+                action.fromstr(text, lazy=lazy)
+            except action.InvalidActionError:
+                invalid = True
 
-        # If the action isn't invalid, something is wrong.
-        self.assertTrue(invalid, "Action not invalid: " + text)
+            # If the action isn't invalid, something is wrong.
+            self.assertTrue(invalid, "Action not invalid: " + text)
 
     def test_action_errors(self):
         # Unknown action type
@@ -512,6 +515,104 @@ Incorrect attribute list.
         self.assertInvalid("file xyz789 hash=abc123 path=usr/bin/foo mode=0755 owner=root group=bin")
         action.fromstr("file abc123 hash=abc123 path=usr/bin/foo mode=0755 owner=root group=bin")
 
+    def test_action_lazy(self):
+        """Verify that lazily created actions are only parsed completely
+        when needed and are then identical to regular actions."""
+
+        astrs = [
+            "file 12345 name=foo attr=bar attr=baz path=tmp/foo",
+            "file 12345 name='f\\'o\\'o' desc=\"a b\" \"c\" path=tmp/foo",
+            "dir group=bin mode=0755 owner=root path=\"tmp/foo bar\"",
+            "link path=tmp/foo target=../bar mediator=foo",
+            "depend fmri=pkg:/foo@1.0 type=require",
+            "license 12345 license=copyright path=copyright",
+            "legacy pkg=SUNWfoo desc=\"foo bar\" name=\"foo\"",
+            "user username=foo uid=1234",
+            "group groupname=foo gid=1234",
+        ]
+        for astr in astrs:
+            reg = action.fromstr(astr)
+            act = action.fromstr(astr, lazy=True)
+            self.assertTrue(isinstance(act, generic.LazyAction))
+            self.assertTrue(isinstance(act, type(reg)))
+            self.assertEqual(act.name, reg.name)
+            self.assertEqual(act.key_attr_value(),
+                reg.key_attr_value())
+            self.assertEqual(getattr(act, "hash", None),
+                getattr(reg, "hash", None))
+            self.assertTrue(isinstance(act, generic.LazyAction))
+
+            # Accessing any other attribute materializes the action.
+            self.assertEqual(act.attrs, reg.attrs)
+            self.assertEqual(type(act), type(reg))
+            self.assertEqual(act.data, reg.data)
+            self.assertEqual(str(act), str(reg))
+            self.assertEqual(act, reg)
+            self.assertTrue(not act.different(reg))
+
+        # Actions with data, actions that are transformed when they are
+        # created, and actions whose key attribute is invalid or has
+        # multiple values are never created lazily.
+        for astr in (
+            "set name=foo value=bar",
+            "set foo=bar",
+            "signature 12345 algorithm=foo",
+            "driver name=foo alias=bar",
+            "file 12345 path=/tmp/foo",
+            "depend fmri=foo fmri=bar type=require-any",
+        ):
+            act = action.fromstr(astr, lazy=True)
+            self.assertTrue(not isinstance(act, generic.LazyAction))
+            self.assertEqual(str(act), str(action.fromstr(astr)))
+        opener = lambda: None
+        act = action.fromstr("file 12345 path=tmp/foo", data=opener,
+            lazy=True)
+        self.assertTrue(not isinstance(act, generic.LazyAction))
+
+        # Attributes can be set before the action is materialized.
+        act = action.fromstr("dir path=tmp/foo mode=0755", lazy=True)
+        act.attrs["mode"] = "0555"
+        self.assertEqual(str(act), "dir mode=0555 path=tmp/foo")
+        act = action.fromstr("file 12345 path=tmp/foo", lazy=True)
+        act.data = opener
+        self.assertEqual(act.hash, "12345")
+        self.assertEqual(act.data, opener)
+
+        # Attributes that no action of the type has are never set.
+        act = action.fromstr("dir path=tmp/foo", lazy=True)
+        self.assertRaises(AttributeError, getattr, act, "hash")
+        self.assertTrue(isinstance(act, generic.LazyAction))
+
+    def test_action_pooled(self):
+        """Verify that the values of common attributes are shared by the
+        actions created by fromstr and that others aren't."""
+
+        astr = "file 12345 group=bin mode=0755 owner=root " \
+            "path=usr/bin/foo pkg.size=1234 variant.arch=i386 " \
+            "facet.doc=\"all\" facet.doc.man=true facet.doc.man=false " \
+            "mediator-version='1.0'"
+        a1 = action.fromstr(astr)
+        a2 = action.fromstr(astr)
+        self.assertEqual(a1.attrs, a2.attrs)
+        self.assertEqual(str(a1), str(a2))
+        for k in ("group", "mode", "owner", "variant.arch", "facet.doc",
+            "mediator-version"):
+            self.assertTrue(a1.attrs[k] is a2.attrs[k], k)
+            self.assertTrue(k in action.pooled_attrs or
+                k.startswith(action.pooled_attr_prefixes))
+        for v1, v2 in zip(a1.attrs["facet.doc.man"],
+            a2.attrs["facet.doc.man"]):
+            self.assertTrue(v1 is v2)
+
+        for k in ("path", "pkg.size"):
+            self.assertEqual(a1.attrs[k], a2.attrs[k])
+            self.assertTrue(a1.attrs[k] is not a2.attrs[k], k)
+
+        # Attribute names are always shared.
+        k1 = [k for k in a1.attrs if k == "pkg.size"][0]
+        k2 = [k for k in a2.attrs if k == "pkg.size"][0]
+        self.assertTrue(k1 is k2)
+
     def test_validate(self):
         """Verify that action validate() works as expected; currently
         only used during publication or action execution failure."""
@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2009, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 #
 
 from . import testutils
@@ -30,14 +30,17 @@ if __name__ == "__main__":
 import pkg5unittest
 
 import calendar
+import collections
 import os
 import pprint
 import re
 import shutil
+import struct
 import unittest
 from functools import cmp_to_key
 
 import pkg.client.api as api
+import pkg.catalog as catalog
 import pkg.client.api_errors as api_errors
 import pkg.fmri as fmri
 import pkg.misc as misc
@@ -537,6 +540,34 @@ add set name=pkg.description value="{desc}"
         self.assertEqualDiff(expected, returned)
         self.assertEqual(len(returned), 2)
 
+        # Verify that the image's catalog of the newest versions of
+        # each package is current and gives the same results as the
+        # known catalog when it is unavailable, whether or not packages
+        # for other variants are listed.  It only has the versions of
+        # each package down to the newest for the image's variants.
+        img = api_obj.img
+        ncat = img.get_newest_catalog()
+        self.assertTrue(ncat is not None)
+        nvers = collections.Counter(
+            (pub, stem) for pub, stem, ver in ncat.tuples())
+        self.assertEqual(nvers[("test1", "apple")], 1)
+        self.assertEqual(nvers[("test1", "zoo")], 2)
+        returned = [
+            self.__get_returned(api_obj.LIST_NEWEST,
+                api_obj=api_obj, variants=variants)
+            for variants in (True, False)
+        ]
+
+        shutil.rmtree(os.path.join(img.imgdir, "state", "newest"))
+        api_obj = self.get_img_api_obj()
+        self.assertEqual(api_obj.img.get_newest_catalog(), None)
+        expected = [
+            self.__get_returned(api_obj.LIST_NEWEST,
+                api_obj=api_obj, variants=variants)
+            for variants in (True, False)
+        ]
+        self.assertEqualDiff(expected, returned)
+
     def test_list_03_cats(self):
         """Verify the sort order and content of a list excluding
         packages not for the current image variant, and packages
@@ -1517,6 +1548,41 @@ add set name=pkg.description value="{desc}"
         else:
             raise RuntimeError("InventoryException not raised!")
 
+    def test_list_09_binary_catalog(self):
+        """Verify that the binary copies of the image's catalog parts
+        are still used once packages have been installed."""
+
+        api_obj = self.get_img_api_obj()
+        for pkgs in (["apple"], ["bat/bar"]):
+            for pd in api_obj.gen_plan_install(pkgs):
+                continue
+            api_obj.prepare()
+            api_obj.execute_plan()
+            api_obj.reset()
+
+        img = api_obj.img
+        hdr = struct.Struct("<8sIQqQ")
+        for name in (img.IMG_CATALOG_KNOWN,
+            img.IMG_CATALOG_INSTALLED):
+            croot = os.path.join(img.imgdir, "state", name)
+            cat = catalog.Catalog(meta_root=croot, read_only=True)
+            for pname in cat.parts:
+                ppath = os.path.join(croot, pname)
+                st = os.stat(ppath)
+                for ext in (".bin", ".idx"):
+                    with open(ppath + ext, "rb") as f:
+                        key = hdr.unpack(f.read(hdr.size))[2:]
+                    self.assertEqual(key, (st.st_size,
+                        st.st_mtime_ns, st.st_ino), ppath + ext)
+
+            # Every part can be loaded from its binary copy.
+            cat = catalog.Catalog(meta_root=croot, read_only=True,
+                binary=True)
+            for pname in cat.parts:
+                part = cat.get_part(pname, must_exist=True)
+                part.load()
+                self.assertTrue(part._CatalogPart__lazy, pname)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -20,7 +20,7 @@
 # CDDL HEADER END
 #
 
-# Copyright (c) 2009, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 
 from . import testutils
 if __name__ == "__main__":
@@ -31,6 +31,7 @@ import copy
 import os
 import shutil
 import tempfile
+import threading
 import time
 import unittest
 from urllib.error import HTTPError
@@ -41,8 +42,11 @@ import pkg.client.api_errors as api_errors
 import pkg.client.query_parser as query_parser
 import pkg.fmri as fmri
 import pkg.indexer as indexer
+import pkg.manifest as manifest
 import pkg.portable as portable
+import pkg.query_parser as qp
 import pkg.search_storage as ss
+import pkg.server.query_parser as sqp
 from pkg.misc import force_str
 
 
@@ -1576,10 +1580,12 @@ class TestApiSearchBasicsP(TestApiSearchBasics):
         dest_fh, dest_path = tempfile.mkstemp()
         shutil.copy(ffh_path, dest_path)
         self._overwrite_hash(ffh_path)
-        self.assertRaises(api_errors.IncorrectIndexFileHash,
-            self._search_op, api_obj, False, "example_pkg", set())
+        # The packages the index covers are compared with those
+        # installed instead, and match.
+        self._search_op(api_obj, False, "example_pkg",
+            self.res_local_pkg)
         # Run the shell version of the test to check for a stack trace.
-        self.pkg("search -l 'exam:::example_pkg'", exit=1)
+        self.pkg("search -l 'exam:::example_pkg'")
         portable.rename(dest_path, ffh_path)
         self._search_op(api_obj, False, "example_pkg",
             self.res_local_pkg)
@@ -1735,10 +1741,10 @@ class TestApiSearchBasicsP(TestApiSearchBasics):
         api_obj.rebuild_search_index()
         self._run_local_tests(api_obj)
         self._api_uninstall(api_obj, ["example_pkg"], update_index=False)
-        # Running empty test because search will notice the index
-        # does not match the installed packages and complain.
-        self.assertRaises(api_errors.IncorrectIndexFileHash,
-            self._search_op, api_obj, False, "example_pkg", set())
+        # Search notices the index doesn't match the installed
+        # packages and searches the packages which differ using their
+        # manifests instead.
+        self._run_local_empty_tests(api_obj)
         api_obj.rebuild_search_index()
         self._run_local_empty_tests(api_obj)
         self._api_install(api_obj, ["example_pkg"])
@@ -1746,21 +1752,108 @@ class TestApiSearchBasicsP(TestApiSearchBasics):
         self.pkgsend_bulk(durl, self.example_pkg11)
         api_obj.refresh(immediate=True)
         self._api_update(api_obj, update_index=False)
-        # Running empty test because search will notice the index
-        # does not match the installed packages and complain.
-        self.assertRaises(api_errors.IncorrectIndexFileHash,
-            self._search_op, api_obj, False, "example_pkg", set())
-        api_obj.rebuild_search_index()
+        self._run_local_tests_example11_installed(api_obj)
+        api_obj.rebuild_search_index(incremental=True)
         self._run_local_tests_example11_installed(api_obj)
         self._api_uninstall(api_obj, ["example_pkg"],
             update_index=False)
-        # Running empty test because search will notice the index
-        # does not match the installed packages and complain.
-        self.assertRaises(api_errors.IncorrectIndexFileHash,
-            self._search_op, api_obj, False, "example_pkg", set())
+        self._run_local_empty_tests(api_obj)
         api_obj.rebuild_search_index()
         self._run_local_empty_tests(api_obj)
 
+    def test_incremental_rebuild(self):
+        """Check that an incremental rebuild of the index only
+        reindexes the packages which don't match it, and folds the
+        update logs into the main dictionary."""
+
+        durl = self.dc.get_depot_url()
+        api_obj = self.image_create(durl)
+        index_dir, index_dir_tmp = self._get_index_dirs()
+        res_local_another = set([
+            ("pkg:/another_pkg@1.0-0", "test/another_pkg",
+            "set name=pkg.fmri value=pkg://test/another_pkg@1.0,5.11-0:")
+        ])
+
+        self._api_install(api_obj, ["example_pkg@1.0"])
+        self._api_install(api_obj, ["another_pkg"], update_index=False)
+
+        def read_set(name):
+            d = ss.IndexStoreSet(name)
+            d.open(index_dir)
+            try:
+                d.read_dict_file()
+            finally:
+                d.close_file_handle()
+            return d.get_set()
+
+        def read_checksums():
+            d = ss.IndexStoreChecksums(ss.PKG_CHECKSUM_FILE)
+            d.open(index_dir)
+            try:
+                d.read_dict_file()
+            finally:
+                d.close_file_handle()
+            return d.get_dict()
+
+        # example_pkg is only in the update log.  Manifests are only
+        # checksummed when the index is repaired.
+        self.assertEqual(len(read_set(ss.FAST_ADD)), 1)
+        self.assertEqual(read_checksums(), {})
+        self._search_op(api_obj, False, "example_pkg",
+            self.res_local_pkg)
+
+        api_obj.rebuild_search_index(incremental=True)
+        self.assertEqual(read_set(ss.FAST_ADD), set())
+        self.assertEqual(read_set(ss.FAST_REMOVE), set())
+        self.assertEqual(len(read_checksums()), 2)
+        self._search_op(api_obj, False, "example_pkg",
+            self.res_local_pkg)
+        self._search_op(api_obj, False, "another_pkg",
+            res_local_another)
+
+        # Change the manifest of one of the packages; only an
+        # incremental rebuild notices this as the installed packages
+        # are unchanged.
+        pfmri = [
+            f for f in api_obj.img.gen_installed_pkgs()
+            if f.pkg_name == "example_pkg"
+        ][0]
+        mpath = api_obj.img.get_manifest_path(pfmri)
+        with open(mpath) as fh:
+            mcontent = fh.read()
+        with open(mpath, "a") as fh:
+            fh.write("dir group=bin mode=0755 owner=root "
+                "path=usr/share/changed_manifest_dir\n")
+        self._search_op(api_obj, False, "changed_manifest_dir", set())
+        api_obj.rebuild_search_index(incremental=True)
+        self._search_op(api_obj, False, "changed_manifest_dir",
+            set([
+                ("pkg:/example_pkg@1.0-0", "basename",
+                "dir group=bin mode=0755 owner=root "
+                "path=usr/share/changed_manifest_dir")
+            ]))
+        self._search_op(api_obj, False, "example_pkg",
+            self.res_local_pkg)
+        with open(mpath, "w") as fh:
+            fh.write(mcontent)
+
+        # A rebuild from scratch doesn't checksum the manifests.
+        api_obj.rebuild_search_index()
+        self.assertEqual(read_checksums(), {})
+        api_obj.rebuild_search_index(incremental=True)
+        self.assertEqual(len(read_checksums()), 2)
+
+        self._api_uninstall(api_obj, ["example_pkg"], update_index=False)
+        api_obj.rebuild_search_index(incremental=True)
+        self.assertEqual(list(read_checksums()), [
+            pfmri.get_fmri(anarchy=True, include_scheme=False)
+            for pfmri in api_obj.img.gen_installed_pkgs()
+        ])
+        self._search_op(api_obj, False, "example_pkg", set())
+        self._search_op(api_obj, False, "changed_manifest_dir", set())
+        self._search_op(api_obj, False, "another_pkg",
+            res_local_another)
+
     def test_bug_2989_1(self):
         durl = self.dc.get_depot_url()
 
@@ -2641,6 +2734,360 @@ class TestApiSearchBasics_nonP(TestApiSearchBasics):
         self._search_op(api_obj, False, "depend::space_pkg",
             expected_result)
 
+    def test_index_segments(self):
+        """Verify that packages added to a repository's search indexes
+        are indexed into segments which are searched along with the
+        main index, and that the segments are merged into the main
+        index when only the search indexes are refreshed."""
+
+        def search(token):
+            q = query_parser.Query(token, False,
+                query_parser.Query.RETURN_ACTIONS, None, None)
+            return set(
+                pfmri.get_name()
+                for v, return_type, (pfmri, fv, l)
+                in self.dc.get_repo().search([q])[0]
+            )
+
+        durl = self.dc.get_depot_url()
+        ind_dir = self._get_repo_index_dir()
+        seg_root = os.path.join(ind_dir, ss.SEGMENTS_DIR)
+
+        # Publish the first package and index it into the main index.
+        self.pkgsend_bulk(durl, self.example_pkg10)
+        self.assertTrue(not os.path.exists(seg_root))
+
+        # Each later refresh of the index should write a segment.
+        for pkg in (self.another_pkg10, self.space_pkg10):
+            TestApiSearchBasics.pkgsend_bulk(self, durl, pkg)
+            self.dc.get_repo().refresh_index()
+        self.assertEqual(len(os.listdir(seg_root)), 2)
+        with open(os.path.join(ind_dir, ss.MAIN_FILE)) as fh:
+            self.assertTrue("bazbin" not in fh.read())
+
+        # Searches should find packages in the main index and in
+        # each segment, and a refresh should find nothing new to
+        # index.
+        self.assertEqual(search("example_path"), set(["example_pkg"]))
+        self.assertEqual(search("bazbin"), set(["another_pkg"]))
+        self.assertEqual(search("unique_dir"), set(["space_pkg"]))
+        self.assertEqual(search("dir::"),
+            set(["example_pkg", "another_pkg", "space_pkg"]))
+        self.assertEqual(indexer.Indexer.check_for_updates(ind_dir,
+            self._get_repo_catalog()), set())
+
+        # Refreshing only the search indexes should merge the segments
+        # into the main index without changing any search results.
+        self.pkgrepo("-s {0} refresh --no-catalog".format(
+            self.dc.get_repodir()))
+        self.assertTrue(not os.path.exists(seg_root))
+        with open(os.path.join(ind_dir, ss.MAIN_FILE)) as fh:
+            self.assertTrue("bazbin" in fh.read())
+        self.assertEqual(search("bazbin"), set(["another_pkg"]))
+        self.assertEqual(search("dir::"),
+            set(["example_pkg", "another_pkg", "space_pkg"]))
+
+        # Once MAX_INDEX_SEGMENTS segments exist, the next refresh
+        # should merge them into the main index instead.
+        for i in range(indexer.MAX_INDEX_SEGMENTS + 1):
+            TestApiSearchBasics.pkgsend_bulk(self, durl,
+                "open seg{0}@1.0,5.11-0\nclose\n".format(i))
+            self.dc.get_repo().refresh_index()
+        self.assertTrue(not os.path.exists(seg_root))
+        self.assertEqual(search("seg*"), set(
+            "seg{0}".format(i)
+            for i in range(indexer.MAX_INDEX_SEGMENTS + 1)
+        ))
+
+    def test_search_result_cache(self):
+        """Verify that repeated searches of a repository are answered
+        from its cache of search results, and that the cache isn't
+        used once the search indexes have been updated."""
+
+        durl = self.dc.get_depot_url()
+        self.pkgsend_bulk(durl, self.example_pkg10)
+        repo = self.dc.get_repo()
+
+        def search(token):
+            q = query_parser.Query(token, False,
+                query_parser.Query.RETURN_ACTIONS, None, None)
+            return set(
+                pfmri.get_name()
+                for v, return_type, (pfmri, fv, l)
+                in repo.search([q])[0]
+            )
+
+        def cache_stats():
+            pstatus = repo.get_status()["repository"]["publishers"]
+            cstatus = pstatus["test"]["search-cache"]
+            return cstatus["hits"], cstatus["misses"]
+
+        self.assertEqual(cache_stats(), (0, 0))
+        self.assertEqual(search("dir::"), set(["example_pkg"]))
+        self.assertEqual(cache_stats(), (0, 1))
+        self.assertEqual(search("dir::"), set(["example_pkg"]))
+        self.assertEqual(cache_stats(), (1, 1))
+
+        # A query that differs only in its case sensitivity is a
+        # different query.
+        q = query_parser.Query("dir::", True,
+            query_parser.Query.RETURN_ACTIONS, None, None)
+        self.assertTrue(list(repo.search([q])[0]))
+        self.assertEqual(cache_stats(), (1, 2))
+
+        # Once the index has been updated, whether by this repository
+        # object or another, the cached results must not be used.
+        TestApiSearchBasics.pkgsend_bulk(self, durl, self.another_pkg10)
+        repo.refresh_index()
+        self.assertEqual(search("dir::"),
+            set(["example_pkg", "another_pkg"]))
+        self.assertEqual(cache_stats(), (1, 3))
+        self.pkgsend_bulk(durl, self.space_pkg10)
+        self.assertEqual(search("dir::"),
+            set(["example_pkg", "another_pkg", "space_pkg"]))
+        self.assertEqual(cache_stats(), (1, 4))
+        self.assertEqual(search("dir::"),
+            set(["example_pkg", "another_pkg", "space_pkg"]))
+        self.assertEqual(cache_stats(), (2, 4))
+
+    def test_search_limits(self):
+        """Verify that only the requested range of results is returned
+        when a search specifies the number of results to return and
+        where to start."""
+
+        durl = self.dc.get_depot_url()
+        self.pkgsend_bulk(durl, (self.example_pkg10, self.another_pkg10,
+            self.space_pkg10))
+        repo = self.dc.get_repo()
+
+        def search(token, return_type, num_to_return=None,
+            start_point=None):
+            q = query_parser.Query(token, False, return_type,
+                num_to_return, start_point)
+            return list(repo.search([q])[0])
+
+        for rt in (query_parser.Query.RETURN_ACTIONS,
+            query_parser.Query.RETURN_PACKAGES):
+            res = search("*", rt)
+            self.assertTrue(len(res) >= 3)
+            self.assertEqual(search("*", rt, num_to_return=2), res[:2])
+            self.assertEqual(search("*", rt, num_to_return=2,
+                start_point=1), res[1:3])
+            self.assertEqual(search("*", rt, start_point=2), res[2:])
+            self.assertEqual(search("*", rt, num_to_return=0), [])
+            self.assertEqual(search("*", rt, num_to_return=1,
+                start_point=len(res)), [])
+
+    def test_search_limits_work(self):
+        """Verify that a search which only needs a few results stops
+        searching once it has found them."""
+
+        durl = self.dc.get_depot_url()
+        self.pkgsend_bulk(durl, (self.example_pkg10, self.another_pkg10,
+            self.space_pkg10))
+        repo = self.dc.get_repo()
+
+        # Count the results the terms of the query produce.
+        produced = []
+        search_internal = sqp.TermQuery._search_internal
+
+        def counting_search_internal(self, *args, **kwargs):
+            for res in search_internal(self, *args, **kwargs):
+                produced.append(res)
+                yield res
+
+        sqp.TermQuery._search_internal = counting_search_internal
+        try:
+            for num_to_return in (None, 1):
+                del produced[:]
+                q = query_parser.Query("*", False,
+                    query_parser.Query.RETURN_ACTIONS,
+                    num_to_return, None)
+                res = list(repo.search([q])[0])
+                if num_to_return is None:
+                    total = len(produced)
+                    self.assertTrue(len(res) > 1)
+                else:
+                    self.assertEqual(len(res), 1)
+        finally:
+            sqp.TermQuery._search_internal = search_internal
+        self.assertTrue(total > 1)
+        self.assertEqual(len(produced), 1)
+
+        # Packages installed since the index was rebuilt are searched
+        # by reading their manifests, which aren't needed when the
+        # index has enough results.
+        api_obj = self.image_create(durl)
+        self._api_install(api_obj, ["example_pkg"])
+        api_obj.rebuild_search_index()
+        self._api_install(api_obj, ["another_pkg", "space_pkg"])
+
+        searched = []
+        search_dict = manifest.Manifest.search_dict
+
+        def counting_search_dict(*args, **kwargs):
+            searched.append(args[0])
+            return search_dict(*args, **kwargs)
+
+        manifest.Manifest.search_dict = staticmethod(
+            counting_search_dict)
+        try:
+            for num_to_return, nsearched in ((None, 2), (1, 0)):
+                del searched[:]
+                res = list(api_obj.local_search([api.Query("*",
+                    False, True, num_to_return, None)]))
+                self.assertEqual(len(searched), nsearched)
+                if num_to_return:
+                    self.assertEqual(len(res), num_to_return)
+        finally:
+            manifest.Manifest.search_dict = staticmethod(search_dict)
+
+    def test_search_snapshots(self):
+        """Verify that searches share a snapshot of the index data until
+        the index is updated, and that searches made in parallel while
+        it's updated find consistent results."""
+
+        durl = self.dc.get_depot_url()
+        self.pkgsend_bulk(durl, self.example_pkg10)
+        ind_dir = self._get_repo_index_dir()
+        repo = self.dc.get_repo()
+        nsearches = []
+
+        def search(token):
+            # Each query asks for a different number of results so
+            # that none of them are answered from the repository's
+            # cache of search results.
+            nsearches.append(None)
+            q = query_parser.Query(token, False,
+                query_parser.Query.RETURN_PACKAGES,
+                1000 + len(nsearches), None)
+            return set(
+                pfmri.get_name()
+                for v, return_type, pfmri
+                in repo.search([q])[0]
+            )
+
+        self.assertEqual(search("example_path"), set(["example_pkg"]))
+        snap = sqp.TermQuery._global_data_dict[ind_dir]
+        self.assertEqual(search("example_path"), set(["example_pkg"]))
+        self.assertTrue(sqp.TermQuery._global_data_dict[ind_dir] is snap)
+
+        # Search in several threads while packages are added to the
+        # index.  Each search must find the packages of some version
+        # of the index.
+        errors = []
+        done = threading.Event()
+
+        def searcher():
+            try:
+                while not done.is_set():
+                    res = search("dir::")
+                    if "example_pkg" not in res or \
+                        not res <= set(["example_pkg",
+                        "another_pkg", "space_pkg"]):
+                        errors.append(res)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=searcher) for i in range(4)]
+        for t in threads:
+            t.start()
+        try:
+            for pkg in (self.another_pkg10, self.space_pkg10):
+                self.pkgsend_bulk(durl, pkg)
+        finally:
+            done.set()
+            for t in threads:
+                t.join()
+        self.assertEqual(errors, [])
+
+        self.assertEqual(search("dir::"),
+            set(["example_pkg", "another_pkg", "space_pkg"]))
+        self.assertTrue(sqp.TermQuery._global_data_dict[ind_dir] is
+            not snap)
+
+    def test_search_index_appears(self):
+        """Verify that a repository opened without a search index can
+        be searched as soon as the index appears."""
+
+        durl = self.dc.get_depot_url()
+        self.pkgsend_bulk(durl, self.example_pkg10)
+        ind_dir = self._get_repo_index_dir()
+        saved = ind_dir + ".saved"
+        shutil.move(ind_dir, saved)
+
+        import pkg.server.repository as sr
+        repo = self.dc.get_repo()
+        q = query_parser.Query("example_path", False,
+            query_parser.Query.RETURN_PACKAGES, None, None)
+        self.assertRaises(sr.RepositorySearchUnavailableError,
+            repo.search, [q])
+
+        shutil.move(saved, ind_dir)
+        self.assertEqual(set(
+            pfmri.get_name()
+            for v, return_type, pfmri in repo.search([q])[0]
+        ), set(["example_pkg"]))
+
+    def test_field_partitions(self):
+        """Verify that searches restricted to both an action type and a
+        key use the index's partition for them, and find the same
+        results as they do in an index without partitions."""
+
+        durl = self.dc.get_depot_url()
+        for pkg in (self.example_pkg10, self.another_pkg10,
+            self.space_pkg10):
+            self.pkgsend_bulk(durl, pkg)
+        ind_dir = self._get_repo_index_dir()
+
+        def search(token):
+            q = query_parser.Query(token, False,
+                query_parser.Query.RETURN_ACTIONS, None, None)
+            return sorted(
+                (str(pfmri), fv, l)
+                for v, return_type, (pfmri, fv, l)
+                in self.dc.get_repo().search([q])[0]
+            )
+
+        parts = ss.get_field_partitions(ind_dir,
+            ss.get_index_generation(ind_dir)[0])
+        self.assertEqual(parts[("dir", "path")], len([
+            l for l in open(os.path.join(ind_dir,
+            ss.get_field_partition_name("dir", "path")))
+        ]))
+        self.assertTrue(("depend", "fmri") not in parts)
+
+        tokens = ["dir:path:*", "dir:path:/bin", "dir:path:*bin*",
+            "example_pkg:dir:path:*", "file:path:*example*",
+            "set:description:whee", "dir:path:nosuch",
+            "depend:fmri:*", "dir::bin", ":path:/bin"]
+
+        # Find the results both by reading each partition sequentially
+        # and by searching it for the lines needed.
+        res = {}
+        for ratio in (1, 1000000):
+            old_ratio = qp.PARTITION_SEEK_RATIO
+            qp.PARTITION_SEEK_RATIO = ratio
+            try:
+                for tok in tokens:
+                    r = search(tok)
+                    self.assertEqual(res.setdefault(tok, r), r,
+                        tok)
+            finally:
+                qp.PARTITION_SEEK_RATIO = old_ratio
+        self.assertEqual(len(res["dir:path:*"]), 5)
+        self.assertEqual(len(res["dir:path:/bin"]), 1)
+        self.assertEqual(len(res["dir:path:*bin*"]), 3)
+        self.assertEqual(len(res["file:path:*example*"]), 1)
+        self.assertEqual(res["depend:fmri:*"], [])
+        self.assertEqual(res["dir:path:nosuch"], [])
+
+        # Without the list of partitions, the index is searched as
+        # one built before it was partitioned.
+        portable.remove(os.path.join(ind_dir, ss.FIELD_INDEX_FILE))
+        for tok in tokens:
+            self.assertEqual(search(tok), res[tok], tok)
+
 
 class TestApiSearchMulti(pkg5unittest.ManyDepotTestCase):
 
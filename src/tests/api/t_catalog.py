@@ -21,7 +21,7 @@
 # CDDL HEADER END
 #
 
-# Copyright (c) 2008, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 
 from . import testutils
 if __name__ == "__main__":
@@ -29,10 +29,12 @@ if __name__ == "__main__":
 import pkg5unittest
 
 import errno
+import filecmp
 import os
 import shutil
 import rapidjson as json
 import stat
+import struct
 import unittest
 from functools import cmp_to_key
 
@@ -104,6 +106,23 @@ class TestCatalog(pkg5unittest.Pkg5TestCase):
                 raise e
         return os.path.abspath(target)
 
+    @staticmethod
+    def __sidecar_key(pathname):
+        """Returns the size, modification time and inode of the JSON
+        part recorded in the header of the binary part or stem offset
+        index at 'pathname'."""
+
+        with open(pathname, "rb") as f:
+            return struct.unpack_from("<QqQ", f.read(36), 12)
+
+    @staticmethod
+    def __part_key(pathname):
+        """Returns the size, modification time and inode of the JSON
+        part at 'pathname'."""
+
+        st = os.stat(pathname)
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
     def __gen_manifest(self, f):
         m = manifest.Manifest()
         lines = misc.force_text(
@@ -1093,6 +1112,363 @@ class TestCatalog(pkg5unittest.Pkg5TestCase):
             self.assertFalse(fname.startswith("catalog.") or \
                 fname.startswith("update."))
 
+    def test_11_binary(self):
+        """Verify that catalogs with binary parts store and retrieve
+        the same content as their JSON parts and that stale binary
+        parts are ignored."""
+
+        cpath = self.create_test_dir("test-11")
+        nc = catalog.Catalog(meta_root=cpath, binary=True)
+        for f, entry in self.c.entries():
+            nc.add_package(f, metadata={ "states": [1] })
+        nc.save()
+
+        bpath = os.path.join(cpath, "catalog.base.C.bin")
+        self.assertTrue(os.path.exists(bpath))
+
+        # Verify that the binary part returns the same content.
+        jc = catalog.Catalog(meta_root=cpath)
+        bc = catalog.Catalog(meta_root=cpath, binary=True)
+        self.assertEqual(list(jc.entries()), list(bc.entries()))
+        self.assertEqual(list(jc.fmris(ordered=True, last=True)),
+            list(bc.fmris(ordered=True, last=True)))
+        self.assertEqual(jc.signatures, bc.signatures)
+        for f in jc.fmris():
+            self.assertEqual(jc.get_entry(f), bc.get_entry(f))
+        bc.validate()
+
+        # Verify that a binary part is not used once the JSON part
+        # has changed and that the binary part is replaced on save.
+        f = fmri.PkgFmri("pkg://opensolaris.org/"
+            "test@3.2.1,5.11-1.2.3:20000101T120052Z")
+        jc.remove_package(f)
+        jc.save()
+        bc = catalog.Catalog(meta_root=cpath, binary=True)
+        self.assertEqual(bc.get_entry(f), None)
+        self.assertEqual(list(jc.fmris()), list(bc.fmris()))
+
+        bc.add_package(f)
+        bc.save()
+        bc = catalog.Catalog(meta_root=cpath, binary=True)
+        self.assertNotEqual(bc.get_entry(f), None)
+        self.assertEqual(bc.package_version_count, self.nversions)
+
+        # Verify that once a signed catalog has been copied, its binary
+        # part is still used, and is updated to match the copy, as the
+        # copy has the same signature.
+        copy_path = os.path.join(self.test_root, "test-11-copy")
+        shutil.copytree(cpath, copy_path)
+        jpath = os.path.join(copy_path, "catalog.base.C")
+        self.assertNotEqual(self.__sidecar_key(jpath + ".bin"),
+            self.__part_key(jpath))
+        jc = catalog.Catalog(meta_root=cpath)
+        bc = catalog.Catalog(meta_root=copy_path, binary=True)
+        self.assertEqual(list(jc.entries()), list(bc.entries()))
+        self.assertEqual(self.__sidecar_key(jpath + ".bin"),
+            self.__part_key(jpath))
+
+        # The binary part of an unsigned catalog can't be matched to a
+        # copy, so isn't used.
+        upath = self.create_test_dir("test-11-unsigned")
+        uc = catalog.Catalog(meta_root=upath, binary=True, sign=False)
+        for f, entry in self.c.entries():
+            uc.add_package(f, metadata={ "states": [1] })
+        uc.save()
+        copy_path = os.path.join(self.test_root, "test-11-ucopy")
+        shutil.copytree(upath, copy_path)
+        jpath = os.path.join(copy_path, "catalog.base.C")
+        key = self.__sidecar_key(jpath + ".bin")
+        uc = catalog.Catalog(meta_root=copy_path, binary=True,
+            sign=False)
+        self.assertEqual(len(list(uc.fmris())), self.nversions)
+        self.assertEqual(self.__sidecar_key(jpath + ".bin"), key)
+
+        # Verify that a corrupt binary part is ignored.
+        with open(bpath, "r+b") as bfile:
+            bfile.write(b"garbage")
+        bc = catalog.Catalog(meta_root=cpath, binary=True)
+        self.assertEqual(len(list(bc.fmris())), self.nversions)
+
+        # Verify that destroy removes the binary parts.
+        bc.destroy()
+        self.assertFalse(os.path.exists(bpath))
+
+    def test_12_stem_offset_index(self):
+        """Verify that single package stem lookups use the stem offset
+        index written by save() and fall back to loading the entire
+        part if the index is missing or stale."""
+
+        cpath = self.create_test_dir("test-12")
+        nc = catalog.Catalog(meta_root=cpath)
+        for f in self.c.fmris():
+            nc.add_package(f)
+        nc.save()
+
+        ipath = os.path.join(cpath, "catalog.base.C.idx")
+        self.assertTrue(os.path.exists(ipath))
+
+        def get_results(c):
+            res = []
+            for stem in ("test", "zpkg", "apkg", "nopkg"):
+                res.append([
+                    (str(ver), [str(f) for f in flist])
+                    for ver, flist in c.fmris_by_version(stem)
+                ])
+                res.append([
+                    (str(ver), [(str(f), e) for f, e in entries])
+                    for ver, entries in c.entries_by_version(stem)
+                ])
+            for f in self.c.fmris():
+                res.append(c.get_entry(f))
+            return res
+
+        # Verify that lookups are performed without loading the part
+        # and match those of a loaded part.
+        nc = catalog.Catalog(meta_root=cpath)
+        nc.get_part("catalog.base.C", must_exist=True).load()
+        expected = get_results(nc)
+        nc = catalog.Catalog(meta_root=cpath)
+        base = nc.get_part("catalog.base.C", must_exist=True)
+        f = fmri.PkgFmri("pkg://extra/zpkg@1.0,5.11-1:20000101T120040Z")
+        self.assertTrue(base.get_entry(f) is not None)
+        self.assertEqual(list(base.fmris_by_version("zpkg",
+            pubs=["extra"]))[0][1], [f])
+        self.assertEqual(base.get_entry(pub="extra", stem="nopkg",
+            ver="1.0"), None)
+        self.assertFalse(base.loaded)
+        self.assertEqual(get_results(nc), expected)
+
+        # Verify that a stale index is ignored.
+        shutil.copyfile(ipath, ipath + ".old")
+        f = fmri.PkgFmri("pkg://extra/apkg@1.0,5.11-1:20000101T120040Z")
+        nc.remove_package(f)
+        nc.save()
+        shutil.move(ipath + ".old", ipath)
+        nc = catalog.Catalog(meta_root=cpath)
+        base = nc.get_part("catalog.base.C", must_exist=True)
+        self.assertEqual(base.get_entry(f), None)
+        self.assertTrue(base.loaded)
+
+        # Verify that the index of a signed catalog is still used once
+        # the catalog has been copied.
+        nc.save()
+        copy_path = os.path.join(self.test_root, "test-12-copy")
+        shutil.copytree(cpath, copy_path)
+        nc = catalog.Catalog(meta_root=copy_path)
+        base = nc.get_part("catalog.base.C", must_exist=True)
+        self.assertEqual(base.get_entry(f), None)
+        self.assertNotEqual(list(base.fmris_by_version("zpkg")), [])
+        self.assertFalse(base.loaded)
+
+        # Verify that a missing index results in the part being loaded.
+        portable.remove(ipath)
+        nc = catalog.Catalog(meta_root=cpath)
+        base = nc.get_part("catalog.base.C", must_exist=True)
+        self.assertEqual(base.get_entry(f), None)
+        self.assertTrue(base.loaded)
+
+    def test_13_parallel_save(self):
+        """Verify that catalogs saved using multiple workers are
+        identical to those saved serially and that save timings are
+        recorded."""
+
+        sigs = []
+        for workers in (1, 4):
+            cpath = self.create_test_dir("test-13-{0:d}".format(
+                workers))
+            nc = catalog.Catalog(meta_root=cpath, save_workers=workers)
+            for f in self.c.fmris():
+                nc.add_package(f, manifest=self.__gen_manifest(f))
+            nc.save()
+
+            names = [name for name, secs in nc.save_timings]
+            self.assertEqual(names[-1], "total")
+            self.assertEqual(set(names[:-1]),
+                set(nc.signatures.keys()))
+
+            nc = catalog.Catalog(meta_root=cpath)
+            nc.validate(require_signatures=True)
+
+            # The catalog.attrs signature differs as it includes
+            # creation and modification times.
+            sigs.append(dict(
+                (name, sig)
+                for name, sig in nc.signatures.items()
+                if name != "catalog.attrs"
+            ))
+
+        self.assertEqual(sigs[0], sigs[1])
+
+    def test_14_journal(self):
+        """Verify that incremental updates can be journaled instead of
+        rewriting catalog parts, that journaled updates are applied when
+        the part is loaded, and that parts are compacted once their
+        journal grows too large."""
+
+        cpath = self.create_test_dir("test-14-orig")
+        orig = catalog.Catalog(meta_root=cpath, log_updates=True)
+        for f in self.c.fmris():
+            orig.add_package(f)
+        for i in range(100):
+            orig.add_package(fmri.PkgFmri("pkg://opensolaris.org/"
+                "pkg{0:d}@1.0,5.11-1:20000101T120000Z".format(i)))
+        orig.save()
+
+        dpath = os.path.join(self.test_root, "test-14-dup")
+        shutil.copytree(cpath, dpath, ignore=shutil.ignore_patterns(
+            "update.*"))
+        base = os.path.join(dpath, "catalog.base.C")
+        jpath = base + ".journal"
+        st = os.stat(base)
+
+        # Add and remove a package, then apply the updates.
+        nf = fmri.PkgFmri("pkg://opensolaris.org/"
+            "zpkg@1.0,5.11-1:20000101T120040Z")
+        orig.add_package(nf)
+        orig.remove_package(next(self.c.fmris()))
+        orig.save()
+
+        old_attrs = os.path.join(self.test_root, "test-14-attrs")
+        shutil.copy2(os.path.join(dpath, "catalog.attrs"), old_attrs)
+        dup = catalog.Catalog(meta_root=dpath, journal=True)
+
+        # The parts should not be verified in full until they are
+        # rewritten.
+        validated = []
+        orig_validate = catalog.CatalogPart.validate
+        def validate(part, *args, **kwargs):
+            validated.append(part.name)
+            return orig_validate(part, *args, **kwargs)
+        catalog.CatalogPart.validate = validate
+        try:
+            dup.apply_updates(cpath)
+        finally:
+            catalog.CatalogPart.validate = orig_validate
+        self.assertEqual(validated, [])
+
+        # The part should not have been rewritten.
+        self.assertTrue(os.path.exists(jpath))
+        self.assertEqual(os.stat(base).st_mtime_ns, st.st_mtime_ns)
+
+        def verify():
+            dup = catalog.Catalog(meta_root=dpath)
+            dup.validate(require_signatures=True)
+            self.assertEqual(list(dup.fmris(ordered=True)),
+                list(orig.fmris(ordered=True)))
+            self.assertEqual(dup.get_entry(nf), orig.get_entry(nf))
+
+        verify()
+
+        # Operations that don't apply to the part are rejected, as they
+        # are by add() and remove(), and aren't recorded.
+        with open(jpath, "rb") as jfile:
+            journal = jfile.read()
+        part = catalog.Catalog(meta_root=dpath).get_part(
+            "catalog.base.C")
+        self.assertRaises(api_errors.DuplicateCatalogEntry,
+            part.append_journal, [(catalog.CatalogUpdate.ADD, nf, None)],
+            dup.last_modified)
+        self.assertRaises(api_errors.UnknownCatalogEntry,
+            part.append_journal, [(catalog.CatalogUpdate.REMOVE,
+            fmri.PkgFmri("pkg://opensolaris.org/bogus@1.0,5.11-1"),
+            None)], dup.last_modified)
+        with open(jpath, "rb") as jfile:
+            self.assertEqual(jfile.read(), journal)
+
+        # A journal that no longer applies to its part can't be loaded.
+        with open(jpath, "a") as jfile:
+            jfile.write('["remove","opensolaris.org","bogus",'
+                '"1.0,5.11-1"]\n["commit","20000101T120040Z"]\n')
+        self.assertRaises(api_errors.UnknownCatalogEntry, list,
+            catalog.Catalog(meta_root=dpath).fmris())
+        with open(jpath, "wb") as jfile:
+            jfile.write(journal)
+        verify()
+
+        # A partially written batch of operations should be ignored.
+        with open(jpath, "a") as jfile:
+            jfile.write('["remove","opensolaris.org","zpkg"')
+        verify()
+
+        # Applying the same updates again (as would happen if the new
+        # catalog.attrs file had not been put in place) should have no
+        # further effect.
+        shutil.copy2(old_attrs, os.path.join(dpath, "catalog.attrs"))
+        dup = catalog.Catalog(meta_root=dpath, journal=True)
+        dup.apply_updates(cpath)
+        verify()
+
+        # A journal that is large relative to the part causes the part
+        # to be rewritten.
+        for f in list(orig.fmris())[:-2]:
+            orig.remove_package(f)
+        orig.save()
+        dup = catalog.Catalog(meta_root=dpath, journal=True)
+        dup.apply_updates(cpath)
+        self.assertFalse(os.path.exists(jpath))
+        self.assertNotEqual(os.stat(base).st_size, st.st_size)
+        verify()
+
+        # If a journaled part doesn't match the new catalog.attrs when
+        # it's rewritten, the updates should be rejected and no journal
+        # left behind.
+        shutil.copy2(os.path.join(dpath, "catalog.attrs"), old_attrs)
+        orig.add_package(fmri.PkgFmri("pkg://opensolaris.org/"
+            "zpkg@2.0,5.11-1:20000101T120050Z"))
+        orig.save()
+        dup = catalog.Catalog(meta_root=dpath)
+        dup.get_part("catalog.base.C").append_journal([
+            (catalog.CatalogUpdate.ADD, fmri.PkgFmri(
+            "pkg://opensolaris.org/bogus@1.0,5.11-1"), None)],
+            dup.last_modified)
+        dup = catalog.Catalog(meta_root=dpath, journal=True)
+        self.assertRaises(api_errors.BadCatalogSignatures,
+            dup.apply_updates, cpath)
+        self.assertFalse(os.path.exists(jpath))
+        self.assertTrue(filecmp.cmp(old_attrs,
+            os.path.join(dpath, "catalog.attrs"), shallow=False))
+
+    def test_15_stem_index(self):
+        """Verify that the package names found using the stem index
+        match those found by testing every name, and that patterns
+        can be matched without loading the catalog."""
+
+        cpath = self.create_test_dir("test-15")
+        cat = catalog.Catalog(meta_root=cpath)
+        stems = ["developer/python/pylint", "library/python/foo",
+            "network/ping", "ping", "runtime/python-39",
+            "shell/bash", "system/library", "system/library/math",
+            "text/gnu-grep"]
+        for stem in stems:
+            cat.add_package(fmri.PkgFmri("pkg://opensolaris.org/"
+                "{0}@1.0,5.11-1:20000101T120000Z".format(stem)))
+        cat.save()
+
+        cat = catalog.Catalog(meta_root=cpath)
+        base = cat.get_part("catalog.base.C", must_exist=True)
+        for matcher, pats in (
+            (fmri.exact_name_match, ["ping", "network/ping", "net"]),
+            (fmri.fmri_match, ["ping", "library", "python/foo",
+                "ython/foo", "math"]),
+            (fmri.glob_match, ["*/python*", "*python*", "system/*",
+                "*library", "*/*/*", "*", "s?stem/*", "*ing*",
+                "*gnu-gre?", "*/[bs]*", "text/*grep", "*xyzzy*"])):
+            for pat in pats:
+                self.assertEqual(base.matching_names(matcher, pat),
+                    sorted(s for s in stems if matcher(s, pat)))
+
+        # Names are retrieved from the stem offset index and the
+        # entries for matching names are retrieved individually.
+        cat = catalog.Catalog(meta_root=cpath)
+        pdict, references, unmatched = cat.get_matching_fmris(
+            ["pkg:/network/ping", "*/python*", "bash", "xyzzy"])
+        self.assertEqual(set(pdict.keys()), set(["network/ping",
+            "library/python/foo", "developer/python/pylint",
+            "runtime/python-39", "shell/bash"]))
+        self.assertEqual(unmatched, set(["xyzzy"]))
+        self.assertFalse(cat.get_part("catalog.base.C",
+            must_exist=True).loaded)
+
     def test_legacy_description(self):
         """Test that gen_packages does not traceback when a package
         uses the legacy style of declaring package description metadata."""
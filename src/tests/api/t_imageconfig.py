@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2008, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 #
 
 from . import testutils
@@ -35,6 +35,7 @@ import shutil
 import sys
 import tempfile
 import pkg.client.imageconfig as imageconfig
+import pkg.config as cfg
 import pkg.portable as portable
 
 
@@ -109,6 +110,21 @@ sort_policy: priority
         pub2 = ic2.publishers["sfbay.sun.com"]
         self.assertEqual(pub2.client_uuid, uuid)
 
+    def test_2_http2_streams(self):
+        """Verify that the http2-streams policy defaults to not using
+        HTTP/2 and only accepts numbers of streams."""
+
+        self.assertEqual(self.ic.get_policy_str(
+            imageconfig.HTTP2_STREAMS), 0)
+        self.assertTrue(not self.ic.get_policy(imageconfig.HTTP2_STREAMS))
+        self.ic.set_property("property", imageconfig.HTTP2_STREAMS, "32")
+        self.assertEqual(self.ic.get_policy_str(
+            imageconfig.HTTP2_STREAMS), 32)
+        for val in ("-1", "many"):
+            self.assertRaises(cfg.InvalidPropertyValueError,
+                self.ic.set_property, "property",
+                imageconfig.HTTP2_STREAMS, val)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -20,7 +20,7 @@
 # CDDL HEADER END
 #
 
-# Copyright (c) 2009, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2009, 2026, Oracle and/or its affiliates.
 
 from . import testutils
 if __name__ == "__main__":
@@ -28,8 +28,10 @@ if __name__ == "__main__":
 import pkg5unittest
 
 import unittest
+import pkg.fmri as fmri
 import pkg.indexer as indexer
 import pkg.search_errors as se
+import pkg.search_storage as ss
 
 import os
 import sys
@@ -109,6 +111,261 @@ class TestIndexer(pkg5unittest.Pkg5TestCase):
             self.assertTrue(len(open(os.path.join(ind._tmp_dir,
                 file)).readlines()) <= 1)
 
+    def test_token_index(self):
+        """Verify that the binary token index maps each token to the
+        same main dictionary offset as the token byte offset file, and
+        that it can be converted from that file."""
+
+        ind = self.__prep_indexer(indexer.SORT_FILE_MAX_SIZE)
+        ind._Indexer__close_sort_fh()
+        ind.empty_index = True
+        ind._progtrack.job_start(ind._progtrack.JOB_REBUILD_SEARCH,
+            goal=2)
+        # Use small blocks so that lookups span several of them.
+        ind._data_token_index.BLOCK_SIZE = 3
+        out_dir = os.path.join(self.test_root, "out")
+        os.mkdir(out_dir)
+        ind._update_index([], out_dir)
+
+        def read(dirname):
+            text = ss.IndexStoreDictMutable(ss.BYTE_OFFSET_FILE)
+            binary = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+            self.assertEqual(ss.consistent_open([text, binary],
+                dirname), 1)
+            try:
+                text.read_dict_file()
+                binary.read_dict_file()
+            finally:
+                text.close_file_handle()
+                binary.close_file_handle()
+            return text, binary
+
+        text, binary = read(out_dir)
+        toks = sorted(text.get_keys())
+        self.assertEqual(len(toks), 8)
+        self.assertEqual(binary.get_keys(), toks)
+        for tok in toks:
+            self.assertTrue(binary.has_entity(tok))
+            self.assertEqual(binary.get_id(tok), text.get_id(tok))
+        for pat in ("*", "1*", "*core", "*OPT*", "2009*Z"):
+            for cs in (True, False):
+                self.assertEqual(sorted(
+                    binary.get_matching_ids(pat, cs)),
+                    sorted(text.get_matching_ids(pat, cs)))
+        for tok in ("", "0", "1.00", "zzz"):
+            self.assertTrue(not binary.has_entity(tok))
+            self.assertRaises(KeyError, binary.get_id, tok)
+
+        # An index from before the binary token index was introduced
+        # is converted using its token byte offset file.
+        conv_dir = os.path.join(self.test_root, "conv")
+        os.mkdir(conv_dir)
+        ind._index_dir = out_dir
+        ind._convert_token_offsets(conv_dir)
+        with open(os.path.join(out_dir, ss.TOKEN_INDEX_FILE),
+            "rb") as fh:
+            expected = fh.read()
+        with open(os.path.join(conv_dir, ss.TOKEN_INDEX_FILE),
+            "rb") as fh:
+            self.assertEqual(fh.read(), expected)
+
+        # An index containing no tokens.
+        binary = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+        binary.write_dict_file(conv_dir, 1)
+        binary.open(conv_dir)
+        binary.read_dict_file()
+        binary.close_file_handle()
+        self.assertEqual(binary.get_keys(), [])
+        self.assertTrue(not binary.has_entity("1.0"))
+
+        # A damaged index is reported as inconsistent.
+        with open(os.path.join(conv_dir, ss.TOKEN_INDEX_FILE),
+            "r+b") as fh:
+            fh.seek(len("VERSION: 1\n"))
+            fh.write(b"PKG5TIX\x00")
+        binary = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+        binary.open(conv_dir)
+        try:
+            self.assertRaises(se.InconsistentIndexException,
+                binary.read_dict_file)
+        finally:
+            binary.close_file_handle()
+
+    def test_token_index_patterns(self):
+        """Verify that the binary token index finds the same tokens
+        matching wildcard patterns as a search of every token."""
+
+        toks = set()
+        for d in ("usr", "Usr", "USR", "lib", "Lib", "LIBRARY", "etc",
+            "a", "ab", "ABC", "xyz"):
+            for f in ("libc.so.1", "LibZ.so", "README", "x", "[x]",
+                "libc", "zz", "\u00fcber", "K\u212a", "stra\u00dfe",
+                "\u017fs"):
+                toks.add(d + "/" + f)
+                toks.add(f)
+                toks.add(d)
+        toks = sorted(toks)
+
+        out_dir = os.path.join(self.test_root, "out")
+        os.mkdir(out_dir)
+        text = ss.IndexStoreDictMutable(ss.BYTE_OFFSET_FILE)
+        binary = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+        # Use small blocks so that matches span several of them.
+        binary.BLOCK_SIZE = 4
+        text.open_out_file(out_dir, 1)
+        binary.open_out_file(out_dir, 1)
+        for i, tok in enumerate(toks):
+            text.write_entity(tok, i * 10)
+            binary.write_entity(tok, i * 10)
+        text.close_file_handle()
+        binary.close_file_handle()
+
+        text = ss.IndexStoreDictMutable(ss.BYTE_OFFSET_FILE)
+        binary = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+        ss.consistent_open([text, binary], out_dir)
+        try:
+            text.read_dict_file()
+            binary.read_dict_file()
+        finally:
+            text.close_file_handle()
+            binary.close_file_handle()
+
+        for pat in ("lib*", "LIB*", "Lib*", "l*", "L*", "li*", "LI*",
+            "ab*", "AB*", "a*", "usr/lib*", "*.so", "*SO*", "*libc*",
+            "*/readme", "*README", "?ib*", "*b?c*", "[lL]ib*",
+            "[!l]ib*", "*[x]*", "[x*", "*[*", "*\u00fc*",
+            "*\u00dcBER", "*k*", "*K\u212a", "*\u212a*", "*ss*",
+            "*STRASSE*", "*stra\u00dfe", "*s*", "*S", "x", "X",
+            "usr/x", "nomatch*", "*nomatch*", "*no?match*", "*", "?",
+            "*/*", "zz", "ZZ*", "*zz", "*xyz*", "*XYZ/*"):
+            for cs in (True, False):
+                self.assertEqual(sorted(
+                    binary.get_matching_ids(pat, cs)),
+                    sorted(text.get_matching_ids(pat, cs)),
+                    "{0} {1}".format(pat, cs))
+
+    def test_parallel_rebuild(self):
+        """Verify that an index built by tokenizing manifests in worker
+        processes is the same as one built serially."""
+
+        paths = {}
+        fmris = []
+        for i in range(12):
+            pfmri = fmri.PkgFmri("pkg://test/pkg{0:d}@1.{1:d},5.11-0:"
+                "20260101T000000Z".format(i % 5, i))
+            mpath = os.path.join(self.test_root, "manifest.{0:d}".format(i))
+            with open(mpath, "w") as fh:
+                fh.write("set name=pkg.fmri value={0}\n".format(pfmri))
+                fh.write("set name=pkg.summary value=\"package {0:d} "
+                    "of {1:d}\"\n".format(i, 12))
+                fh.write("dir group=bin mode=0755 owner=root "
+                    "path=usr/share/pkg{0:d}\n".format(i % 3))
+                fh.write("file {0:d} group=bin mode=0444 owner=root "
+                    "path=usr/share/pkg{1:d}/file{2:d}\n".format(i, i % 3,
+                    i % 4))
+            paths[pfmri] = mpath
+            fmris.append(pfmri)
+
+        def build(name, workers):
+            ind_dir = os.path.join(self.test_root, name)
+            # A small sort file size makes each worker write many
+            # runs.
+            ind = indexer.Indexer(ind_dir, None, paths.get,
+                sort_file_max_size=512, workers=workers)
+            ind.rebuild_index_from_scratch(fmris)
+
+            md = ss.IndexStoreMainDict(ss.MAIN_FILE)
+            manf = ss.IndexStoreListDict(ss.MANIFEST_LIST)
+            self.assertTrue(ss.consistent_open([md, manf], ind_dir))
+            try:
+                manf.read_dict_file()
+                fh = md.get_file_handle()
+                next(fh)
+                toks = []
+                entries = set()
+                for line in fh:
+                    tok, at_lst = md.parse_main_dict_line(line)
+                    toks.append(tok)
+                    for at, st_lst in at_lst:
+                        for st, fv_lst in st_lst:
+                            for fv, p_lst in fv_lst:
+                                for p_id, offs in p_lst:
+                                    entries.add((tok, at, st, fv,
+                                        manf.get_entity(int(p_id)),
+                                        tuple(offs)))
+            finally:
+                md.close_file_handle()
+                manf.close_file_handle()
+            return toks, entries
+
+        serial = build("serial", 1)
+        self.assertTrue(serial[0])
+        min_pkgs = indexer.PARALLEL_INDEX_MIN_PKGS
+        indexer.PARALLEL_INDEX_MIN_PKGS = 1
+        try:
+            self.assertEqual(build("parallel", 3), serial)
+        finally:
+            indexer.PARALLEL_INDEX_MIN_PKGS = min_pkgs
+
+        # The worker count must be positive.
+        self.assertRaises(se.IndexingException, indexer.Indexer,
+            self.test_root, None, None, workers=0)
+
+    def test_stale_token_index(self):
+        """Verify that a binary token index that doesn't have the
+        version of the rest of the index is reported as inconsistent
+        and removed, and that it's written again when the index is
+        next updated."""
+
+        paths = {}
+        fmris = []
+        for i in range(4):
+            pfmri = fmri.PkgFmri("pkg://test/pkg{0:d}@1.0,5.11-0:"
+                "20260101T000000Z".format(i))
+            mpath = os.path.join(self.test_root, "manifest.{0:d}".format(i))
+            with open(mpath, "w") as fh:
+                fh.write("set name=pkg.fmri value={0}\n".format(pfmri))
+                fh.write("dir group=bin mode=0755 owner=root "
+                    "path=usr/share/pkg{0:d}\n".format(i))
+            paths[pfmri] = mpath
+            fmris.append(pfmri)
+
+        ind_dir = os.path.join(self.test_root, "index")
+        ti_path = os.path.join(ind_dir, ss.TOKEN_INDEX_FILE)
+
+        def make_stale():
+            # Leave the token index as it would be if the rest of
+            # the index had been updated without it.  The versions
+            # used are all one digit, so the length of the version
+            # line is unchanged.
+            with open(ti_path, "r+b") as fh:
+                version = int(fh.readline().split()[1])
+                fh.seek(0)
+                fh.write("VERSION: {0:d}\n".format(version - 1).encode())
+
+        ind = indexer.Indexer(ind_dir, None, paths.get, workers=1)
+        ind.rebuild_index_from_scratch(fmris[:2])
+        self.assertTrue(ind.check_index_existence())
+
+        ind = indexer.Indexer(ind_dir, None, paths.get, workers=1)
+        ind.server_update_index(fmris[2:3])
+        make_stale()
+        ind = indexer.Indexer(ind_dir, None, paths.get, workers=1)
+        self.assertRaises(se.InconsistentIndexException,
+            ind.check_index_existence)
+        ind.setup()
+        self.assertFalse(os.path.exists(ti_path))
+        self.assertTrue(ind.check_index_existence())
+
+        # The next update of the index writes it again.
+        ind = indexer.Indexer(ind_dir, None, paths.get, workers=1)
+        ind.rebuild_index_from_scratch(fmris[:3])
+        make_stale()
+        ind = indexer.Indexer(ind_dir, None, paths.get, workers=1)
+        ind.server_update_index(fmris[3:])
+        self.assertTrue(os.path.exists(ti_path))
+        self.assertTrue(ind.check_index_existence())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -21,7 +21,7 @@
 # CDDL HEADER END
 #
 
-# Copyright (c) 2008, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 
 import unittest
 import tempfile
@@ -169,6 +169,53 @@ link path=usr/lib/amd64/libjpeg.so target=libjpeg.so.62.0.0
 
         self.assertEqualDiff(expected, actual)
 
+    def test_set_content_lazy(self):
+        """Verify that manifests with lazily created actions have the
+        same content as those without."""
+
+        m = manifest.Manifest()
+        m.set_content(self.diverse_contents)
+        lm = manifest.Manifest()
+        lm.set_content(self.diverse_contents, lazy=True)
+
+        # Only actions of types that haven't been used yet and that
+        # haven't been transformed are still lazy.
+        self.assertEqual(
+            sorted(a.name for a in lm.gen_actions()
+                if isinstance(a, actions.generic.LazyAction)),
+            ["depend", "dir", "dir", "dir", "group", "link"])
+        for atype in ("depend", "dir", "file", "group", "link",
+            "hardlink"):
+            self.assertEqual(
+                list(lm.gen_key_attribute_value_by_type(atype)),
+                list(m.gen_key_attribute_value_by_type(atype)))
+        self.assertEqual(len([a for a in lm.gen_actions()
+            if isinstance(a, actions.generic.LazyAction)]), 6)
+
+        self.assertEqualDiff(sorted(m.as_lines()),
+            sorted(lm.as_lines()))
+        self.assertTrue(not [a for a in lm.gen_actions()
+            if isinstance(a, actions.generic.LazyAction)])
+        diffs = m.difference(lm)
+        self.assertEqual(diffs.added, [])
+        self.assertEqual(diffs.changed, [])
+        self.assertEqual(diffs.removed, [])
+
+        # Legacy zone attributes are still transformed.
+        lm = manifest.Manifest()
+        lm.set_content("dir path=etc opensolaris.zone=global\n",
+            lazy=True)
+        a = next(lm.gen_actions())
+        self.assertEqual(a.attrs["variant.opensolaris.zone"], "global")
+
+        # Actions are never lazy when excludes are used.
+        lm = manifest.Manifest()
+        lm.set_content(self.diverse_contents, lazy=True,
+            excludes=[variant.Variants({ "variant.arch": "i386"
+                }).allow_action, facet.Facets().allow_action])
+        self.assertTrue(not [a for a in lm.gen_actions()
+            if isinstance(a, actions.generic.LazyAction)])
+
     def test_diffs1(self):
         """ humanized_differences runs to completion """
 
@@ -343,6 +390,45 @@ link path=usr/lib/amd64/libjpeg.so target=libjpeg.so.62.0.0
             self.assertEqual(d[0].attrs["target"], "old")
             self.assertEqual(d[1].attrs["target"], "new")
 
+    def test_diffs11(self):
+        """ ASSERT: difference() results are ordered for execution and
+        mediated links are matched by mediation """
+
+        self.m1.set_content("""
+            dir mode=0755 owner=root group=sys path=bin
+            file 00000001 mode=0444 owner=root group=sys path=bin/a
+            file 00000002 mode=0444 owner=root group=sys path=bin/b
+            link path=bin/l target=a mediator=m mediator-version=1
+            link path=bin/l target=b mediator=m mediator-version=2
+            dir mode=0755 owner=root group=sys path=old
+            file 00000003 mode=0444 owner=root group=sys path=old/c
+                    """)
+        self.m2.set_content("""
+            file 00000002 mode=0444 owner=root group=sys path=bin/b
+            file 00000004 mode=0444 owner=root group=sys path=bin/a
+            link path=bin/l target=c mediator=m mediator-version=2
+            link path=bin/l target=a mediator=m mediator-version=1
+            file 00000005 mode=0444 owner=root group=sys path=new/d
+            dir mode=0755 owner=root group=sys path=new
+            dir mode=0755 owner=root group=sys path=bin
+                    """)
+
+        added, changed, removed = self.m2.difference(self.m1)
+        self.assertEqual([str(d[1]) for d in added], [
+            "dir group=sys mode=0755 owner=root path=new",
+            "file 00000005 group=sys mode=0444 owner=root path=new/d",
+        ])
+        self.assertEqual([str(d[0]) for d in removed], [
+            "file 00000003 group=sys mode=0444 owner=root path=old/c",
+            "dir group=sys mode=0755 owner=root path=old",
+        ])
+        self.assertEqual([(str(d[0]), str(d[1])) for d in changed], [
+            ("file 00000001 group=sys mode=0444 owner=root path=bin/a",
+            "file 00000004 group=sys mode=0444 owner=root path=bin/a"),
+            ("link mediator=m mediator-version=2 path=bin/l target=b",
+            "link mediator=m mediator-version=2 path=bin/l target=c"),
+        ])
+
     def test_dups1(self):
         """ Test the duplicate search.  /bin shouldn't show up, since
             they're identical actions, but /usr should show up three
@@ -452,6 +538,89 @@ dir owner=root path=fm group=bin mode=0755 facet.multi=true \\
         m1.exclude_content([v.allow_action, lambda x, publisher: True])
         self.assertEqual(len(list(m1.gen_actions_by_type("dir"))), 1)
 
+    def test_binary_cache(self):
+        """Verify that the binary per-action type cache is used when
+        current and that the text cache is used if it is missing,
+        stale, or of another version, without the binary cache being
+        rewritten by what only reads the cache."""
+
+        m1 = manifest.FactoredManifest("foo-content@1.0", self.cache_dir,
+            pathname=self.foo_content_p5m)
+        expected = sorted(str(a) for a in m1.gen_actions_by_type("dir"))
+        self.assertEqual(len(expected), 8)
+
+        tpath = os.path.join(self.cache_dir, "manifest.dir")
+        bpath = tpath + ".bin"
+        for atype in ("dir", "set"):
+            self.assertTrue(os.path.isfile(os.path.join(
+                self.cache_dir, "manifest.{0}.bin".format(atype))))
+
+        def get_dirs():
+            m = manifest.FactoredManifest("foo-content@1.0",
+                self.cache_dir, pathname=self.foo_content_p5m)
+            self.assertTrue(not m.loaded)
+            return sorted(str(a) for a in m.gen_actions_by_type("dir"))
+
+        def modify_in_place():
+            # Changes the text cache without changing its size,
+            # modification time or inode.
+            st = os.stat(tpath)
+            with open(tpath, "r") as f:
+                text = f.read()
+            with open(tpath, "w") as f:
+                f.write(text.replace("owner=root", "owner=nope"))
+            os.utime(tpath, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        # The binary cache is used instead of the text cache.
+        with open(tpath, "r") as f:
+            text = f.read()
+        modify_in_place()
+        self.assertEqualDiff(expected, get_dirs())
+
+        # Once the text cache is replaced, it is used instead.
+        with open(bpath, "rb") as f:
+            bdata = f.read()
+        with open(tpath + ".new", "w") as f:
+            f.write(text.replace("mode=0755", "mode=0700"))
+        os.rename(tpath + ".new", tpath)
+        junk = get_dirs()
+        self.assertEqual(len(junk), len(expected))
+        self.assertTrue(all("mode=0700" in a for a in junk))
+        with open(bpath, "rb") as f:
+            self.assertEqual(f.read(), bdata)
+
+        with open(tpath + ".new", "w") as f:
+            f.write(text)
+        os.rename(tpath + ".new", tpath)
+        self.assertEqualDiff(expected, get_dirs())
+
+        # The binary cache is ignored if it is missing, of another
+        # version, or malformed.
+        for data in (None, b"PKG5FMC\x00junk", b"PKG5FMC\x01junk"):
+            if data is None:
+                portable.remove(bpath)
+            else:
+                with open(bpath, "wb") as f:
+                    f.write(data)
+            self.assertEqualDiff(expected, get_dirs())
+            if data is None:
+                self.assertTrue(not os.path.exists(bpath))
+            else:
+                with open(bpath, "rb") as f:
+                    self.assertEqual(f.read(), data)
+
+        # Attributes are loaded from the binary cache of set actions.
+        m1 = manifest.FactoredManifest("foo-content@1.0", self.cache_dir,
+            pathname=self.foo_content_p5m)
+        self.assertEqual(sorted(m1.gen_variants()), [
+            ("variant.arch", ["i386"]),
+            ("variant.debug.osnet", ["false", "true"]),
+            ("variant.osnet", ["false", "true"]),
+        ])
+        self.assertTrue(not m1.loaded)
+        self.assertEqual(m1.get("pkg.fmri", None),
+            "pkg:/foo-content@1.0")
+
     def test_store_to_disk(self):
         """Verifies that a FactoredManifest gets force-loaded before it
         gets stored to disk."""
@@ -0,0 +1,254 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+from . import testutils
+if __name__ == "__main__":
+    testutils.setup_environment("../../../proto")
+import pkg5unittest
+
+import os
+import time
+import unittest
+
+import pkg.client.api as api
+import pkg.client.imageconfig as imageconfig
+import pkg.client.progress as progress
+import pkg.client.transport.sharedcache as sharedcache
+import pkg.misc as misc
+
+
+class TestSharedCache(pkg5unittest.Pkg5TestCase):
+
+    def setUp(self):
+        pkg5unittest.Pkg5TestCase.setUp(self)
+        self.cache_dir = os.path.join(self.test_root, "cache")
+        self.src_dir = os.path.join(self.test_root, "src")
+        os.mkdir(self.src_dir)
+
+    def __insert(self, cache, name, size, age=0):
+        """Store 'size' bytes in the cache as 'name', last used 'age'
+        seconds ago."""
+
+        src = os.path.join(self.src_dir, name)
+        with open(src, "wb") as fh:
+            fh.write(b"x" * size)
+        path = cache.insert(name, src)
+        self.assertTrue(not os.path.exists(src))
+        t = time.time() - age
+        os.utime(path, (t, t))
+        return path
+
+    def test_lookup(self):
+        """Verify that content can be stored and found, and that finding
+        it records that it has been used."""
+
+        cache = sharedcache.SharedCache(self.cache_dir, 1024 * 1024)
+        h = "a" * 40
+        self.assertEqual(cache.lookup(h), None)
+        path = self.__insert(cache, h, 100, age=sharedcache.MIN_AGE)
+        self.assertEqual(path, os.path.join(self.cache_dir, "aa", h))
+
+        then = os.stat(path).st_mtime
+        self.assertEqual(cache.lookup(h), path)
+        self.assertTrue(os.stat(path).st_mtime > then)
+        with cache.lookup(h, opener=True) as fh:
+            self.assertEqual(len(fh.read()), 100)
+
+        # Another cache object for the same directory, as used by
+        # another image, finds the same content.
+        other = sharedcache.SharedCache(self.cache_dir, 1024 * 1024)
+        self.assertEqual(other.lookup(h), path)
+
+    def test_prune(self):
+        """Verify that the content used least recently is evicted to
+        keep the cache within its size limit, but that content in use
+        is not."""
+
+        cache = sharedcache.SharedCache(self.cache_dir, 1024 * 1024)
+        hashes = ["{0:02x}{1}".format(i, "0" * 38) for i in range(10)]
+        # The first file stored has most recently been used.
+        for i, h in enumerate(hashes):
+            self.__insert(cache, h, 200,
+                age=sharedcache.MIN_AGE * (i + 2))
+        cache.size_limit = 1000
+        cache.prune()
+
+        # Eviction stops once the cache is within 90% of its limit.
+        remaining = [h for h in hashes if cache.lookup(h)]
+        self.assertEqual(remaining, hashes[:4])
+
+        # Recently used content isn't evicted, even if the cache
+        # is still larger than its limit.
+        cache.size_limit = 1024 * 1024
+        for h in hashes[4:]:
+            self.__insert(cache, h, 200)
+        cache.size_limit = 1000
+        cache.prune()
+        remaining = [h for h in hashes if cache.lookup(h)]
+        self.assertEqual(remaining, hashes)
+
+        # Files other than content are left alone.
+        with open(os.path.join(self.cache_dir, "other"), "w") as fh:
+            fh.write("x" * 2000)
+        for h in hashes:
+            p = cache.lookup(h)
+            os.utime(p, (1, 1))
+        cache.prune()
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir,
+            "other")))
+        self.assertEqual(len([h for h in hashes if cache.lookup(h)]), 4)
+
+        # Copies into the cache abandoned part way through are
+        # removed once they're old enough that they can't still be
+        # in progress, whether or not the cache is over its limit.
+        cache.size_limit = 1024 * 1024
+        stale = os.path.join(self.cache_dir, "incoming-stale")
+        fresh = os.path.join(self.cache_dir, "incoming-fresh")
+        for p in (stale, fresh):
+            with open(p, "w") as fh:
+                fh.write("x" * 200)
+        t = time.time() - sharedcache.MIN_AGE * 2
+        os.utime(stale, (t, t))
+        cache.prune()
+        self.assertTrue(not os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+    def test_readonly(self):
+        """Verify that a read-only shared cache can't be modified."""
+
+        cache = sharedcache.SharedCache(self.cache_dir, 1000)
+        h = "b" * 40
+        path = self.__insert(cache, h, 100, age=sharedcache.MIN_AGE)
+        then = os.stat(path).st_mtime
+
+        ro_cache = sharedcache.SharedCache(self.cache_dir, 1,
+            readonly=True)
+        self.assertEqual(ro_cache.lookup(h), path)
+        self.assertEqual(os.stat(path).st_mtime, then)
+        ro_cache.prune()
+        self.assertTrue(os.path.exists(path))
+        self.assertRaises(sharedcache.fm.NeedToModifyReadOnlyFileManager,
+            ro_cache.insert, h, path)
+
+
+class CacheTracker(progress.QuietProgressTracker):
+    """A progress tracker that records the number of files downloaded and
+    found in a download cache when downloading completes."""
+
+    def download_done(self, dryrun=False):
+        progress.QuietProgressTracker.download_done(self,
+            dryrun=dryrun)
+        self.dl_result = (self.dl_files.items,
+            self.dl_cache_files.items, self._dl_cache_msg())
+
+
+class TestSharedCacheImages(pkg5unittest.SingleDepotTestCase):
+
+    foo10 = """
+            open foo@1.0,5.11-0
+            add dir mode=0755 owner=root group=bin path=/lib
+            add file tmp/libc.so.1 mode=0555 owner=root group=bin path=/lib/libc.so.1
+            add file tmp/cat mode=0555 owner=root group=bin path=/lib/cat
+            close """
+
+    misc_files = {
+        "tmp/libc.so.1": "libc",
+        "tmp/cat": "cat",
+    }
+
+    def setUp(self):
+        pkg5unittest.SingleDepotTestCase.setUp(self, start_depot=True,
+            image_count=2)
+        self.make_misc_files(self.misc_files)
+        self.pkgsend_bulk(self.durl, self.foo10)
+        self.cache_dir = os.path.join(self.test_root, "shared")
+
+    def __install(self, ii):
+        """Create image 'ii' using the shared cache, install foo in it,
+        and return the progress tracker used to do so."""
+
+        self.set_image(ii)
+        api_obj = self.image_create(self.durl)
+        api_obj.img.set_property(imageconfig.SHARED_CACHE_DIR,
+            self.cache_dir)
+
+        progtrack = CacheTracker()
+        api_obj = api.ImageInterface(self.img_path(),
+            pkg5unittest.CLIENT_API_VERSION, progtrack, lambda x: False,
+            pkg5unittest.PKG_CLIENT_NAME,
+            cmdpath=os.path.join(self.img_path(), "pkg"))
+        self._api_install(api_obj, ["foo"])
+        return api_obj, progtrack
+
+    def __cached(self, img):
+        """Returns the hashes of the content in the image's own
+        caches."""
+
+        found = []
+        for path, readonly, pub, layout in img.get_cachedirs():
+            for dirpath, dirnames, filenames in os.walk(path):
+                found.extend(filenames)
+        return found
+
+    def test_shared_cache(self):
+        """Verify that content downloaded for one image is stored in the
+        shared cache, kept there when the operation succeeds, and used
+        by other images."""
+
+        api_obj, progtrack = self.__install(0)
+        img = api_obj.img
+        self.assertEqual(img.get_shared_cachedir(),
+            (self.cache_dir, imageconfig.SHARED_CACHE_SIZE_DEFAULT *
+            1024 * 1024))
+        self.assertEqual(progtrack.dl_result, (2, 0, None))
+        self.assertEqual(self.__cached(img), [])
+        shared = []
+        for dirpath, dirnames, filenames in os.walk(self.cache_dir):
+            shared.extend(f for f in filenames if f != "lock")
+        self.assertEqual(len(shared), 2)
+
+        api_obj, progtrack = self.__install(1)
+        nfiles, hits, msg = progtrack.dl_result
+        self.assertEqual((nfiles, hits), (2, 2))
+        self.assertTrue(msg.startswith("Download cache: 2 hits "))
+        self.assertTrue(msg.endswith(", 0 misses"))
+        self.assertEqual(self.__cached(api_obj.img), [])
+        self.assertEqual(misc.force_str(open(os.path.join(
+            self.img_path(), "lib", "cat")).read()), "cat")
+
+        # The shared cache isn't used if the user has chosen another.
+        os.environ["PKG_CACHEDIR"] = os.path.join(self.test_root,
+            "user")
+        try:
+            api_obj = self.get_img_api_obj()
+            self.assertEqual(api_obj.img.get_shared_cachedir(),
+                (None, None))
+        finally:
+            del os.environ["PKG_CACHEDIR"]
+
+
+if __name__ == "__main__":
+    unittest.main()
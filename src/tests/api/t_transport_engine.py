@@ -0,0 +1,218 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+from . import testutils
+if __name__ == "__main__":
+    testutils.setup_environment("../../../proto")
+import pkg5unittest
+
+import http.server
+import os
+import re
+import threading
+import unittest
+
+import pkg.client.publisher as publisher
+import pkg.client.transport.engine as engine
+import pkg.client.transport.transport as transport
+from pkg.client import global_settings
+
+CONTENT = bytes(range(256)) * 256
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serves CONTENT, breaking off the response after 'cutoff' bytes
+    the first time it's requested, and honouring Range requests only if
+    'ranges' is set."""
+
+    def do_GET(self):
+        srv = self.server
+        srv.ranges_seen.append(self.headers.get("Range"))
+        m = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if m and srv.ranges:
+            start = int(m.group(1))
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {0}-{1}/{2}".format(
+                start, len(CONTENT) - 1, len(CONTENT)))
+        else:
+            start = 0
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(CONTENT) - start))
+        self.end_headers()
+
+        if srv.cutoff:
+            self.wfile.write(CONTENT[start:srv.cutoff])
+            srv.cutoff = None
+            self.close_connection = True
+            return
+        self.wfile.write(CONTENT[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class TestResumableDownloads(pkg5unittest.Pkg5TestCase):
+
+    def setUp(self):
+        pkg5unittest.Pkg5TestCase.setUp(self)
+        self.__resume_min = global_settings.pkg_client_resume_min_size
+        global_settings.pkg_client_resume_min_size = 1024
+
+        self.server = http.server.ThreadingHTTPServer(("localhost", 0),
+            RangeHandler)
+        self.server.ranges = True
+        self.server.ranges_seen = []
+        self.server.cutoff = None
+        threading.Thread(target=self.server.serve_forever,
+            daemon=True).start()
+        self.url = "http://localhost:{0:d}/".format(
+            self.server.server_address[1])
+
+        xport = transport.Transport(transport.GenericTransportCfg())
+        repouri = publisher.TransportRepoURI(self.url)
+        self.repourl = repouri.key()[0]
+        xport.stats.get_repostats([repouri])
+        self.engine = engine.CurlTransportEngine(xport)
+        self.path = os.path.join(self.test_root, "file")
+        self.partial = self.path + engine.PARTIAL_SUFFIX
+
+    def tearDown(self):
+        self.engine.shutdown()
+        self.server.shutdown()
+        self.server.server_close()
+        global_settings.pkg_client_resume_min_size = self.__resume_min
+        pkg5unittest.Pkg5TestCase.tearDown(self)
+
+    def __get(self, cutoff=None, resumable=True):
+        """Download CONTENT to self.path, breaking off after 'cutoff'
+        bytes, and return the retryable failures."""
+
+        self.server.cutoff = cutoff
+        self.engine.add_url(self.url + "file/0/content",
+            filepath=self.path, repourl=self.repourl,
+            resumable=resumable)
+        while self.engine.pending:
+            self.engine.run()
+        return self.engine.check_status()
+
+    def __check_content(self):
+        self.assertTrue(not os.path.exists(self.partial))
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_resume(self):
+        """Verify that an interrupted download is kept and that a retry
+        asks for just the rest of it."""
+
+        failures = self.__get(cutoff=40000)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0].retryable)
+        self.assertEqual(os.stat(self.path).st_size, 40000)
+        self.assertTrue(os.path.exists(self.partial))
+
+        # Even a resumed download can be interrupted.
+        failures = self.__get(cutoff=50000)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(os.stat(self.path).st_size, 50000)
+
+        self.assertEqual(self.__get(), [])
+        self.assertEqual(self.server.ranges_seen,
+            [None, "bytes=40000-", "bytes=50000-"])
+        self.__check_content()
+
+    def test_not_resumed(self):
+        """Verify that interrupted downloads are discarded if they
+        aren't resumable or are too small to be worth keeping."""
+
+        self.__get(cutoff=40000, resumable=False)
+        self.assertTrue(not os.path.exists(self.path))
+
+        global_settings.pkg_client_resume_min_size = 50000
+        self.__get(cutoff=40000)
+        self.assertTrue(not os.path.exists(self.path))
+        self.assertTrue(not os.path.exists(self.partial))
+
+        self.assertEqual(self.__get(), [])
+        self.assertEqual(self.server.ranges_seen, [None, None, None])
+        self.__check_content()
+
+    def test_stale_partial(self):
+        """Verify that a download starts over if the partial content
+        recorded doesn't match what's on disk or the server doesn't
+        support ranges."""
+
+        self.__get(cutoff=40000)
+        with open(self.path, "ab") as f:
+            f.write(b"x")
+        self.assertEqual(self.__get(), [])
+        self.assertEqual(self.server.ranges_seen, [None, None])
+        self.__check_content()
+
+        os.remove(self.path)
+        self.__get(cutoff=40000)
+        self.server.ranges = False
+        failures = self.__get()
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0].retryable)
+        self.assertTrue(not os.path.exists(self.path))
+        self.assertTrue(not os.path.exists(self.partial))
+        self.assertEqual(self.__get(), [])
+        self.__check_content()
+
+    def test_handles(self):
+        """Verify that curl handles are only created for the requests
+        performed at once, and that multiplexing doesn't raise the
+        number that may be beyond MAX_HANDLES."""
+
+        handles = lambda eng: len(eng._CurlTransportEngine__chandles)
+        self.assertEqual(handles(self.engine), 0)
+        self.assertEqual(self.__get(), [])
+        self.assertEqual(handles(self.engine), 1)
+
+        self.engine.set_concurrency(2)
+        for i in range(6):
+            self.engine.add_url(self.url + "file/0/content",
+                filepath="{0}.{1:d}".format(self.path, i),
+                repourl=self.repourl)
+        while self.engine.pending:
+            self.engine.run()
+        self.assertEqual(self.engine.check_status(), [])
+        self.assertEqual(handles(self.engine), 2)
+
+        eng = engine.CurlTransportEngine(
+            transport.Transport(transport.GenericTransportCfg()),
+            max_conn=20, max_streams=1000)
+        if engine.http2_supported():
+            self.assertEqual(eng.set_concurrency(),
+                engine.MAX_HANDLES)
+        else:
+            self.assertEqual(eng.set_concurrency(), 20)
+        self.assertEqual(handles(eng), 0)
+        eng.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+from . import testutils
+if __name__ == "__main__":
+    testutils.setup_environment("../../../proto")
+import pkg5unittest
+
+import http.client
+import pycurl
+import unittest
+
+import pkg.client.publisher as publisher
+import pkg.client.transport.exception as tx
+import pkg.client.transport.stats as tstats
+
+
+class TestRepoStats(pkg5unittest.Pkg5TestCase):
+
+    def __chunk(self, rs, nreqs, concurrency, fail=False):
+        rs.start_chunk()
+        if fail:
+            rs.record_error(decayable=True, congestion=True)
+        rs.end_chunk(nreqs, concurrency)
+
+    def test_chunk_size(self):
+        """Verify that chunk sizes grow while requests succeed and are
+        cut back when they fail."""
+
+        rs = tstats.RepoStats(
+            publisher.RepositoryURI("http://localhost:12001/"))
+        self.assertEqual(rs.chunk_size, tstats.CHUNK_MIN)
+        self.assertEqual(rs.concurrency, None)
+
+        # Chunk sizes double up to the maximum.
+        size = tstats.CHUNK_MIN
+        while size < tstats.CHUNK_MAX:
+            self.__chunk(rs, size, 20)
+            size = min(size * 2, tstats.CHUNK_MAX)
+            self.assertEqual(rs.chunk_size, size)
+        self.__chunk(rs, size, 20)
+        self.assertEqual(rs.chunk_size, tstats.CHUNK_MAX)
+        self.assertEqual(rs.concurrency, None)
+
+        # Failures that don't suggest the repository is overloaded,
+        # such as missing or corrupt files, change nothing.
+        rs.start_chunk()
+        rs.record_error(decayable=True)
+        rs.record_error(content=True)
+        rs.end_chunk(size, 20)
+        self.assertEqual(rs.chunk_size, tstats.CHUNK_MAX)
+        self.assertEqual(rs.concurrency, None)
+
+        # A failure halves the chunk size and the number of requests
+        # made at once.
+        self.__chunk(rs, size, 20, fail=True)
+        self.assertEqual(rs.chunk_size, tstats.CHUNK_MAX // 2)
+        self.assertEqual(rs.concurrency, 10)
+        self.__chunk(rs, rs.chunk_size, 10, fail=True)
+        self.assertEqual(rs.chunk_size, tstats.CHUNK_MAX // 4)
+        self.assertEqual(rs.concurrency, 5)
+
+        # After that, they only grow additively.
+        self.__chunk(rs, rs.chunk_size, 5)
+        self.assertEqual(rs.chunk_size,
+            tstats.CHUNK_MAX // 4 + tstats.CHUNK_MIN)
+        self.assertEqual(rs.concurrency, 6)
+
+        # Neither falls below its minimum.
+        for i in range(20):
+            self.__chunk(rs, rs.chunk_size, rs.concurrency,
+                fail=True)
+        self.assertEqual(rs.chunk_size, tstats.CHUNK_MIN)
+        self.assertEqual(rs.concurrency, 1)
+
+        # The limit on concurrency is lifted once it exceeds what
+        # the transport could use.
+        self.__chunk(rs, rs.chunk_size, 1)
+        self.assertEqual(rs.concurrency, 2)
+        self.__chunk(rs, rs.chunk_size, 1)
+        self.assertEqual(rs.concurrency, None)
+
+        # Chunk statistics survive a reset.
+        size = rs.chunk_size
+        rs.reset()
+        self.assertEqual(rs.chunk_size, size)
+
+        # Nothing changes unless a chunk was started.
+        rs.end_chunk(size, 20)
+        self.assertEqual(rs.chunk_size, size)
+
+    def test_congestion_errors(self):
+        """Verify which transport errors are taken as a sign that a
+        repository is overloaded."""
+
+        for code in (http.client.SERVICE_UNAVAILABLE,
+            http.client.GATEWAY_TIMEOUT,
+            http.client.TOO_MANY_REQUESTS):
+            self.assertTrue(tx.TransportProtoError("https",
+                code).congestion)
+        for code in (http.client.NOT_FOUND, http.client.FORBIDDEN):
+            self.assertFalse(tx.TransportProtoError("https",
+                code).congestion)
+        self.assertFalse(tx.TransportProtoError("file",
+            pycurl.E_FILE_COULDNT_READ_FILE).congestion)
+
+        for code in (pycurl.E_OPERATION_TIMEOUTED,
+            pycurl.E_COULDNT_CONNECT, pycurl.E_RECV_ERROR):
+            self.assertTrue(tx.TransportFrameworkError(
+                code).congestion)
+        self.assertFalse(tx.TransportFrameworkError(
+            pycurl.E_COULDNT_RESOLVE_HOST).congestion)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+from . import testutils
+if __name__ == "__main__":
+    testutils.setup_environment("../../../proto")
+import pkg5unittest
+
+import gzip
+import hashlib
+import os
+import threading
+import unittest
+
+import pkg.client.api_errors as apx
+import pkg.client.transport.exception as tx
+import pkg.client.transport.transport as transport
+import pkg.misc as misc
+
+
+class TestVerifyWorkers(pkg5unittest.SingleDepotTestCase):
+
+    foo10 = """
+            open foo@1.0,5.11-0
+            add dir mode=0755 owner=root group=bin path=/lib
+            add file tmp/libc.so.1 mode=0555 owner=root group=bin path=/lib/libc.so.1
+            add file tmp/cat mode=0555 owner=root group=bin path=/lib/cat
+            add file tmp/ls mode=0555 owner=root group=bin path=/lib/ls
+            close """
+
+    misc_files = {
+        "tmp/libc.so.1": "libc",
+        "tmp/cat": "cat",
+        "tmp/ls": "ls",
+    }
+
+    def setUp(self):
+        pkg5unittest.SingleDepotTestCase.setUp(self, start_depot=True)
+        self.make_misc_files(self.misc_files)
+        self.pkgsend_bulk(self.durl, self.foo10)
+        self.image_create(self.durl)
+
+        # Record the threads that content is verified on.
+        self.verified = []
+        self.__verify_content = transport.Transport._verify_content
+
+        def verify_content(xport, action, filepath):
+            self.verified.append((os.path.basename(filepath),
+                threading.current_thread().name))
+            return self.__verify_content(xport, action, filepath)
+
+        transport.Transport._verify_content = verify_content
+        self.__workers = transport.VERIFY_WORKERS
+
+    def tearDown(self):
+        transport.Transport._verify_content = self.__verify_content
+        transport.VERIFY_WORKERS = self.__workers
+        pkg5unittest.SingleDepotTestCase.tearDown(self)
+
+    def __hash(self, name):
+        return hashlib.sha1(misc.force_bytes(
+            self.misc_files[name])).hexdigest()
+
+    def test_workers(self):
+        """Verify that retrieved content is verified by worker
+        threads, and that content that fails verification is retrieved
+        again and then reported as it was before."""
+
+        transport.VERIFY_WORKERS = 2
+
+        # Replace the repository's copy of one file with something
+        # else.
+        bad = self.__hash("tmp/cat")
+        for dirpath, dirnames, filenames in os.walk(
+            self.dc.get_repodir()):
+            if bad in filenames:
+                bad_path = os.path.join(dirpath, bad)
+        with open(bad_path, "rb") as f:
+            good = f.read()
+        with gzip.open(bad_path, "wb") as f:
+            f.write(b"dog")
+
+        api_obj = self.get_img_api_obj()
+        try:
+            self._api_install(api_obj, ["foo"])
+        except apx.TransportError as e:
+            self.assertTrue(isinstance(e, tx.TransportFailures))
+            self.assertTrue(any(
+                isinstance(f, tx.InvalidContentException)
+                for f in e.exceptions))
+        else:
+            self.fail("corrupt content was installed")
+
+        self.assertTrue(self.verified)
+        self.assertTrue(all(name.startswith("pkg-verify")
+            for h, name in self.verified))
+        # The bad file was retrieved and verified more than once.
+        self.assertTrue(len([h for h, name in self.verified
+            if h == bad]) > 1)
+
+        # Once the content is fixed, the install succeeds.
+        with open(bad_path, "wb") as f:
+            f.write(good)
+        api_obj.reset()
+        self._api_install(api_obj, ["foo"])
+        self.assertEqual(misc.force_str(open(os.path.join(
+            self.img_path(), "lib", "cat")).read()), "cat")
+
+    def test_no_workers(self):
+        """Verify that no worker threads are used on a single processor
+        system, and that content is then verified after retrieval on
+        the thread driving the engine."""
+
+        self.assertEqual(transport._verify_workers(None), 0)
+        self.assertEqual(transport._verify_workers(1), 0)
+        self.assertEqual(transport._verify_workers(2), 2)
+        self.assertEqual(transport._verify_workers(64), 8)
+
+        transport.VERIFY_WORKERS = transport._verify_workers(1)
+        api_obj = self.get_img_api_obj()
+        self._api_install(api_obj, ["foo"])
+        self.assertEqual(len(self.verified), 3)
+        self.assertTrue(all(name == threading.current_thread().name
+            for h, name in self.verified))
+
+
+if __name__ == "__main__":
+    unittest.main()
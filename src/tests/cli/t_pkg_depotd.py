@@ -30,7 +30,10 @@ if __name__ == "__main__":
 import pkg5unittest
 
 import datetime
+import gzip
+import lzma
 import os
+import rapidjson as json
 import shutil
 import sys
 import tempfile
@@ -40,7 +43,7 @@ import http.client
 
 from urllib.error import HTTPError, URLError
 from urllib.parse import quote, urljoin
-from urllib.request import urlopen
+from urllib.request import Request, urlopen
 
 import pkg.client.publisher as publisher
 import depotcontroller as dc
@@ -210,6 +213,87 @@ class TestPkgDepot(pkg5unittest.SingleDepotTestCase):
         repourl = urljoin(depot_url, "info/0/{0}".format(plist[0]))
         urlopen(repourl)
 
+    def test_catalog_compression(self):
+        """Verify that catalog files and update logs are compressed
+        when the client accepts it, and that all of the update logs
+        needed can be retrieved using a single request."""
+
+        depot_url = self.dc.get_depot_url()
+        self.pkgsend_bulk(depot_url, (self.foo10, self.bar10))
+
+        def get(req_path, encoding=None):
+            req = Request(urljoin(depot_url, req_path))
+            if encoding:
+                req.add_header("Accept-Encoding", encoding)
+            res = urlopen(req)
+            self.assertEqual(res.info().get("Vary"),
+                "Accept-Encoding")
+            return res.info().get("Content-Encoding"), res.read()
+
+        self.assertTrue(b"updatelog 0" in
+            urlopen(urljoin(depot_url, "versions/0/")).read())
+
+        enc, attrs = get("catalog/1/catalog.attrs")
+        self.assertEqual(enc, None)
+        decompress = {
+            None: bytes,
+            "gzip": gzip.decompress,
+            "xz": lzma.decompress,
+        }
+
+        # Data is only compressed using xz in the background, so until
+        # that's done it's returned uncompressed.
+        enc, data = get("catalog/1/catalog.attrs", "xz")
+        self.assertEqual(enc, None)
+        self.assertEqual(data, attrs)
+        for i in range(100):
+            enc, data = get("catalog/1/catalog.attrs", "xz")
+            self.assertEqual(decompress[enc](data), attrs)
+            if enc == "xz":
+                break
+            time.sleep(0.1)
+        self.assertEqual(enc, "xz")
+
+        for accepted, expected in (
+            ("gzip", "gzip"),
+            ("xz", "xz"),
+            ("gzip, xz", "xz"),
+            ("gzip, xz;q=0", "gzip")):
+            # Retrieved twice so that the cached copy is used too.
+            for i in range(2):
+                enc, data = get("catalog/1/catalog.attrs",
+                    accepted)
+                self.assertEqual(enc, expected)
+                self.assertEqual(decompress[enc](data), attrs)
+
+        # Unsupported encodings are ignored.
+        self.assertEqual(get("catalog/1/catalog.attrs", "br"),
+            (None, attrs))
+
+        # Every update log newer than (and including) the one requested
+        # should be returned.
+        names = sorted(json.loads(attrs)["updates"])
+        for encoding in (None, "gzip"):
+            enc, data = get("updatelog/0/{0}".format(names[0]),
+                encoding)
+            self.assertEqual(enc, encoding)
+            updates = json.loads(decompress[enc](data))
+            self.assertEqual(sorted(updates), names)
+            for name in names:
+                self.assertEqual(updates[name], json.loads(
+                    get("catalog/1/{0}".format(name))[1]))
+
+        enc, data = get("updatelog/0/{0}".format(names[-1]))
+        self.assertEqual(list(json.loads(data)), [names[-1]])
+
+        try:
+            get("updatelog/0/update.19700101T00Z.C")
+        except HTTPError as e:
+            self.assertEqual(e.code, http.client.NOT_FOUND)
+        else:
+            raise RuntimeError("Expected 404 for unknown update "
+                "log")
+
     def test_bug_3739(self):
         """Verify that a depot will return a 400 (Bad Request) error
         whenever it is provided malformed FMRIs."""
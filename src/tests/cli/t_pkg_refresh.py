@@ -20,21 +20,24 @@
 # CDDL HEADER END
 #
 
-# Copyright (c) 2008, 2025, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 
 from . import testutils
 if __name__ == "__main__":
     testutils.setup_environment("../../../proto")
 import pkg5unittest
 
+import datetime
 import hashlib
 import os
 import re
 import shutil
 import tempfile
 import unittest
+import unittest.mock
 
 import pkg.catalog as catalog
+import pkg.fmri as fmri
 import pkg.misc
 
 from pkg.client import global_settings
@@ -636,6 +639,61 @@ class TestPkgRefreshMulti(pkg5unittest.ManyDepotTestCase):
         shutil.copytree(old_cat, v1_cat.meta_root)
         self.pkg("refresh")
 
+    def test_catalog_v1_update_logs(self):
+        """Verify that when more than one catalog update log is needed
+        for an incremental refresh, they are retrieved using a single
+        request."""
+
+        dc = self.dcs[1]
+        self.pkgsend_bulk(self.durl1, self.foo10)
+        self.image_create(self.durl1, prefix="test1")
+
+        # Update logs are kept for each hour that the catalog changed
+        # in, so add packages to the repository's catalog as though
+        # they were published over the next two hours.
+        start = datetime.datetime.utcnow()
+        offset = []
+
+        class LaterDatetime(datetime.datetime):
+            @classmethod
+            def utcnow(cls):
+                return start + datetime.timedelta(hours=len(offset))
+
+        dc.stop()
+        meta_root = dc.get_repo().get_catalog("test1").meta_root
+        for ver in ("1.1", "1.2"):
+            offset.append(ver)
+            pfmri = fmri.PkgFmri("pkg://test1/foo@{0},5.11-0:"
+                "20260101T000000Z".format(ver))
+            v1_cat = catalog.Catalog(meta_root=meta_root,
+                log_updates=True)
+            with unittest.mock.patch.object(catalog.datetime,
+                "datetime", LaterDatetime):
+                v1_cat.add_package(pfmri)
+            v1_cat.save()
+        dc.start()
+
+        v1_cat = catalog.Catalog(meta_root=meta_root, read_only=True)
+        updates = sorted(v1_cat.updates)
+        self.assertEqual(len(updates), 3)
+
+        self.pkg("refresh")
+        self.pkg("list -afH pkg:/foo@1.1 pkg:/foo@1.2")
+
+        # Only the catalog attributes should have been retrieved using
+        # catalog/1; the two update logs that changed since the image
+        # was created should have been retrieved using a single
+        # updatelog/0 request.
+        returned = self.get_op_entries(dc, "catalog", "1")
+        self.assertEqual(returned[-1], "/catalog/1/catalog.attrs")
+        self.assertTrue(not [
+            r for r in returned
+            if r.startswith("/catalog/1/update.")
+        ])
+        returned = self.get_op_entries(dc, "updatelog", "0")
+        self.assertEqual(returned,
+            ["/updatelog/0/{0}".format(updates[1])])
+
     def test_multi_origin_refresh(self):
         """Test that refresh behaves correctly if some origins of a
         publisher are not reachable."""
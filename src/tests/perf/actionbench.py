@@ -21,7 +21,7 @@
 #
 
 #
-# Copyright (c) 2008, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2008, 2026, Oracle and/or its affiliates.
 #
 
 #
@@ -52,6 +52,25 @@ if __name__ == "__main__":
             import sys
             sys.exit(0)
 
+    # Lazily created actions only have their key attribute decoded until
+    # any of their other attributes are needed.
+    str1l = str1.replace(")", ", lazy=True)")
+    for name, bstr in (
+        ("lazy action creation", str1l),
+        ("lazy action creation + key attribute value",
+            str1l + "; action.key_attr_value()"),
+        ("lazy action creation + all attributes",
+            str1l + "; action.attrs")):
+        print(name)
+        for i in (1, 2, 3):
+            try:
+                t = timeit.Timer(bstr, setup1).timeit(n)
+                print("{0:>20f}  {1:>8d} actions/sec".format(t,
+                    int(n // t)))
+            except KeyboardInterrupt:
+                import sys
+                sys.exit(0)
+
     setup2 = """import pkg.actions as actions
 a1 = actions.fromstr("file 1234 group=bin mode=0755 owner=root path=usr/lib/libzonecfg.so.1")
 a2 = actions.fromstr("dir group=bin mode=0755 owner=root path=usr/lib/libzonecfg.so.2")
@@ -226,6 +245,23 @@ mf.set_content(m)
             print("{0:>20f} {1:>8d} manifest contents loads/sec ({2:d} actions/sec)".format(
                 t, int(n // t), int((n * 60) // t)))
 
+        # Retrieving only the paths of the files and directories in a
+        # manifest (like the depot does for package information).
+        str7 = """
+mf = manifest.Manifest()
+mf.set_content(m, lazy={0})
+for atype in ("file", "dir"):
+    for p in mf.gen_key_attribute_value_by_type(atype):
+        pass
+"""
+        for lazy in (False, True):
+            print("manifest contents loading + paths{0}".format(
+                " (lazy)" if lazy else ""))
+            for i in (1, 2, 3):
+                t = timeit.Timer(str7.format(lazy), setup5).timeit(n)
+                print("{0:>20f} {1:>8d} manifest contents loads/sec ({2:d} actions/sec)".format(
+                    t, int(n // t), int((n * 60) // t)))
+
         n = 1000000
         str6 = "id(a1)"
         print("id() speed")
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# catalogbench - benchmark catalog part loading using the JSON (with and
+# without a stem offset index) and binary catalog part formats
+#
+
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import pkg.catalog as catalog
+import pkg.fmri as fmri
+
+# Number of package stems and versions per stem to populate the
+# benchmark catalog with.
+NSTEMS = 10000
+NVERS = 5
+
+
+def populate(cpath):
+    """Create a catalog with binary parts at 'cpath'."""
+
+    cat = catalog.Catalog(batch_mode=True, meta_root=cpath, sign=False,
+        binary=True)
+    base = cat.get_part("catalog.base.C")
+    for i in range(NSTEMS):
+        for v in range(NVERS):
+            base.add(metadata={
+                "metadata": { "states": [2, 3] },
+                "signature-sha-1":
+                    "8a2e1bbc0d6c7f3e6dfe8e4d7c4be4b2b0c24fe1",
+            }, pub="benchmark", stem="system/bench{0:d}".format(i),
+                ver="0.5.11,5.11-0.{0:d}:20260101T000000Z".format(v))
+    cat.finalize()
+    cat.save()
+
+
+if __name__ == "__main__":
+
+    cpath = tempfile.mkdtemp(prefix="catalogbench.")
+    populate(cpath)
+
+    # A copy of the catalog without stem offset indices.
+    npath = os.path.join(cpath, "noindex")
+    os.mkdir(npath)
+    for fname in os.listdir(cpath):
+        if fname.startswith("catalog.") and \
+            not fname.endswith(".idx"):
+            shutil.copy2(os.path.join(cpath, fname), npath)
+
+    setup = """
+import pkg.catalog as catalog
+cpath = "{0}"
+"""
+
+    stem = "system/bench{0:d}".format(NSTEMS // 2)
+    ver = "0.5.11,5.11-0.0:20260101T000000Z"
+
+    # Cold: a new Catalog object is created, its base part loaded and
+    # a single entry retrieved (like a single package operation).
+    cold = """
+cat = catalog.Catalog(meta_root=cpath, read_only=True, binary={0})
+cat.get_part("catalog.base.C", must_exist=True).get_entry(
+    pub="benchmark", stem="{1}", ver="{2}")
+"""
+
+    # Full: a new Catalog object is created and every entry visited.
+    full = """
+cat = catalog.Catalog(meta_root=cpath, read_only=True, binary={0})
+for t, entry in cat.get_part("catalog.base.C",
+    must_exist=True).tuple_entries():
+    pass
+"""
+
+    # Warm: entries are retrieved from an already loaded part.
+    wsetup = setup + """
+cat = catalog.Catalog(meta_root=cpath, read_only=True, binary={1})
+part = cat.get_part("catalog.base.C", must_exist=True)
+part.load()
+"""
+    warm = """
+part.get_entry(pub="benchmark", stem="{1}", ver="{2}")
+"""
+
+    benches = [
+        ("cold get_entry", 20, setup, cold),
+        ("cold load + all entries", 5, setup, full),
+        ("warm get_entry", 100000, wsetup, warm),
+    ]
+
+    try:
+        print("{0:d} stems, {1:d} versions per stem".format(NSTEMS,
+            NVERS))
+        for name, n, bsetup, bstr in benches:
+            for fmt, path, binary in (
+                ("json", npath, False),
+                ("json, stem offset index", cpath, False),
+                ("binary", cpath, True)):
+                print("{0} ({1})".format(name, fmt))
+                for i in (1, 2, 3):
+                    t = timeit.Timer(bstr.format(binary, stem,
+                        ver), bsetup.format(path,
+                        binary)).timeit(n)
+                    print("{0:>20f} {1:>8d} /sec".format(t,
+                        int(n // t)))
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        shutil.rmtree(cpath)
@@ -0,0 +1,168 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# catalogxferbench - benchmark retrieval of catalog parts and update logs
+# from a local depot server with and without compression, and of update
+# logs using catalog/1 and updatelog/0
+#
+# Usage: catalogxferbench.py [path to pkg.depotd]
+#
+
+import datetime
+import gettext
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest.mock
+
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+
+import pkg.catalog as catalog
+import pkg.fmri as fmri
+import pkg.server.repository as sr
+
+# Number of packages to populate the benchmark catalog with, and the
+# number of hours (and so update logs) their publication is spread over.
+NPKGS = 10000
+NHOURS = 24
+
+# Number of times each retrieval is performed.
+NREQS = 20
+
+PORT = 12321
+
+
+def populate(rpath):
+    """Create a repository at 'rpath' and populate its catalog."""
+
+    repo = sr.repository_create(rpath, properties={
+        "publisher": { "prefix": "benchmark" } })
+    croot = repo.get_pub_rstore("benchmark").catalog_root
+
+    # Update logs are kept for each hour the catalog was changed in, so
+    # add packages as though they were published over several hours.
+    start = datetime.datetime.utcnow() - datetime.timedelta(hours=NHOURS)
+    hour = []
+
+    class BenchDatetime(datetime.datetime):
+        @classmethod
+        def utcnow(cls):
+            return start + datetime.timedelta(hours=len(hour))
+
+    cat = catalog.Catalog(meta_root=croot, log_updates=True)
+    for i in range(NPKGS):
+        if i % (NPKGS // NHOURS) == 0:
+            hour.append(i)
+        pfmri = fmri.PkgFmri("pkg://benchmark/system/bench{0:d}@"
+            "0.5.11,5.11-0.1:20260101T000000Z".format(i))
+        with unittest.mock.patch.object(catalog.datetime, "datetime",
+            BenchDatetime):
+            cat.add_package(pfmri)
+    cat.save()
+    return sorted(cat.updates)
+
+
+def fetch(url, encoding=None):
+    """Retrieve 'url' and return the number of bytes transferred."""
+
+    req = Request(url)
+    if encoding:
+        req.add_header("Accept-Encoding", encoding)
+    return len(urlopen(req).read())
+
+
+if __name__ == "__main__":
+
+    gettext.install("pkg", "/usr/share/locale")
+
+    depotd = "/usr/lib/pkg.depotd"
+    if len(sys.argv) > 1:
+        depotd = sys.argv[1]
+
+    tdir = tempfile.mkdtemp(prefix="catalogxferbench.")
+    rpath = os.path.join(tdir, "repo")
+    updates = populate(rpath)
+
+    depot = subprocess.Popen([sys.executable, depotd, "-d", rpath, "-p",
+        str(PORT), "--readonly", "--log-access=none"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True)
+    durl = "http://localhost:{0:d}/".format(PORT)
+
+    try:
+        # Wait for the depot to start.
+        for i in range(30):
+            try:
+                fetch(durl + "versions/0/")
+                break
+            except URLError:
+                time.sleep(1)
+
+        # The retrieval of the update logs that a client needs after
+        # not having refreshed for several hours.
+        since = updates[NHOURS // 2]
+        needed = [u for u in updates if u >= since]
+
+        benches = [
+            ("catalog.base.C", ["catalog/1/catalog.base.C"]),
+            ("{0:d} update logs using catalog/1".format(len(needed)),
+                ["catalog/1/{0}".format(u) for u in needed]),
+            ("{0:d} update logs using updatelog/0".format(len(needed)),
+                ["updatelog/0/{0}".format(since)]),
+        ]
+
+        print("{0:d} packages, {1:d} update logs".format(NPKGS,
+            len(updates)))
+        for name, reqs in benches:
+            print(name)
+            for encoding in (None, "gzip", "xz"):
+                # The first retrieval populates the depot's cache
+                # of compressed catalog data.
+                for r in reqs:
+                    fetch(durl + r, encoding)
+
+                nbytes = 0
+                start = time.time()
+                for i in range(NREQS):
+                    for r in reqs:
+                        nbytes += fetch(durl + r, encoding)
+                t = time.time() - start
+                print("{0:>10} {1:>10d} bytes {2:>8.1f} "
+                    "retrievals/sec {3:>10.1f} KB/sec".format(
+                    encoding or "identity", nbytes // NREQS,
+                    NREQS / t, nbytes / t / 1024))
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        os.killpg(depot.pid, signal.SIGKILL)
+        depot.wait()
+        shutil.rmtree(tdir)
@@ -0,0 +1,93 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# diffbench - benchmark Manifest.difference() for large package updates
+#
+
+import sys
+import timeit
+
+# Number of files in the benchmark manifests (modeled on a large OS
+# package such as system/library) and the number of them that change
+# between the origin and destination versions.
+NFILES = 20000
+NCHANGED = 1000
+
+setup = """
+import pkg.manifest as manifest
+
+def gen(ver, changed):
+    lines = ["set name=pkg.fmri value=pkg:/system/bench@{{0:d}}".format(ver)]
+    for i in range({0:d} // 10):
+        lines.append("dir group=bin mode=0755 owner=root "
+            "path=usr/lib/d{{0:d}}".format(i))
+    for i in range({0:d}):
+        h = "{{0:040x}}".format(i * 7919 + (ver if i < changed else 0))
+        lines.append("file {{0}} chash={{1}} elfarch=i386 elfbits=64 "
+            "elfhash={{0}} group=bin mode=0555 owner=root "
+            "path=usr/lib/d{{2:d}}/f{{3:d}}.so.1 "
+            "pkg.content-hash=gelf:sha512t_256:{{1}}{{1}} pkg.csize=1234 "
+            "pkg.size=5678 variant.arch=i386".format(h, h[::-1],
+            i % ({0:d} // 10), i))
+    for i in range({0:d} // 5):
+        lines.append("link path=usr/lib/f{{0:d}}.so "
+            "target=d{{1:d}}/f{{0:d}}.so.1".format(i, i % ({0:d} // 10)))
+        lines.append("link path=usr/bin/cmd{{0:d}} "
+            "target=../lib/f{{0:d}}.so mediator=bench "
+            "mediator-version=1".format(i))
+    for i in range({0:d} // 20):
+        lines.append("depend fmri=pkg:/dep{{0:d}}@1.0 "
+            "type=require".format(i))
+    m = manifest.Manifest()
+    m.set_content("\\n".join(lines))
+    return m
+
+origin = gen(1, 0)
+dest = gen(2, {1:d})
+""".format(NFILES, NCHANGED)
+
+if __name__ == "__main__":
+
+    benches = [
+        ("update", "dest.difference(origin)"),
+        ("install", "dest.difference(manifest.null)"),
+        ("uninstall", "manifest.null.difference(origin)"),
+    ]
+
+    n = 10
+
+    try:
+        print("{0:d} files, {1:d} changed".format(NFILES, NCHANGED))
+        for name, stmt in benches:
+            print("manifest difference - {0}".format(name))
+            for i in (1, 2, 3):
+                t = timeit.Timer(stmt, setup).timeit(n)
+                print("{0:>20f} {1:>8.1f} difference()/sec".format(
+                    t, n / t))
+    except KeyboardInterrupt:
+        sys.exit(0)
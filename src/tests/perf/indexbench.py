@@ -0,0 +1,104 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# indexbench - benchmark rebuilding a search index from scratch using
+# varying numbers of worker processes
+#
+
+import gettext
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import pkg.fmri as fmri
+import pkg.indexer as indexer
+
+# Number of packages, and actions per package, to index.
+NPKGS = 3000
+NACTIONS = 60
+
+
+def populate(mpath):
+    """Write the manifests to index into 'mpath' and return a dictionary
+    mapping their FMRIs to their paths."""
+
+    rand = random.Random(0)
+    words = [
+        "".join(rand.choice("abcdefghijklmnop") for i in range(6))
+        for i in range(20000)
+    ]
+    paths = {}
+    for i in range(NPKGS):
+        pfmri = fmri.PkgFmri("pkg://test/pkg{0:d}@1.{1:d},5.11-0:"
+            "20260101T000000Z".format(i % 700, i))
+        path = os.path.join(mpath, str(i))
+        with open(path, "w") as fh:
+            fh.write("set name=pkg.fmri value={0}\n".format(pfmri))
+            fh.write("set name=pkg.description value=\"{0}\"\n".format(
+                " ".join(rand.choice(words) for j in range(30))))
+            for j in range(NACTIONS):
+                fh.write("file {0} group=bin mode=0444 owner=root "
+                    "path=usr/{1}/{2}.{3:d} pkg.size={4:d}\n".format(
+                    rand.choice(words), rand.choice(words),
+                    rand.choice(words), j, rand.randint(1, 99999)))
+        paths[pfmri] = path
+    return paths
+
+
+if __name__ == "__main__":
+
+    gettext.install("pkg", "/usr/share/locale")
+
+    tmp = tempfile.mkdtemp(prefix="indexbench.")
+    try:
+        mpath = os.path.join(tmp, "manifests")
+        os.mkdir(mpath)
+        paths = populate(mpath)
+        fmris = list(paths)
+
+        print("{0:d} packages, {1:d} processors".format(NPKGS,
+            os.cpu_count() or 1))
+        workers = sorted(set([1, 2, 4, os.cpu_count() or 1]))
+        for n in workers:
+            print("rebuild ({0:d} workers)".format(n))
+            for i in (1, 2, 3):
+                ind_dir = os.path.join(tmp, "index")
+                ind = indexer.Indexer(ind_dir, None, paths.get,
+                    workers=n)
+                start = time.time()
+                ind.rebuild_index_from_scratch(fmris)
+                t = time.time() - start
+                print("{0:>20f} {1:>8d} pkgs/sec".format(t,
+                    int(NPKGS // t)))
+                shutil.rmtree(ind_dir)
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        shutil.rmtree(tmp)
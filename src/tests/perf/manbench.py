@@ -21,15 +21,16 @@
 #
 
 #
-# Copyright (c) 2014, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2014, 2026, Oracle and/or its affiliates.
 #
 
 #
 # manbench - benchmark manifest operations
 #
 
+import shutil
 import sys
-
+import tempfile
 import timeit
 
 #
@@ -118,6 +119,27 @@ for act in mf.gen_actions(attr_match={ "mode": "0444" }):
         continue
 """
 
+    # A factored manifest is created in a cache directory and each run
+    # loads a new FactoredManifest object from it (as a new process
+    # would) and generates actions of a single type from the per-type
+    # cache files; the text path is measured by disabling the binary
+    # cache, so it must be measured last.
+    cache_root = tempfile.mkdtemp(prefix="manbench.")
+    setup2 = setup1 + """
+import pkg.actions as actions
+cache_root = "{0}"
+manifest.FactoredManifest("pkg:/manbench@1.0", cache_root, contents=m)
+if {1}:
+    manifest.FactoredManifest._FactoredManifest__load_binary_cache = \\
+        lambda self, atype, st: None
+"""
+    str3 = """
+fm = manifest.FactoredManifest("pkg:/manbench@1.0", cache_root)
+for act in fm.gen_actions_by_type("file"):
+        continue
+"""
+    nfiles = sum(1 for l in setup1.splitlines() if l.startswith("file "))
+
     try:
         print("manifest gen_actions")
         for i in (1, 2, 3):
@@ -129,5 +151,16 @@ for act in mf.gen_actions(attr_match={ "mode": "0444" }):
             t = timeit.Timer(str2, setup1).timeit(n)
             print("{0:>20f} {1:>8d} manifest gen_actions()/sec " \
                 "({2:d} actions/sec)".format(t, int(n // t), int((n * 60) // t)))
+        for fmt, text in (("binary", False), ("text", True)):
+            print("factored manifest gen_actions_by_type - {0} "
+                "cache".format(fmt))
+            for i in (1, 2, 3):
+                t = timeit.Timer(str3, setup2.format(cache_root,
+                    text)).timeit(n)
+                print("{0:>20f} {1:>8d} factored manifest "
+                    "gen_actions_by_type()/sec ({2:d} actions/sec)".format(
+                    t, int(n // t), int((n * nfiles) // t)))
     except KeyboardInterrupt:
         sys.exit(0)
+    finally:
+        shutil.rmtree(cache_root)
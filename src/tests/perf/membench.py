@@ -21,13 +21,14 @@
 #
 
 #
-# Copyright (c) 2010, 2024, Oracle and/or its affiliates.
+# Copyright (c) 2010, 2026, Oracle and/or its affiliates.
 #
 
 #
 # membench - benchmark memory usage of various objects
 #
 
+import pkg.actions as actions
 import pkg.fmri as fmri
 import pkg.version as version
 import sys
@@ -59,8 +60,33 @@ def mfmri_different(num):
     return fmri.PkgFmri("pkg:/SUNWttf-google-{0:d}@0.5.11,5.11-0.{1:d}:{2:0=8d}T233516Z".format(num, num, num))
 
 
+def faction(num):
+    return actions.fromstr("file 2a4f3b7d8e5a1c3b0f9e2d4c6b8a0f1e3d5c7b9a "
+        "chash=8c1e0f6b4d2a9e7c5b3a1f0e8d6c4b2a0f9e7d5c group=bin "
+        "mode=0444 owner=root path=usr/share/lib/fonts/droid.ttf "
+        "pkg.csize=1048 pkg.size=2876")
+
+
+def faction_different(num):
+    return actions.fromstr("file {0:040x} chash={1:040x} group=bin "
+        "mode=0444 owner=root path=usr/share/lib/d{2:d}/f{3:d}.ttf "
+        "pkg.csize={4:d} pkg.size={5:d}".format(num, num * 7, num % 300,
+        num, num % 9973, num % 99991))
+
+
+def daction_different(num):
+    return actions.fromstr("dir group=bin mode=0755 owner=root "
+        "path=usr/share/lib/d{0:d}/sub{1:d}".format(num % 300, num))
+
+
+def depaction_different(num):
+    return actions.fromstr("depend fmri=pkg:/SUNWttf-google-{0:d}@0.5.11 "
+        "type=require variant.arch=i386".format(num % 2000))
+
+
 collection = []
-funcs = [dotseq, dotseq_different, vers, vers_different, mfmri, mfmri_different]
+funcs = [dotseq, dotseq_different, vers, vers_different, mfmri, mfmri_different,
+    faction, faction_different, daction_different, depaction_different]
 
 for func in funcs:
     print("#", func.__name__)
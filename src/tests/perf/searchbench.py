@@ -0,0 +1,141 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# searchbench - benchmark loading of, lookups in, and wildcard matching in
+# the search index's token byte offset file and binary token index
+#
+
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import pkg.search_storage as ss
+
+# Number of tokens to populate the benchmark index with.
+NTOKS = 500000
+
+
+def populate(ipath):
+    """Write the token byte offset file and binary token index for
+    an index at 'ipath'."""
+
+    text = ss.IndexStoreDictMutable(ss.BYTE_OFFSET_FILE)
+    binary = ss.IndexStoreTokenIndex(ss.TOKEN_INDEX_FILE)
+    text.open_out_file(ipath, 1)
+    binary.open_out_file(ipath, 1)
+    rand = random.Random(0)
+    toks = set()
+    while len(toks) < NTOKS:
+        toks.add("".join(rand.choice("abcdefghijklmnopqrstuvwxyz")
+            for i in range(rand.randint(4, 12))))
+    off = 0
+    for tok in sorted(toks):
+        text.write_entity(tok, off)
+        binary.write_entity(tok, off)
+        off += 120
+    text.close_file_handle()
+    binary.close_file_handle()
+
+
+if __name__ == "__main__":
+
+    ipath = tempfile.mkdtemp(prefix="searchbench.")
+    populate(ipath)
+
+    setup = """
+import pkg.search_storage as ss
+ipath = "{0}"
+def load():
+    d = ss.{1}(ss.{2})
+    d.open(ipath)
+    d.read_dict_file()
+    d.close_file_handle()
+    return d
+"""
+
+    # Cold: the index is loaded and a single token looked up (like the
+    # first search after the index has changed).
+    cold = """
+load().has_entity("search")
+"""
+
+    # Warm: tokens are looked up in an already loaded index.
+    warm = """
+d.has_entity("search")
+"""
+
+    # Glob: tokens matching a wildcard pattern are found in an already
+    # loaded index.
+    glob = """
+d.get_matching_ids("{0}", {1})
+"""
+
+    wsetup = setup + "d = load()\n"
+    benches = [
+        ("cold lookup", 5, setup, cold),
+        ("warm lookup", 100000, wsetup, warm),
+    ]
+    for pat, cs in (("sea*", True), ("sea*", False), ("se*", False),
+        ("*arch*", False), ("*ch", False), ("*", False)):
+        benches.append(("glob {0} ({1})".format(pat,
+            "case sensitive" if cs else "case insensitive"), 5,
+            wsetup, glob.format(pat, cs)))
+
+    fmts = [
+        ("text", "IndexStoreDictMutable", "BYTE_OFFSET_FILE"),
+        ("binary", "IndexStoreTokenIndex", "TOKEN_INDEX_FILE"),
+    ]
+
+    try:
+        print("{0:d} tokens".format(NTOKS))
+        for name, n, bsetup, bstr in benches:
+            for fmt, cls, fname in fmts:
+                print("{0} ({1})".format(name, fmt))
+                for i in (1, 2, 3):
+                    t = timeit.Timer(bstr, bsetup.format(
+                        ipath, cls, fname)).timeit(n)
+                    print("{0:>20f} {1:>8d} /sec".format(t,
+                        int(n // t)))
+
+        print("memory used by a loaded index")
+        for fmt, cls, fname in fmts:
+            d = getattr(ss, cls)(getattr(ss, fname))
+            tracemalloc.start()
+            d.open(ipath)
+            d.read_dict_file()
+            d.close_file_handle()
+            size, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("{0:>10} {1:>12d} bytes".format(fmt, size))
+            del d
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        shutil.rmtree(ipath)
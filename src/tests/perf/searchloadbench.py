@@ -0,0 +1,162 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# searchloadbench - benchmark search/1 requests made in parallel by
+# varying numbers of clients of a local depot server
+#
+# Usage: searchloadbench.py [path to pkg.depotd]
+#
+
+import concurrent.futures
+import gettext
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import urlopen
+
+import pkg.actions as actions
+import pkg.fmri as fmri
+import pkg.server.repository as sr
+
+# Number of packages, and actions per package, to publish.
+NPKGS = 500
+NACTIONS = 40
+
+# Number of search requests made by each client.
+NREQS = 50
+
+PORT = 12322
+
+
+def populate(rpath):
+    """Create a repository at 'rpath', publish the packages to search
+    and index them.  Returns the words used in the packages."""
+
+    repo = sr.repository_create(rpath, properties={
+        "publisher": { "prefix": "benchmark" } })
+    rand = random.Random(0)
+    words = [
+        "".join(rand.choice("abcdefghijklmnop") for i in range(6))
+        for i in range(5000)
+    ]
+    for i in range(NPKGS):
+        pfmri = fmri.PkgFmri("pkg://benchmark/bench{0:d}@1.0,5.11-0"
+            "".format(i))
+        tid = repo.open("5.11", pfmri)
+        repo.add(tid, actions.fromstr("set name=pkg.description "
+            "value=\"{0}\"".format(" ".join(
+            rand.choice(words) for j in range(10)))))
+        for j in range(NACTIONS):
+            repo.add(tid, actions.fromstr("dir group=bin mode=0755 "
+                "owner=root path=usr/{0}/{1}.{2:d}".format(
+                rand.choice(words), rand.choice(words), j)))
+        repo.close(tid)
+    repo.refresh_index(merge=True)
+    return words
+
+
+def search(durl, token, return_type):
+    """Search for 'token' and return the number of bytes of results."""
+
+    q = "False_{0:d}_None_None_{1}".format(return_type, token)
+    try:
+        return len(urlopen(durl + "search/1/" + quote(q, safe="")).read())
+    except HTTPError as e:
+        if e.code == 204:
+            return 0
+        raise
+
+
+def client(durl, tokens):
+    """Make the searches for 'tokens' and return the number of bytes of
+    results."""
+
+    return sum(search(durl, tok, rt) for tok, rt in tokens)
+
+
+if __name__ == "__main__":
+
+    gettext.install("pkg", "/usr/share/locale")
+
+    depotd = "/usr/lib/pkg.depotd"
+    if len(sys.argv) > 1:
+        depotd = sys.argv[1]
+
+    tdir = tempfile.mkdtemp(prefix="searchloadbench.")
+    rpath = os.path.join(tdir, "repo")
+    words = populate(rpath)
+
+    depot = subprocess.Popen([sys.executable, depotd, "-d", rpath, "-p",
+        str(PORT), "--readonly", "--log-access=none"],
+        env=dict(os.environ, PKGDEPOT_CONTROLLER="1"),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True)
+    durl = "http://localhost:{0:d}/".format(PORT)
+
+    try:
+        # Wait for the depot to start.
+        for i in range(30):
+            try:
+                urlopen(durl + "versions/0/").read()
+                break
+            except URLError:
+                time.sleep(1)
+
+        print("{0:d} packages, {1:d} processors".format(NPKGS,
+            os.cpu_count() or 1))
+        rand = random.Random(0)
+        for nclients in (1, 2, 4, 8, 16):
+            # Each search is of a different token, so that the
+            # depot's cache of search results isn't used.
+            reqs = [
+                [(rand.choice(words), rand.choice((1, 2)))
+                for j in range(NREQS)]
+                for i in range(nclients)
+            ]
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=nclients) as executor:
+                start = time.time()
+                nbytes = sum(executor.map(
+                    lambda r: client(durl, r), reqs))
+                t = time.time() - start
+            print("{0:>3d} clients {1:>8.1f} searches/sec "
+                "{2:>10.1f} KB/sec".format(nclients,
+                nclients * NREQS / t, nbytes / t / 1024))
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        os.killpg(depot.pid, signal.SIGKILL)
+        depot.wait()
+        shutil.rmtree(tdir)
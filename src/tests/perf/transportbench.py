@@ -0,0 +1,216 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# transportbench - benchmark the rate at which the transport engine
+# retrieves small files from a local TLS depot, with and without HTTP/2
+# multiplexing
+#
+# Usage: transportbench.py [path to pkg.depotd]
+#
+# pkg.depotd only speaks HTTP/1.1, so its results show the cost of falling
+# back from HTTP/2.  If nghttpd(1) is installed, the repository's files are
+# also served over HTTP/2 by it, as they would be by a front end such as
+# Apache with mod_http2.
+#
+
+import gettext
+import io
+import os
+import random
+import shutil
+import signal
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+
+from urllib.error import URLError
+from urllib.request import urlopen
+
+import pkg.actions as actions
+import pkg.client.publisher as publisher
+import pkg.client.transport.engine as engine
+import pkg.client.transport.stats as tstats
+import pkg.fmri as fmri
+import pkg.server.repository as sr
+
+from pkg.client.debugvalues import DebugValues
+
+# Number of packages, and files per package, to publish.
+NPKGS = 20
+NFILES = 50
+
+DEPOT_PORT = 12323
+H2_PORT = 12324
+
+
+class BenchTransport:
+    """The parts of a Transport used by the transport engine."""
+
+    def __init__(self, url, cadir):
+        self.stats = {
+            (url, None): tstats.RepoStats(publisher.RepositoryURI(url))
+        }
+        self.__cadir = cadir
+
+    def get_ca_dir(self):
+        return self.__cadir
+
+
+def populate(rpath):
+    """Create a repository at 'rpath' and publish the files to retrieve.
+    Returns the hashes of the files."""
+
+    repo = sr.repository_create(rpath, properties={
+        "publisher": { "prefix": "benchmark" } })
+    rand = random.Random(0)
+    hashes = []
+    for i in range(NPKGS):
+        pfmri = fmri.PkgFmri("pkg://benchmark/bench{0:d}@1.0,5.11-0"
+            "".format(i))
+        tid = repo.open("5.11", pfmri)
+        for j in range(NFILES):
+            data = bytes(rand.getrandbits(8)
+                for k in range(rand.randint(200, 4000)))
+            act = actions.fromstr("file NOHASH group=bin mode=0444 "
+                "owner=root path=usr/bench{0:d}/{1:d} pkg.size={2:d}"
+                "".format(i, j, len(data)),
+                data=lambda data=data: io.BytesIO(data))
+            repo.add(tid, act)
+            hashes.append(act.hash)
+        repo.close(tid)
+    return hashes, repo
+
+
+def make_cert(tdir):
+    """Create a self-signed certificate for localhost and return the
+    paths of it and its key."""
+
+    cert = os.path.join(tdir, "cert.pem")
+    key = os.path.join(tdir, "key.pem")
+    subprocess.check_call(["openssl", "req", "-x509", "-newkey",
+        "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+        "-addext", "subjectAltName=DNS:localhost", "-keyout", key,
+        "-out", cert], stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL)
+    return cert, key
+
+
+def fetch(url, hashes, cadir, streams):
+    """Retrieve the files with the given hashes from 'url' using a
+    transport engine multiplexing 'streams' requests over each
+    connection, and return the time taken."""
+
+    xport = BenchTransport(url, cadir)
+    eng = engine.CurlTransportEngine(xport, max_streams=streams)
+    start = time.time()
+    for h in hashes:
+        eng.add_url("{0}file/1/{1}".format(url, h),
+            writefunc=lambda data: None, repourl=url)
+    while eng.pending:
+        eng.run()
+    t = time.time() - start
+    failures = eng.check_status()
+    eng.shutdown()
+    if failures:
+        raise failures[0]
+    return t
+
+
+def wait_for(url):
+    """Wait for the server at 'url' to start."""
+
+    for i in range(30):
+        try:
+            urlopen(url, context=ssl.create_default_context(
+                cafile=DebugValues["ssl_ca_file"])).read()
+            return
+        except URLError:
+            time.sleep(1)
+        except Exception:
+            # Any response (e.g. a 404) means it has started.
+            return
+
+
+if __name__ == "__main__":
+
+    gettext.install("pkg", "/usr/share/locale")
+
+    depotd = "/usr/lib/pkg.depotd"
+    if len(sys.argv) > 1:
+        depotd = sys.argv[1]
+
+    tdir = tempfile.mkdtemp(prefix="transportbench.")
+    procs = []
+    try:
+        rpath = os.path.join(tdir, "repo")
+        hashes, repo = populate(rpath)
+        cert, key = make_cert(tdir)
+        DebugValues["ssl_ca_file"] = cert
+
+        servers = []
+        procs.append(subprocess.Popen([sys.executable, depotd, "-d",
+            rpath, "-p", str(DEPOT_PORT), "--readonly",
+            "--log-access=none", "--ssl-cert-file", cert,
+            "--ssl-key-file", key, "--ssl-dialog", "builtin"],
+            env=dict(os.environ, PKGDEPOT_CONTROLLER="1"),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True))
+        servers.append(("pkg.depotd (HTTP/1.1)",
+            "https://localhost:{0:d}/".format(DEPOT_PORT)))
+
+        if shutil.which("nghttpd"):
+            # Lay the files out as the depot presents them.
+            docroot = os.path.join(tdir, "htdocs")
+            os.makedirs(os.path.join(docroot, "file", "1"))
+            for h in hashes:
+                os.symlink(repo.file(h), os.path.join(docroot,
+                    "file", "1", h))
+            procs.append(subprocess.Popen(["nghttpd", "-d", docroot,
+                str(H2_PORT), key, cert], stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL, start_new_session=True))
+            servers.append(("nghttpd (HTTP/2)",
+                "https://localhost:{0:d}/".format(H2_PORT)))
+
+        print("{0:d} files, HTTP/2 {1}supported".format(len(hashes),
+            "" if engine.http2_supported() else "not "))
+        for name, url in servers:
+            wait_for(url)
+            print(name)
+            for streams in (0, 8, 32, 100):
+                t = min(fetch(url, hashes, tdir, streams)
+                    for i in (1, 2, 3))
+                print("{0:>4d} streams {1:>10.1f} requests/sec".format(
+                    streams, len(hashes) / t))
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        for p in procs:
+            os.killpg(p.pid, signal.SIGKILL)
+            p.wait()
+        shutil.rmtree(tdir)
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright (c) 2026, Oracle and/or its affiliates.
+#
+
+#
+# verifybench - benchmark the rate at which the transport retrieves and
+# verifies files from a local file:// repository, with content verified
+# on the thread driving the transport engine and by different numbers of
+# worker threads
+#
+# Usage: verifybench.py
+#
+
+import gettext
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import pkg.actions as actions
+import pkg.client.transport.transport as transport
+import pkg.fmri as fmri
+import pkg.manifest as manifest
+import pkg.server.repository as sr
+
+# Number of packages, files per package, and bytes per file to publish.
+NPKGS = 10
+NFILES = 40
+FILESZ = 256 * 1024
+
+
+def populate(rpath):
+    """Create a repository at 'rpath' and publish the files to retrieve.
+    Returns the file actions as published."""
+
+    repo = sr.repository_create(rpath, properties={
+        "publisher": { "prefix": "benchmark" } })
+    rand = random.Random(0)
+    fmris = []
+    for i in range(NPKGS):
+        pfmri = fmri.PkgFmri("pkg://benchmark/bench{0:d}@1.0,5.11-0"
+            "".format(i))
+        tid = repo.open("5.11", pfmri)
+        for j in range(NFILES):
+            data = rand.randbytes(FILESZ)
+            act = actions.fromstr("file NOHASH group=bin mode=0444 "
+                "owner=root path=usr/bench{0:d}/{1:d} pkg.size={2:d}"
+                "".format(i, j, len(data)),
+                data=lambda data=data: io.BytesIO(data))
+            repo.add(tid, act)
+        fmris.append(repo.close(tid)[0])
+
+    acts = []
+    for f in fmris:
+        m = manifest.Manifest()
+        m.set_content(pathname=repo.manifest(f))
+        acts.extend(m.gen_actions_by_type("file"))
+    return acts
+
+
+def fetch(rpath, incoming, acts, workers):
+    """Retrieve and verify the content of 'acts' from the repository at
+    'rpath' using 'workers' verification threads, and return the time
+    taken."""
+
+    transport.VERIFY_WORKERS = workers
+    xport, xport_cfg = transport.setup_transport()
+    xport_cfg.incoming_root = incoming
+    pub = transport.setup_publisher("file://" + rpath, "benchmark",
+        xport, xport_cfg)
+
+    start = time.time()
+    mfile = xport.multi_file_ni(pub, None)
+    for a in acts:
+        mfile.add_action(a)
+    mfile.wait_files()
+    t = time.time() - start
+
+    xport.shutdown()
+    shutil.rmtree(incoming)
+    return t
+
+
+if __name__ == "__main__":
+
+    gettext.install("pkg", "/usr/share/locale")
+
+    tdir = tempfile.mkdtemp(prefix="verifybench.")
+    try:
+        rpath = os.path.join(tdir, "repo")
+        acts = populate(rpath)
+        incoming = os.path.join(tdir, "incoming")
+        mbytes = sum(int(a.attrs["pkg.csize"]) for a in acts) / \
+            (1024 * 1024)
+
+        print("{0:d} files, {1:.1f} MB, {2:d} CPUs".format(len(acts),
+            mbytes, os.cpu_count() or 1))
+        for workers in (0, 1, 2, 4, 8):
+            t = min(fetch(rpath, incoming, acts, workers)
+                for i in (1, 2, 3))
+            print("{0:>2d} workers {1:>10.1f} MB/sec".format(workers,
+                mbytes / t))
+    except KeyboardInterrupt:
+        sys.exit(0)
+    finally:
+        shutil.rmtree(tdir)